@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analitik laba (HPP) per produk dan per pelanggan untuk bot nota.
+
+Item nota diringkas per (bulan, jenis, barang, pihak) di tabel item_bulanan
+saat nota disimpan (lihat bot_nota.py), sehingga riwayat bertahun-tahun hanya
+berupa beberapa ribu baris. Baris itu dimuat ke array kolom lalu dihitung
+dengan agregasi per kelompok (bincount): NumPy jika terpasang, modul array
+bawaan jika tidak (hasil sama, hanya lebih lambat).
+
+Perhitungan:
+    WAC bahan  - harga rata-rata tertimbang kumulatif semua belanja bahan
+                 sampai bulan tersebut
+    HPP produk - sum(resep[bahan] * WAC bahan) per satuan produk
+    Laba kotor - (penjualan - retur) - qty bersih * HPP
+    Overhead   - belanja non-bahan (upah, biaya produksi, lain-lain)
+    Laba bersih - laba kotor - overhead
+"""
+
+from array import array
+
+# NumPy di-import saat analisa pertama, bukan saat bot start (import numpy
+# bisa memakan ratusan ms di container baru); lihat muat_numpy()
+np = None
+_numpy_dicoba = False
+
+JENIS_JUAL = 'jual'
+JENIS_RETUR = 'retur'
+JENIS_BELI = 'beli'
+
+# Jumlah bulan yang ditampilkan di tren
+BULAN_TREN = 6
+
+
+def indeks_bulan(bulan):
+    """Ubah bulan integer YYYYMM menjadi nomor bulan berurutan"""
+    return (bulan // 100) * 12 + bulan % 100 - 1
+
+def label_bulan(indeks):
+    """Ubah nomor bulan berurutan menjadi teks mm/YYYY"""
+    return f"{indeks % 12 + 1:02d}/{indeks // 12}"
+
+
+def muat_numpy():
+    """Import NumPy jika terpasang (sekali saja); kembalikan modulnya atau None"""
+    global np, _numpy_dicoba
+    if not _numpy_dicoba:
+        _numpy_dicoba = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+
+# ===== OPERASI KOLOM =====
+def _kolom(tipe, nilai):
+    if np is not None:
+        return np.fromiter(nilai, dtype=np.int64 if tipe == 'q' else np.float64)
+    return array(tipe, nilai)
+
+def _bincount(kode, bobot, panjang):
+    """Jumlahkan `bobot` per `kode` (0..panjang-1) dalam satu lintasan"""
+    if np is not None:
+        return np.bincount(kode, weights=bobot, minlength=panjang)
+    hasil = array('d', bytes(8 * panjang))
+    for k, w in zip(kode, bobot):
+        hasil[k] += w
+    return hasil
+
+def _gabung_kode(a, b, lebar_b):
+    """Kode kelompok dua kolom: a * lebar_b + b"""
+    if np is not None:
+        return a * lebar_b + b
+    return array('q', (x * lebar_b + y for x, y in zip(a, b)))
+
+def _kali(a, b):
+    if np is not None:
+        return a * b
+    return array('d', (x * y for x, y in zip(a, b)))
+
+
+class DataKolom:
+    """Item nota satu usaha dalam bentuk array kolom
+
+    `baris` berisi tuple (bulan YYYYMM, jenis, barang, pihak, qty, nilai)
+    dari tabel item_bulanan.
+    """
+
+    def __init__(self, baris):
+        muat_numpy()
+        self.barang = []
+        self.pihak = []
+        kode_barang, kode_pihak = {}, {}
+        bulan, barang, pihak, qty, nilai = [], [], [], [], []
+        tanda_jual, tanda_beli = [], []
+        for b, jenis, nama_barang, nama_pihak, q, n in baris:
+            if nama_barang not in kode_barang:
+                kode_barang[nama_barang] = len(self.barang)
+                self.barang.append(nama_barang)
+            if nama_pihak not in kode_pihak:
+                kode_pihak[nama_pihak] = len(self.pihak)
+                self.pihak.append(nama_pihak)
+            bulan.append(indeks_bulan(b))
+            barang.append(kode_barang[nama_barang])
+            pihak.append(kode_pihak[nama_pihak])
+            qty.append(q)
+            nilai.append(n)
+            # Penjualan +1, retur -1, belanja 0 (dan sebaliknya untuk belanja)
+            tanda_jual.append(1.0 if jenis == JENIS_JUAL else -1.0 if jenis == JENIS_RETUR else 0.0)
+            tanda_beli.append(1.0 if jenis == JENIS_BELI else 0.0)
+
+        self.jumlah_baris = len(bulan)
+        self.bulan_awal = min(bulan) if bulan else 0
+        self.jumlah_bulan = (max(bulan) - self.bulan_awal + 1) if bulan else 0
+        self.bulan = _kolom('q', (m - self.bulan_awal for m in bulan))
+        self.kode_barang = _kolom('q', barang)
+        self.kode_pihak = _kolom('q', pihak)
+        self.qty = _kolom('d', qty)
+        self.nilai = _kolom('d', nilai)
+        self.tanda_jual = _kolom('d', tanda_jual)
+        self.tanda_beli = _kolom('d', tanda_beli)
+
+
+def _grid(data, kode, bobot):
+    """Agregasi (barang, bulan) -> list baris per barang berisi nilai per bulan"""
+    lebar = data.jumlah_bulan
+    datar = _bincount(kode, bobot, len(data.barang) * lebar)
+    return [list(datar[i * lebar:(i + 1) * lebar]) for i in range(len(data.barang))]
+
+def hitung_analisa(data, bulan, resep, bahan_baku):
+    """Hitung analisa laba untuk bulan YYYYMM
+
+    resep      - {produk: {bahan: pemakaian per satuan}}
+    bahan_baku - nama barang belanja yang masuk HPP (selain itu dianggap overhead)
+    """
+    target = indeks_bulan(bulan)
+    kosong = {
+        'bulan': label_bulan(target), 'produk': [], 'pelanggan': [], 'wac': {},
+        'pendapatan': 0, 'hpp': 0, 'laba_kotor': 0, 'overhead': 0, 'laba_bersih': 0,
+        'tren': [], 'tanpa_biaya': [],
+    }
+    if data.jumlah_baris == 0 or target < data.bulan_awal:
+        return kosong
+    m_target = target - data.bulan_awal
+    if m_target >= data.jumlah_bulan:
+        m_target = None  # bulan target belum punya transaksi (WAC tetap dari bulan terakhir)
+
+    # Lintasan per baris: agregasi (barang, bulan) untuk belanja dan penjualan bersih
+    kode_bb = _gabung_kode(data.kode_barang, data.bulan, data.jumlah_bulan)
+    qty_beli = _grid(data, kode_bb, _kali(data.qty, data.tanda_beli))
+    nilai_beli = _grid(data, kode_bb, _kali(data.nilai, data.tanda_beli))
+    qty_jual = _grid(data, kode_bb, _kali(data.qty, data.tanda_jual))
+    nilai_jual = _grid(data, kode_bb, _kali(data.nilai, data.tanda_jual))
+
+    # WAC kumulatif per bahan per bulan
+    wac = {}
+    for i, nama in enumerate(data.barang):
+        if nama not in bahan_baku:
+            continue
+        total_qty = total_nilai = 0.0
+        per_bulan = []
+        for m in range(data.jumlah_bulan):
+            total_qty += qty_beli[i][m]
+            total_nilai += nilai_beli[i][m]
+            per_bulan.append(total_nilai / total_qty if total_qty > 0 else None)
+        wac[nama] = per_bulan
+
+    def harga_bahan(bahan, m):
+        per_bulan = wac.get(bahan)
+        if not per_bulan:
+            return None
+        return per_bulan[min(m, data.jumlah_bulan - 1)]
+
+    def hpp_satuan(produk, m):
+        total = 0.0
+        for bahan, pemakaian in resep.get(produk, {}).items():
+            total += pemakaian * (harga_bahan(bahan, m) or 0.0)
+        return total
+
+    def ringkas_bulan(m):
+        pendapatan = hpp = overhead = 0.0
+        for i, nama in enumerate(data.barang):
+            if nilai_jual[i][m] or qty_jual[i][m]:
+                pendapatan += nilai_jual[i][m]
+                hpp += qty_jual[i][m] * hpp_satuan(nama, m)
+            if nama not in bahan_baku:
+                overhead += nilai_beli[i][m]
+        return pendapatan, hpp, overhead
+
+    hasil = dict(kosong)
+    if m_target is not None:
+        m = m_target
+        pendapatan, hpp, overhead = ringkas_bulan(m)
+        hasil.update(pendapatan=pendapatan, hpp=hpp, laba_kotor=pendapatan - hpp,
+                     overhead=overhead, laba_bersih=pendapatan - hpp - overhead)
+
+        # Per produk
+        produk = []
+        for i, nama in enumerate(data.barang):
+            if not (nilai_jual[i][m] or qty_jual[i][m]):
+                continue
+            biaya = qty_jual[i][m] * hpp_satuan(nama, m)
+            produk.append(_baris_laba(nama, qty_jual[i][m], nilai_jual[i][m], biaya))
+            if not resep.get(nama) or any(harga_bahan(b, m) is None for b in resep[nama]):
+                hasil['tanpa_biaya'].append(nama)
+        hasil['produk'] = sorted(produk, key=lambda x: -x['laba'])
+
+        # Per pelanggan: lintasan (barang, pihak) khusus bulan target
+        tanda_bulan = _kolom('d', (1.0 if x == m else 0.0 for x in data.bulan)) if np is None \
+            else (data.bulan == m).astype(np.float64)
+        bobot_qty = _kali(_kali(data.qty, data.tanda_jual), tanda_bulan)
+        bobot_nilai = _kali(_kali(data.nilai, data.tanda_jual), tanda_bulan)
+        jumlah_pihak = len(data.pihak)
+        kode_bp = _gabung_kode(data.kode_barang, data.kode_pihak, jumlah_pihak)
+        qty_bp = _bincount(kode_bp, bobot_qty, len(data.barang) * jumlah_pihak)
+        nilai_bp = _bincount(kode_bp, bobot_nilai, len(data.barang) * jumlah_pihak)
+        pelanggan = {}
+        for i, nama_barang in enumerate(data.barang):
+            satuan = hpp_satuan(nama_barang, m)
+            for j in range(jumlah_pihak):
+                k = i * jumlah_pihak + j
+                if qty_bp[k] or nilai_bp[k]:
+                    total = pelanggan.setdefault(data.pihak[j], [0.0, 0.0, 0.0])
+                    total[0] += qty_bp[k]
+                    total[1] += nilai_bp[k]
+                    total[2] += qty_bp[k] * satuan
+        hasil['pelanggan'] = sorted(
+            (_baris_laba(nama, *total) for nama, total in pelanggan.items()), key=lambda x: -x['laba']
+        )
+
+    # WAC per bahan pada bulan target (atau bulan terakhir yang ada)
+    m_wac = data.jumlah_bulan - 1 if m_target is None else m_target
+    hasil['wac'] = {bahan: harga_bahan(bahan, m_wac) for bahan in wac if harga_bahan(bahan, m_wac) is not None}
+
+    # Tren beberapa bulan terakhir sampai bulan target
+    akhir = data.jumlah_bulan - 1 if m_target is None else m_target
+    mulai = max(0, akhir - BULAN_TREN + 1)
+    sebelumnya = None
+    if mulai > 0:
+        pendapatan, hpp, overhead = ringkas_bulan(mulai - 1)
+        sebelumnya = (pendapatan, pendapatan - hpp - overhead)
+    for m in range(mulai, akhir + 1):
+        pendapatan, hpp, overhead = ringkas_bulan(m)
+        laba_bersih = pendapatan - hpp - overhead
+        hasil['tren'].append({
+            'bulan': label_bulan(data.bulan_awal + m),
+            'pendapatan': pendapatan,
+            'laba_kotor': pendapatan - hpp,
+            'laba_bersih': laba_bersih,
+            'perubahan_pendapatan': _persen(pendapatan, sebelumnya[0]) if sebelumnya else None,
+            'perubahan_laba': _persen(laba_bersih, sebelumnya[1]) if sebelumnya else None,
+        })
+        sebelumnya = (pendapatan, laba_bersih)
+    return hasil
+
+def _baris_laba(nama, qty, pendapatan, hpp):
+    laba = pendapatan - hpp
+    return {
+        'nama': nama, 'qty': qty, 'pendapatan': pendapatan, 'hpp': hpp, 'laba': laba,
+        'margin': (laba / pendapatan * 100) if pendapatan else None,
+    }
+
+def _persen(sekarang, sebelum):
+    if not sebelum:
+        return None
+    return (sekarang - sebelum) / abs(sebelum) * 100
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arsip tahunan nota untuk bot nota (backend SQLite).
+
+Nota tahun buku yang sudah tutup dipindah dari database utama ke satu file
+arsip per tahun (ARSIP_DIR/nota-YYYY.db), sehingga index, FTS, backup, dan
+VACUUM database utama hanya menanggung tahun-tahun terakhir:
+
+    - nota_penjualan / nota_belanja arsip memakai id yang sama dengan
+      database utama; daftar_barang & retur_items disimpan sebagai JSON
+      terkompresi deflate dengan kamus KAMUS_ZLIB (BLOB, buka lagi dengan
+      `buka_json`)
+    - baris nota_fts ikut dipindah dengan rowid yang sama, jadi pencarian
+      di arsip memakai query FTS5 yang sama dengan database utama
+    - jumlah & total nota yang dipindah ditambahkan ke ringkasan_arsip
+      (per usaha per bulan) di database utama, sehingga STATISTIK tidak
+      pernah membuka arsip; item_bulanan (/laba) dan ringkasan_harian tetap
+    - nota belum lunas (sisa < 0) tetap di database utama agar piutang dan
+      laporan harian tidak membaca arsip; setelah lunas ikut dipindah pada
+      run berikutnya
+    - event jurnal nota (jurnal.py) ikut dipindah, snapshot-nya dihapus;
+      nota di arsip tidak bisa dikoreksi lagi
+
+Pemindahan per batch dengan dua transaksi pendek: salin ke arsip (commit),
+lalu hapus dari database utama hanya baris yang salinan arsipnya sama persis
+sambil menambah ringkasan (commit). Jika proses berhenti di antaranya atau
+nota diubah setelah disalin, run berikutnya menyalin ulang (INSERT OR
+REPLACE) lalu menghapus, tanpa nota hilang atau terhitung dua kali. Nota
+yang dibatalkan setelah disalin dibuang lagi dari arsip. Pembaca melewati
+baris arsip yang masih ada di database utama (mis. setelah /restore
+snapshot lama).
+
+Repositori SQLite meng-ATTACH file arsip hanya saat halaman histori atau
+pencarian melewati data database utama.
+
+Pemakaian dari command line:
+
+    python arsip.py --db keuangan.db --sampai 2024
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import datetime
+
+from tutup_buku import Pembatas
+
+logger = logging.getLogger(__name__)
+
+NAMA_FILE = "nota-{tahun}.db"
+
+# Nota per batch pemindahan (dua transaksi pendek per batch)
+UKURAN_BATCH = 2000
+
+# Level kompresi zlib JSON barang (arsip jarang dibaca, ukuran lebih penting)
+LEVEL_ZLIB = 9
+
+# Jendela deflate kompresor 4 KB (2**12): JSON per nota jauh lebih kecil,
+# hasilnya sama kecil tetapi alokasi state per panggilan ~3x lebih cepat
+# (penting untuk event jurnal yang dikompres per nota saat simpan/impor).
+# Pembuka tetap memakai jendela penuh, jadi BLOB lama tetap terbaca.
+WBITS_KOMPRES = 12
+
+# JSON barang per nota pendek (~100 byte), zlib biasa hanya menghemat ~20%.
+# Deflate mentah (tanpa header) dengan kamus berisi kerangka JSON dan nama
+# barang bawaan bot menghemat ~70%. JANGAN diubah setelah ada file arsip:
+# BLOB lama hanya bisa dibuka dengan kamus yang sama persis.
+KAMUS_ZLIB = (
+    b'[]'
+    b'{"nama": "Kacang Kupas", "harga": 25000, "qty": 1, "subtotal": 25000}, '
+    b'{"nama": "Bumbu", "harga": , "qty": , "subtotal": }, {"nama": "Minyak", '
+    b'{"nama": "Plastik", {"nama": "Label", {"nama": "Biaya Produksi", '
+    b'{"nama": "Gas LPG", {"nama": "Upah goreng", {"nama": "Upah Bungkus", '
+    b'{"nama": "Lain-lain", {"nama": "Kc Bawang Kiloan", "harga": 41000, '
+    b'[{"nama": "Kc Bawang Renceng", "harga": 1200, "qty": 100, "subtotal": 120000}]'
+)
+
+# Nama skema saat file arsip di-ATTACH
+SKEMA = "arsip"
+
+KOLOM_ARSIP = {
+    'nota_penjualan': (
+        'id', 'user_id', 'business_id', 'nomor_nota', 'nama_pelanggan', 'tanggal', 'timestamp', 'daftar_barang',
+        'retur_items', 'total_sebelum_retur', 'total_retur', 'total_setelah_retur', 'bayar', 'sisa', 'status',
+        'keterangan',
+    ),
+    'nota_belanja': (
+        'id', 'user_id', 'business_id', 'nomor_nota', 'nama_supplier', 'tanggal', 'timestamp', 'daftar_barang',
+        'total_belanja', 'keterangan',
+    ),
+}
+KOLOM_JSON = ('daftar_barang', 'retur_items')
+
+# rowid nota_fts = id * 2 untuk penjualan, id * 2 + 1 untuk belanja (lihat migrasi.py)
+GANJIL_FTS = {'nota_penjualan': 0, 'nota_belanja': 1}
+
+# jenis_nota di tabel nota_event
+JENIS_EVENT = {'nota_penjualan': 'penjualan', 'nota_belanja': 'belanja'}
+KOLOM_EVENT = "id, business_id, jenis_nota, nota_id, nomor_nota, jenis, data, user_id, timestamp"
+
+# Hanya nota lunas yang dipindah; piutang tetap di database utama
+SYARAT_PINDAH = {
+    'nota_penjualan': "ifnull(sisa, 0) >= 0",
+    'nota_belanja': "1",
+}
+
+SKEMA_ARSIP = [
+    '''
+    CREATE TABLE IF NOT EXISTS {db}.nota_penjualan (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        business_id INTEGER,
+        nomor_nota TEXT,
+        nama_pelanggan TEXT,
+        tanggal TEXT,
+        timestamp TEXT,
+        daftar_barang BLOB,
+        retur_items BLOB,
+        total_sebelum_retur INTEGER,
+        total_retur INTEGER,
+        total_setelah_retur INTEGER,
+        bayar INTEGER,
+        sisa INTEGER,
+        status TEXT,
+        keterangan TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS {db}.nota_belanja (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        business_id INTEGER,
+        nomor_nota TEXT,
+        nama_supplier TEXT,
+        tanggal TEXT,
+        timestamp TEXT,
+        daftar_barang BLOB,
+        total_belanja INTEGER,
+        keterangan TEXT
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS {db}.idx_penjualan_business_waktu ON nota_penjualan (business_id, timestamp, total_setelah_retur)",
+    "CREATE INDEX IF NOT EXISTS {db}.idx_penjualan_business_pelanggan ON nota_penjualan (business_id, nama_pelanggan, timestamp)",
+    "CREATE INDEX IF NOT EXISTS {db}.idx_penjualan_nomor ON nota_penjualan (nomor_nota)",
+    "CREATE INDEX IF NOT EXISTS {db}.idx_belanja_business_waktu ON nota_belanja (business_id, timestamp, total_belanja)",
+    "CREATE INDEX IF NOT EXISTS {db}.idx_belanja_nomor ON nota_belanja (nomor_nota)",
+    '''
+    CREATE TABLE IF NOT EXISTS {db}.nota_event (
+        id INTEGER PRIMARY KEY,
+        business_id INTEGER NOT NULL,
+        jenis_nota TEXT NOT NULL,
+        nota_id INTEGER NOT NULL,
+        nomor_nota TEXT NOT NULL,
+        jenis TEXT NOT NULL,
+        data BLOB NOT NULL,
+        user_id INTEGER,
+        timestamp TEXT NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS {db}.idx_event_nota ON nota_event (jenis_nota, nota_id, id)",
+    "CREATE INDEX IF NOT EXISTS {db}.idx_event_nomor ON nota_event (business_id, nomor_nota, id)",
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {db}.nota_fts USING fts5(
+        nomor_nota, nama, barang, keterangan, usaha,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''',
+]
+
+# Ringkasan nota yang dipindah, dalam transaksi yang sama dengan DELETE-nya
+SQL_TAMBAH_RINGKASAN = {
+    'nota_penjualan': '''
+        INSERT INTO main.ringkasan_arsip
+        (business_id, bulan, jumlah_penjualan, total_penjualan, jumlah_belanja, total_belanja)
+        SELECT business_id, CAST(strftime('%Y%m', timestamp) AS INTEGER), COUNT(*),
+               ifnull(SUM(total_setelah_retur), 0), 0, 0
+        FROM main.nota_penjualan WHERE business_id IS NOT NULL AND {syarat}
+        GROUP BY 1, 2
+        ON CONFLICT(business_id, bulan) DO UPDATE SET
+            jumlah_penjualan = jumlah_penjualan + excluded.jumlah_penjualan,
+            total_penjualan = total_penjualan + excluded.total_penjualan
+    ''',
+    'nota_belanja': '''
+        INSERT INTO main.ringkasan_arsip
+        (business_id, bulan, jumlah_penjualan, total_penjualan, jumlah_belanja, total_belanja)
+        SELECT business_id, CAST(strftime('%Y%m', timestamp) AS INTEGER), 0, 0, COUNT(*),
+               ifnull(SUM(total_belanja), 0)
+        FROM main.nota_belanja WHERE business_id IS NOT NULL AND {syarat}
+        GROUP BY 1, 2
+        ON CONFLICT(business_id, bulan) DO UPDATE SET
+            jumlah_belanja = jumlah_belanja + excluded.jumlah_belanja,
+            total_belanja = total_belanja + excluded.total_belanja
+    ''',
+}
+
+
+def _sekarang():
+    return datetime.datetime.now().isoformat()
+
+def kompres_json(teks):
+    """JSON (teks) -> BLOB deflate (kamus KAMUS_ZLIB) untuk kolom barang di arsip"""
+    if teks is None:
+        return None
+    kompresor = zlib.compressobj(LEVEL_ZLIB, zlib.DEFLATED, -WBITS_KOMPRES, zdict=KAMUS_ZLIB)
+    return kompresor.compress(teks.encode('utf-8')) + kompresor.flush()
+
+def buka_json(blob):
+    """BLOB kolom barang arsip -> list/dict"""
+    if blob is None:
+        return None
+    pembuka = zlib.decompressobj(-zlib.MAX_WBITS, zdict=KAMUS_ZLIB)
+    return json.loads(pembuka.decompress(blob) + pembuka.flush())
+
+def path_arsip(arsip_dir, tahun):
+    return os.path.join(arsip_dir, NAMA_FILE.format(tahun=tahun))
+
+def tahun_tutup_terakhir(hari_ini, setelah_bulan=3):
+    """Tahun terbaru yang sudah boleh diarsip: tahun lalu setelah `setelah_bulan` bulan berjalan"""
+    return hari_ini.year - 1 if hari_ini.month > setelah_bulan else hari_ini.year - 2
+
+
+# ===== BACA ARSIP =====
+def daftar_arsip(conn, arsip_dir):
+    """[(tahun, path)] arsip yang tercatat di database utama dan filenya ada, terbaru dulu"""
+    return [
+        (tahun, path) for tahun, path in (
+            (tahun, os.path.join(arsip_dir, nama_file)) for tahun, nama_file in conn.execute(
+                "SELECT tahun, file FROM arsip_tahun ORDER BY tahun DESC"
+            )
+        )
+        if os.path.exists(path)
+    ]
+
+def pasang(conn, path):
+    """ATTACH file arsip sebagai skema `arsip` (file harus sudah ada, ATTACH membuat file kosong)"""
+    conn.execute(f"ATTACH DATABASE ? AS {SKEMA}", (path,))
+
+def lepas(conn):
+    conn.execute(f"DETACH DATABASE {SKEMA}")
+
+
+# ===== PINDAHKAN NOTA =====
+def _ada_kandidat(conn, tabel, rentang):
+    return conn.execute(
+        f"SELECT 1 FROM main.{tabel} WHERE timestamp >= ? AND timestamp < ? AND {SYARAT_PINDAH[tabel]} LIMIT 1",
+        rentang
+    ).fetchone() is not None
+
+def _pindahkan(conn, tabel, tahun, rentang, ukuran_batch, pembatas):
+    """Pindahkan nota `tabel` dalam rentang timestamp ke arsip per batch; kembalikan jumlahnya"""
+    kolom = KOLOM_ARSIP[tabel]
+    daftar_kolom = ", ".join(kolom)
+    pilih = ", ".join(f"kompres_json({k})" if k in KOLOM_JSON else k for k in kolom)
+    ganjil = GANJIL_FTS[tabel]
+    # Hanya baris yang salinannya di arsip masih sama persis; nota yang berubah di
+    # antara kedua transaksi tetap di database utama dan disalin ulang run berikutnya
+    sama = " AND ".join(
+        f"a.{k} IS kompres_json({tabel}.{k})" if k in KOLOM_JSON else f"a.{k} IS {tabel}.{k}" for k in kolom
+    )
+    syarat_batch = (
+        f"id IN (SELECT value FROM json_each(:ids)) "
+        f"AND EXISTS (SELECT 1 FROM {SKEMA}.{tabel} a WHERE {sama})"
+    )
+    # Nota batch ini yang sudah tidak ada di database utama sebelum dihapus: dibatalkan setelah disalin
+    dibatalkan = (
+        f"id IN (SELECT value FROM json_each(:ids)) "
+        f"AND NOT EXISTS (SELECT 1 FROM main.{tabel} m WHERE m.id = {SKEMA}.{tabel}.id)"
+    )
+    jenis = 'jumlah_penjualan' if tabel == 'nota_penjualan' else 'jumlah_belanja'
+
+    terakhir, jumlah = 0, 0
+    while True:
+        ids = [row[0] for row in conn.execute(f'''
+            SELECT id FROM main.{tabel}
+            WHERE id > ? AND timestamp >= ? AND timestamp < ? AND {SYARAT_PINDAH[tabel]}
+            ORDER BY id LIMIT ?
+        ''', (terakhir, *rentang, ukuran_batch))]
+        if not ids:
+            return jumlah
+        terakhir = ids[-1]
+        parameter = {'ids': json.dumps(ids), 'ganjil': ganjil, 'jenis': JENIS_EVENT[tabel]}
+
+        # 1. Salin ke arsip: hanya file arsip yang ditulis, database utama tidak dikunci
+        conn.execute("BEGIN")
+        try:
+            conn.execute(f'''
+                INSERT OR REPLACE INTO {SKEMA}.{tabel} ({daftar_kolom})
+                SELECT {pilih} FROM main.{tabel} WHERE id IN (SELECT value FROM json_each(:ids))
+            ''', parameter)
+            conn.execute(
+                f"DELETE FROM {SKEMA}.nota_fts WHERE rowid IN (SELECT value * 2 + :ganjil FROM json_each(:ids))",
+                parameter
+            )
+            conn.execute(f'''
+                INSERT INTO {SKEMA}.nota_fts (rowid, nomor_nota, nama, barang, keterangan, usaha)
+                SELECT rowid, nomor_nota, nama, barang, keterangan, usaha FROM main.nota_fts
+                WHERE rowid IN (SELECT value * 2 + :ganjil FROM json_each(:ids))
+            ''', parameter)
+            conn.execute(f'''
+                INSERT OR REPLACE INTO {SKEMA}.nota_event ({KOLOM_EVENT})
+                SELECT {KOLOM_EVENT} FROM main.nota_event
+                WHERE jenis_nota = :jenis AND nota_id IN (SELECT value FROM json_each(:ids))
+            ''', parameter)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+        # 2. Hapus dari database utama yang sudah tersalin + ringkasan, satu transaksi
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f'''
+                DELETE FROM {SKEMA}.nota_fts WHERE rowid IN (SELECT id * 2 + :ganjil FROM {SKEMA}.{tabel} WHERE {dibatalkan})
+            ''', parameter)
+            conn.execute(f'''
+                DELETE FROM {SKEMA}.nota_event
+                WHERE jenis_nota = :jenis AND nota_id IN (SELECT id FROM {SKEMA}.{tabel} WHERE {dibatalkan})
+            ''', parameter)
+            conn.execute(f"DELETE FROM {SKEMA}.{tabel} WHERE {dibatalkan}", parameter)
+            conn.execute(SQL_TAMBAH_RINGKASAN[tabel].format(syarat=syarat_batch), parameter)
+            # Trigger DELETE nota ikut membuang baris nota_fts database utama
+            pindah = conn.execute(f"DELETE FROM main.{tabel} WHERE {syarat_batch}", parameter).rowcount
+            # Event yang sudah tersalin untuk nota yang baru dipindah; event yang ditulis setelah
+            # salinan dibuat (notanya berubah, jadi tidak dipindah) tetap di database utama
+            sudah_pindah = (
+                f"jenis_nota = :jenis AND nota_id IN (SELECT value FROM json_each(:ids)) "
+                f"AND NOT EXISTS (SELECT 1 FROM main.{tabel} m WHERE m.id = nota_id)"
+            )
+            conn.execute(f'''
+                DELETE FROM main.nota_event WHERE {sudah_pindah}
+                AND EXISTS (SELECT 1 FROM {SKEMA}.nota_event a WHERE a.id = main.nota_event.id)
+            ''', parameter)
+            conn.execute(f'''
+                DELETE FROM main.snapshot_nota WHERE {sudah_pindah}
+                AND EXISTS (SELECT 1 FROM {SKEMA}.{tabel} a WHERE a.id = nota_id)
+            ''', parameter)
+            conn.execute(f'''
+                INSERT INTO main.arsip_tahun (tahun, file, {jenis}, diperbarui) VALUES (?, ?, ?, ?)
+                ON CONFLICT(tahun) DO UPDATE SET
+                    {jenis} = {jenis} + excluded.{jenis}, diperbarui = excluded.diperbarui
+            ''', (tahun, NAMA_FILE.format(tahun=tahun), pindah, _sekarang()))
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        jumlah += pindah
+        pembatas.jeda()
+
+def arsipkan_tahun(db_file, tahun, arsip_dir, ukuran_batch=UKURAN_BATCH, cpu_persen=50):
+    """Pindahkan nota lunas tahun `tahun` ke file arsipnya; kembalikan dict info
+
+    Blocking, dipanggil lewat asyncio.to_thread. Aman diulang: tahun yang
+    sudah diarsip hanya memindahkan nota yang baru lunas.
+    """
+    path = path_arsip(arsip_dir, tahun)
+    rentang = (f"{tahun:04d}-01-01", f"{tahun + 1:04d}-01-01")
+    info = {'tahun': tahun, 'file': path, 'penjualan': 0, 'belanja': 0}
+    t0 = time.perf_counter()
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    try:
+        if not any(_ada_kandidat(conn, tabel, rentang) for tabel in KOLOM_ARSIP):
+            return info
+
+        os.makedirs(arsip_dir, exist_ok=True)
+        conn.create_function("kompres_json", 1, kompres_json, deterministic=True)
+        pasang(conn, path)
+        for sql in SKEMA_ARSIP:
+            conn.execute(sql.format(db=SKEMA))
+
+        pembatas = Pembatas(cpu_persen)
+        info['penjualan'] = _pindahkan(conn, 'nota_penjualan', tahun, rentang, ukuran_batch, pembatas)
+        info['belanja'] = _pindahkan(conn, 'nota_belanja', tahun, rentang, ukuran_batch, pembatas)
+
+        # Arsip jarang ditulis lagi: rapatkan indeks FTS dan file sekali di akhir
+        conn.execute(f"INSERT INTO {SKEMA}.nota_fts (nota_fts) VALUES ('optimize')")
+        conn.execute(f"VACUUM {SKEMA}")
+        lepas(conn)
+    finally:
+        conn.close()
+
+    info['ukuran'] = os.path.getsize(path)
+    info['durasi_detik'] = round(time.perf_counter() - t0, 2)
+    logger.info(f"🗄️ Arsip {tahun}: {info['penjualan']:,} nota penjualan, {info['belanja']:,} nota belanja "
+                f"dipindah ({info['ukuran'] / 1024 / 1024:.1f} MB, {info['durasi_detik']} detik)")
+    return info
+
+def tahun_kandidat(db_file, sampai_tahun):
+    """Tahun <= `sampai_tahun` yang masih punya nota yang bisa dipindah, terlama dulu"""
+    batas = f"{sampai_tahun + 1:04d}-01-01"
+    conn = sqlite3.connect(db_file)
+    try:
+        tahun = set()
+        for tabel, syarat in SYARAT_PINDAH.items():
+            tahun.update(row[0] for row in conn.execute(f'''
+                SELECT DISTINCT CAST(substr(timestamp, 1, 4) AS INTEGER) FROM {tabel}
+                WHERE timestamp < ? AND {syarat}
+            ''', (batas,)))
+        return sorted(t for t in tahun if t)
+    finally:
+        conn.close()
+
+def arsipkan(db_file, arsip_dir, sampai_tahun, ukuran_batch=UKURAN_BATCH, cpu_persen=50):
+    """Arsipkan semua tahun tutup sampai `sampai_tahun`; kembalikan list info per tahun yang berubah"""
+    hasil = []
+    for tahun in tahun_kandidat(db_file, sampai_tahun):
+        info = arsipkan_tahun(db_file, tahun, arsip_dir, ukuran_batch=ukuran_batch, cpu_persen=cpu_persen)
+        if info['penjualan'] or info['belanja']:
+            hasil.append(info)
+    return hasil
+
+def status_arsip(db_file, arsip_dir):
+    """[(tahun, jumlah_penjualan, jumlah_belanja, ukuran file byte)] semua arsip, terlama dulu"""
+    conn = sqlite3.connect(db_file)
+    try:
+        return [
+            (tahun, penjualan, belanja, os.path.getsize(path) if os.path.exists(path) else 0)
+            for tahun, penjualan, belanja, path in (
+                (tahun, penjualan, belanja, os.path.join(arsip_dir, nama_file))
+                for tahun, nama_file, penjualan, belanja in conn.execute(
+                    "SELECT tahun, file, jumlah_penjualan, jumlah_belanja FROM arsip_tahun ORDER BY tahun"
+                )
+            )
+        ]
+    finally:
+        conn.close()
+
+
+def main():
+    # argparse hanya untuk CLI, tidak ikut dimuat saat bot start
+    import argparse
+    parser = argparse.ArgumentParser(description="Arsip tahunan nota bot")
+    parser.add_argument('--db', required=True, help="path keuangan.db (skema sudah dimigrasi)")
+    parser.add_argument('--arsip-dir', help="folder file arsip (default: folder arsip di samping database)")
+    parser.add_argument('--sampai', type=int, help="tahun terakhir yang diarsip (default: tahun tutup terakhir)")
+    parser.add_argument('--batch', type=int, default=UKURAN_BATCH, help="nota per batch")
+    parser.add_argument('--cpu', type=int, default=100, help="batas CPU (persen)")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    arsip_dir = args.arsip_dir or os.path.join(os.path.dirname(os.path.abspath(args.db)), "arsip")
+    sampai = args.sampai if args.sampai is not None else tahun_tutup_terakhir(datetime.date.today())
+    for info in arsipkan(args.db, arsip_dir, sampai, ukuran_batch=args.batch, cpu_persen=args.cpu):
+        print(f"{info['tahun']}: {info['penjualan']:,} penjualan, {info['belanja']:,} belanja → {info['file']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backup online database bot nota.
+
+Snapshot dibuat dengan SQLite online backup API ke file sementara, lalu
+dikompres gzip dan disimpan ke penyimpanan tujuan:
+
+    PenyimpananLokal - direktori lokal (default BACKUP_DIR, juga untuk uji)
+    PenyimpananS3    - bucket S3 / kompatibel S3 (butuh paket `boto3`)
+
+Pada mode WAL backup dijalankan dalam satu langkah: SQLite memakai satu
+read transaction sehingga penulis tetap jalan. Di luar WAL, backup disalin
+bertahap (beberapa halaman per langkah dengan jeda) agar lock tidak lama.
+
+Restore memilih snapshot terakhir pada/atau sebelum waktu yang diminta,
+mengecek integritasnya, membuat snapshot pengaman dari kondisi sekarang,
+lalu menyalin isinya ke database aktif lewat backup API.
+
+File arsip tahunan (arsip.py) tidak ikut snapshot. Setelah diarsipkan, tiap
+ARSIP_DIR/nota-YYYY.db diunggah ke penyimpanan yang sama sebagai
+arsip-nota-YYYY.db.gz (di luar daftar snapshot dan retensi); file penanda
+.terunggah di sampingnya mencatat ukuran & mtime yang sudah diunggah, jadi
+hanya arsip yang berubah yang diunggah ulang. Setelah restore, arsip yang
+tercatat di database hasil restore tetapi filenya hilang/rusak diunduh lagi.
+"""
+
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+import datetime
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "keuangan-"
+PREFIX_ARSIP = "arsip-"
+AKHIRAN = ".db.gz"
+AKHIRAN_TERUNGGAH = ".terunggah"
+FORMAT_WAKTU = "%Y%m%d-%H%M%S"
+
+# Backup bertahap (non-WAL): halaman per langkah dan jeda antar langkah
+HALAMAN_PER_LANGKAH = 256
+JEDA_LANGKAH = 0.005
+
+UKURAN_BLOK = 1024 * 1024
+
+
+# ===== PENYIMPANAN =====
+class PenyimpananLokal:
+    """Snapshot disimpan sebagai file di direktori lokal"""
+
+    def __init__(self, direktori):
+        self.direktori = direktori
+        os.makedirs(direktori, exist_ok=True)
+
+    def simpan(self, nama, path):
+        tujuan = os.path.join(self.direktori, nama)
+        sementara = tujuan + ".tmp"
+        shutil.copyfile(path, sementara)
+        os.replace(sementara, tujuan)
+
+    def ambil(self, nama, path):
+        shutil.copyfile(os.path.join(self.direktori, nama), path)
+
+    def daftar(self, prefix=PREFIX):
+        return sorted(n for n in os.listdir(self.direktori) if n.startswith(prefix) and n.endswith(AKHIRAN))
+
+    def hapus(self, nama):
+        os.remove(os.path.join(self.direktori, nama))
+
+    def ukuran(self, nama):
+        return os.path.getsize(os.path.join(self.direktori, nama))
+
+
+class PenyimpananS3:
+    """Snapshot disimpan sebagai object di bucket S3 (atau kompatibel, lewat endpoint_url)"""
+
+    def __init__(self, bucket, prefix="backup/", endpoint_url=None):
+        import boto3
+        self.klien = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def simpan(self, nama, path):
+        self.klien.upload_file(path, self.bucket, self.prefix + nama)
+
+    def ambil(self, nama, path):
+        self.klien.download_file(self.bucket, self.prefix + nama, path)
+
+    def daftar(self, prefix=PREFIX):
+        hasil = []
+        for halaman in self.klien.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in halaman.get('Contents', []):
+                nama = obj['Key'][len(self.prefix):]
+                if nama.startswith(prefix) and nama.endswith(AKHIRAN):
+                    hasil.append(nama)
+        return sorted(hasil)
+
+    def hapus(self, nama):
+        self.klien.delete_object(Bucket=self.bucket, Key=self.prefix + nama)
+
+    def ukuran(self, nama):
+        return self.klien.head_object(Bucket=self.bucket, Key=self.prefix + nama)['ContentLength']
+
+
+def buat_penyimpanan(direktori=None, s3_bucket=None, s3_endpoint=None):
+    """Buat penyimpanan sesuai konfigurasi (S3 jika bucket diisi, selain itu direktori lokal)"""
+    if s3_bucket:
+        return PenyimpananS3(s3_bucket, endpoint_url=s3_endpoint)
+    return PenyimpananLokal(direktori)
+
+
+# ===== NAMA SNAPSHOT =====
+def nama_snapshot(waktu, label=""):
+    return f"{PREFIX}{waktu.strftime(FORMAT_WAKTU)}{'-' + label if label else ''}{AKHIRAN}"
+
+def waktu_snapshot(nama):
+    """Waktu pembuatan dari nama file snapshot, atau None jika bukan snapshot"""
+    try:
+        return datetime.datetime.strptime(nama[len(PREFIX):len(PREFIX) + 15], FORMAT_WAKTU)
+    except ValueError:
+        return None
+
+
+# ===== SNAPSHOT =====
+def _salin_online(db_file, tujuan):
+    """Salin database aktif ke file `tujuan` dengan backup API"""
+    sumber = sqlite3.connect(db_file, timeout=30)
+    salinan = sqlite3.connect(tujuan)
+    try:
+        mode = sumber.execute("PRAGMA journal_mode").fetchone()[0]
+        if mode == 'wal':
+            # Satu read transaction: penulis lain tidak terblokir
+            sumber.backup(salinan)
+        else:
+            sumber.backup(salinan, pages=HALAMAN_PER_LANGKAH, sleep=JEDA_LANGKAH)
+    finally:
+        salinan.close()
+        sumber.close()
+
+def _kompres(path_asal, path_tujuan):
+    with open(path_asal, 'rb') as masuk, gzip.open(path_tujuan, 'wb', compresslevel=6) as keluar:
+        shutil.copyfileobj(masuk, keluar, UKURAN_BLOK)
+
+def _dekompres(path_asal, path_tujuan):
+    with gzip.open(path_asal, 'rb') as masuk, open(path_tujuan, 'wb') as keluar:
+        shutil.copyfileobj(masuk, keluar, UKURAN_BLOK)
+
+def buat_snapshot(db_file, penyimpanan, label="", waktu=None):
+    """Buat snapshot terkompresi; kembalikan dict info (nama, ukuran, durasi)"""
+    waktu = waktu or datetime.datetime.now()
+    nama = nama_snapshot(waktu, label)
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="backup-") as tmp:
+        salinan = os.path.join(tmp, "salinan.db")
+        _salin_online(db_file, salinan)
+        t_salin = time.perf_counter()
+        terkompresi = os.path.join(tmp, nama)
+        _kompres(salinan, terkompresi)
+        ukuran_asli = os.path.getsize(salinan)
+        ukuran = os.path.getsize(terkompresi)
+        penyimpanan.simpan(nama, terkompresi)
+    info = {
+        'nama': nama,
+        'ukuran_db': ukuran_asli,
+        'ukuran': ukuran,
+        'durasi_salin': round(t_salin - t0, 3),
+        'durasi_total': round(time.perf_counter() - t0, 3),
+    }
+    logger.info(f"💾 Snapshot {nama} ({ukuran / 1024 / 1024:.1f} MB, {info['durasi_total']} detik)")
+    return info
+
+
+# ===== RETENSI =====
+def pilih_hapus(daftar_nama, sekarang, simpan_jam=24, simpan_hari=14, simpan_minggu=8):
+    """Tentukan snapshot yang dihapus
+
+    Semua snapshot dalam `simpan_jam` terakhir disimpan; setelah itu satu per
+    hari selama `simpan_hari`, lalu satu per minggu selama `simpan_minggu`.
+    Snapshot terbaru tidak pernah dihapus.
+    """
+    berwaktu = sorted(
+        ((waktu_snapshot(n), n) for n in daftar_nama if waktu_snapshot(n) is not None), reverse=True
+    )
+    simpan = set()
+    ember = set()
+    for i, (waktu, nama) in enumerate(berwaktu):
+        umur = sekarang - waktu
+        if i == 0 or umur <= datetime.timedelta(hours=simpan_jam):
+            simpan.add(nama)
+        elif umur <= datetime.timedelta(days=simpan_hari):
+            kunci = ('hari', waktu.date())
+            if kunci not in ember:
+                ember.add(kunci)
+                simpan.add(nama)
+        elif umur <= datetime.timedelta(weeks=simpan_minggu):
+            kunci = ('minggu', waktu.isocalendar()[:2])
+            if kunci not in ember:
+                ember.add(kunci)
+                simpan.add(nama)
+    return [nama for _, nama in berwaktu if nama not in simpan]
+
+def terapkan_retensi(penyimpanan, sekarang=None, **kebijakan):
+    """Hapus snapshot di luar kebijakan retensi; kembalikan daftar yang dihapus"""
+    dihapus = pilih_hapus(penyimpanan.daftar(), sekarang or datetime.datetime.now(), **kebijakan)
+    for nama in dihapus:
+        penyimpanan.hapus(nama)
+    if dihapus:
+        logger.info(f"🧹 {len(dihapus)} snapshot lama dihapus")
+    return dihapus
+
+
+# ===== RESTORE =====
+def _versi_data_maks(conn):
+    """Versi data tertinggi semua usaha, atau None jika skema belum punya versi_data"""
+    try:
+        return conn.execute("SELECT ifnull(MAX(versi_data), 0) FROM usaha").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+def cari_snapshot(penyimpanan, waktu):
+    """Snapshot terakhir yang dibuat pada atau sebelum `waktu`, atau None"""
+    kandidat = [n for n in penyimpanan.daftar() if waktu_snapshot(n) is not None and waktu_snapshot(n) <= waktu]
+    return max(kandidat, key=waktu_snapshot) if kandidat else None
+
+def pulihkan(db_file, penyimpanan, nama):
+    """Ganti isi database aktif dengan snapshot `nama`
+
+    Sebelum menimpa, kondisi sekarang disimpan sebagai snapshot berlabel
+    'pra-restore'. versi_data setiap usaha dinaikkan melewati versi tertinggi
+    sebelum restore, supaya cache worker lain (yang dicek dengan versi_data)
+    tidak menganggap isi lamanya masih berlaku. Kembalikan nama snapshot
+    pengaman tersebut.
+    """
+    with tempfile.TemporaryDirectory(prefix="restore-") as tmp:
+        terkompresi = os.path.join(tmp, nama)
+        penyimpanan.ambil(nama, terkompresi)
+        hasil = os.path.join(tmp, "hasil.db")
+        _dekompres(terkompresi, hasil)
+
+        sumber = sqlite3.connect(hasil)
+        try:
+            cek = sumber.execute("PRAGMA integrity_check").fetchone()[0]
+            if cek != 'ok':
+                raise ValueError(f"Snapshot {nama} rusak: {cek}")
+
+            pengaman = buat_snapshot(db_file, penyimpanan, label="pra-restore")['nama']
+
+            aktif = sqlite3.connect(db_file, timeout=30)
+            try:
+                versi_lama = _versi_data_maks(aktif)
+                sumber.backup(aktif)
+                if versi_lama is not None and _versi_data_maks(aktif) is not None:
+                    aktif.execute("UPDATE usaha SET versi_data = versi_data + ?", (versi_lama + 1,))
+                    aktif.commit()
+            finally:
+                aktif.close()
+        finally:
+            sumber.close()
+    logger.info(f"♻️ Database dipulihkan dari {nama} (pengaman: {pengaman})")
+    return pengaman
+
+
+# ===== ARSIP TAHUNAN =====
+def nama_arsip(path):
+    """Nama object backup untuk file arsip (nota-2024.db -> arsip-nota-2024.db.gz)"""
+    return f"{PREFIX_ARSIP}{os.path.basename(path)}.gz"
+
+def _tanda_arsip(path):
+    st = os.stat(path)
+    return f"{st.st_size} {st.st_mtime_ns}"
+
+def _sudah_terunggah(path):
+    try:
+        with open(path + AKHIRAN_TERUNGGAH) as f:
+            return f.read().strip() == _tanda_arsip(path)
+    except OSError:
+        return False
+
+def _tandai_terunggah(path, tanda):
+    with open(path + AKHIRAN_TERUNGGAH, 'w') as f:
+        f.write(tanda)
+
+def _arsip_tercatat(db_file, arsip_dir):
+    """[path] semua file arsip yang tercatat di arsip_tahun database `db_file`"""
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        return [os.path.join(arsip_dir, nama_file) for (nama_file,) in conn.execute(
+            "SELECT file FROM arsip_tahun ORDER BY tahun"
+        )]
+    except sqlite3.OperationalError:
+        # Snapshot dari sebelum migrasi arsip: belum ada tabel arsip_tahun
+        return []
+    finally:
+        conn.close()
+
+def unggah_arsip(db_file, arsip_dir, penyimpanan):
+    """Unggah file arsip yang belum/berubah sejak unggahan terakhir; kembalikan nama object yang diunggah
+
+    Gagal di tengah jalan tidak menandai file, jadi diunggah lagi pada
+    pemanggilan berikutnya.
+    """
+    diunggah = []
+    for path in _arsip_tercatat(db_file, arsip_dir):
+        if not os.path.exists(path) or _sudah_terunggah(path):
+            continue
+        # Tanda diambil sebelum disalin: arsip yang berubah selama salin diunggah ulang nanti
+        tanda = _tanda_arsip(path)
+        nama = nama_arsip(path)
+        with tempfile.TemporaryDirectory(prefix="backup-arsip-") as tmp:
+            salinan = os.path.join(tmp, "salinan.db")
+            _salin_online(path, salinan)
+            terkompresi = os.path.join(tmp, nama)
+            _kompres(salinan, terkompresi)
+            penyimpanan.simpan(nama, terkompresi)
+            ukuran = os.path.getsize(terkompresi)
+        _tandai_terunggah(path, tanda)
+        diunggah.append(nama)
+        logger.info(f"💾 Arsip {nama} diunggah ({ukuran / 1024 / 1024:.1f} MB)")
+    return diunggah
+
+def _arsip_utuh(path):
+    if not os.path.exists(path):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return conn.execute("PRAGMA quick_check").fetchone()[0] == 'ok'
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return False
+
+def pulihkan_arsip(db_file, arsip_dir, penyimpanan):
+    """Unduh arsip yang tercatat di `db_file` tetapi filenya hilang atau rusak
+
+    Arsip lokal yang utuh dibiarkan (bisa lebih baru dari unggahan terakhir;
+    pembaca melewati baris arsip yang masih ada di database utama).
+    Kembalikan (dipulihkan, hilang): nama file yang diunduh dan nama file
+    yang tidak ada di penyimpanan.
+    """
+    dipulihkan, hilang = [], []
+    perlu = [path for path in _arsip_tercatat(db_file, arsip_dir) if not _arsip_utuh(path)]
+    if not perlu:
+        return dipulihkan, hilang
+    tersedia = set(penyimpanan.daftar(PREFIX_ARSIP))
+    os.makedirs(arsip_dir, exist_ok=True)
+    for path in perlu:
+        nama = nama_arsip(path)
+        if nama not in tersedia:
+            hilang.append(os.path.basename(path))
+            continue
+        with tempfile.TemporaryDirectory(prefix="restore-arsip-") as tmp:
+            terkompresi = os.path.join(tmp, nama)
+            penyimpanan.ambil(nama, terkompresi)
+            sementara = path + ".tmp"
+            _dekompres(terkompresi, sementara)
+        conn = sqlite3.connect(sementara)
+        try:
+            cek = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        if cek != 'ok':
+            os.remove(sementara)
+            raise ValueError(f"Arsip {nama} rusak: {cek}")
+        os.replace(sementara, path)
+        _tandai_terunggah(path, _tanda_arsip(path))
+        dipulihkan.append(os.path.basename(path))
+        logger.info(f"♻️ Arsip {os.path.basename(path)} dipulihkan dari {nama}")
+    return dipulihkan, hilang
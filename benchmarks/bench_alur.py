@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark alur percakapan bot (JUAL, BELI, HISTORI, STATISTIK).
+
+Contoh:
+    python benchmarks/bench_alur.py                         # level 1/10/100/1000 user
+    python benchmarks/bench_alur.py --level 1 10 --output hasil.json
+    python benchmarks/bench_alur.py --rekam alur.jsonl --level 10
+    python benchmarks/bench_alur.py --replay alur.jsonl
+
+Setiap level dijalankan di subprocess tersendiri agar peak RSS terukur
+per level. Hasil ditulis sebagai JSON supaya bisa dibandingkan antar rilis.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+from collections import defaultdict
+
+import harness
+from harness import bot_nota, update_pesan, update_callback
+
+LEVEL_DEFAULT = [1, 10, 100, 1000]
+
+
+# ===== SKENARIO =====
+def skenario_jual(user_id, rng):
+    idx = rng.randrange(len(bot_nota.DAFTAR_PELANGGAN))
+    nama_pelanggan = bot_nota.DAFTAR_PELANGGAN[idx]
+    qty_renceng = rng.randint(50, 300)
+    harga_kiloan = rng.choice([40000, 45000, 50000])
+    qty_kiloan = rng.randint(1, 5)
+    total = bot_nota.get_harga_renceng(nama_pelanggan) * qty_renceng + harga_kiloan * qty_kiloan
+    return [
+        update_pesan(user_id, '/start'),
+        update_callback(user_id, 'menu_jual'),
+        update_callback(user_id, f'pelanggan_{idx + 1}'),
+        update_callback(user_id, 'barang_jual_1'),
+        update_pesan(user_id, str(qty_renceng)),
+        update_callback(user_id, 'tambah_barang_penjualan'),
+        update_callback(user_id, 'barang_jual_2'),
+        update_pesan(user_id, str(harga_kiloan)),
+        update_pesan(user_id, str(qty_kiloan)),
+        update_callback(user_id, 'selesai_barang_penjualan'),
+        update_callback(user_id, f'bayar_pas_{total}'),
+    ]
+
+def skenario_beli(user_id, rng):
+    idx = rng.randrange(len(bot_nota.DAFTAR_BARANG_BELANJA))
+    harga = rng.choice([15000, 25000, 32000, 120000])
+    qty = rng.randint(1, 20)
+    return [
+        update_callback(user_id, 'menu_beli'),
+        update_pesan(user_id, rng.choice(['Toko Sumber Rejeki', 'Pasar Ciamis', 'CV Kacang Jaya'])),
+        update_callback(user_id, f'barang_beli_{idx + 1}'),
+        update_pesan(user_id, str(harga)),
+        update_pesan(user_id, str(qty)),
+        update_callback(user_id, 'selesai_barang_belanja'),
+        update_pesan(user_id, str(harga * qty)),
+    ]
+
+def skenario_histori(user_id, rng):
+    idx = rng.randrange(len(bot_nota.DAFTAR_PELANGGAN))
+    return [
+        update_callback(user_id, 'menu_histori'),
+        update_callback(user_id, f'histori_pelanggan_{idx + 1}'),
+        update_callback(user_id, 'menu_histori'),
+        update_callback(user_id, 'histori_semua'),
+    ]
+
+def skenario_statistik(user_id, rng):
+    return [update_callback(user_id, 'menu_statistik')]
+
+SKENARIO = {
+    'jual': skenario_jual,
+    'beli': skenario_beli,
+    'histori': skenario_histori,
+    'statistik': skenario_statistik,
+}
+
+def buat_skenario_user(user_id, seed):
+    """Daftar (alur, [update...]) untuk satu user: JUAL, BELI, HISTORI, STATISTIK"""
+    rng = random.Random(seed)
+    return [(nama, fungsi(user_id, rng)) for nama, fungsi in SKENARIO.items()]
+
+
+# ===== PENGUKURAN =====
+def persentil(data, p):
+    if not data:
+        return 0.0
+    data = sorted(data)
+    k = (len(data) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(data) - 1)
+    return data[f] + (data[c] - data[f]) * (k - f)
+
+def ringkas_latency(data_detik):
+    ms = [x * 1000 for x in data_detik]
+    return {
+        'n': len(ms),
+        'p50_ms': round(persentil(ms, 50), 3),
+        'p90_ms': round(persentil(ms, 90), 3),
+        'p99_ms': round(persentil(ms, 99), 3),
+        'max_ms': round(max(ms), 3) if ms else 0.0,
+    }
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KiB, macOS byte
+    return round(rss / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+
+async def jalankan(daftar_user, label):
+    """Jalankan alur semua user secara konkuren; tiap user berurutan"""
+    db_path = harness.siapkan_database()
+    application, request = await harness.buat_aplikasi_uji()
+    error = []
+
+    async def catat_error(update, context):
+        error.append(repr(context.error))
+    application.add_error_handler(catat_error)
+
+    latency = defaultdict(list)
+
+    async def jalankan_user(skenario):
+        for nama_alur, updates in skenario:
+            for data in updates:
+                t0 = time.perf_counter()
+                await harness.kirim(application, data)
+                latency[nama_alur].append(time.perf_counter() - t0)
+
+    t_mulai = time.perf_counter()
+    await asyncio.gather(*(jalankan_user(s) for s in daftar_user))
+    durasi = time.perf_counter() - t_mulai
+    await application.shutdown()
+
+    semua = [x for nilai in latency.values() for x in nilai]
+    hasil = {
+        'label': label,
+        'users': len(daftar_user),
+        'updates': len(semua),
+        'durasi_s': round(durasi, 4),
+        'updates_per_s': round(len(semua) / durasi, 1) if durasi else 0.0,
+        'latency': ringkas_latency(semua),
+        'latency_per_alur': {nama: ringkas_latency(nilai) for nama, nilai in latency.items()},
+        'api_calls': dict(request.panggilan),
+        'api_calls_per_update': round(request.total_panggilan / max(len(semua), 1), 2),
+        'errors': len(error),
+        'contoh_error': error[:5],
+        'nota_tersimpan': hitung_nota(db_path),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    os.remove(db_path)
+    return hasil
+
+def hitung_nota(db_path):
+    conn = bot_nota.sqlite3.connect(db_path)
+    penjualan = conn.execute("SELECT COUNT(*) FROM nota_penjualan").fetchone()[0]
+    belanja = conn.execute("SELECT COUNT(*) FROM nota_belanja").fetchone()[0]
+    conn.close()
+    return {'penjualan': penjualan, 'belanja': belanja}
+
+
+# ===== REKAM & REPLAY =====
+def rekam(path, daftar_user):
+    """Simpan skenario sebagai JSONL update Telegram mentah"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for skenario in daftar_user:
+            for _, updates in skenario:
+                for data in updates:
+                    f.write(json.dumps(data, ensure_ascii=False) + '\n')
+
+def muat_replay(path):
+    """Baca log update Telegram (JSONL), kelompokkan per user dengan urutan asli"""
+    per_user = defaultdict(list)
+    with open(path, encoding='utf-8') as f:
+        for baris in f:
+            baris = baris.strip()
+            if not baris:
+                continue
+            data = json.loads(baris)
+            isi = data.get('message') or data.get('callback_query') or {}
+            user_id = isi.get('from', {}).get('id', 0)
+            per_user[user_id].append(data)
+    return [[('replay', updates)] for updates in per_user.values()]
+
+
+def jalankan_level(jumlah_user, seed):
+    daftar_user = [buat_skenario_user(100000 + i, seed + i) for i in range(jumlah_user)]
+    return asyncio.run(jalankan(daftar_user, f'{jumlah_user}_users'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark alur percakapan bot nota")
+    parser.add_argument('--level', type=int, nargs='+', default=LEVEL_DEFAULT, help="jumlah user konkuren")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--replay', help="file JSONL update Telegram untuk diputar ulang")
+    parser.add_argument('--rekam', help="tulis skenario sintetis ke file JSONL lalu keluar")
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    parser.add_argument('--satu-level', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.satu_level is not None:
+        print(json.dumps(jalankan_level(args.satu_level, args.seed)))
+        return
+
+    if args.rekam:
+        jumlah = max(args.level)
+        rekam(args.rekam, [buat_skenario_user(100000 + i, args.seed + i) for i in range(jumlah)])
+        print(f"✅ Skenario {jumlah} user direkam ke {args.rekam}", file=sys.stderr)
+        return
+
+    if args.replay:
+        hasil = [asyncio.run(jalankan(muat_replay(args.replay), f'replay:{os.path.basename(args.replay)}'))]
+    else:
+        hasil = []
+        for level in args.level:
+            proses = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--satu-level', str(level), '--seed', str(args.seed)],
+                capture_output=True, text=True, check=True
+            )
+            hasil.append(json.loads(proses.stdout.strip().splitlines()[-1]))
+            print(f"• {level} user: {hasil[-1]['updates_per_s']} update/s, "
+                  f"p99 {hasil[-1]['latency']['p99_ms']} ms", file=sys.stderr)
+
+    laporan = {
+        'benchmark': 'alur',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': bot_nota.sqlite3.sqlite_version,
+        'hasil': hasil,
+    }
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark arsip tahunan (arsip.py) terhadap database hasil generate_data.py.
+
+Salinan database diukur sebelum dan sesudah nota tahun tutup dipindah ke
+file arsip (lalu optimize FTS + VACUUM seperti tahap optimasi tutup buku):
+    - ukuran database utama dan file arsip (JSON barang terkompresi)
+    - latency histori halaman pertama & halaman yang masuk arsip, statistik
+      bulan ini & bulan yang sudah diarsip, pencarian, dan piutang
+    - hasil harus sama persis: statistik setiap bulan, halaman histori di
+      sekitar batas arsip, kandidat & detail pencarian (juga semua jendela
+      kandidat yang melintasi arsip), ringkasan piutang
+    - isi arsip bisa dibuka lagi (daftar barang = JSON aslinya)
+
+Contoh:
+    python benchmarks/generate_data.py --db /tmp/besar.db --penjualan 1000000 --belanja 250000
+    python benchmarks/bench_arsip.py --db /tmp/besar.db --output hasil-arsip.json
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+import platform
+import tempfile
+
+import harness
+from harness import bot_nota
+import arsip
+import tutup_buku
+from bench_alur import ringkas_latency
+
+
+def ukur(fungsi, *args, ulang=20):
+    hasil = fungsi(*args)  # pemanasan cache halaman
+    durasi = []
+    for _ in range(ulang):
+        t0 = time.perf_counter()
+        fungsi(*args)
+        durasi.append(time.perf_counter() - t0)
+    return hasil, ringkas_latency(durasi)
+
+def daftar_bulan(conn):
+    awal, akhir = conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM nota_penjualan").fetchone()
+    bulan = datetime.date(int(awal[:4]), int(awal[5:7]), 1)
+    hasil = []
+    while bulan.strftime("%Y-%m") <= akhir[:7]:
+        hasil.append(bulan.strftime("%m/%Y"))
+        bulan = (bulan + datetime.timedelta(days=32)).replace(day=1)
+    return hasil
+
+def piutang(business_id):
+    return tutup_buku.hitung_ringkasan(bot_nota.get_repositori(), business_id, datetime.date.today().isoformat())
+
+def semua_kandidat(business_id, kata):
+    """Kunci semua kandidat pencarian, dibaca per jendela KANDIDAT_CARI sampai habis"""
+    kunci, offset = [], 0
+    while True:
+        bagian = bot_nota.get_repositori().kandidat_cari(business_id, kata, bot_nota.KANDIDAT_CARI, offset)
+        kunci += [row[0] for row in bagian]
+        offset += len(bagian)
+        if len(bagian) < bot_nota.KANDIDAT_CARI:
+            # Piutang lama tetap di database utama, jadi urutannya boleh beda: bandingkan isinya
+            return sorted(kunci)
+
+def potret(business_id, pelanggan, daftar_offset, kata_cari, kata_jendela, bulan_lama, ulang):
+    """Semua hasil yang dibandingkan + latency operasi utama"""
+    hasil, latency = {}, {}
+    hasil['histori_0'], latency['histori_halaman_1'] = ukur(bot_nota.ambil_histori_semua, business_id, ulang=ulang)
+    hasil['histori_lama'], latency['histori_halaman_arsip'] = ukur(
+        bot_nota.ambil_histori_semua, business_id, 10, daftar_offset[-1], ulang=ulang)
+    bulan_ini = datetime.datetime.now().strftime("%m/%Y")
+    _, latency['statistik_bulan_ini'] = ukur(bot_nota.ambil_statistik_bulan, business_id, bulan_ini, ulang=ulang)
+    _, latency['statistik_bulan_arsip'] = ukur(bot_nota.ambil_statistik_bulan, business_id, bulan_lama, ulang=ulang)
+    hasil['piutang'], latency['piutang'] = ukur(piutang, business_id, ulang=ulang)
+    for kata in kata_cari:
+        hasil[f'cari {kata}'], latency[f'cari {kata}'] = ukur(bot_nota.cari_nota, business_id, kata, ulang=ulang)
+    hasil['kandidat_semua_jendela'] = semua_kandidat(business_id, kata_jendela)
+
+    hasil['histori'] = [bot_nota.ambil_histori_semua(business_id, 10, offset) for offset in daftar_offset]
+    hasil['histori_pelanggan'] = [
+        bot_nota.ambil_histori_pelanggan(business_id, pelanggan, 10, offset) for offset in daftar_offset[:3]
+    ]
+    conn = sqlite3.connect(bot_nota.DB_FILE)
+    try:
+        bulan = daftar_bulan(conn)
+    finally:
+        conn.close()
+    hasil['statistik'] = {b: [tuple(x) for x in bot_nota.ambil_statistik_bulan(business_id, b)] for b in bulan}
+    return hasil, latency
+
+def sama(a, b):
+    """Bandingkan hasil; halaman histori dibandingkan sebagai himpunan (timestamp kembar boleh beda urutan)"""
+    if isinstance(a, list) and a and isinstance(a[0], list):
+        return all(sorted(map(tuple, x)) == sorted(map(tuple, y)) for x, y in zip(a, b)) and len(a) == len(b)
+    if isinstance(a, list):
+        return sorted(map(tuple, a)) == sorted(map(tuple, b)) if a and isinstance(a[0], (list, tuple)) else a == b
+    return json.dumps(a, sort_keys=True, default=str) == json.dumps(b, sort_keys=True, default=str)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark arsip tahunan nota")
+    parser.add_argument('--db', required=True, help="database hasil generate_data.py (tidak diubah)")
+    parser.add_argument('--user', type=int, default=1001)
+    parser.add_argument('--sampai', type=int, help="tahun terakhir yang diarsip (default: tahun lalu)")
+    parser.add_argument('--ulang', type=int, default=20)
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('bot_nota').setLevel(logging.WARNING)
+    sampai = args.sampai if args.sampai is not None else datetime.date.today().year - 1
+
+    with tempfile.TemporaryDirectory(prefix="bench-arsip-") as tmp:
+        db = os.path.join(tmp, "keuangan.db")
+        sumber = sqlite3.connect(args.db)
+        salinan = sqlite3.connect(db)
+        sumber.backup(salinan)
+        salinan.close()
+        sumber.close()
+        bot_nota.ARSIP_DIR = os.path.join(tmp, "arsip")
+        harness.siapkan_database(db)
+        business_id = bot_nota.get_keanggotaan(args.user)['business_id']
+        pelanggan = bot_nota.DAFTAR_PELANGGAN[0]
+
+        conn = sqlite3.connect(db)
+        batas = f"{sampai + 1:04d}-01-01"
+        hot = conn.execute(
+            "SELECT COUNT(*) FROM nota_penjualan WHERE business_id = ? AND timestamp >= ?", (business_id, batas)
+        ).fetchone()[0]
+        total = conn.execute("SELECT COUNT(*) FROM nota_penjualan WHERE business_id = ?", (business_id,)).fetchone()[0]
+        # Nota lama untuk dicari lewat nomornya setelah dipindah ke arsip
+        nomor_lama = conn.execute(
+            "SELECT nomor_nota FROM nota_penjualan WHERE business_id = ? AND timestamp < ? AND sisa >= 0 LIMIT 1",
+            (business_id, batas)
+        ).fetchone()[0]
+        nomor_baru = conn.execute(
+            "SELECT nomor_nota FROM nota_penjualan WHERE business_id = ? ORDER BY id DESC LIMIT 1", (business_id,)
+        ).fetchone()[0]
+        bulan_lama = conn.execute(
+            "SELECT strftime('%m/%Y', timestamp) FROM nota_penjualan WHERE timestamp < ? ORDER BY id DESC LIMIT 1", (batas,)
+        ).fetchone()[0]
+        ids_contoh = [row[0] for row in conn.execute(
+            "SELECT id FROM nota_penjualan WHERE timestamp < ? AND sisa >= 0 ORDER BY random() LIMIT 200", (batas,))]
+        payload_asli = {row[0]: (json.loads(row[1]), json.loads(row[2])) for row in conn.execute(
+            f"SELECT id, daftar_barang, retur_items FROM nota_penjualan WHERE id IN ({','.join(map(str, ids_contoh))})")}
+        conn.close()
+
+        # Halaman sekitar batas data utama/arsip, di tengah arsip, dan paling akhir
+        daftar_offset = sorted({0, max(hot - 15, 0), max(hot - 5, 0), hot, hot + 5, (hot + total) // 2, max(total - 5, 0)})
+        kata_cari = ["ujang", nomor_lama.lower().replace('-', ' ')]
+        # Tanggal-bulan nota terbaru di semua tahun: kandidatnya melintasi database utama & arsip
+        kata_jendela = nomor_baru.lower().split('-')[:3]
+
+        print("📊 Sebelum arsip...", file=sys.stderr)
+        ukuran_sebelum = os.path.getsize(db)
+        sebelum, latency_sebelum = potret(business_id, pelanggan, daftar_offset, kata_cari, kata_jendela, bulan_lama, args.ulang)
+
+        print(f"🗄️ Mengarsipkan sampai {sampai}...", file=sys.stderr)
+        t0 = time.perf_counter()
+        dipindah = arsip.arsipkan(db, bot_nota.ARSIP_DIR, sampai, cpu_persen=100)
+        durasi_arsip = round(time.perf_counter() - t0, 2)
+        t0 = time.perf_counter()
+        # Setara hasil akhir merge FTS bertahap + VACUUM di tahap optimasi tutup buku
+        conn = sqlite3.connect(db)
+        conn.execute("INSERT INTO nota_fts (nota_fts) VALUES ('optimize')")
+        conn.commit()
+        conn.execute("VACUUM")
+        conn.close()
+        durasi_vacuum = round(time.perf_counter() - t0, 2)
+        t0 = time.perf_counter()
+        ulang_arsip = arsip.arsipkan(db, bot_nota.ARSIP_DIR, sampai, cpu_persen=100)
+        durasi_ulang = round(time.perf_counter() - t0, 3)
+
+        print("📊 Sesudah arsip...", file=sys.stderr)
+        bot_nota.respons_cache.kosongkan()
+        sesudah, latency_sesudah = potret(business_id, pelanggan, daftar_offset, kata_cari, kata_jendela, bulan_lama, args.ulang)
+
+        conn = sqlite3.connect(db)
+        arsip_dibaca = {}
+        for tahun, path in arsip.daftar_arsip(conn, bot_nota.ARSIP_DIR):
+            arsip.pasang(conn, path)
+            for id_nota, barang, retur in conn.execute(
+                f"SELECT id, daftar_barang, retur_items FROM arsip.nota_penjualan WHERE id IN ({','.join(map(str, ids_contoh))})"
+            ):
+                arsip_dibaca[id_nota] = (arsip.buka_json(barang), arsip.buka_json(retur))
+            arsip.lepas(conn)
+        conn.close()
+
+        beda = [k for k in sebelum if not sama(sebelum[k], sesudah[k])]
+        ukuran_arsip = sum(info['ukuran'] for info in dipindah)
+        laporan = {
+            'benchmark': 'arsip',
+            'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'sampai_tahun': sampai,
+            'nota_usaha': total,
+            'nota_usaha_database_utama': hot,
+            'dipindah': [{k: v for k, v in info.items() if k != 'file'} for info in dipindah],
+            'durasi_arsip_detik': durasi_arsip,
+            'durasi_optimasi_detik': durasi_vacuum,
+            'durasi_run_ulang_detik': durasi_ulang,
+            'run_ulang_memindah': len(ulang_arsip),
+            'ukuran_mb': {
+                'sebelum': round(ukuran_sebelum / 1024 / 1024, 1),
+                'database_utama': round(os.path.getsize(db) / 1024 / 1024, 1),
+                'arsip': round(ukuran_arsip / 1024 / 1024, 1),
+            },
+            'latency_sebelum': latency_sebelum,
+            'latency_sesudah': latency_sesudah,
+            'hasil_beda': beda,
+            'payload_dicek': len(ids_contoh),
+            'payload_sama': sum(arsip_dibaca.get(i) == payload_asli[i] for i in ids_contoh),
+        }
+        laporan['lolos'] = not beda and not ulang_arsip and laporan['payload_sama'] == len(ids_contoh)
+
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+    if not laporan['lolos']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark backup online: durasi snapshot dan pengaruhnya ke latency tulis.
+
+Database sumber disalin ke direktori sementara, lalu satu thread penulis
+menyimpan nota penjualan terus-menerus (simpan_nota_penjualan). Latency tulis
+diukur tanpa backup, lalu saat snapshot dibuat berulang di thread lain.
+Snapshot disimpan ke PenyimpananLokal (pengganti object store).
+
+Contoh:
+    python benchmarks/generate_data.py --db /tmp/besar.db --penjualan 2000000 --belanja 500000
+    python benchmarks/bench_backup.py --db /tmp/besar.db --output hasil-backup.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import threading
+
+from harness import bot_nota
+from bench_alur import ringkas_latency
+import backup
+
+
+def penulis(berhenti, durasi, gagal, user_id):
+    """Simpan nota penjualan berulang sampai `berhenti` di-set; catat latency dan kegagalan tiap simpan"""
+    barang = [{'nama': "Kc Bawang Renceng", 'harga': 1200, 'qty': 100, 'subtotal': 120000}]
+    i = 0
+    while not berhenti.is_set():
+        i += 1
+        t0 = time.perf_counter()
+        ok = bot_nota.simpan_nota_penjualan(
+            user_id, f"BCK-{threading.get_ident()}-{time.time_ns()}-{i}", "UJANG", "01/01/2026",
+            barang, [], 120000, 120000, 0
+        )
+        durasi.append(time.perf_counter() - t0)
+        if not ok:
+            gagal.append(i)
+        time.sleep(0.002)
+
+def fase(detik, user_id, dengan_backup, penyimpanan):
+    berhenti = threading.Event()
+    durasi = []
+    gagal = []
+    snapshot = []
+    thread = threading.Thread(target=penulis, args=(berhenti, durasi, gagal, user_id))
+    thread.start()
+    t_akhir = time.perf_counter() + detik
+    if dengan_backup:
+        while time.perf_counter() < t_akhir:
+            snapshot.append(backup.buat_snapshot(bot_nota.DB_FILE, penyimpanan))
+    else:
+        time.sleep(detik)
+    berhenti.set()
+    thread.join()
+    return {'latency_tulis': ringkas_latency(durasi), 'jumlah_tulis': len(durasi), 'gagal_tulis': len(gagal), 'snapshot': snapshot}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot backup online")
+    parser.add_argument('--db', required=True, help="database sumber (tidak diubah, disalin dulu)")
+    parser.add_argument('--detik', type=float, default=10, help="lama tiap fase")
+    parser.add_argument('--user', type=int, default=1001)
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('bot_nota').setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="bench-backup-") as tmp:
+        db = os.path.join(tmp, "keuangan.db")
+        sumber = sqlite3.connect(args.db)
+        salinan = sqlite3.connect(db)
+        sumber.backup(salinan)
+        salinan.close()
+        sumber.close()
+        bot_nota.DB_FILE = db
+        bot_nota.init_database()
+        penyimpanan = backup.PenyimpananLokal(os.path.join(tmp, "backup"))
+
+        print("✍️ Fase tanpa backup...", file=sys.stderr)
+        tanpa = fase(args.detik, args.user, False, penyimpanan)
+        print("💾 Fase dengan snapshot berulang...", file=sys.stderr)
+        dengan = fase(args.detik, args.user, True, penyimpanan)
+
+        t0 = time.perf_counter()
+        backup.pulihkan(db, penyimpanan, penyimpanan.daftar()[0])
+        durasi_restore = time.perf_counter() - t0
+
+        snapshot = dengan.pop('snapshot')
+        tanpa.pop('snapshot')
+        laporan = {
+            'benchmark': 'backup',
+            'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'db_mb': round(snapshot[0]['ukuran_db'] / 1024 / 1024, 1) if snapshot else None,
+            'snapshot': {
+                'jumlah': len(snapshot),
+                'gzip_mb': round(snapshot[0]['ukuran'] / 1024 / 1024, 1) if snapshot else None,
+                'durasi_salin': ringkas_latency([s['durasi_salin'] for s in snapshot]) if snapshot else None,
+                'durasi_total': ringkas_latency([s['durasi_total'] for s in snapshot]) if snapshot else None,
+            },
+            'tanpa_backup': tanpa,
+            'dengan_backup': dengan,
+            'restore_detik': round(durasi_restore, 2),
+        }
+        shutil.rmtree(os.path.join(tmp, "backup"), ignore_errors=True)
+
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark pencarian nota: indeks FTS5 (cari_nota) dibanding scan LIKE.
+
+Contoh:
+    python benchmarks/generate_data.py --db /tmp/besar.db --penjualan 2000000 --belanja 500000
+    python benchmarks/bench_cari.py --db /tmp/besar.db --output hasil-cari.json
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+
+from harness import bot_nota
+from bench_alur import ringkas_latency
+
+KATA_KUNCI_DEFAULT = ["plastik", "ujang kiloan", "minyak barokah", "PNJ-19-10", "kacang kupas"]
+
+
+def cari_like(business_id, kata_kunci, per_halaman=bot_nota.HASIL_CARI_PER_HALAMAN):
+    """Pencarian naif: setiap kata harus muncul (LIKE) di salah satu kolom teks"""
+    kata = bot_nota._token_cari(kata_kunci)
+    syarat_penjualan = " AND ".join(
+        "(nomor_nota LIKE ? OR nama_pelanggan LIKE ? OR daftar_barang LIKE ? OR retur_items LIKE ? OR keterangan LIKE ?)"
+        for _ in kata)
+    syarat_belanja = " AND ".join(
+        "(nomor_nota LIKE ? OR nama_supplier LIKE ? OR daftar_barang LIKE ? OR keterangan LIKE ?)"
+        for _ in kata)
+    params = [business_id]
+    for k in kata:
+        params.extend([f"%{k}%"] * 5)
+    params.append(business_id)
+    for k in kata:
+        params.extend([f"%{k}%"] * 4)
+    params.append(per_halaman)
+
+    conn = sqlite3.connect(bot_nota.DB_FILE)
+    try:
+        return conn.execute(f'''
+            SELECT nomor_nota, timestamp FROM nota_penjualan WHERE business_id = ? AND {syarat_penjualan}
+            UNION ALL
+            SELECT nomor_nota, timestamp FROM nota_belanja WHERE business_id = ? AND {syarat_belanja}
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', params).fetchall()
+    finally:
+        conn.close()
+
+def ukur(fungsi, *args, ulang=10):
+    fungsi(*args)
+    durasi = []
+    for _ in range(ulang):
+        t0 = time.perf_counter()
+        fungsi(*args)
+        durasi.append(time.perf_counter() - t0)
+    return ringkas_latency(durasi)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pencarian FTS5 vs LIKE")
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--user', type=int, default=1001)
+    parser.add_argument('--ulang', type=int, default=10)
+    parser.add_argument('--kata', nargs='+', default=KATA_KUNCI_DEFAULT)
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    bot_nota.DB_FILE = os.path.abspath(args.db)
+    bot_nota.init_database()
+    business_id = bot_nota.get_keanggotaan(args.user)['business_id']
+
+    conn = sqlite3.connect(bot_nota.DB_FILE)
+    jumlah_fts = conn.execute("SELECT COUNT(*) FROM nota_fts").fetchone()[0]
+    conn.close()
+
+    hasil = {}
+    for kata in args.kata:
+        fts = ukur(bot_nota.cari_nota, business_id, kata, ulang=args.ulang)
+        like = ukur(cari_like, business_id, kata, ulang=args.ulang)
+        hasil[kata] = {
+            'fts': fts,
+            'like': like,
+            'percepatan_p50': round(like['p50_ms'] / fts['p50_ms'], 1) if fts['p50_ms'] else None,
+        }
+        print(f"• {kata!r}: FTS p50 {fts['p50_ms']} ms, LIKE p50 {like['p50_ms']} ms", file=sys.stderr)
+
+    laporan = {
+        'benchmark': 'cari',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'baris_terindeks': jumlah_fts,
+        'kandidat_cari': bot_nota.KANDIDAT_CARI,
+        'hasil': hasil,
+    }
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark entri cepat dibanding alur menu penjualan.
+
+Nota yang sama (pelanggan acak, renceng dengan harga otomatis + kiloan dengan
+harga diketik, bayar pas) dibuat dua kali lewat handler asli di database
+sementara:
+    - menu: urutan update skenario_jual dari bench_alur.py
+    - entri_cepat: satu pesan 'jual <pelanggan>: renceng <qty>, kiloan <qty>@<harga>'
+
+Dicatat per nota: jumlah update yang harus dikirim user, panggilan Bot API
+yang dilakukan bot, dan waktu proses total. Total nota yang tersimpan di
+kedua database harus sama. Terakhir diukur throughput parser saja.
+
+Contoh:
+    python benchmarks/bench_entri_cepat.py --nota 300 --output hasil-entri-cepat.json
+"""
+
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import platform
+
+import harness
+from harness import bot_nota, update_pesan
+from bench_alur import skenario_jual, ringkas_latency
+import entri_cepat
+
+
+def pesan_entri_cepat(sekuens):
+    """Pesan entri cepat yang setara dengan urutan update skenario_jual"""
+    teks = [u['message']['text'] for u in sekuens if 'message' in u]
+    idx = int(next(u['callback_query']['data'] for u in sekuens
+                   if u.get('callback_query', {}).get('data', '').startswith('pelanggan_')).split('_')[1])
+    qty_renceng, harga_kiloan, qty_kiloan = teks[1:4]
+    nama = bot_nota.DAFTAR_PELANGGAN[idx - 1].split()[0].lower()
+    return f"jual {nama}: renceng {qty_renceng}, kiloan {qty_kiloan}@{harga_kiloan}, bayar pas"
+
+async def jalankan(label, daftar_nota, user_id):
+    db = harness.siapkan_database()
+    application, request = await harness.buat_aplikasi_uji()
+    error = []
+
+    async def catat_error(update, context):
+        error.append(repr(context.error))
+    application.add_error_handler(catat_error)
+
+    durasi = []
+    jumlah_update = 0
+    for sekuens in daftar_nota:
+        t0 = time.perf_counter()
+        for data in sekuens:
+            await harness.kirim(application, data)
+        durasi.append(time.perf_counter() - t0)
+        jumlah_update += len(sekuens)
+    await application.shutdown()
+
+    with sqlite3.connect(db) as conn:
+        nota, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(total_setelah_retur), 0) FROM nota_penjualan").fetchone()
+    n = len(daftar_nota)
+    return {
+        'nota_tersimpan': nota,
+        'total_penjualan': total,
+        'update_per_nota': round(jumlah_update / n, 2),
+        'panggilan_api_per_nota': round(request.total_panggilan / n, 2),
+        'panggilan_api': request.panggilan,
+        'latency_per_nota': ringkas_latency(durasi),
+        'errors': len(error),
+        'contoh_error': error[:5],
+    }
+
+def ukur_parser(daftar_pesan, ulang):
+    t0 = time.perf_counter()
+    for _ in range(ulang):
+        for pesan in daftar_pesan:
+            entri_cepat.urai(pesan, bot_nota.DAFTAR_PELANGGAN, bot_nota.KATALOG_BARANG, bot_nota.get_harga_otomatis)
+    detik = time.perf_counter() - t0
+    jumlah = ulang * len(daftar_pesan)
+    return {'pesan': jumlah, 'pesan_per_detik': round(jumlah / detik), 'us_per_pesan': round(detik / jumlah * 1e6, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark entri cepat vs alur menu penjualan")
+    parser.add_argument('--nota', type=int, default=300)
+    parser.add_argument('--user', type=int, default=1001)
+    parser.add_argument('--ulang-parser', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('bot_nota').setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    menu = [skenario_jual(args.user, rng) for _ in range(args.nota)]
+    daftar_pesan = [pesan_entri_cepat(s) for s in menu]
+    cepat = [[update_pesan(args.user, pesan)] for pesan in daftar_pesan]
+
+    laporan = {
+        'benchmark': 'entri_cepat',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'nota': args.nota,
+        'contoh_pesan': daftar_pesan[0],
+        'hasil': {},
+    }
+    for label, daftar in (('menu', menu), ('entri_cepat', cepat)):
+        print(f"📊 {label}...", file=sys.stderr)
+        laporan['hasil'][label] = asyncio.run(jalankan(label, daftar, args.user))
+    laporan['parser'] = ukur_parser(daftar_pesan, args.ulang_parser)
+
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Uji & benchmark pemrosesan update tepat sekali (idempotensi.py).
+
+Lewat handler asli di database sementara:
+
+1. dobel     - setiap update alur JUAL (menu) dan entri cepat dikirim dua
+               kali berturut-turut, seperti webhook yang diulang Telegram
+2. restart   - entri cepat diproses, lalu "restart" sebelum offset ditulis
+               (jendela update di memori hilang) dan update yang sama
+               dikirim ulang: kunci idempotensi yang mencegah nota kedua
+3. tombol    - tombol bayar ditekan lagi dengan sesi yang belum sempat
+               direset (mis. sesi SQLite/Redis tersimpan sebelum crash)
+4. offset    - offset disimpan lalu dimuat seperti saat start; semua update
+               lama yang dikirim ulang dilewati sebelum handler jalan
+
+Jumlah nota di database harus sama dengan jumlah nota unik. Dicatat juga
+biaya update ulang yang dilewati dibanding update baru.
+
+Contoh:
+    python benchmarks/bench_idempotensi.py --nota 200 --output hasil-idempotensi.json
+"""
+
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import platform
+
+import harness
+from harness import bot_nota, update_pesan, update_callback
+from bench_alur import skenario_jual, ringkas_latency
+from bench_entri_cepat import pesan_entri_cepat
+
+
+class RequestNota(harness.RequestPalsu):
+    """RequestPalsu yang mencatat nomor nota di setiap balasan nota"""
+
+    def __init__(self):
+        super().__init__()
+        self.nomor = []
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if request_data and url.rsplit('/', 1)[-1] in ('sendMessage', 'editMessageText'):
+            for baris in request_data.parameters.get('text', '').splitlines():
+                if baris.startswith('📋'):
+                    self.nomor.append(baris.split(':', 1)[1].strip(' *'))
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+def jumlah_nota(db):
+    with sqlite3.connect(db) as conn:
+        return (conn.execute("SELECT COUNT(*) FROM nota_penjualan").fetchone()[0] +
+                conn.execute("SELECT COUNT(*) FROM nota_belanja").fetchone()[0])
+
+async def kirim_semua(application, daftar):
+    durasi = []
+    for data in daftar:
+        t0 = time.perf_counter()
+        await harness.kirim(application, data)
+        durasi.append(time.perf_counter() - t0)
+    return durasi
+
+async def jalankan(args):
+    db = harness.siapkan_database()
+    application, request = await harness.buat_aplikasi_uji(RequestNota())
+    error = []
+
+    async def catat_error(update, context):
+        error.append(repr(context.error))
+    application.add_error_handler(catat_error)
+
+    rng = random.Random(args.seed)
+    hasil = {}
+    nota_unik = 0
+
+    # 1. Setiap update dikirim dua kali
+    menu = [skenario_jual(args.user, rng) for _ in range(args.nota)]
+    cepat = [update_pesan(args.user, pesan_entri_cepat(s)) for s in menu]
+    dilewati = bot_nota.jendela_update.dilewati
+    baru, ulang = [], []
+    for data in [u for s in menu for u in s] + cepat:
+        baru += await kirim_semua(application, [data])
+        ulang += await kirim_semua(application, [data])
+    nota_unik += 2 * args.nota
+    hasil['dobel'] = {
+        'update': len(baru),
+        'dilewati': bot_nota.jendela_update.dilewati - dilewati,
+        'nota_unik': nota_unik,
+        'nota_tersimpan': jumlah_nota(db),
+        'latency_update_baru': ringkas_latency(baru),
+        'latency_update_ulang': ringkas_latency(ulang),
+    }
+
+    # 2. Restart sebelum offset ditulis: hanya kunci idempotensi yang tersisa
+    cepat = [update_pesan(args.user, pesan_entri_cepat(skenario_jual(args.user, rng))) for _ in range(args.nota)]
+    request.nomor.clear()
+    await kirim_semua(application, cepat)
+    nomor_pertama = list(request.nomor)
+    bot_nota.jendela_update.kosongkan()
+    request.nomor.clear()
+    await kirim_semua(application, cepat)
+    nota_unik += args.nota
+    hasil['restart'] = {
+        'update_dikirim_ulang': len(cepat),
+        'nota_unik': nota_unik,
+        'nota_tersimpan': jumlah_nota(db),
+        'balasan_nomor_sama': sum(a == b for a, b in zip(nomor_pertama, request.nomor)),
+    }
+
+    # 3. Tombol bayar ditekan lagi dengan sesi sebelum bayar (sesi belum sempat direset)
+    sama = 0
+    for _ in range(args.nota // 10 or 1):
+        sekuens = skenario_jual(args.user, rng)
+        await kirim_semua(application, sekuens[:-1])
+        sesi = json.loads(json.dumps(bot_nota.user_sessions[args.user]))
+        request.nomor.clear()
+        await kirim_semua(application, sekuens[-1:])
+        bot_nota.user_sessions[args.user] = sesi
+        await kirim_semua(application, [update_callback(args.user, sekuens[-1]['callback_query']['data'])])
+        sama += len(request.nomor) == 2 and request.nomor[0] == request.nomor[1]
+        nota_unik += 1
+    hasil['tombol'] = {
+        'tekan_ulang': args.nota // 10 or 1,
+        'balasan_nomor_sama': sama,
+        'nota_unik': nota_unik,
+        'nota_tersimpan': jumlah_nota(db),
+    }
+
+    # 4. Offset tersimpan lalu dimuat seperti saat start
+    bot_nota.simpan_offset_update(bot_nota.jendela_update.perlu_disimpan(paksa=True))
+    bot_nota.jendela_update.kosongkan()
+    bot_nota.jendela_update.offset = bot_nota.muat_offset_update()
+    dilewati = bot_nota.jendela_update.dilewati
+    ulang = await kirim_semua(application, cepat)
+    hasil['offset'] = {
+        'offset_dimuat': bot_nota.jendela_update.offset,
+        'update_dikirim_ulang': len(cepat),
+        'dilewati': bot_nota.jendela_update.dilewati - dilewati,
+        'nota_unik': nota_unik,
+        'nota_tersimpan': jumlah_nota(db),
+        'latency_update_ulang': ringkas_latency(ulang),
+    }
+
+    await application.shutdown()
+    hasil['errors'] = len(error)
+    hasil['contoh_error'] = error[:5]
+    hasil['lolos'] = (
+        all(hasil[k]['nota_tersimpan'] == hasil[k]['nota_unik'] for k in ('dobel', 'restart', 'tombol', 'offset'))
+        and hasil['restart']['balasan_nomor_sama'] == args.nota
+        and hasil['tombol']['balasan_nomor_sama'] == hasil['tombol']['tekan_ulang']
+        and hasil['offset']['dilewati'] == len(cepat)
+        and not error
+    )
+    return hasil
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji & benchmark update tepat sekali")
+    parser.add_argument('--nota', type=int, default=200)
+    parser.add_argument('--user', type=int, default=1001)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('bot_nota').setLevel(logging.WARNING)
+
+    laporan = {
+        'benchmark': 'idempotensi',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'nota': args.nota,
+        'hasil': asyncio.run(jalankan(args)),
+    }
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+    if not laporan['hasil']['lolos']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
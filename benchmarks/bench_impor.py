@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark /import: file CSV/XLSX besar diunggah lewat handler bot asli.
+
+File sintetis berisi nota 1-3 item per nota asal dengan sebagian baris
+rusak (barang di luar katalog, qty 0 / nan, harga inf, tanggal salah / di
+masa depan). Bot
+menerima /import lalu dokumen lewat harness (getFile dan unduhan dijawab
+RequestPalsu). Yang diukur: durasi impor, baris per detik, dan kenaikan
+peak RSS. Hasilnya dicek: jumlah nota & baris ditolak sesuai file, dan
+item_bulanan sama dengan hasil bangun ulang penuh.
+
+Contoh:
+    python benchmarks/bench_impor.py --baris 100000 --output hasil-impor.json
+    python benchmarks/bench_impor.py --baris 100000 --xlsx    # butuh openpyxl
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import datetime
+import platform
+import tempfile
+
+import harness
+from harness import bot_nota
+from bench_alur import peak_rss_mb
+from generate_data import HARGA_BELANJA, SUPPLIER
+
+USER_ID = 1001
+HEADER = ['jenis', 'tanggal', 'pihak', 'barang', 'qty', 'harga', 'nota', 'bayar']
+
+
+def buat_baris(jumlah_baris, rusak, seed):
+    """Generator baris file + hitungan yang diharapkan (diisi saat generator habis)"""
+    rng = random.Random(seed)
+    hari_ini = datetime.date.today()
+    harapan = {'nota': 0, 'baris_ditolak': 0}
+
+    def generator():
+        ditulis = 0
+        urut = 0
+        while ditulis < jumlah_baris:
+            urut += 1
+            jual = rng.random() < 0.75
+            tanggal = hari_ini - datetime.timedelta(days=rng.randrange(1, 3 * 365))
+            pihak = rng.choice(bot_nota.DAFTAR_PELANGGAN if jual else SUPPLIER)
+            jumlah_item = min(rng.randint(1, 3), jumlah_baris - ditulis)
+            nota_rusak = False
+            for _ in range(jumlah_item):
+                if jual:
+                    barang = rng.choice(bot_nota.DAFTAR_BARANG_PENJUALAN)
+                    harga = bot_nota.get_harga_renceng(pihak) if barang == "Kc Bawang Renceng" else 40000
+                    qty = rng.randint(20, 300) if barang == "Kc Bawang Renceng" else rng.randint(1, 10)
+                else:
+                    barang = rng.choice(list(HARGA_BELANJA))
+                    minimum, maksimum, kelipatan = HARGA_BELANJA[barang]
+                    harga = rng.randrange(minimum, maksimum + 1, kelipatan)
+                    qty = rng.randint(1, 20)
+                kolom_tanggal = tanggal.strftime("%d/%m/%Y")
+                if rng.random() < rusak:
+                    nota_rusak = True
+                    cacat = rng.randrange(6)
+                    if cacat == 0:
+                        barang = "Kacang Atom"
+                    elif cacat == 1:
+                        qty = 0
+                    elif cacat == 2:
+                        kolom_tanggal = "31/02/2024"
+                    elif cacat == 3:
+                        qty = "nan"
+                    elif cacat == 4:
+                        harga = "inf"
+                    else:
+                        kolom_tanggal = (hari_ini + datetime.timedelta(days=30)).strftime("%d/%m/%Y")
+                yield ['jual' if jual else 'beli', kolom_tanggal, pihak, barang, qty, harga, f"A-{urut}", '']
+                ditulis += 1
+            if nota_rusak:
+                harapan['baris_ditolak'] += jumlah_item
+            else:
+                harapan['nota'] += 1
+
+    return generator(), harapan
+
+def tulis_csv(path, baris):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        penulis = csv.writer(f)
+        penulis.writerow(HEADER)
+        for b in baris:
+            penulis.writerow(b)
+
+def tulis_xlsx(path, baris):
+    import openpyxl
+    buku = openpyxl.Workbook(write_only=True)
+    lembar = buku.create_sheet()
+    lembar.append(HEADER)
+    for b in baris:
+        lembar.append(b)
+    buku.save(path)
+
+def cek_item_bulanan(db_path):
+    """Bandingkan item_bulanan hasil impor dengan bangun ulang penuh dari semua nota"""
+    conn = sqlite3.connect(db_path)
+    try:
+        sql = "SELECT business_id, bulan, jenis, barang, pihak, round(qty, 3), nilai FROM item_bulanan ORDER BY 1, 2, 3, 4, 5"
+        inkremental = conn.execute(sql).fetchall()
+        conn.execute("BEGIN")
+        bot_nota.bangun_ulang_item_bulanan(conn)
+        penuh = conn.execute(sql).fetchall()
+        conn.rollback()
+        return inkremental == penuh
+    finally:
+        conn.close()
+
+async def impor_lewat_bot(path_file, nama_file):
+    db_path = harness.siapkan_database()
+    application, request = await harness.buat_aplikasi_uji()
+    error = []
+
+    async def catat_error(update, context):
+        error.append(repr(context.error))
+    application.add_error_handler(catat_error)
+
+    request.berkas['berkas-impor'] = path_file
+    await harness.kirim(application, harness.update_pesan(USER_ID, '/start'))
+    await harness.kirim(application, harness.update_pesan(USER_ID, '/import'))
+    rss_awal = peak_rss_mb()
+    t0 = time.perf_counter()
+    await harness.kirim(application, harness.update_dokumen(USER_ID, 'berkas-impor', nama_file, os.path.getsize(path_file)))
+    durasi = time.perf_counter() - t0
+    rss_akhir = peak_rss_mb()
+    await application.shutdown()
+    return db_path, durasi, rss_awal, rss_akhir, error
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark impor massal CSV/XLSX lewat /import")
+    parser.add_argument('--baris', type=int, default=100000)
+    parser.add_argument('--rusak', type=float, default=0.01, help="peluang satu baris rusak")
+    parser.add_argument('--xlsx', action='store_true', help="uji file .xlsx (butuh openpyxl) selain .csv")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('bot_nota').setLevel(logging.WARNING)
+
+    laporan = {
+        'benchmark': 'impor',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'baris': args.baris,
+        'hasil': {},
+    }
+    format_uji = ['csv'] + (['xlsx'] if args.xlsx else [])
+    with tempfile.TemporaryDirectory(prefix="bench-impor-") as tmp:
+        for fmt in format_uji:
+            path = os.path.join(tmp, f"nota.{fmt}")
+            baris, harapan = buat_baris(args.baris, args.rusak, args.seed)
+            (tulis_csv if fmt == 'csv' else tulis_xlsx)(path, baris)
+            print(f"📥 Impor {fmt} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)...", file=sys.stderr)
+
+            db_path, durasi, rss_awal, rss_akhir, error = asyncio.run(impor_lewat_bot(path, f"nota.{fmt}"))
+            conn = sqlite3.connect(db_path)
+            nota = sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ('nota_penjualan', 'nota_belanja'))
+            baris_diimpor = conn.execute('''
+                SELECT (SELECT COALESCE(SUM(json_array_length(daftar_barang)), 0) FROM nota_penjualan) +
+                       (SELECT COALESCE(SUM(json_array_length(daftar_barang)), 0) FROM nota_belanja)
+            ''').fetchone()[0]
+            conn.close()
+            laporan['hasil'][fmt] = {
+                'mb': round(os.path.getsize(path) / 1024 / 1024, 1),
+                'durasi_detik': round(durasi, 2),
+                'baris_per_detik': round(args.baris / durasi),
+                'nota': nota,
+                'nota_diharapkan': harapan['nota'],
+                'baris_ditolak': args.baris - baris_diimpor,
+                'baris_ditolak_diharapkan': harapan['baris_ditolak'],
+                'item_bulanan_sama_dengan_bangun_ulang': cek_item_bulanan(db_path),
+                'peak_rss_sebelum_mb': rss_awal,
+                'peak_rss_sesudah_mb': rss_akhir,
+                'errors': len(error),
+                'contoh_error': error[:5],
+            }
+            os.remove(db_path)
+            os.remove(path)
+
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark inline query (@bot ujang) dari indeks pelanggan di memori.
+
+Database hasil generate_data.py disalin ke direktori sementara dan diberi
+--pelanggan pelanggan tambahan (impor massal), lalu diukur:
+    - waktu memanaskan indeks semua usaha (seperti saat bot start)
+    - jawaban/detik & latency inline query lewat Application asli
+      (InlineQueryHandler -> answerInlineQuery ke Bot API palsu) dan
+      pencarian + format saja, dibanding membaca pelanggan dari SQLite
+    - jumlah koneksi SQLite selama inline query dijawab (harus 0, selain
+      penyimpanan offset update berkala yang berlaku untuk semua update)
+    - isi indeks setelah campuran simpan/bayar/ubah/batal harus sama dengan
+      indeks yang dimuat ulang dari database
+
+Contoh:
+    python benchmarks/generate_data.py --db /tmp/besar.db --penjualan 1000000 --belanja 250000
+    python benchmarks/bench_inline.py --db /tmp/besar.db --query 5000 --output hasil-inline.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import platform
+import tempfile
+
+import harness
+from harness import bot_nota
+import entri_cepat
+from bench_alur import ringkas_latency
+from indeks_pelanggan import IndeksPelanggan
+
+
+class PenghitungKoneksi:
+    """Bungkus sqlite3.connect untuk menghitung koneksi yang dibuka selama fase tertentu"""
+
+    def __init__(self):
+        self.asli = sqlite3.connect
+        self.jumlah = 0
+
+    def __call__(self, *args, **kwargs):
+        self.jumlah += 1
+        return self.asli(*args, **kwargs)
+
+
+def impor_pelanggan(business_id, user_id, jumlah, per_pelanggan=3):
+    """Nota penjualan untuk `jumlah` pelanggan baru (sebagian belum lunas) lewat impor massal"""
+    daftar = []
+    for i in range(jumlah):
+        nama = f"{random.choice(['TOKO', 'WARUNG', 'KIOS', 'BU', 'PAK'])} {random.choice(['SARI', 'JAYA', 'MAKMUR', 'BAROKAH', 'ABADI'])} {i}"
+        for j in range(per_pelanggan):
+            qty = random.randint(10, 300)
+            total = qty * 1600
+            bayar = total if random.random() < 0.7 else total // 2
+            daftar.append({
+                'user_id': user_id, 'business_id': business_id, 'nomor_nota': f"INL-{i}-{j}",
+                'nama_pelanggan': nama, 'tanggal': "01/09/2026", 'timestamp': f"2026-09-01T{8 + j:02d}:00:00.{i:06d}",
+                'daftar_barang': [{'nama': "Kc Bawang Renceng", 'harga': 1600, 'qty': qty, 'subtotal': total}],
+                'retur_items': [], 'total_sebelum_retur': total, 'total_retur': 0, 'total_setelah_retur': total,
+                'bayar': bayar, 'sisa': bayar - total, 'status': "LUNAS" if bayar >= total else "BELUM LUNAS",
+                'keterangan': "",
+            })
+    bot_nota.get_repositori().impor_nota('penjualan', daftar, business_id)
+    return sorted({nota['nama_pelanggan'] for nota in daftar})
+
+def daftar_query(nama_pelanggan, jumlah):
+    """Query inline acak: awalan nama, satu kata, nama lengkap, dan kosong"""
+    hasil = []
+    for _ in range(jumlah):
+        nama = random.choice(nama_pelanggan)
+        pilihan = random.random()
+        if pilihan < 0.4:
+            hasil.append(nama.split()[0][:random.randint(2, 4)].lower())
+        elif pilihan < 0.8:
+            hasil.append(nama.lower())
+        elif pilihan < 0.95:
+            hasil.append(nama.split()[-1])
+        else:
+            hasil.append("")
+    return hasil
+
+def jawaban_langsung(query, business_id):
+    """Pencarian + format hasil inline dari indeks (tanpa Bot API)"""
+    return [(bot_nota.deskripsi_pelanggan(e), bot_nota.format_kartu_pelanggan(e))
+            for e in bot_nota.cari_pelanggan_inline(business_id, query)]
+
+def isi_indeks(indeks, business_id):
+    return {k: {kolom: v for kolom, v in e.items() if kolom != 'kata'}
+            for k, e in indeks._usaha.get(business_id, {}).items()}
+
+async def ukur_aplikasi(daftar, user_id):
+    application, request = await harness.buat_aplikasi_uji()
+    simpan_offset = bot_nota.simpan_offset_update
+    offset_disimpan = 0
+
+    def hitung_offset(offset):
+        nonlocal offset_disimpan
+        offset_disimpan += 1
+        simpan_offset(offset)
+
+    bot_nota.simpan_offset_update = hitung_offset
+    durasi = []
+    t0 = time.perf_counter()
+    for query in daftar:
+        t = time.perf_counter()
+        await harness.kirim(application, harness.update_inline(user_id, query))
+        durasi.append(time.perf_counter() - t)
+    total = time.perf_counter() - t0
+    bot_nota.simpan_offset_update = simpan_offset
+    await application.shutdown()
+    return durasi, total, request.panggilan.get('answerInlineQuery', 0), offset_disimpan
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inline query indeks pelanggan")
+    parser.add_argument('--db', required=True, help="database hasil generate_data.py (tidak diubah)")
+    parser.add_argument('--user', type=int, default=1001)
+    parser.add_argument('--pelanggan', type=int, default=2000, help="pelanggan tambahan yang diimpor")
+    parser.add_argument('--query', type=int, default=5000)
+    parser.add_argument('--tulis', type=int, default=200, help="simpan/bayar/ubah/batal sebelum cek isi indeks")
+    parser.add_argument('--seed', type=int, default=45)
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('bot_nota').setLevel(logging.WARNING)
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="bench-inline-") as tmp:
+        db = os.path.join(tmp, "keuangan.db")
+        sumber = sqlite3.connect(args.db)
+        salinan = sqlite3.connect(db)
+        sumber.backup(salinan)
+        salinan.close()
+        sumber.close()
+        harness.siapkan_database(db)
+        business_id = bot_nota.get_keanggotaan(args.user)['business_id']
+        nama_pelanggan = impor_pelanggan(business_id, args.user, args.pelanggan) + bot_nota.DAFTAR_PELANGGAN
+
+        print("🔎 Memanaskan indeks...", file=sys.stderr)
+        bot_nota.indeks_pelanggan.hapus()
+        t0 = time.perf_counter()
+        usaha = bot_nota.panaskan_indeks_pelanggan()
+        durasi_panas = round(time.perf_counter() - t0, 3)
+        statistik_indeks = bot_nota.indeks_pelanggan.statistik()
+
+        daftar = daftar_query(nama_pelanggan, args.query)
+
+        # Pembanding tanpa indeks: pelanggan yang cocok persis dibaca dari SQLite per query
+        repo = bot_nota.get_repositori()
+        durasi_sqlite = []
+        for nama in random.sample(nama_pelanggan, min(500, len(nama_pelanggan))):
+            t = time.perf_counter()
+            repo.ringkasan_pelanggan(business_id, nama, bot_nota.INLINE_NOTA_TERAKHIR)
+            durasi_sqlite.append(time.perf_counter() - t)
+
+        print("⚡ Inline query...", file=sys.stderr)
+        penghitung = PenghitungKoneksi()
+        sqlite3.connect = penghitung
+        try:
+            durasi_cari = []
+            jumlah_hasil = 0
+            t0 = time.perf_counter()
+            for query in daftar:
+                t = time.perf_counter()
+                jumlah_hasil += len(jawaban_langsung(query, business_id))
+                durasi_cari.append(time.perf_counter() - t)
+            total_cari = time.perf_counter() - t0
+            koneksi_cari = penghitung.jumlah
+            durasi_app, total_app, dijawab, offset_disimpan = asyncio.run(ukur_aplikasi(daftar, args.user))
+        finally:
+            sqlite3.connect = penghitung.asli
+
+        print("✍️ Tulis + cek isi indeks...", file=sys.stderr)
+        entri = entri_cepat.urai("jual ujang: renceng 150, kiloan 3@45000", bot_nota.DAFTAR_PELANGGAN,
+                                 bot_nota.KATALOG_BARANG, bot_nota.get_harga_otomatis)
+        nomor_baru = []
+        for i in range(args.tulis):
+            aksi = random.random()
+            if aksi < 0.4 or not nomor_baru:
+                nomor = f"INLW-{i:05d}"
+                nama = random.choice(nama_pelanggan)
+                bot_nota.simpan_nota_penjualan(
+                    args.user, nomor, nama, "19/10/2026",
+                    [{'nama': "Kc Bawang Renceng", 'harga': 1600, 'qty': 50, 'subtotal': 80000}], [], 80000, 50000, -30000,
+                    business_id=business_id)
+                nomor_baru.append(nomor)
+                continue
+            nomor = random.choice(nomor_baru)
+            try:
+                if aksi < 0.7:
+                    bot_nota.bayar_nota(business_id, args.user, nomor, 10000)
+                elif aksi < 0.85:
+                    bot_nota.ubah_nota(business_id, args.user, nomor, entri, False)
+                else:
+                    bot_nota.batalkan_nota(business_id, args.user, nomor)
+                    nomor_baru.remove(nomor)
+            except bot_nota.KoreksiDitolak:
+                pass
+        pembanding = IndeksPelanggan(bot_nota.INLINE_NOTA_TERAKHIR)
+        piutang, nota = repo.ringkasan_pelanggan(business_id, per_pelanggan=bot_nota.INLINE_NOTA_TERAKHIR)
+        pembanding.muat(business_id, piutang, nota, 0)
+        hasil_indeks = isi_indeks(bot_nota.indeks_pelanggan, business_id)
+        hasil_db = isi_indeks(pembanding, business_id)
+        beda = sorted(k for k in set(hasil_indeks) | set(hasil_db) if hasil_indeks.get(k) != hasil_db.get(k))
+
+    laporan = {
+        'benchmark': 'inline',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'usaha': usaha,
+        'indeks': statistik_indeks,
+        'panaskan_detik': durasi_panas,
+        'query': len(daftar),
+        'rata_hasil_per_query': round(jumlah_hasil / max(len(daftar), 1), 1),
+        'cache_time_detik': bot_nota.INLINE_CACHE_DETIK,
+        'aplikasi': {
+            'jawaban_per_detik': round(dijawab / total_app),
+            'latency': ringkas_latency(durasi_app),
+        },
+        'cari_format': {
+            'jawaban_per_detik': round(len(daftar) / total_cari),
+            'latency': ringkas_latency(durasi_cari),
+        },
+        'tanpa_indeks_sqlite_per_pelanggan': ringkas_latency(durasi_sqlite),
+        'koneksi_sqlite': {
+            'cari_format': koneksi_cari,
+            'aplikasi': penghitung.jumlah - koneksi_cari,
+            'simpan_offset_update': offset_disimpan,
+        },
+        'tulis': args.tulis,
+        'pelanggan_beda_setelah_tulis': len(beda),
+        'contoh_beda': beda[:10],
+    }
+    laporan['lolos'] = (
+        dijawab == len(daftar) and koneksi_cari == 0
+        and penghitung.jumlah - koneksi_cari == offset_disimpan and not beda
+    )
+
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+    if not laporan['lolos']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark jurnal koreksi nota (jurnal.py) terhadap database hasil generate_data.py.
+
+Pada salinan database:
+    - latency /bayar, /ubah, /batal (fungsi bot_nota yang dipanggil handler),
+      separuh pada nota lama (keadaan awal ditulis saat koreksi pertama) dan
+      separuh pada nota baru yang disimpan lewat bot
+    - waktu membangun keadaan semua nota: putar ulang seluruh event vs
+      snapshot terakhir + event sesudahnya, dan waktu snapshot inkremental
+    - pemeriksa melaporkan 0 beda pada database bersih
+    - kerusakan yang disengaja (kolom nota diubah, baris nota dihapus, nota
+      batal muncul lagi, item_bulanan & mutasi stok diutak-atik) terdeteksi,
+      lalu /jurnal perbaiki mengembalikan nota & item bulanan (stok tetap
+      dilaporkan, dibetulkan lewat opname)
+
+Contoh:
+    python benchmarks/generate_data.py --db /tmp/besar.db --penjualan 1000000 --belanja 250000
+    python benchmarks/bench_jurnal.py --db /tmp/besar.db --output hasil-jurnal.json
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import tempfile
+
+import harness
+from harness import bot_nota
+import jurnal
+import entri_cepat
+from bench_alur import ringkas_latency
+
+
+def ukur_operasi(fungsi, daftar_argumen):
+    durasi = []
+    for args in daftar_argumen:
+        t0 = time.perf_counter()
+        fungsi(*args)
+        durasi.append(time.perf_counter() - t0)
+    return ringkas_latency(durasi)
+
+def putar_penuh(db):
+    """Keadaan semua nota dari event pertama tanpa snapshot; kembalikan (jumlah nota, detik)"""
+    conn = sqlite3.connect(db)
+    try:
+        t0 = time.perf_counter()
+        keadaan = {}
+        sampai = conn.execute("SELECT ifnull(MAX(id), 0) FROM nota_event").fetchone()[0]
+        jurnal._putar(conn, keadaan, 0, sampai, [])
+        return keadaan, round(time.perf_counter() - t0, 4)
+    finally:
+        conn.close()
+
+def dari_snapshot(db):
+    """Keadaan semua nota dari snapshot terakhir + event sesudahnya; kembalikan (keadaan, info, detik)"""
+    conn = sqlite3.connect(db)
+    try:
+        t0 = time.perf_counter()
+        keadaan, info = jurnal.bangun_keadaan(conn)
+        return keadaan, info, round(time.perf_counter() - t0, 4)
+    finally:
+        conn.close()
+
+def bersih(laporan):
+    return not (laporan['nota_beda'] or laporan['item_beda'] or laporan['stok_beda'] or laporan['tanpa_awal'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark jurnal koreksi nota")
+    parser.add_argument('--db', required=True, help="database hasil generate_data.py (tidak diubah)")
+    parser.add_argument('--user', type=int, default=1001)
+    parser.add_argument('--operasi', type=int, default=400, help="jumlah /bayar, /ubah, dan /batal masing-masing")
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('bot_nota').setLevel(logging.WARNING)
+    logging.getLogger('jurnal').setLevel(logging.WARNING)
+    n = args.operasi
+
+    with tempfile.TemporaryDirectory(prefix="bench-jurnal-") as tmp:
+        db = os.path.join(tmp, "keuangan.db")
+        sumber = sqlite3.connect(args.db)
+        salinan = sqlite3.connect(db)
+        sumber.backup(salinan)
+        salinan.close()
+        sumber.close()
+        bot_nota.ARSIP_DIR = os.path.join(tmp, "arsip")
+        harness.siapkan_database(db)
+        business_id = bot_nota.get_keanggotaan(args.user)['business_id']
+
+        # Nota lama (belum punya event): yang belum lunas untuk /bayar, sisanya /ubah & /batal
+        conn = sqlite3.connect(db)
+        lama_utang = [r[0] for r in conn.execute(
+            "SELECT nomor_nota FROM nota_penjualan WHERE business_id = ? AND sisa < 0 ORDER BY random() LIMIT ?",
+            (business_id, n - n // 2))]
+        lama_lain = [r[0] for r in conn.execute(
+            "SELECT nomor_nota FROM nota_penjualan WHERE business_id = ? AND sisa >= 0 ORDER BY random() LIMIT ?",
+            (business_id, 2 * (n - n // 2)))]
+        conn.close()
+
+        # Nota baru lewat bot: tercatat lengkap di jurnal, mutasi stoknya ikut diperiksa
+        print("🧾 Menyimpan nota baru...", file=sys.stderr)
+        baru = []
+        for i in range(3 * (n // 2)):
+            nomor = f"JRN-{i + 1:06d}"
+            barang = [{'nama': "Kc Bawang Renceng", 'harga': 1200, 'qty': 100, 'subtotal': 120000}]
+            bot_nota.simpan_nota_penjualan(args.user, nomor, "ASEP RIDWAN", "01/01/2026", barang, [], 120000, 100000, -20000,
+                                           business_id=business_id)
+            baru.append(nomor)
+        k = n // 2
+        target_bayar = lama_utang + baru[:k]
+        target_ubah = lama_lain[:len(lama_lain) // 2] + baru[k:2 * k]
+        target_batal = lama_lain[len(lama_lain) // 2:] + baru[2 * k:]
+
+        entri = entri_cepat.urai("jual ujang: renceng 150, kiloan 3@45000", bot_nota.DAFTAR_PELANGGAN,
+                                 bot_nota.KATALOG_BARANG, bot_nota.get_harga_otomatis)
+        print("✏️ Koreksi nota...", file=sys.stderr)
+        latency = {
+            'bayar': ukur_operasi(bot_nota.bayar_nota, [(business_id, args.user, nomor) for nomor in target_bayar]),
+            'ubah': ukur_operasi(bot_nota.ubah_nota, [(business_id, args.user, nomor, entri, False) for nomor in target_ubah]),
+            'batal': ukur_operasi(bot_nota.batalkan_nota, [(business_id, args.user, nomor, "bench") for nomor in target_batal]),
+        }
+
+        # Keadaan tanpa snapshot, snapshot penuh pertama, lalu event baru sesudahnya
+        keadaan_penuh, detik_tanpa_snapshot = putar_penuh(db)
+        snapshot_pertama = jurnal.buat_snapshot(db)
+        ekor = baru[:k][:max(k // 4, 1)]
+        for nomor in ekor:
+            bot_nota.ubah_nota(business_id, args.user, nomor, entri, False)
+        snapshot_ekor = dari_snapshot(db)
+        keadaan_penuh, detik_penuh = putar_penuh(db)
+        snapshot_kedua = jurnal.buat_snapshot(db)
+        replay = {
+            'event': jurnal.status(db)['event'],
+            'putar_penuh_sebelum_snapshot_detik': detik_tanpa_snapshot,
+            'snapshot_pertama': snapshot_pertama,
+            'event_sesudah_snapshot': snapshot_ekor[1]['event_diputar'],
+            'putar_penuh_detik': detik_penuh,
+            'snapshot_plus_event_detik': snapshot_ekor[2],
+            'snapshot_inkremental': snapshot_kedua,
+            'keadaan_sama': snapshot_ekor[0] == keadaan_penuh,
+        }
+
+        print("🔎 Pemeriksaan database bersih...", file=sys.stderr)
+        cek_bersih = bot_nota.cek_jurnal()
+
+        # Kerusakan disengaja di luar jurnal
+        conn = sqlite3.connect(db)
+        conn.execute("UPDATE nota_penjualan SET bayar = bayar + 1 WHERE nomor_nota = ?", (target_bayar[0],))
+        conn.execute("DELETE FROM nota_penjualan WHERE nomor_nota = ?", (target_ubah[0],))
+        batal_id, batal_data = conn.execute('''
+            SELECT e.nota_id, e.data FROM nota_event e WHERE e.nomor_nota = ? AND e.jenis = ? ORDER BY e.id LIMIT 1
+        ''', (target_batal[-1], jurnal.DIBUAT)).fetchone()
+        from repositori import TABEL_NOTA, baris_nota
+        tabel, kolom = TABEL_NOTA['penjualan']
+        conn.execute(f"INSERT INTO {tabel} (id, {', '.join(kolom)}) VALUES (?, {', '.join('?' * len(kolom))})",
+                     (batal_id, *baris_nota(jurnal.baca_data(batal_data)['nota'], kolom)))
+        conn.execute('''
+            UPDATE item_bulanan SET qty = qty + 7
+            WHERE rowid = (SELECT rowid FROM item_bulanan WHERE business_id = ? ORDER BY bulan DESC LIMIT 1)
+        ''', (business_id,))
+        conn.execute('''
+            INSERT INTO mutasi_stok (business_id, sku, perubahan, saldo, sumber, referensi, user_id, timestamp)
+            VALUES (?, 'Kc Bawang Renceng', -5, 0, 'penjualan', ?, ?, '2026-01-01T00:00:00')
+        ''', (business_id, baru[-1], args.user))
+        conn.commit()
+        conn.close()
+
+        print("🩹 Pemeriksaan & perbaikan database rusak...", file=sys.stderr)
+        cek_rusak = bot_nota.cek_jurnal()
+        cek_perbaiki = bot_nota.cek_jurnal(perbaiki=True)
+        cek_ulang = bot_nota.cek_jurnal()
+
+    ringkas = ('nota_dicek', 'nota_beda', 'item_beda', 'stok_beda', 'tanpa_awal', 'durasi_detik')
+    laporan = {
+        'benchmark': 'jurnal',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'operasi': {'bayar': len(target_bayar), 'ubah': len(target_ubah), 'batal': len(target_batal)},
+        'latency': latency,
+        'replay': replay,
+        'cek_bersih': {k: cek_bersih[k] for k in ringkas},
+        'cek_rusak': {k: cek_rusak[k] for k in ringkas},
+        'contoh_rusak': {k: cek_rusak[k] for k in ('contoh_nota', 'contoh_item', 'contoh_stok')},
+        'diperbaiki': cek_perbaiki['diperbaiki'],
+        'cek_sesudah_perbaiki': {k: cek_ulang[k] for k in ringkas},
+    }
+    laporan['lolos'] = (
+        replay['keadaan_sama'] and bersih(cek_bersih)
+        and cek_rusak['nota_beda'] == 3 and cek_rusak['item_beda'] >= 1 and cek_rusak['stok_beda'] == 1
+        and cek_perbaiki['diperbaiki'] == 3
+        and cek_ulang['nota_beda'] == 0 and cek_ulang['item_beda'] == 0 and cek_ulang['stok_beda'] == 1
+    )
+
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+    if not laporan['lolos']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
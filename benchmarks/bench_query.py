@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark query histori & statistik terhadap database hasil generate_data.py.
+
+Mengukur fungsi data yang dipakai handler (ambil_histori_pelanggan,
+ambil_histori_semua, ambil_statistik_bulan, ambil_analisa) dan menampilkan EXPLAIN QUERY PLAN
+untuk setiap query, sehingga perubahan skema/index bisa dibuktikan dengan angka.
+
+Contoh:
+    python benchmarks/bench_query.py --db /tmp/besar.db --output hasil-query.json
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import datetime
+import platform
+
+from harness import bot_nota
+import analitik
+import repositori
+from bench_alur import ringkas_latency
+
+
+def ukur(fungsi, *args, ulang=20):
+    fungsi(*args)  # pemanasan cache halaman
+    durasi = []
+    for _ in range(ulang):
+        t0 = time.perf_counter()
+        fungsi(*args)
+        durasi.append(time.perf_counter() - t0)
+    return ringkas_latency(durasi)
+
+def rencana_query(conn, sql, params):
+    baris = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [r[-1] for r in baris]
+
+def analisa_tanpa_cache(business_id, bulan):
+    bot_nota.analisa_cache.clear()
+    return bot_nota.ambil_analisa(business_id, bulan)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query histori/statistik")
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--user', type=int, default=1001, help="user yang usahanya diukur")
+    parser.add_argument('--ulang', type=int, default=20)
+    parser.add_argument('--bulan', default=None, help="bulan statistik mm/YYYY (default bulan ini)")
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    bot_nota.DB_FILE = os.path.abspath(args.db)
+    bulan = args.bulan or datetime.datetime.now().strftime("%m/%Y")
+
+    conn = sqlite3.connect(bot_nota.DB_FILE)
+    jumlah = {
+        'nota_penjualan': conn.execute("SELECT COUNT(*) FROM nota_penjualan").fetchone()[0],
+        'nota_belanja': conn.execute("SELECT COUNT(*) FROM nota_belanja").fetchone()[0],
+    }
+    jumlah_usaha = conn.execute("SELECT COUNT(*) FROM usaha").fetchone()[0]
+    index = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+    business_id = bot_nota.get_keanggotaan(args.user)['business_id']
+    pelanggan = bot_nota.DAFTAR_PELANGGAN[0]
+    awal, akhir = bot_nota.rentang_bulan(bulan)
+    kasus = {
+        'tampilkan_histori_pelanggan': (
+            bot_nota.ambil_histori_pelanggan, (business_id, pelanggan),
+            [(repositori.SQL_HISTORI_PELANGGAN, (business_id, pelanggan, 10, 0))],
+        ),
+        'tampilkan_histori_semua': (
+            bot_nota.ambil_histori_semua, (business_id,),
+            [(repositori.SQL_HISTORI_SEMUA, (business_id, 10, 0))],
+        ),
+        'tampilkan_statistik': (
+            bot_nota.ambil_statistik_bulan, (business_id, bulan),
+            [(repositori.SQL_STATISTIK_PENJUALAN, (business_id, awal, akhir)),
+             (repositori.SQL_STATISTIK_BELANJA, (business_id, awal, akhir))],
+        ),
+        'analisa_laba_tanpa_cache': (
+            analisa_tanpa_cache, (business_id, bulan),
+            [(repositori.SQL_ITEM_BULANAN, (business_id, int(awal[:4] + awal[5:7])))],
+        ),
+        'analisa_laba_cache': (
+            bot_nota.ambil_analisa, (business_id, bulan),
+            [],
+        ),
+    }
+
+    hasil = {}
+    for nama, (fungsi, params, daftar_sql) in kasus.items():
+        hasil[nama] = {
+            'latency': ukur(fungsi, *params, ulang=args.ulang),
+            'query_plan': [rencana_query(conn, sql, p) for sql, p in daftar_sql],
+        }
+        print(f"• {nama}: p50 {hasil[nama]['latency']['p50_ms']} ms", file=sys.stderr)
+        for rencana in hasil[nama]['query_plan']:
+            for langkah in rencana:
+                print(f"    {langkah}", file=sys.stderr)
+    conn.close()
+
+    laporan = {
+        'benchmark': 'query',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'db_mb': round(os.path.getsize(bot_nota.DB_FILE) / 1024 / 1024, 1),
+        'jumlah_baris': jumlah,
+        'jumlah_usaha': jumlah_usaha,
+        'index': index,
+        'numpy': analitik.muat_numpy() is not None,
+        'hasil': hasil,
+    }
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
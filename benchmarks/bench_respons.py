@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark cache respons STATISTIK / HISTORI.
+
+Database hasil generate_data.py disalin ke direktori sementara, lalu satu
+user membuka tampilan STATISTIK, HISTORI semua pelanggan, dan HISTORI per
+pelanggan secara acak lewat handler callback asli. Di sela tampilan, nota
+penjualan/belanja baru disimpan dengan peluang --tulis, sehingga invalidasi
+ikut teruji. Dijalankan dua kali dengan urutan yang sama: tanpa cache
+(CACHE_RESPONS_MAKS=0) dan dengan cache.
+
+Setiap teks yang dikirim bot dibandingkan dengan teks yang dihitung ulang
+langsung dari database; jumlah beda harus 0.
+
+Contoh:
+    python benchmarks/generate_data.py --db /tmp/besar.db --penjualan 2000000 --belanja 500000
+    python benchmarks/bench_respons.py --db /tmp/besar.db --tampilan 2000 --output hasil-respons.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import datetime
+import platform
+import tempfile
+
+import harness
+from harness import bot_nota, RequestPalsu
+from bench_alur import ringkas_latency
+from cache import CacheRespons
+
+
+class RequestTeks(RequestPalsu):
+    """RequestPalsu yang menyimpan teks editMessageText terakhir"""
+
+    def __init__(self):
+        super().__init__()
+        self.teks_terakhir = None
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith('/editMessageText') and request_data:
+            self.teks_terakhir = request_data.parameters.get('text')
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+def teks_langsung(business_id, keanggotaan, tampilan):
+    """Teks tampilan dihitung langsung dari database (tanpa cache) untuk pembanding"""
+    if tampilan == 'menu_statistik':
+        bulan = datetime.datetime.now().strftime("%m/%Y")
+        return bot_nota.format_statistik(keanggotaan['nama_usaha'], bulan, *bot_nota.ambil_statistik_bulan(business_id, bulan))
+    if tampilan == 'histori_semua':
+        return bot_nota.format_histori_semua(bot_nota.ambil_histori_semua(business_id))
+    nama = bot_nota.DAFTAR_PELANGGAN[int(tampilan.split('_')[2]) - 1]
+    return bot_nota.format_histori_pelanggan(nama, bot_nota.ambil_histori_pelanggan(business_id, nama))
+
+def simpan_nota_acak(rng, user_id, urut):
+    nomor = f"RSP-{os.getpid()}-{urut}"
+    tanggal = datetime.datetime.now().strftime("%d/%m/%Y")
+    if rng.random() < 0.7:
+        nama = rng.choice(bot_nota.DAFTAR_PELANGGAN)
+        qty = rng.randint(10, 200)
+        barang = [{'nama': "Kc Bawang Renceng", 'harga': 1200, 'qty': qty, 'subtotal': qty * 1200}]
+        return bot_nota.simpan_nota_penjualan(user_id, nomor, nama, tanggal, barang, [], qty * 1200, qty * 1200, 0)
+    barang = [{'nama': "Kacang Tanah", 'harga': 25000, 'qty': 2, 'subtotal': 50000}]
+    return bot_nota.simpan_nota_belanja(user_id, nomor, "Supplier A", tanggal, barang, 50000, "")
+
+async def jalankan(db_sumber, tmp, label, maks_entri, args):
+    db = os.path.join(tmp, f"{label}.db")
+    sumber = sqlite3.connect(db_sumber)
+    salinan = sqlite3.connect(db)
+    sumber.backup(salinan)
+    salinan.close()
+    sumber.close()
+    harness.siapkan_database(db)
+    bot_nota.respons_cache = CacheRespons(maks_entri)
+
+    application, request = await harness.buat_aplikasi_uji(RequestTeks())
+    error = []
+
+    async def catat_error(update, context):
+        error.append(repr(context.error))
+    application.add_error_handler(catat_error)
+
+    keanggotaan = bot_nota.get_keanggotaan(args.user)
+    business_id = keanggotaan['business_id']
+    daftar_tampilan = ['menu_statistik', 'histori_semua'] + [
+        f"histori_pelanggan_{i + 1}" for i in range(len(bot_nota.DAFTAR_PELANGGAN))
+    ]
+    rng = random.Random(args.seed)
+    durasi = []
+    beda = []
+    nota = 0
+    for i in range(args.tampilan):
+        if rng.random() < args.tulis:
+            nota += bool(simpan_nota_acak(rng, args.user, i))
+        tampilan = rng.choice(daftar_tampilan)
+        t0 = time.perf_counter()
+        await harness.kirim(application, harness.update_callback(args.user, tampilan))
+        durasi.append(time.perf_counter() - t0)
+        if request.teks_terakhir.strip() != teks_langsung(business_id, keanggotaan, tampilan).strip():
+            beda.append(tampilan)
+    await application.shutdown()
+
+    return {
+        'latency': ringkas_latency(durasi),
+        'nota_disimpan': nota,
+        'teks_beda_dengan_database': len(beda),
+        'contoh_beda': beda[:5],
+        'cache': bot_nota.respons_cache.statistik(),
+        'errors': len(error),
+        'contoh_error': error[:5],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cache respons STATISTIK/HISTORI")
+    parser.add_argument('--db', required=True, help="database hasil generate_data.py (tidak diubah)")
+    parser.add_argument('--user', type=int, default=1001)
+    parser.add_argument('--tampilan', type=int, default=2000, help="jumlah tampilan dibuka")
+    parser.add_argument('--tulis', type=float, default=0.05, help="peluang nota baru sebelum tiap tampilan")
+    parser.add_argument('--maks-entri', type=int, default=bot_nota.CACHE_RESPONS_MAKS)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('bot_nota').setLevel(logging.WARNING)
+
+    laporan = {
+        'benchmark': 'respons',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'db_mb': round(os.path.getsize(args.db) / 1024 / 1024, 1),
+        'tampilan': args.tampilan,
+        'tulis': args.tulis,
+        'hasil': {},
+    }
+    with tempfile.TemporaryDirectory(prefix="bench-respons-") as tmp:
+        for label, maks in (('tanpa_cache', 0), ('dengan_cache', args.maks_entri)):
+            print(f"📊 {label}...", file=sys.stderr)
+            laporan['hasil'][label] = asyncio.run(jalankan(args.db, tmp, label, maks, args))
+
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
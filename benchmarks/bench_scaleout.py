@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark skala worker: update/detik untuk 1, 2, 4, ... proses worker.
+
+Update sintetis dari bench_alur dibagikan lewat Dispatcher (consistent
+hashing user_id) ke worker yang memakai Bot API palsu dan satu database
+SQLite bersama.
+
+Contoh:
+    python benchmarks/bench_scaleout.py --workers 1 2 4 8 --users 200 --sesi sqlite
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+import harness
+from harness import bot_nota
+from bench_alur import buat_skenario_user
+
+import sesi
+import scaleout
+
+
+def buat_updates(jumlah_user, seed):
+    """Update semua user, diselang-seling antar user dengan urutan per user tetap"""
+    per_user = []
+    for i in range(jumlah_user):
+        updates = []
+        for _, alur in buat_skenario_user(200000 + i, seed + i):
+            updates.extend(alur)
+        per_user.append(updates)
+    hasil = []
+    for langkah in range(max(len(u) for u in per_user)):
+        for updates in per_user:
+            if langkah < len(updates):
+                hasil.append(updates[langkah])
+    return hasil
+
+def ukur(jumlah_worker, updates):
+    db_path = harness.siapkan_database()
+    dispatcher = scaleout.Dispatcher(jumlah_worker, db_file=db_path, pembuat_aplikasi=harness.buat_aplikasi_uji)
+    dispatcher.mulai()
+    dispatcher.tunggu_siap()
+
+    t0 = time.perf_counter()
+    for data in updates:
+        dispatcher.kirim(data)
+    diproses = dispatcher.berhenti()
+    durasi = time.perf_counter() - t0
+
+    os.remove(db_path)
+    return {
+        'workers': jumlah_worker,
+        'updates': len(updates),
+        'durasi_s': round(durasi, 4),
+        'updates_per_s': round(len(updates) / durasi, 1),
+        'updates_per_worker': [diproses[i] for i in sorted(diproses)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark skala jumlah worker")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sesi', default='memory', choices=['memory', 'sqlite', 'redis'],
+                        help="backend sesi worker (redis tanpa REDIS_URL memakai RedisPalsu per worker)")
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    # Worker (proses spawn) membaca SESSION_BACKEND dari environment saat import bot_nota
+    os.environ['SESSION_BACKEND'] = args.sesi
+    if args.sesi == 'redis':
+        os.environ.setdefault('REDIS_URL', sesi.URL_REDIS_PALSU)
+    updates = buat_updates(args.users, args.seed)
+
+    hasil = []
+    for jumlah in args.workers:
+        hasil.append(ukur(jumlah, updates))
+        print(f"• {jumlah} worker: {hasil[-1]['updates_per_s']} update/s", file=sys.stderr)
+
+    dasar = hasil[0]['updates_per_s']
+    for h in hasil:
+        h['speedup'] = round(h['updates_per_s'] / dasar, 2) if dasar else 0.0
+
+    laporan = {
+        'benchmark': 'scaleout',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu': os.cpu_count(),
+        'sesi': args.sesi,
+        'users': args.users,
+        'hasil': hasil,
+    }
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
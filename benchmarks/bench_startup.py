@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark startup: waktu import dan waktu sampai update pertama dibalas.
+
+Dua pengukuran, masing-masing di proses Python baru:
+
+1. `python -X importtime -c "import bot_nota"` diringkas per modul level
+   atas (kumulatif), dipisah modul proyek dan pihak ketiga.
+2. Time-to-first-update: proses anak menjalankan `bot_nota.main()` asli
+   (init database, buat aplikasi, jadwal job, run_polling) dengan Bot API
+   palsu yang mengembalikan satu update /start di getUpdates pertama.
+   Dicatat per fase sejak proses dibuat: interpreter siap, import selesai,
+   database siap, aplikasi dibuat, polling dimulai, balasan pertama.
+
+Skenario: database dengan skema terbaru (restart biasa) dan database baru
+(semua migrasi dijalankan). Secara default modul proyek dikompilasi dulu
+(compileall, seperti langkah build di dockerfile/nixpacks.toml). Dengan
+--tanpa-pyc file proyek disalin ke direktori sementara dan dijalankan dengan
+-B, meniru container yang belum punya __pycache__ dan tidak bisa menulisnya
+(mis. PYTHONDONTWRITEBYTECODE=1).
+
+Contoh:
+    python benchmarks/bench_startup.py --ulang 5 --output hasil-startup.json
+    python benchmarks/bench_startup.py --tanpa-pyc
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import shutil
+import signal
+import compileall
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+FOLDER_BENCH = os.path.dirname(os.path.abspath(__file__))
+FOLDER_PROYEK = os.path.dirname(FOLDER_BENCH)
+POLA_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def modul_proyek(folder):
+    return {os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(folder, '*.py'))}
+
+def lingkungan(db_file=None):
+    env = dict(os.environ)
+    env.setdefault('BOT_TOKEN', '123456:STARTUP')
+    env['BACKUP_INTERVAL_MENIT'] = '0'
+    if db_file:
+        env['BENCH_DB_FILE'] = db_file
+    return env
+
+
+# ===== IMPORTTIME =====
+def ringkas_importtime(stderr, proyek):
+    """Kumulatif per modul level atas (anak langsung bot_nota atau modul yang di-import pertama kali)"""
+    per_modul = {}
+    total = 0
+    for baris in stderr.splitlines():
+        m = POLA_IMPORTTIME.match(baris)
+        if not m:
+            continue
+        kumulatif, indent, nama = int(m.group(2)), len(m.group(3)), m.group(4)
+        if nama == 'bot_nota':
+            total = kumulatif
+        # indent 1 = di-import langsung (mis. site / bot_nota), 3 = di-import oleh bot_nota
+        if indent == 3 or (indent == 1 and nama != 'bot_nota'):
+            akar = nama.split('.')[0]
+            per_modul[akar] = per_modul.get(akar, 0) + kumulatif
+    urut = sorted(per_modul.items(), key=lambda x: -x[1])
+    return {
+        'bot_nota_ms': round(total / 1000, 1),
+        'proyek_ms': round(sum(v for k, v in per_modul.items() if k in proyek) / 1000, 1),
+        'modul': [{'modul': k, 'ms': round(v / 1000, 1), 'proyek': k in proyek} for k, v in urut[:20]],
+    }
+
+def ukur_importtime(folder, ulang, tanpa_pyc):
+    proyek = modul_proyek(folder)
+    hasil = []
+    for _ in range(ulang):
+        perintah = [sys.executable, '-X', 'importtime'] + (['-B'] if tanpa_pyc else []) + ['-c', 'import bot_nota']
+        p = subprocess.run(perintah, cwd=folder, env=lingkungan(), capture_output=True, text=True)
+        hasil.append(ringkas_importtime(p.stderr, proyek))
+    # Ambil run dengan total median agar rincian per modul konsisten
+    return sorted(hasil, key=lambda h: h['bot_nota_ms'])[len(hasil) // 2]
+
+
+# ===== TIME-TO-FIRST-UPDATE =====
+def anak():
+    """Dijalankan di proses anak: main() asli dengan Bot API palsu, cetak stempel waktu fase (JSON)"""
+    t_interpreter = time.time()
+    sys.path.insert(0, os.getcwd())
+    import bot_nota
+    t_import = time.time()
+
+    from harness import RequestPalsu, update_pesan
+
+    bot_nota.DB_FILE = os.environ['BENCH_DB_FILE']
+    stempel = {'interpreter': t_interpreter, 'import': t_import}
+
+    def catat(nama, fungsi):
+        def pembungkus(*args, **kwargs):
+            hasil = fungsi(*args, **kwargs)
+            stempel.setdefault(nama, time.time())
+            return hasil
+        return pembungkus
+    bot_nota.init_database = catat('database', bot_nota.init_database)
+    bot_nota.buat_aplikasi = catat('aplikasi', bot_nota.buat_aplikasi)
+
+    class RequestStartup(RequestPalsu):
+        """getUpdates pertama berisi /start; balasan pertama menghentikan polling (SIGINT)"""
+
+        def __init__(self):
+            super().__init__()
+            self.terkirim = False
+
+        async def do_request(self, url, method, request_data=None, **kwargs):
+            endpoint = url.rsplit('/', 1)[-1]
+            if endpoint == 'getUpdates':
+                stempel.setdefault('polling', time.time())
+                if not self.terkirim:
+                    self.terkirim = True
+                    return 200, json.dumps({'ok': True, 'result': [update_pesan(1001, '/start')]}).encode('utf-8')
+                await asyncio.sleep(0.01)
+            status, isi = await super().do_request(url, method, request_data, **kwargs)
+            if endpoint == 'sendMessage' and 'balasan' not in stempel:
+                stempel['balasan'] = time.time()
+                signal.raise_signal(signal.SIGINT)
+            return status, isi
+
+    request = RequestStartup()
+    builder = (
+        bot_nota.Application.builder()
+        .token(os.environ['BOT_TOKEN'])
+        .request(request)
+        .get_updates_request(request)
+    )
+    bot_nota.main(builder)
+    print(json.dumps(stempel))
+
+def ukur_first_update(folder, db_file, tanpa_pyc):
+    perintah = [sys.executable] + (['-B'] if tanpa_pyc else []) + [os.path.abspath(__file__), '--anak']
+    t0 = time.time()
+    p = subprocess.run(perintah, cwd=folder, env=lingkungan(db_file), capture_output=True, text=True)
+    if p.returncode != 0 or not p.stdout.strip():
+        raise RuntimeError(f"Proses anak gagal:\n{p.stderr[-2000:]}")
+    stempel = json.loads(p.stdout.strip().splitlines()[-1])
+    return {fase: (t - t0) * 1000 for fase, t in stempel.items()}
+
+def ringkas_fase(daftar):
+    return {fase: round(statistics.median(d[fase] for d in daftar), 1) for fase in daftar[0]}
+
+def skenario(folder, ulang, tanpa_pyc):
+    # Jangan tulis __pycache__ ke salinan proyek (--tanpa-pyc)
+    sys.dont_write_bytecode = True
+    sys.path.insert(0, folder)
+    import migrasi
+    hasil = {}
+    with tempfile.TemporaryDirectory(prefix="bench-startup-db-") as tmp:
+        # Restart biasa: skema sudah versi terbaru
+        db_file = os.path.join(tmp, 'keuangan.db')
+        migrasi.jalankan(db_file)
+        hasil['skema_terbaru'] = ringkas_fase([ukur_first_update(folder, db_file, tanpa_pyc) for _ in range(ulang)])
+        # Deploy pertama: database kosong, semua migrasi dijalankan
+        daftar = []
+        for i in range(ulang):
+            daftar.append(ukur_first_update(folder, os.path.join(tmp, f'baru-{i}.db'), tanpa_pyc))
+        hasil['database_baru'] = ringkas_fase(daftar)
+    return hasil
+
+def main():
+    if '--anak' in sys.argv:
+        return anak()
+    parser = argparse.ArgumentParser(description="Benchmark waktu import dan time-to-first-update bot")
+    parser.add_argument('--ulang', type=int, default=5, help="jumlah proses per skenario (median)")
+    parser.add_argument('--tanpa-pyc', action='store_true', help="jalankan salinan proyek tanpa __pycache__ (-B)")
+    parser.add_argument('--output', help="tulis hasil JSON ke file (default stdout)")
+    args = parser.parse_args()
+
+    laporan = {
+        'benchmark': 'startup',
+        'waktu': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'ulang': args.ulang,
+        'tanpa_pyc': args.tanpa_pyc,
+    }
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as tmp:
+        folder = FOLDER_PROYEK
+        if args.tanpa_pyc:
+            folder = os.path.join(tmp, 'proyek')
+            os.mkdir(folder)
+            for path in glob.glob(os.path.join(FOLDER_PROYEK, '*.py')):
+                shutil.copy(path, folder)
+        else:
+            compileall.compile_dir(folder, maxlevels=0, quiet=1)
+        print("⏱️ Mengukur -X importtime...", file=sys.stderr)
+        laporan['importtime'] = ukur_importtime(folder, args.ulang, args.tanpa_pyc)
+        print("⏱️ Mengukur time-to-first-update...", file=sys.stderr)
+        laporan['first_update_ms'] = skenario(folder, args.ulang, args.tanpa_pyc)
+
+    teks = json.dumps(laporan, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(teks + '\n')
+    else:
+        print(teks)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generator dataset besar untuk keuangan.db.
+
+Mengisi nota_penjualan dan nota_belanja dengan nota realistis: pelanggan dan
+barang dari konfigurasi bot, harga renceng sesuai get_harga_renceng, retur,
+pembayaran sebagian, tersebar beberapa tahun ke belakang.
+
+Contoh:
+    python benchmarks/generate_data.py --db /tmp/besar.db --penjualan 2000000 --belanja 500000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import datetime
+
+from harness import bot_nota
+
+BATCH = 50000
+
+SUPPLIER = [
+    "Toko Sumber Rejeki", "Pasar Ciamis", "CV Kacang Jaya", "Agen Minyak Barokah",
+    "Toko Plastik Makmur", "Pangkalan Gas Werasari", "Percetakan Label Priangan",
+]
+
+# Kisaran harga satuan (min, max, kelipatan) untuk tiap jenis belanja
+HARGA_BELANJA = {
+    "Kacang Kupas": (24000, 32000, 500),
+    "Bumbu": (5000, 25000, 1000),
+    "Minyak": (14000, 19000, 500),
+    "Plastik": (20000, 45000, 1000),
+    "Label": (50000, 150000, 5000),
+    "Biaya Produksi": (10000, 100000, 5000),
+    "Gas LPG": (20000, 23000, 500),
+    "Upah goreng": (50000, 100000, 5000),
+    "Upah Bungkus": (40000, 80000, 5000),
+    "Lain-lain": (5000, 50000, 1000),
+}
+
+# Pelanggan grosir lebih sering belanja daripada pelanggan umum
+BOBOT_PELANGGAN = [5, 4, 2]
+
+
+def acak_harga(rng, minimum, maksimum, kelipatan):
+    return rng.randrange(minimum, maksimum + 1, kelipatan)
+
+def acak_waktu(rng, mulai, rentang_detik):
+    # Jam operasional 07:00 - 20:00
+    hari = mulai + datetime.timedelta(seconds=rng.randrange(rentang_detik))
+    return hari.replace(hour=rng.randint(7, 19), minute=rng.randint(0, 59), second=rng.randint(0, 59))
+
+def baris_penjualan(rng, i, pemilik, waktu):
+    pelanggan = rng.choices(bot_nota.DAFTAR_PELANGGAN, weights=BOBOT_PELANGGAN[:len(bot_nota.DAFTAR_PELANGGAN)])[0]
+    harga_renceng = bot_nota.get_harga_renceng(pelanggan)
+
+    daftar_barang = []
+    qty = rng.randint(20, 500)
+    daftar_barang.append({'nama': "Kc Bawang Renceng", 'harga': harga_renceng, 'qty': qty, 'subtotal': harga_renceng * qty})
+    if rng.random() < 0.4:
+        harga = acak_harga(rng, 40000, 55000, 1000)
+        qty = rng.randint(1, 10)
+        daftar_barang.append({'nama': "Kc Bawang Kiloan", 'harga': harga, 'qty': qty, 'subtotal': harga * qty})
+
+    retur_items = []
+    if rng.random() < 0.1:
+        qty = rng.randint(5, 30)
+        retur_items.append({'nama': "Kc Bawang Renceng", 'harga': harga_renceng, 'qty': qty, 'subtotal': harga_renceng * qty})
+
+    total_sebelum_retur = sum(item['subtotal'] for item in daftar_barang)
+    total_retur = sum(item['subtotal'] for item in retur_items)
+    total_setelah_retur = total_sebelum_retur - total_retur
+
+    peluang = rng.random()
+    if peluang < 0.15:
+        bayar = int(total_setelah_retur * rng.uniform(0.3, 0.9)) // 1000 * 1000
+    elif peluang < 0.5:
+        bayar = -(-total_setelah_retur // 50000) * 50000
+    else:
+        bayar = total_setelah_retur
+    sisa = bayar - total_setelah_retur
+
+    return (
+        *pemilik,
+        f"PNJ-{waktu:%d-%m-%y}-{i:07d}",
+        pelanggan,
+        waktu.strftime("%d/%m/%Y"),
+        waktu.isoformat(),
+        json.dumps(daftar_barang, ensure_ascii=False),
+        json.dumps(retur_items, ensure_ascii=False),
+        total_sebelum_retur, total_retur, total_setelah_retur, bayar, sisa,
+        "LUNAS" if sisa >= 0 else "BELUM LUNAS",
+        f"Sisa {sisa}" if sisa >= 0 else f"Kurang {-sisa}",
+    )
+
+def baris_belanja(rng, i, pemilik, waktu):
+    daftar_barang = []
+    for nama in rng.sample(bot_nota.DAFTAR_BARANG_BELANJA, rng.randint(1, 3)):
+        harga = acak_harga(rng, *HARGA_BELANJA.get(nama, (5000, 50000, 1000)))
+        qty = rng.randint(1, 50)
+        daftar_barang.append({'nama': nama, 'harga': harga, 'qty': qty, 'subtotal': harga * qty})
+    return (
+        *pemilik,
+        f"BLJ-{waktu:%d-%m-%y}-{i:07d}",
+        rng.choice(SUPPLIER),
+        waktu.strftime("%d/%m/%Y"),
+        waktu.isoformat(),
+        json.dumps(daftar_barang, ensure_ascii=False),
+        sum(item['subtotal'] for item in daftar_barang),
+        "",
+    )
+
+def isi_tabel(conn, sql, pembuat, jumlah, rng, pemilik, tahun):
+    """Insert `jumlah` baris berurutan waktu dengan executemany per batch"""
+    akhir = datetime.datetime.now()
+    mulai = akhir - datetime.timedelta(days=365 * tahun)
+    rentang = int((akhir - mulai).total_seconds())
+    langkah = rentang / max(jumlah, 1)
+
+    i = 0
+    while i < jumlah:
+        batch = []
+        for j in range(i, min(i + BATCH, jumlah)):
+            # Waktu bertambah monoton agar id searah dengan timestamp seperti data asli
+            waktu = acak_waktu(rng, mulai + datetime.timedelta(seconds=int(j * langkah)), max(int(langkah), 1))
+            batch.append(pembuat(rng, j, rng.choice(pemilik), waktu))
+        conn.executemany(sql, batch)
+        conn.commit()
+        i += len(batch)
+        print(f"  {i:>10,}/{jumlah:,}", end='\r', file=sys.stderr)
+    print(file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Isi keuangan.db dengan data sintetis dalam jumlah besar")
+    parser.add_argument('--db', required=True, help="path database tujuan (dibuat jika belum ada)")
+    parser.add_argument('--penjualan', type=int, default=1000000)
+    parser.add_argument('--belanja', type=int, default=250000)
+    parser.add_argument('--tahun', type=int, default=3, help="rentang data ke belakang (tahun)")
+    parser.add_argument('--jumlah-user', type=int, default=1,
+                        help="jumlah user (masing-masing usaha sendiri), user_id mulai 1001")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    bot_nota.DB_FILE = os.path.abspath(args.db)
+    bot_nota.init_database()
+
+    # Setiap user punya usaha pribadi; nota disimpan dengan (user_id, business_id)
+    pemilik = [(user_id, bot_nota.get_keanggotaan(user_id)['business_id'])
+               for user_id in range(1001, 1001 + args.jumlah_user)]
+
+    rng = random.Random(args.seed)
+    conn = sqlite3.connect(bot_nota.DB_FILE)
+    # Hanya untuk pengisian awal: tanpa fsync agar cepat
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+
+    t0 = time.perf_counter()
+    print(f"🛒 Mengisi {args.penjualan:,} nota penjualan...", file=sys.stderr)
+    isi_tabel(conn, '''
+        INSERT INTO nota_penjualan
+        (user_id, business_id, nomor_nota, nama_pelanggan, tanggal, timestamp, daftar_barang, retur_items,
+         total_sebelum_retur, total_retur, total_setelah_retur, bayar, sisa, status, keterangan)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', baris_penjualan, args.penjualan, rng, pemilik, args.tahun)
+
+    print(f"🛍️ Mengisi {args.belanja:,} nota belanja...", file=sys.stderr)
+    isi_tabel(conn, '''
+        INSERT INTO nota_belanja
+        (user_id, business_id, nomor_nota, nama_supplier, tanggal, timestamp, daftar_barang, total_belanja, keterangan)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', baris_belanja, args.belanja, rng, pemilik, args.tahun)
+
+    # Ringkasan item bulanan untuk /laba (nota di atas di-insert langsung, tanpa simpan_nota_*)
+    bot_nota.bangun_ulang_item_bulanan(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    ukuran = os.path.getsize(bot_nota.DB_FILE) / 1024 / 1024
+    print(f"✅ Selesai dalam {time.perf_counter() - t0:.1f} detik, ukuran {ukuran:.1f} MB", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Harness offline untuk menjalankan bot tanpa koneksi ke Telegram.
+
+Semua request Bot API dijawab oleh `RequestPalsu`, sehingga update sintetis
+diproses lewat Application asli (routing handler, serialisasi, parsing
+respons) terhadap database sementara.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import itertools
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+# bot_nota butuh BOT_TOKEN saat di-import
+os.environ.setdefault('BOT_TOKEN', '123456:HARNESS')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot_nota  # noqa: E402
+
+BOT_ID = 123456
+_id_update = itertools.count(1)
+_id_pesan = itertools.count(1)
+
+
+class RequestPalsu(BaseRequest):
+    """Pengganti HTTP request: mencatat panggilan API dan membalas respons sukses"""
+
+    def __init__(self):
+        self.panggilan = {}
+        # File yang bisa diunduh bot lewat getFile: file_id -> path lokal
+        self.berkas = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def total_panggilan(self):
+        return sum(self.panggilan.values())
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit('/', 1)[-1]
+        self.panggilan[endpoint] = self.panggilan.get(endpoint, 0) + 1
+        params = request_data.parameters if request_data else {}
+
+        if method == 'GET' and endpoint in self.berkas:
+            with open(self.berkas[endpoint], 'rb') as f:
+                return 200, f.read()
+
+        if endpoint == 'getMe':
+            hasil = {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bot Nota', 'username': 'bot_nota_bench'}
+        elif endpoint == 'getUpdates':
+            hasil = []
+        elif endpoint == 'getFile':
+            file_id = params['file_id']
+            hasil = {
+                'file_id': file_id, 'file_unique_id': file_id,
+                'file_size': os.path.getsize(self.berkas[file_id]), 'file_path': file_id,
+            }
+        elif endpoint in ('sendMessage', 'editMessageText', 'sendDocument'):
+            chat_id = int(params.get('chat_id', 0))
+            hasil = {
+                'message_id': params.get('message_id') or next(_id_pesan),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bot Nota'},
+                'text': params.get('text', ''),
+            }
+        else:
+            hasil = True
+        return 200, json.dumps({'ok': True, 'result': hasil}).encode('utf-8')
+
+
+# ===== PEMBUAT UPDATE =====
+def _user(user_id):
+    return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+
+def _pesan(user_id, text, message_id=None):
+    pesan = {
+        'message_id': message_id or next(_id_pesan),
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': _user(user_id),
+        'text': text,
+    }
+    if text.startswith('/'):
+        panjang = len(text.split()[0])
+        pesan['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': panjang}]
+    return pesan
+
+def update_pesan(user_id, text):
+    """Dict update Telegram untuk pesan teks/command"""
+    return {'update_id': next(_id_update), 'message': _pesan(user_id, text)}
+
+def update_dokumen(user_id, file_id, nama_file, ukuran):
+    """Dict update Telegram untuk file (document) yang dikirim user"""
+    pesan = _pesan(user_id, '')
+    del pesan['text']
+    pesan['document'] = {'file_id': file_id, 'file_unique_id': file_id, 'file_name': nama_file, 'file_size': ukuran}
+    return {'update_id': next(_id_update), 'message': pesan}
+
+def update_callback(user_id, data):
+    """Dict update Telegram untuk tombol inline yang ditekan"""
+    pesan_bot = _pesan(user_id, 'menu')
+    pesan_bot['from'] = {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bot Nota'}
+    return {
+        'update_id': next(_id_update),
+        'callback_query': {
+            'id': str(next(_id_update)),
+            'from': _user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': pesan_bot,
+        }
+    }
+
+
+def update_inline(user_id, query):
+    """Dict update Telegram untuk inline query (@bot <query>)"""
+    return {
+        'update_id': next(_id_update),
+        'inline_query': {'id': str(next(_id_update)), 'from': _user(user_id), 'query': query, 'offset': ''},
+    }
+
+# ===== APLIKASI UJI =====
+def siapkan_database(path=None):
+    """Arahkan bot ke database sementara dan inisialisasi tabel"""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='bench-keuangan-', suffix='.db')
+        os.close(fd)
+        os.remove(path)
+    bot_nota.DB_FILE = path
+    # Cache dari database sebelumnya tidak berlaku lagi
+    bot_nota.keanggotaan_cache.clear()
+    bot_nota.analisa_cache.clear()
+    bot_nota.respons_cache.kosongkan()
+    bot_nota.jendela_update.kosongkan()
+    bot_nota.init_database()
+    return path
+
+async def buat_aplikasi_uji(request=None):
+    """Application bot_nota dengan RequestPalsu (atau turunannya); kembalikan (application, request)"""
+    logging.getLogger().setLevel(logging.WARNING)
+    request = request or RequestPalsu()
+    builder = (
+        bot_nota.Application.builder()
+        .token(os.environ['BOT_TOKEN'])
+        .request(request)
+        .get_updates_request(RequestPalsu())
+        .updater(None)
+    )
+    application = bot_nota.buat_aplikasi(builder)
+    await application.initialize()
+    return application, request
+
+async def kirim(application, data):
+    """Proses satu dict update seperti yang diterima dari Telegram"""
+    update = Update.de_json(data, application.bot)
+    await application.process_update(update)
@@ -2,13 +2,36 @@
 # -*- coding: utf-8 -*-
 
 import os
+import io
+import asyncio
 import datetime
-import random
+import secrets
+import re
 import sqlite3
-import json
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent,
+)
+from telegram.helpers import escape_markdown
+from telegram.ext import (
+    Application, ApplicationHandlerStop, CommandHandler, CallbackQueryHandler, InlineQueryHandler, MessageHandler,
+    TypeHandler, filters, ContextTypes,
+)
+
+# Fitur yang jarang dipakai (backup/restore, impor file) di-import saat pertama
+# dipakai di dalam fungsinya, agar bot lebih cepat mulai polling setelah restart
+import analitik
+import arsip
+import entri_cepat
+import idempotensi
+import jurnal
+import migrasi
+import repositori
+import tutup_buku
+from cache import CacheRespons
+from indeks_pelanggan import IndeksPelanggan
+from profiler import PROFILER, pantau
+from sesi import buat_penyimpanan_sesi
 
 # ===== SETUP LOGGING =====
 logging.basicConfig(
@@ -27,6 +50,67 @@ if not BOT_TOKEN:
 # Database SQLite
 DB_FILE = os.path.join(os.path.dirname(__file__), "keuangan.db")
 
+# Admin bot (user_id dipisah koma) untuk command khusus seperti /profile
+ADMIN_IDS = {int(x) for x in os.environ.get('ADMIN_IDS', '').split(',') if x.strip()}
+
+# Set BOT_PROFILE=1 untuk langsung mengaktifkan profiler saat bot start
+BOT_PROFILE = os.environ.get('BOT_PROFILE', '') == '1'
+
+# Mode banyak worker: BOT_WORKERS > 1 memakai webhook (lihat scaleout.py)
+BOT_WORKERS = int(os.environ.get('BOT_WORKERS', '1'))
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+PORT = int(os.environ.get('PORT', '8080'))
+
+# Penyimpanan nota: sqlite (default, DB_FILE) atau postgres (DATABASE_URL, butuh psycopg)
+DB_BACKEND = os.environ.get('DB_BACKEND', 'sqlite')
+DATABASE_URL = os.environ.get('DATABASE_URL')
+
+# Penyimpanan sesi: memory (default), sqlite, atau redis
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+REDIS_URL = os.environ.get('REDIS_URL')
+
+# Tutup buku harian & laporan ke owner (jam lokal server HH:MM, butuh python-telegram-bot[job-queue])
+JAM_TUTUP_HARIAN = os.environ.get('JAM_TUTUP_HARIAN', '21:00')
+# Hari laporan mingguan: 0=Senin ... 6=Minggu
+HARI_LAPORAN_MINGGUAN = int(os.environ.get('HARI_LAPORAN_MINGGUAN', '6'))
+# Cache respons STATISTIK/HISTORI: jumlah entri maksimum (0 = tanpa cache)
+CACHE_RESPONS_MAKS = int(os.environ.get('CACHE_RESPONS_MAKS', '2000'))
+
+# Kode undangan usaha berlaku selama UNDANGAN_BERLAKU_JAM sejak dibuat
+UNDANGAN_BERLAKU_JAM = int(os.environ.get('UNDANGAN_BERLAKU_JAM', '48'))
+
+# Kunci idempotensi nota disimpan selama IDEMPOTENSI_JAM (Telegram menyimpan update belum terkirim 24 jam)
+IDEMPOTENSI_JAM = int(os.environ.get('IDEMPOTENSI_JAM', '48'))
+
+# Batas pemakaian CPU job tutup buku (persen satu core)
+JOB_CPU_PERSEN = int(os.environ.get('JOB_CPU_PERSEN', '50'))
+
+# Arsip tahunan (SQLite): nota lunas tahun lalu dipindah ke ARSIP_DIR/nota-YYYY.db setelah
+# ARSIP_SETELAH_BULAN bulan tahun berjalan lewat; default folder arsip di samping DB_FILE
+ARSIP_DIR = os.environ.get('ARSIP_DIR')
+ARSIP_SETELAH_BULAN = int(os.environ.get('ARSIP_SETELAH_BULAN', '3'))
+JAM_ARSIP = os.environ.get('JAM_ARSIP', '03:00')
+
+# Jurnal nota (SQLite): snapshot keadaan nota dicek tiap jam, dibuat setelah sebanyak ini event baru
+JURNAL_SNAPSHOT_EVENT = int(os.environ.get('JURNAL_SNAPSHOT_EVENT', '500'))
+
+# Inline query (@bot ujang): lama hasil boleh di-cache Telegram (detik, per user),
+# jumlah nota terakhir per pelanggan di indeks, dan maksimal hasil per jawaban
+INLINE_CACHE_DETIK = int(os.environ.get('INLINE_CACHE_DETIK', '10'))
+INLINE_NOTA_TERAKHIR = 5
+INLINE_HASIL_MAKS = 20
+
+# Backup database: snapshot gzip ke BACKUP_DIR, atau ke bucket S3 jika BACKUP_S3_BUCKET diisi (butuh boto3)
+BACKUP_DIR = os.environ.get('BACKUP_DIR', os.path.join(os.path.dirname(__file__), "backup"))
+BACKUP_S3_BUCKET = os.environ.get('BACKUP_S3_BUCKET')
+BACKUP_S3_ENDPOINT = os.environ.get('BACKUP_S3_ENDPOINT')
+BACKUP_INTERVAL_MENIT = int(os.environ.get('BACKUP_INTERVAL_MENIT', '60'))  # 0 = tanpa backup otomatis
+# Retensi: semua snapshot N jam terakhir, lalu 1 per hari, lalu 1 per minggu
+BACKUP_SIMPAN_JAM = int(os.environ.get('BACKUP_SIMPAN_JAM', '24'))
+BACKUP_SIMPAN_HARI = int(os.environ.get('BACKUP_SIMPAN_HARI', '14'))
+BACKUP_SIMPAN_MINGGU = int(os.environ.get('BACKUP_SIMPAN_MINGGU', '8'))
+
 # Data pilihan
 DAFTAR_PELANGGAN = [
     "ASEP RIDWAN", "UJANG", "Pelanggan Umum"
@@ -42,54 +126,94 @@ DAFTAR_BARANG_BELANJA = [
     "Biaya Produksi", "Gas LPG", "Upah goreng", "Upah Bungkus", "Lain-lain"
 ]
 
+# Barang yang dicatat stoknya (nama -> satuan)
+# Bahan baku bertambah dari nota belanja, produk jadi bertambah dari produksi
+# dan berkurang dari nota penjualan. Barang lain (upah, biaya) hanya dicatat uangnya.
+BAHAN_BAKU = {
+    "Kacang Kupas": "kg", "Bumbu": "pak", "Minyak": "liter",
+    "Plastik": "pak", "Label": "pak", "Gas LPG": "tabung",
+}
+
+PRODUK_JADI = {
+    "Kc Bawang Renceng": "renceng",
+    "Kc Bawang Kiloan": "kg",
+}
+
+# Resep default: pemakaian bahan untuk 1 satuan produk (bisa diganti owner lewat /resep)
+RESEP_DEFAULT = {
+    "Kc Bawang Renceng": {"Kacang Kupas": 0.025, "Minyak": 0.003, "Bumbu": 0.002, "Plastik": 0.001, "Label": 0.001, "Gas LPG": 0.0005},
+    "Kc Bawang Kiloan": {"Kacang Kupas": 1.0, "Minyak": 0.1, "Bumbu": 0.05, "Plastik": 0.02, "Gas LPG": 0.02},
+}
+
+# Role anggota usaha
+ROLE_OWNER = "owner"
+ROLE_KASIR = "kasir"
+ROLE_VIEWER = "viewer"
+DAFTAR_ROLE = [ROLE_OWNER, ROLE_KASIR, ROLE_VIEWER]
+
+# Role yang boleh membuat nota
+ROLE_PENCATAT = {ROLE_OWNER, ROLE_KASIR}
+
+# Impor massal: batas ukuran file (batas unduh Bot API 20 MB)
+IMPOR_MAKS_MB = 20
+
+# Katalog barang per jenis nota (dipakai impor file dan entri cepat)
+KATALOG_BARANG = {'penjualan': DAFTAR_BARANG_PENJUALAN, 'belanja': DAFTAR_BARANG_BELANJA}
+
 # State management untuk setiap user
 user_sessions = {}
 
+# Cache keanggotaan usaha per user (user_id -> (versi_data usaha, dict business_id, role, nama_usaha)).
+# Gabung dan ganti nama usaha menaikkan versi_data, jadi worker lain ikut membaca ulang.
+keanggotaan_cache = {}
+
+# Cache analisa laba ((business_id, bulan) -> (versi_data usaha, hasil))
+analisa_cache = {}
+
+# Cache teks STATISTIK/HISTORI ((business_id, tampilan, parameter) -> teks), dibuang saat nota disimpan.
+# Dengan banyak worker, nota bisa disimpan proses lain: entri divalidasi dengan versi_data usaha.
+respons_cache = CacheRespons(CACHE_RESPONS_MAKS)
+CACHE_CEK_VERSI = BOT_WORKERS > 1
+
+# Piutang, nota terakhir, dan harga per pelanggan untuk inline query (lihat indeks_pelanggan.py),
+# diperbarui setiap nota penjualan disimpan/dikoreksi; mode banyak worker juga dicek dengan versi_data
+indeks_pelanggan = IndeksPelanggan(INLINE_NOTA_TERAKHIR)
+
+# update_id yang sudah diproses, agar update yang dikirim ulang Telegram dilewati (lihat idempotensi.py).
+# Offset polling hanya ditulis di mode satu proses: worker webhook memproses update secara paralel.
+jendela_update = idempotensi.JendelaUpdate()
+SIMPAN_OFFSET_UPDATE = BOT_WORKERS <= 1
+
+# Penyimpanan snapshot backup (dibuat saat pertama dipakai)
+penyimpanan_backup = None
+
+# Repositori nota sesuai DB_BACKEND (dibuat saat pertama dipakai)
+repositori_nota = None
+
+def buat_sesi():
+    """Buat penyimpanan sesi sesuai SESSION_BACKEND"""
+    return buat_penyimpanan_sesi(SESSION_BACKEND, db_file=DB_FILE, redis_url=REDIS_URL)
+
+def get_repositori():
+    """Repositori nota sesuai DB_BACKEND (dibuat ulang jika DB_FILE diganti, mis. oleh benchmark)"""
+    global repositori_nota
+    if repositori_nota is None or (DB_BACKEND == 'sqlite' and repositori_nota.db_file != DB_FILE):
+        repositori_nota = repositori.buat_repositori(DB_BACKEND, db_file=DB_FILE, dsn=DATABASE_URL, arsip_dir=ARSIP_DIR)
+    return repositori_nota
+
 # ===== FUNGSI DATABASE =====
 def init_database():
-    """Inisialisasi database SQLite"""
+    """Inisialisasi database SQLite: terapkan migrasi skema yang belum dijalankan (lihat migrasi.py)
+
+    Backfill data lama hanya dicatat; diisi lanjutkan_backfill_latar setelah
+    bot mulai polling.
+    """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Tabel untuk nota penjualan
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS nota_penjualan (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                nomor_nota TEXT UNIQUE,
-                nama_pelanggan TEXT,
-                tanggal TEXT,
-                timestamp TEXT,
-                daftar_barang TEXT,
-                retur_items TEXT,
-                total_sebelum_retur INTEGER,
-                total_retur INTEGER,
-                total_setelah_retur INTEGER,
-                bayar INTEGER,
-                sisa INTEGER,
-                status TEXT,
-                keterangan TEXT
-            )
-        ''')
-        
-        # Tabel untuk nota belanja
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS nota_belanja (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                nomor_nota TEXT UNIQUE,
-                nama_supplier TEXT,
-                tanggal TEXT,
-                timestamp TEXT,
-                daftar_barang TEXT,
-                total_belanja INTEGER,
-                keterangan TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        laporan = migrasi.jalankan(DB_FILE, tunda_backfill=True)
+        if laporan:
+            logger.info(migrasi.format_laporan(laporan))
+        if DB_BACKEND != 'sqlite':
+            get_repositori().siapkan()
         logger.info("✅ Database initialized successfully")
         return True
         
@@ -97,79 +221,862 @@ def init_database():
         logger.error(f"❌ Error inisialisasi database: {str(e)}")
         return False
 
-def simpan_nota_penjualan(user_id, nomor_nota, nama_pelanggan, tanggal, daftar_barang, retur_items, total_setelah_retur, bayar, sisa):
-    """Menyimpan nota penjualan ke database"""
+# ===== BACKFILL MIGRASI =====
+# Awalan langkah backfill (riwayat_migrasi) yang datanya dibaca fitur tertentu
+BACKFILL_USAHA = "business_id"
+BACKFILL_CARI = "nota_fts"
+BACKFILL_ANALISA = "item_bulanan"
+
+# DB_FILE yang semua backfill-nya sudah selesai (tidak perlu membaca riwayat_migrasi lagi)
+backfill_selesai = None
+
+def backfill_tertunda(*awalan):
+    """[(versi, langkah, checkpoint, batas)] backfill yang belum selesai, difilter awalan langkah (tanpa awalan: semua)"""
+    global backfill_selesai
+    if DB_BACKEND != 'sqlite' or backfill_selesai == DB_FILE:
+        return []
+    tertunda = migrasi.status_backfill(DB_FILE)
+    if not tertunda:
+        backfill_selesai = DB_FILE
+    return [row for row in tertunda if not awalan or row[1].startswith(awalan)]
+
+def pesan_backfill(tertunda):
+    """Pesan untuk fitur yang datanya masih diisi backfill"""
+    checkpoint = sum(row[2] for row in tertunda)
+    batas = sum(row[3] for row in tertunda)
+    persen = checkpoint * 100 // batas if batas else 0
+    return f"🔧 Data lama sedang disiapkan setelah upgrade database ({persen}%). Coba lagi sebentar lagi."
+
+def lanjutkan_backfill_latar():
+    """Isi backfill migrasi yang ditunda di thread latar agar bot tidak menunggu sebelum polling"""
+    import threading
+    global backfill_selesai
+    backfill_selesai = None
+
+    def jalankan():
+        try:
+            t0 = datetime.datetime.now()
+            laporan = migrasi.jalankan_backfill(DB_FILE, cpu_persen=JOB_CPU_PERSEN)
+            if not laporan:
+                return
+            logger.info(f"🔧 Backfill migrasi selesai: {sum(info['baris'] for info in laporan):,} baris, "
+                        f"{(datetime.datetime.now() - t0).total_seconds():.2f} detik")
+            # Cache dan indeks yang dibuat selama backfill belum memuat data lama
+            analisa_cache.clear()
+            respons_cache.kosongkan()
+            indeks_pelanggan.hapus()
+            panaskan_indeks_pelanggan()
+        except Exception as e:
+            logger.error(f"❌ Error backfill migrasi: {e}")
+
+    threading.Thread(target=jalankan, name="backfill-migrasi", daemon=True).start()
+
+@pantau
+def simpan_nota_penjualan(user_id, nomor_nota, nama_pelanggan, tanggal, daftar_barang, retur_items, total_setelah_retur, bayar, sisa, business_id=None, kunci=None):
+    """Menyimpan nota penjualan ke database
+
+    `kunci` (token sesi / update_id) mencegah nota yang sama tersimpan dua kali.
+    Kembalikan nomor nota yang tersimpan (nomor lama jika kunci sudah pernah
+    dipakai), atau False jika gagal.
+    """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+        if business_id is None:
+            business_id = get_keanggotaan(user_id)['business_id']
+        waktu = datetime.datetime.now()
         
-        daftar_barang_json = json.dumps(daftar_barang, ensure_ascii=False)
-        retur_items_json = json.dumps(retur_items, ensure_ascii=False)
+        nota = {
+            'user_id': user_id, 'business_id': business_id, 'nomor_nota': nomor_nota,
+            'nama_pelanggan': nama_pelanggan, 'tanggal': tanggal, 'timestamp': waktu.isoformat(),
+            'daftar_barang': daftar_barang, 'retur_items': retur_items,
+            'total_sebelum_retur': sum(item["subtotal"] for item in daftar_barang),
+            'total_retur': sum(item["subtotal"] for item in retur_items),
+            'total_setelah_retur': total_setelah_retur, 'bayar': bayar, 'sisa': sisa,
+            'status': "LUNAS" if sisa >= 0 else "BELUM LUNAS",
+            'keterangan': f"Sisa {sisa}" if sisa >= 0 else f"Kurang {-sisa}",
+        }
         
-        total_sebelum_retur = sum(item["subtotal"] for item in daftar_barang)
-        total_retur = sum(item["subtotal"] for item in retur_items)
-        status = "LUNAS" if sisa >= 0 else "BELUM LUNAS"
-        keterangan = f"Sisa {sisa}" if sisa >= 0 else f"Kurang {-sisa}"
-        
-        cursor.execute('''
-            INSERT INTO nota_penjualan 
-            (user_id, nomor_nota, nama_pelanggan, tanggal, timestamp, daftar_barang, retur_items, 
-             total_sebelum_retur, total_retur, total_setelah_retur, bayar, sisa, status, keterangan)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id, nomor_nota, nama_pelanggan, tanggal, datetime.datetime.now().isoformat(),
-            daftar_barang_json, retur_items_json, total_sebelum_retur, total_retur,
-            total_setelah_retur, bayar, sisa, status, keterangan
-        ))
-        
-        conn.commit()
-        conn.close()
+        # Stok produk jadi berkurang (retur menambah kembali) dan ringkasan item untuk analisa laba,
+        # disimpan repositori dalam transaksi yang sama dengan notanya
+        bulan = int(waktu.strftime("%Y%m"))
+        get_repositori().simpan_penjualan(
+            nota,
+            _mutasi_stok_barang(daftar_barang, -1, 'penjualan') + _mutasi_stok_barang(retur_items, 1, 'retur'),
+            _item_bulanan(bulan, analitik.JENIS_JUAL, nama_pelanggan, daftar_barang) +
+            _item_bulanan(bulan, analitik.JENIS_RETUR, nama_pelanggan, retur_items),
+            kunci=kunci
+        )
+        hapus_respons_nota(business_id, waktu.strftime("%m/%Y"), nama_pelanggan)
+        indeks_pelanggan.catat_nota(business_id, nota)
         logger.info(f"✅ Nota penjualan {nomor_nota} disimpan ke database")
-        return True
+        return nomor_nota
+    
+    except repositori.NotaSudahTersimpan as e:
+        logger.info(f"♻️ Nota penjualan {kunci} sudah tersimpan sebagai {e.nomor_nota}, tidak disimpan ulang")
+        return e.nomor_nota
         
     except Exception as e:
         logger.error(f"❌ Error menyimpan nota penjualan: {str(e)}")
         return False
 
-def simpan_nota_belanja(user_id, nomor_nota, nama_supplier, tanggal, daftar_barang, total_belanja, keterangan):
-    """Menyimpan nota belanja ke database"""
+@pantau
+def simpan_nota_belanja(user_id, nomor_nota, nama_supplier, tanggal, daftar_barang, total_belanja, keterangan, business_id=None, kunci=None):
+    """Menyimpan nota belanja ke database (kunci & nilai kembali sama dengan simpan_nota_penjualan)"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        daftar_barang_json = json.dumps(daftar_barang, ensure_ascii=False)
+        if business_id is None:
+            business_id = get_keanggotaan(user_id)['business_id']
+        waktu = datetime.datetime.now()
         
-        cursor.execute('''
-            INSERT INTO nota_belanja 
-            (user_id, nomor_nota, nama_supplier, tanggal, timestamp, daftar_barang, total_belanja, keterangan)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id, nomor_nota, nama_supplier, tanggal, datetime.datetime.now().isoformat(),
-            daftar_barang_json, total_belanja, keterangan
-        ))
+        nota = {
+            'user_id': user_id, 'business_id': business_id, 'nomor_nota': nomor_nota,
+            'nama_supplier': nama_supplier, 'tanggal': tanggal, 'timestamp': waktu.isoformat(),
+            'daftar_barang': daftar_barang, 'total_belanja': total_belanja, 'keterangan': keterangan,
+        }
         
-        conn.commit()
-        conn.close()
+        # Bahan baku yang dibeli menambah stok
+        get_repositori().simpan_belanja(
+            nota,
+            _mutasi_stok_barang(daftar_barang, 1, 'belanja'),
+            _item_bulanan(int(waktu.strftime("%Y%m")), analitik.JENIS_BELI, nama_supplier, daftar_barang),
+            kunci=kunci
+        )
+        hapus_respons_nota(business_id, waktu.strftime("%m/%Y"))
         logger.info(f"✅ Nota belanja {nomor_nota} disimpan ke database")
-        return True
+        return nomor_nota
+    
+    except repositori.NotaSudahTersimpan as e:
+        logger.info(f"♻️ Nota belanja {kunci} sudah tersimpan sebagai {e.nomor_nota}, tidak disimpan ulang")
+        return e.nomor_nota
         
     except Exception as e:
         logger.error(f"❌ Error menyimpan nota belanja: {str(e)}")
         return False
 
+def muat_offset_update():
+    """update_id terakhir yang selesai diproses sebelum bot berhenti (0 jika belum ada)"""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        row = conn.execute("SELECT nilai FROM status_bot WHERE kunci = ?", (idempotensi.KUNCI_OFFSET,)).fetchone()
+        return int(row[0]) if row else 0
+    finally:
+        conn.close()
+
+def simpan_offset_update(offset):
+    """Tulis update_id terakhir yang selesai diproses; kembalikan False jika gagal"""
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        try:
+            conn.execute('''
+                INSERT INTO status_bot (kunci, nilai) VALUES (?, ?)
+                ON CONFLICT(kunci) DO UPDATE SET nilai = excluded.nilai
+            ''', (idempotensi.KUNCI_OFFSET, str(offset)))
+            conn.commit()
+        finally:
+            conn.close()
+        jendela_update.sudah_disimpan(offset)
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error menyimpan offset update: {str(e)}")
+        return False
+
+def bersihkan_idempotensi():
+    """Hapus kunci idempotensi nota di luar jendela IDEMPOTENSI_JAM; kembalikan jumlahnya"""
+    batas = datetime.datetime.now() - datetime.timedelta(hours=IDEMPOTENSI_JAM)
+    return get_repositori().bersihkan_idempotensi(batas.isoformat())
+
+def rentang_bulan(bulan):
+    """Ubah bulan format mm/YYYY menjadi rentang timestamp ISO [awal, akhir)"""
+    awal = datetime.datetime.strptime(bulan, "%m/%Y")
+    akhir = (awal + datetime.timedelta(days=32)).replace(day=1)
+    return awal.isoformat(), akhir.isoformat()
+
+# ===== CACHE RESPONS =====
+def respons_tersimpan(business_id, tampilan, parameter, buat_teks):
+    """Respons tampilan dari respons_cache; `buat_teks()` (query + format) hanya dijalankan saat miss"""
+    kunci = (business_id, tampilan, parameter)
+    versi = get_repositori().versi_data(business_id) if CACHE_CEK_VERSI else None
+    teks = respons_cache.ambil(kunci, versi)
+    if teks is None:
+        teks = buat_teks()
+        respons_cache.simpan(kunci, teks, versi)
+    return teks
+
+def hapus_respons_nota(business_id, bulan, nama_pelanggan=None):
+    """Buang respons yang berubah karena nota baru bulan `bulan` (mm/YYYY)
+
+    Nota belanja hanya mengubah statistik bulannya; nota penjualan juga
+    histori semua pelanggan dan histori pelanggan tersebut.
+    """
+    respons_cache.hapus(business_id, 'statistik', lambda parameter: parameter[0] == bulan)
+    if nama_pelanggan is not None:
+        respons_cache.hapus(business_id, 'histori_semua')
+        respons_cache.hapus(business_id, 'histori_pelanggan', lambda parameter: parameter[0] == nama_pelanggan)
+
+# ===== INDEKS PELANGGAN (INLINE) =====
+def muat_indeks_pelanggan(business_id, nama_pelanggan=None, coba=3):
+    """Muat usaha (atau satu pelanggannya) ke indeks_pelanggan dari repositori (blocking)
+
+    Dibaca ulang jika ada nota tersimpan selama query berjalan; False jika
+    tetap kalah setelah `coba` kali (dimuat lagi saat dicari berikutnya).
+    Satu pelanggan dari usaha yang belum dimuat dilewati: nanti ikut dimuat utuh.
+    """
+    if nama_pelanggan is not None and business_id not in indeks_pelanggan:
+        return False
+    repo = get_repositori()
+    for _ in range(coba):
+        generasi = indeks_pelanggan.generasi(business_id)
+        versi = repo.versi_data(business_id) if CACHE_CEK_VERSI else None
+        piutang, nota = repo.ringkasan_pelanggan(business_id, nama_pelanggan, INLINE_NOTA_TERAKHIR)
+        if indeks_pelanggan.muat(business_id, piutang, nota, generasi, versi, nama_pelanggan):
+            return True
+    return False
+
+def panaskan_indeks_pelanggan():
+    """Muat semua usaha ke indeks pelanggan (blocking, saat start / setelah arsip & restore)"""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        daftar = [row[0] for row in conn.execute("SELECT id FROM usaha")]
+    finally:
+        conn.close()
+    for business_id in daftar:
+        muat_indeks_pelanggan(business_id)
+    return len(daftar)
+
+def panaskan_indeks_latar():
+    """Panaskan indeks pelanggan di thread latar agar bot tidak menunggu sebelum polling"""
+    import threading
+
+    def jalankan():
+        try:
+            t0 = datetime.datetime.now()
+            jumlah = panaskan_indeks_pelanggan()
+            logger.info(f"🔎 Indeks pelanggan siap: {jumlah} usaha, "
+                        f"{(datetime.datetime.now() - t0).total_seconds():.2f} detik")
+        except Exception as e:
+            logger.error(f"❌ Error memanaskan indeks pelanggan: {e}")
+
+    threading.Thread(target=jalankan, name="indeks-pelanggan", daemon=True).start()
+
+def indeks_perlu_dimuat(business_id):
+    """True jika usaha belum ada di indeks (atau basi karena ditulis worker lain)"""
+    if business_id not in indeks_pelanggan:
+        return True
+    if CACHE_CEK_VERSI and indeks_pelanggan.versi(business_id) != get_repositori().versi_data(business_id):
+        indeks_pelanggan.hapus(business_id)
+        return True
+    return False
+
+@pantau
+def cari_pelanggan_inline(business_id, teks):
+    """Entri indeks pelanggan yang cocok dengan teks inline query (dari memori)"""
+    return indeks_pelanggan.cari(business_id, teks, INLINE_HASIL_MAKS) or []
+
+# Nota per halaman histori; halaman lama diambil dari arsip tahunan jika sudah dipindah
+HISTORI_PER_HALAMAN = 10
+
+@pantau
+def ambil_histori_pelanggan(business_id, nama_pelanggan, limit=HISTORI_PER_HALAMAN, offset=0):
+    """Ambil nota penjualan terakhir untuk satu pelanggan"""
+    return get_repositori().histori_pelanggan(business_id, nama_pelanggan, limit, offset)
+
+@pantau
+def ambil_histori_semua(business_id, limit=HISTORI_PER_HALAMAN, offset=0):
+    """Ambil nota penjualan terakhir semua pelanggan"""
+    return get_repositori().histori_semua(business_id, limit, offset)
+
+@pantau
+def ambil_statistik_bulan(business_id, bulan):
+    """Ambil (jumlah, total) penjualan dan belanja untuk bulan format mm/YYYY"""
+    awal, akhir = rentang_bulan(bulan)
+    return get_repositori().statistik_periode(business_id, awal, akhir)
+
+# ===== PENCARIAN NOTA =====
+HASIL_CARI_PER_HALAMAN = 5
+
+# Ukuran jendela kandidat: nota yang cocok diambil per KANDIDAT_CARI nota
+# terbaru lalu diurutkan skornya di dalam jendela itu; halaman yang melewati
+# jendela pertama mengambil jendela berikutnya (OFFSET), jadi semua nota
+# yang cocok tetap bisa dicapai. bm25() bawaan FTS5 menghitung statistik
+# seluruh doclist token usaha di tiap query sehingga makin lambat seiring
+# data; dengan jendela terbatas biaya per halaman tetap kecil.
+KANDIDAT_CARI = 200
+
+# Bobot kecocokan per kolom nota_fts
+BOBOT_KOLOM_CARI = {'nomor_nota': 4, 'nama': 3, 'barang': 2, 'keterangan': 1}
+
+POLA_TOKEN_CARI = re.compile(r'[^\W_]+')
+
+def _token_cari(teks):
+    """Pecah teks menjadi token huruf/angka kecil (mirip tokenizer unicode61)"""
+    return POLA_TOKEN_CARI.findall(teks.lower()) if teks else []
+
+def _skor_cari(kata, kolom):
+    """Skor kandidat: jumlah bobot kolom yang memuat tiap kata"""
+    skor = 0
+    for i, k in enumerate(kata):
+        terakhir = i == len(kata) - 1
+        for nama_kolom, bobot in BOBOT_KOLOM_CARI.items():
+            token = kolom[nama_kolom]
+            if k in token or (terakhir and any(t.startswith(k) for t in token)):
+                skor += bobot
+    return skor
+
+def _jendela_cari(repo, business_id, kata, jendela):
+    """Kunci kandidat jendela ke-`jendela` (KANDIDAT_CARI nota terbaru berikutnya), urut skor lalu terbaru"""
+    kandidat = []
+    for kunci, nomor_nota, nama, barang, keterangan in repo.kandidat_cari(
+            business_id, kata, KANDIDAT_CARI, jendela * KANDIDAT_CARI):
+        kolom = {
+            'nomor_nota': _token_cari(nomor_nota), 'nama': _token_cari(nama),
+            'barang': _token_cari(barang), 'keterangan': _token_cari(keterangan),
+        }
+        kandidat.append((-_skor_cari(kata, kolom), -kunci))
+    kandidat.sort()
+    return [-kunci for _, kunci in kandidat]
+
+@pantau
+def cari_nota(business_id, kata_kunci, halaman=0, per_halaman=HASIL_CARI_PER_HALAMAN):
+    """Cari nota penjualan/belanja; kembalikan (daftar hasil, ada halaman berikutnya)
+
+    Semua kata harus cocok; kata terakhir dicocokkan sebagai prefix
+    (seperti saat mengetik), kata lain harus utuh agar tetap cepat.
+    Hasil diurutkan skor per jendela KANDIDAT_CARI nota terbaru.
+    """
+    kata = _token_cari(kata_kunci)
+    if not kata:
+        return [], False
+    
+    repo = get_repositori()
+    awal = halaman * per_halaman
+    jendela = awal // KANDIDAT_CARI
+    mulai = awal - jendela * KANDIDAT_CARI
+    kunci_urut = _jendela_cari(repo, business_id, kata, jendela)
+    penuh = len(kunci_urut) == KANDIDAT_CARI
+    # Halaman di ujung jendela: ambil jendela berikutnya untuk sisa halaman & tombol berikutnya
+    while penuh and len(kunci_urut) <= mulai + per_halaman:
+        jendela += 1
+        berikutnya = _jendela_cari(repo, business_id, kata, jendela)
+        kunci_urut += berikutnya
+        penuh = len(berikutnya) == KANDIDAT_CARI
+    
+    halaman_kunci = kunci_urut[mulai:mulai + per_halaman]
+    detail = repo.ambil_hasil_cari(halaman_kunci)
+    hasil = [detail[kunci] for kunci in halaman_kunci if kunci in detail]
+    return hasil, len(kunci_urut) > mulai + per_halaman
+
+# ===== STOK & PRODUKSI =====
+def info_sku(sku):
+    """Kembalikan (jenis, satuan) barang stok, atau (None, None) jika barang tidak dicatat stoknya"""
+    if sku in PRODUK_JADI:
+        return 'produk', PRODUK_JADI[sku]
+    if sku in BAHAN_BAKU:
+        return 'bahan', BAHAN_BAKU[sku]
+    return None, None
+
+def cari_sku(teks, daftar=None):
+    """Cocokkan teks bebas (mis. 'renceng', 'kacang') ke nama SKU; None jika tidak ada atau ambigu"""
+    daftar = list(daftar) if daftar is not None else [*PRODUK_JADI, *BAHAN_BAKU]
+    teks = teks.strip().lower()
+    for sku in daftar:
+        if sku.lower() == teks:
+            return sku
+    cocok = [sku for sku in daftar if teks and teks in sku.lower()]
+    return cocok[0] if len(cocok) == 1 else None
+
+def _mutasi(sku, perubahan, sumber):
+    """Dict mutasi stok satu SKU (format repositori)"""
+    jenis, satuan = info_sku(sku)
+    return {'sku': sku, 'jenis': jenis or 'lain', 'satuan': satuan, 'perubahan': perubahan, 'sumber': sumber}
+
+def _mutasi_stok_barang(daftar_barang, arah, sumber):
+    """Mutasi stok untuk item nota yang termasuk barang stok (qty digabung per SKU)"""
+    perubahan = {}
+    for item in daftar_barang:
+        if info_sku(item['nama'])[0] is not None:
+            perubahan[item['nama']] = perubahan.get(item['nama'], 0) + item['qty']
+    mutasi = []
+    for sku, qty in perubahan.items():
+        jenis, satuan = info_sku(sku)
+        mutasi.append({'sku': sku, 'jenis': jenis, 'satuan': satuan, 'perubahan': arah * qty, 'sumber': sumber})
+    return mutasi
+
+def _ambil_resep(conn, business_id, produk):
+    rows = conn.execute(
+        "SELECT bahan, jumlah FROM resep WHERE business_id = ? AND produk = ?", (business_id, produk)
+    ).fetchall()
+    return dict(rows) if rows else dict(RESEP_DEFAULT.get(produk, {}))
+
+def ambil_resep(business_id, produk):
+    """Resep produk milik usaha ({bahan: pemakaian per satuan}), default RESEP_DEFAULT"""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        return _ambil_resep(conn, business_id, produk)
+    finally:
+        conn.close()
+
+def simpan_resep(business_id, produk, komposisi):
+    """Ganti resep produk milik usaha"""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        conn.execute("DELETE FROM resep WHERE business_id = ? AND produk = ?", (business_id, produk))
+        conn.executemany(
+            "INSERT INTO resep (business_id, produk, bahan, jumlah) VALUES (?, ?, ?, ?)",
+            [(business_id, produk, bahan, jumlah) for bahan, jumlah in komposisi.items()]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    # HPP berubah: cache analisa laba usaha ini tidak berlaku lagi
+    get_repositori().naikkan_versi_data(business_id)
+
+@pantau
+def catat_produksi(business_id, user_id, produk, jumlah, kunci=None):
+    """Konversi bahan baku menjadi produk jadi sesuai resep dalam satu transaksi
+
+    Kembalikan (nomor_produksi, {bahan: pemakaian}) atau None jika gagal.
+    Stok bahan boleh minus (belum di-opname); peringatan dikirim lewat cek_stok_menipis.
+    NotaSudahTersimpan (nomor produksi lama) jika `kunci` sudah pernah dipakai.
+    """
+    try:
+        nomor = buat_nomor_nota("PRD")
+        pemakaian = {
+            bahan: round(per_satuan * jumlah, 3)
+            for bahan, per_satuan in ambil_resep(business_id, produk).items()
+        }
+        mutasi = [_mutasi(bahan, -qty, 'produksi') for bahan, qty in pemakaian.items()]
+        mutasi.append(_mutasi(produk, jumlah, 'produksi'))
+        get_repositori().catat_mutasi(business_id, mutasi, nomor, user_id, kunci=kunci)
+        logger.info(f"🏭 Produksi {nomor}: {jumlah} {produk}")
+        return nomor, pemakaian
+    
+    except repositori.NotaSudahTersimpan:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error mencatat produksi: {str(e)}")
+        return None
+
+def atur_stok(business_id, user_id, sku, jumlah):
+    """Stock opname: samakan saldo dengan jumlah fisik, selisihnya dicatat sebagai mutasi 'opname'"""
+    jenis, satuan = info_sku(sku)
+    return get_repositori().opname_stok(business_id, sku, jenis or 'lain', satuan, jumlah, user_id)
+
+def atur_batas_minimum(business_id, sku, batas):
+    """Set batas minimum stok untuk peringatan stok menipis"""
+    jenis, satuan = info_sku(sku)
+    get_repositori().atur_batas_minimum(business_id, sku, jenis or 'lain', satuan, batas)
+
+def ambil_stok(business_id):
+    """Saldo semua barang stok usaha (produk jadi lalu bahan baku); yang belum pernah bermutasi bernilai 0"""
+    tersimpan = {row[0]: row for row in get_repositori().daftar_stok(business_id)}
+    hasil = []
+    for sku in [*PRODUK_JADI, *BAHAN_BAKU, *sorted(set(tersimpan) - set(PRODUK_JADI) - set(BAHAN_BAKU))]:
+        jenis, satuan = info_sku(sku)
+        _, jenis, satuan, jumlah, batas = tersimpan.get(sku, (sku, jenis, satuan, 0, 0))
+        hasil.append({'sku': sku, 'jenis': jenis, 'satuan': satuan, 'jumlah': jumlah, 'batas_minimum': batas})
+    return hasil
+
+def cek_stok_menipis(business_id, daftar_sku):
+    """SKU yang stoknya minus atau tidak di atas batas minimum (lookup primary key per SKU)"""
+    daftar_sku = list(dict.fromkeys(daftar_sku))
+    if not daftar_sku:
+        return []
+    return get_repositori().stok_menipis(business_id, daftar_sku)
+
+def ambil_mutasi_stok(business_id, sku, limit=10):
+    """Mutasi terakhir satu SKU (perubahan, saldo, sumber, referensi, timestamp)"""
+    return get_repositori().mutasi_stok(business_id, sku, limit)
+
+# ===== ANALISA LABA =====
+def _item_bulanan(bulan, jenis, pihak, daftar_barang):
+    """Baris ringkasan bulanan item nota (bulan, jenis, barang, pihak, qty, nilai)"""
+    return [(bulan, jenis, item['nama'], pihak or '', item['qty'], item['subtotal']) for item in daftar_barang]
+
+def bangun_ulang_item_bulanan(conn):
+    """Isi ulang item_bulanan dari semua nota (database lama atau hasil import massal)
+
+    Bulan tahun yang sudah diarsip dipertahankan apa adanya: notanya tidak
+    lagi (atau hanya sebagian) ada di database utama.
+    """
+    tahun_arsip = conn.execute("SELECT MAX(tahun) FROM arsip_tahun").fetchone()[0]
+    batas_bulan = (tahun_arsip + 1) * 100 if tahun_arsip else 0
+    conn.execute("CREATE TEMP TABLE item_arsip AS SELECT * FROM item_bulanan WHERE bulan < ?", (batas_bulan,))
+    conn.execute("DELETE FROM item_bulanan")
+    for tabel, daftar_sql in migrasi.SUMBER_ITEM_BULANAN.items():
+        for sql in daftar_sql:
+            conn.execute(sql, {'dari': 0, 'sampai': 1 << 62})
+    conn.execute("DELETE FROM item_bulanan WHERE bulan < ?", (batas_bulan,))
+    conn.execute("INSERT INTO item_bulanan SELECT * FROM temp.item_arsip")
+    conn.execute("DROP TABLE temp.item_arsip")
+    conn.execute("UPDATE usaha SET versi_data = versi_data + 1")
+    logger.info("✅ Ringkasan item bulanan dibangun ulang")
+
+# ===== KOREKSI NOTA (JURNAL) =====
+# Sumber mutasi stok selisih koreksi; referensinya tetap nomor nota
+SUMBER_KOREKSI = {jurnal.DIUBAH: 'ubah', jurnal.DIBATALKAN: 'batal'}
+
+
+class KoreksiDitolak(Exception):
+    """Koreksi nota tidak bisa dilakukan; pesannya langsung dibalas ke user"""
+
+
+def _mutasi_nota(jenis, nota):
+    """Mutasi stok yang ditimbulkan isi nota (sama dengan saat nota disimpan)"""
+    if jenis == 'penjualan':
+        return _mutasi_stok_barang(nota['daftar_barang'], -1, 'penjualan') + _mutasi_stok_barang(nota['retur_items'], 1, 'retur')
+    return _mutasi_stok_barang(nota['daftar_barang'], 1, 'belanja')
+
+def _item_nota(jenis, nota):
+    """Baris item_bulanan nota (bulan dari timestamp nota)"""
+    bulan = int(nota['timestamp'][:4] + nota['timestamp'][5:7])
+    if jenis == 'penjualan':
+        return (_item_bulanan(bulan, analitik.JENIS_JUAL, nota['nama_pelanggan'], nota['daftar_barang']) +
+                _item_bulanan(bulan, analitik.JENIS_RETUR, nota['nama_pelanggan'], nota['retur_items']))
+    return _item_bulanan(bulan, analitik.JENIS_BELI, nota['nama_supplier'], nota['daftar_barang'])
+
+def mutasi_bersih_nota(jenis, nota):
+    """{sku: perubahan stok bersih} isi nota, juga dipakai pemeriksa jurnal"""
+    hasil = {}
+    for m in _mutasi_nota(jenis, nota):
+        hasil[m['sku']] = round(hasil.get(m['sku'], 0) + m['perubahan'], 3)
+    return hasil
+
+def _selisih_mutasi(jenis, lama, baru, sumber):
+    """Mutasi yang membawa efek stok nota `lama` menjadi efek nota `baru` (None = batal)"""
+    efek_lama = mutasi_bersih_nota(jenis, lama)
+    efek_baru = mutasi_bersih_nota(jenis, baru) if baru is not None else {}
+    mutasi = []
+    for sku in sorted(set(efek_lama) | set(efek_baru)):
+        perubahan = round(efek_baru.get(sku, 0) - efek_lama.get(sku, 0), 3)
+        if perubahan:
+            jenis_sku, satuan = info_sku(sku)
+            mutasi.append({'sku': sku, 'jenis': jenis_sku, 'satuan': satuan, 'perubahan': perubahan, 'sumber': sumber})
+    return mutasi
+
+def _selisih_item(jenis, lama, baru):
+    """Baris item_bulanan nota lama dikurangkan, nota baru ditambahkan (upsert menjumlahkan)"""
+    item = [(bulan, j, barang, pihak, -qty, -nilai) for bulan, j, barang, pihak, qty, nilai in _item_nota(jenis, lama)]
+    return item + (_item_nota(jenis, baru) if baru is not None else [])
+
+def _bulan_nota(nota):
+    return f"{nota['timestamp'][5:7]}/{nota['timestamp'][:4]}"
+
+def ambil_nota_koreksi(business_id, nomor_nota):
+    """(jenis, nota) yang masih bisa dikoreksi; KoreksiDitolak jika diarsip, dibatalkan, atau tidak ada"""
+    repo = get_repositori()
+    for jenis in repositori.TABEL_NOTA:
+        nota = repo.ambil_nota(business_id, jenis, nomor_nota)
+        if nota is not None:
+            return jenis, nota
+    if repo.nota_diarsipkan(business_id, nomor_nota):
+        raise KoreksiDitolak(f"🗄️ Nota {nomor_nota} sudah diarsipkan (tahun buku tutup), tidak bisa dikoreksi")
+    riwayat = repo.riwayat_nota(business_id, nomor_nota)
+    if riwayat and riwayat[-1][0] == jurnal.DIBATALKAN:
+        raise KoreksiDitolak(f"❌ Nota {nomor_nota} sudah dibatalkan")
+    raise KoreksiDitolak(f"❌ Nota {nomor_nota} tidak ditemukan")
+
+def koreksi_nota(business_id, user_id, nomor_nota, event, buat_baru, info=None, kunci=None):
+    """Koreksi nota lewat jurnal event; kembalikan (jenis, nota lama, nota baru)
+
+    `buat_baru(jenis, lama)` mengembalikan isi nota setelah koreksi (None =
+    batal) atau melempar KoreksiDitolak. Selisih stok dan item bulanan
+    disimpan repositori dalam transaksi yang sama dengan event-nya.
+    NotaBerubah diteruskan jika nota dikoreksi proses lain di antaranya;
+    NotaSudahTersimpan jika `kunci` (update_id) sudah pernah dipakai.
+    """
+    repo = get_repositori()
+    # Cek awal agar koreksi yang diulang tidak ditolak validasi ("sudah lunas", "tidak ada yang berubah");
+    # yang menjamin tepat sekali tetap insert kunci di transaksi koreksi
+    tersimpan = repo.nota_kunci(kunci) if kunci is not None else None
+    if tersimpan is not None:
+        raise repositori.NotaSudahTersimpan(tersimpan)
+    jenis, lama = ambil_nota_koreksi(business_id, nomor_nota)
+    baru = buat_baru(jenis, lama)
+    if baru is not None and not jurnal.perubahan(lama, baru, repositori.TABEL_NOTA[jenis][1]):
+        raise KoreksiDitolak(f"ℹ️ Tidak ada yang berubah pada nota {nomor_nota}")
+    repo.koreksi_nota(
+        jenis, lama, baru, event, info,
+        mutasi=_selisih_mutasi(jenis, lama, baru, SUMBER_KOREKSI[event]) if event in SUMBER_KOREKSI else (),
+        item=_selisih_item(jenis, lama, baru) if event in SUMBER_KOREKSI else (),
+        user_id=user_id, kunci=kunci
+    )
+    if jenis == 'penjualan':
+        hapus_respons_nota(business_id, _bulan_nota(lama), lama['nama_pelanggan'])
+        # Piutang & nota terakhir pelanggan dihitung ulang dari database (nota bisa keluar dari daftar terakhir)
+        indeks_pelanggan.tandai_berubah(business_id)
+        muat_indeks_pelanggan(business_id, lama['nama_pelanggan'])
+        if baru is not None and baru['nama_pelanggan'] != lama['nama_pelanggan']:
+            hapus_respons_nota(business_id, _bulan_nota(lama), baru['nama_pelanggan'])
+            muat_indeks_pelanggan(business_id, baru['nama_pelanggan'])
+    else:
+        hapus_respons_nota(business_id, _bulan_nota(lama))
+    logger.info(f"📝 Nota {nomor_nota} {event} oleh {user_id}")
+    return jenis, lama, baru
+
+def _status_bayar(nota):
+    """Isi kolom bayar/sisa/status/keterangan nota penjualan sesuai total dan bayar-nya"""
+    nota['sisa'] = nota['bayar'] - nota['total_setelah_retur']
+    nota['status'] = "LUNAS" if nota['sisa'] >= 0 else "BELUM LUNAS"
+    nota['keterangan'] = f"Sisa {nota['sisa']}" if nota['sisa'] >= 0 else f"Kurang {-nota['sisa']}"
+    return nota
+
+def bayar_nota(business_id, user_id, nomor_nota, nominal=None, kunci=None):
+    """Catat pembayaran piutang nota penjualan (None = lunasi sisa); kembalikan nota baru"""
+    def buat_baru(jenis, lama):
+        if jenis != 'penjualan':
+            raise KoreksiDitolak("❌ /bayar hanya untuk nota penjualan")
+        if lama['sisa'] >= 0:
+            raise KoreksiDitolak(f"ℹ️ Nota {nomor_nota} sudah lunas")
+        if nominal is not None and nominal > -lama['sisa']:
+            raise KoreksiDitolak(f"❌ Nominal melebihi kekurangan nota ({format_rupiah(-lama['sisa'])})")
+        info['nominal'] = -lama['sisa'] if nominal is None else nominal
+        return _status_bayar({**lama, 'bayar': lama['bayar'] + info['nominal']})
+
+    info = {}
+    return koreksi_nota(business_id, user_id, nomor_nota, jurnal.DIBAYAR, buat_baru, info, kunci=kunci)[2]
+
+def ubah_nota(business_id, user_id, nomor_nota, entri, bayar_ditulis=True, kunci=None):
+    """Ganti isi nota dengan hasil entri_cepat.urai (jenisnya harus sama); kembalikan (jenis, nota baru)
+
+    Jika bayar tidak ditulis di entri, pembayaran lama dipertahankan.
+    """
+    def buat_baru(jenis, lama):
+        if jenis != entri['jenis']:
+            raise KoreksiDitolak(f"❌ Nota {nomor_nota} adalah nota {jenis}, entri yang dikirim {entri['jenis']}")
+        total_barang = sum(item['subtotal'] for item in entri['daftar_barang'])
+        if jenis == 'belanja':
+            return {
+                **lama, 'nama_supplier': entri['pihak'], 'daftar_barang': entri['daftar_barang'],
+                'total_belanja': total_barang if entri['total'] is None else entri['total'],
+                'keterangan': entri['keterangan'] or lama['keterangan'],
+            }
+        total_retur = sum(item['subtotal'] for item in entri['retur_items'])
+        baru = {
+            **lama, 'nama_pelanggan': entri['pihak'], 'daftar_barang': entri['daftar_barang'],
+            'retur_items': entri['retur_items'], 'total_sebelum_retur': total_barang,
+            'total_retur': total_retur, 'total_setelah_retur': total_barang - total_retur,
+        }
+        if bayar_ditulis:
+            baru['bayar'] = baru['total_setelah_retur'] if entri['bayar'] is None else entri['bayar']
+        return _status_bayar(baru)
+
+    jenis, _, baru = koreksi_nota(business_id, user_id, nomor_nota, jurnal.DIUBAH, buat_baru, kunci=kunci)
+    return jenis, baru
+
+def batalkan_nota(business_id, user_id, nomor_nota, alasan="", kunci=None):
+    """Batalkan nota: keluar dari histori/statistik/pencarian, stok & item bulanan dikembalikan"""
+    return koreksi_nota(business_id, user_id, nomor_nota, jurnal.DIBATALKAN, lambda jenis, lama: None,
+                        {'alasan': alasan}, kunci=kunci)[:2]
+
+def snapshot_jurnal(minimal_event=1):
+    """Snapshot jurnal jika event baru sudah cukup banyak (blocking, jalankan di thread)"""
+    return jurnal.buat_snapshot(DB_FILE, minimal_event)
+
+def cek_jurnal(perbaiki=False):
+    """Periksa (dan opsional perbaiki) data nota terhadap jurnal (blocking, jalankan di thread)"""
+    arsip_dir = get_repositori().arsip_dir
+    diperbaiki = None
+    if perbaiki:
+        diperbaiki = jurnal.perbaiki(DB_FILE, arsip_dir)
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        try:
+            bangun_ulang_item_bulanan(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        respons_cache.kosongkan()
+        indeks_pelanggan.hapus()
+        panaskan_indeks_pelanggan()
+    laporan = jurnal.cek(DB_FILE, arsip_dir, mutasi_bersih_nota)
+    laporan['diperbaiki'] = diperbaiki
+    return laporan
+
+@pantau
+def ambil_analisa(business_id, bulan):
+    """Analisa laba usaha untuk bulan format mm/YYYY (di-cache sampai ada nota/resep baru)"""
+    kunci = (business_id, bulan)
+    repo = get_repositori()
+    versi = repo.versi_data(business_id)
+    tersimpan = analisa_cache.get(kunci)
+    if tersimpan is not None and tersimpan[0] == versi:
+        return tersimpan[1]
+    
+    bulan_int = int(datetime.datetime.strptime(bulan, "%m/%Y").strftime("%Y%m"))
+    data = analitik.DataKolom(repo.item_bulanan(business_id, bulan_int))
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        resep = {produk: _ambil_resep(conn, business_id, produk) for produk in PRODUK_JADI}
+    finally:
+        conn.close()
+    
+    hasil = analitik.hitung_analisa(data, bulan_int, resep, BAHAN_BAKU)
+    # Versi berubah: buang semua cache lama usaha ini
+    for k in [k for k, (v, _) in analisa_cache.items() if k[0] == business_id and v != versi]:
+        del analisa_cache[k]
+    analisa_cache[kunci] = (versi, hasil)
+    return hasil
+
+# ===== FUNGSI USAHA (MULTI-TENANT) =====
+def _pastikan_usaha(conn, user_id):
+    """Kembalikan business_id user; buat usaha pribadi (role owner) jika belum punya"""
+    row = conn.execute("SELECT business_id FROM anggota_usaha WHERE user_id = ?", (user_id,)).fetchone()
+    if row:
+        return row[0]
+    sekarang = datetime.datetime.now().isoformat()
+    cursor = conn.execute("INSERT INTO usaha (nama, dibuat) VALUES (?, ?)", (f"Usaha {user_id}", sekarang))
+    business_id = cursor.lastrowid
+    conn.execute(
+        "INSERT INTO anggota_usaha (user_id, business_id, role, bergabung) VALUES (?, ?, ?, ?)",
+        (user_id, business_id, ROLE_OWNER, sekarang)
+    )
+    return business_id
+
+def _versi_usaha(business_id):
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        row = conn.execute("SELECT versi_data FROM usaha WHERE id = ?", (business_id,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+def get_keanggotaan(user_id):
+    """Ambil keanggotaan usaha user (business_id, role, nama_usaha), dengan cache
+
+    Mode banyak worker: entri dicek dengan versi_data usaha, yang dinaikkan
+    saat anggota gabung/pindah, nama usaha diganti, atau database di-restore.
+    """
+    tersimpan = keanggotaan_cache.get(user_id)
+    if tersimpan is not None and (not CACHE_CEK_VERSI or tersimpan[0] == _versi_usaha(tersimpan[1]['business_id'])):
+        return tersimpan[1]
+    
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        _pastikan_usaha(conn, user_id)
+        conn.commit()
+        business_id, role, nama_usaha, versi = conn.execute('''
+            SELECT a.business_id, a.role, u.nama, u.versi_data
+            FROM anggota_usaha a JOIN usaha u ON u.id = a.business_id
+            WHERE a.user_id = ?
+        ''', (user_id,)).fetchone()
+    finally:
+        conn.close()
+    
+    data = {'business_id': business_id, 'role': role, 'nama_usaha': nama_usaha}
+    keanggotaan_cache[user_id] = (versi, data)
+    return data
+
+def buat_undangan(business_id, role, dibuat_oleh):
+    """Buat kode undangan sekali pakai untuk bergabung ke usaha, berlaku UNDANGAN_BERLAKU_JAM"""
+    kode = secrets.token_hex(4).upper()
+    sekarang = datetime.datetime.now()
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        conn.execute(
+            "INSERT INTO undangan_usaha (kode, business_id, role, dibuat_oleh, dibuat, kedaluwarsa) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (kode, business_id, role, dibuat_oleh, sekarang.isoformat(),
+             (sekarang + datetime.timedelta(hours=UNDANGAN_BERLAKU_JAM)).isoformat())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return kode
+
+class GabungDitolak(Exception):
+    """User tidak boleh pindah usaha; pesannya langsung dibalas ke user"""
+
+
+def gabung_usaha(user_id, kode):
+    """Gabungkan user ke usaha lewat kode undangan; kembalikan keanggotaan baru atau None
+
+    Kode dipakai dalam satu transaksi (DELETE ... RETURNING), jadi satu kode
+    hanya bisa ditukar sekali walau dipakai bersamaan dari beberapa worker.
+    Owner satu-satunya dari usaha yang masih punya anggota lain ditolak
+    (GabungDitolak) agar usaha lamanya tidak tertinggal tanpa owner; kode
+    yang sudah kedaluwarsa dihapus dan ditolak. versi_data usaha lama dan
+    baru dinaikkan agar cache keanggotaan di worker lain dibaca ulang.
+    """
+    kode = kode.strip().upper()
+    sekarang = datetime.datetime.now().isoformat()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "DELETE FROM undangan_usaha WHERE kode = ? RETURNING business_id, role, kedaluwarsa", (kode,)
+        ).fetchall()
+        if not rows:
+            conn.rollback()
+            return None
+        business_id, role, kedaluwarsa = rows[0]
+        if kedaluwarsa is None or kedaluwarsa < sekarang:
+            conn.commit()
+            raise GabungDitolak("❌ Kode undangan sudah kedaluwarsa, minta kode baru ke owner (/undang)")
+        lama = conn.execute("SELECT business_id, role FROM anggota_usaha WHERE user_id = ?", (user_id,)).fetchone()
+        if lama and lama[1] == ROLE_OWNER and (lama[0], role) != (business_id, ROLE_OWNER):
+            owner_lain, anggota_lain = conn.execute(
+                "SELECT COALESCE(SUM(role = ?), 0), COUNT(*) FROM anggota_usaha WHERE business_id = ? AND user_id != ?",
+                (ROLE_OWNER, lama[0], user_id)
+            ).fetchone()
+            if anggota_lain and not owner_lain:
+                # Kode undangan tidak ikut terpakai
+                conn.rollback()
+                raise GabungDitolak(
+                    "❌ Kamu satu-satunya owner usaha ini. Undang owner lain dulu (/undang owner), "
+                    "lalu gabung lagi dengan kode yang sama."
+                )
+        conn.execute('''
+            INSERT INTO anggota_usaha (user_id, business_id, role, bergabung) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET business_id = excluded.business_id,
+                role = excluded.role, bergabung = excluded.bergabung
+        ''', (user_id, business_id, role, sekarang))
+        conn.execute(
+            "UPDATE usaha SET versi_data = versi_data + 1 WHERE id IN (?, ?)",
+            (business_id, lama[0] if lama else business_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    
+    keanggotaan_cache.pop(user_id, None)
+    return get_keanggotaan(user_id)
+
+def ubah_nama_usaha(business_id, nama):
+    """Ganti nama usaha"""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        conn.execute("UPDATE usaha SET nama = ?, versi_data = versi_data + 1 WHERE id = ?", (nama, business_id))
+        conn.commit()
+    finally:
+        conn.close()
+    for user_id in [u for u, (_, data) in keanggotaan_cache.items() if data['business_id'] == business_id]:
+        del keanggotaan_cache[user_id]
+
+def ambil_anggota_usaha(business_id):
+    """Daftar (user_id, role) anggota usaha"""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        return conn.execute(
+            "SELECT user_id, role FROM anggota_usaha WHERE business_id = ? ORDER BY bergabung", (business_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
 # ===== FUNGSI UTILITY =====
+def is_admin(user_id):
+    """Cek apakah user termasuk admin bot"""
+    return user_id in ADMIN_IDS
+
 def format_rupiah(angka):
     """Format angka ke format Rupiah"""
     return f"Rp {angka:,.0f}".replace(",", ".")
 
+def format_jumlah(angka):
+    """Format jumlah stok (maks 3 desimal, tanpa nol berlebih) dengan pemisah ribuan titik"""
+    teks = f"{angka:,.3f}".rstrip("0").rstrip(".")
+    return teks.replace(",", "_").replace(".", ",").replace("_", ".")
+
 def buat_nomor_nota(prefix="BDP"):
-    """Generate nomor nota unik"""
-    sekarang = datetime.datetime.now()
-    tanggal = sekarang.strftime("%d")
-    bulan = sekarang.strftime("%m")
-    tahun = sekarang.strftime("%y")
-    nomor_acak = random.randint(1, 999)
-    return f"{prefix}-{tanggal}-{bulan}-{tahun}-{nomor_acak:03d}"
+    """Generate nomor nota unik: nomor urut per prefix per hari dari tabel nomor_urut"""
+    awalan = f"{prefix}-{datetime.datetime.now().strftime('%d-%m-%y')}"
+    return f"{awalan}-{get_repositori().alokasi_nomor(awalan):03d}"
 
 def get_harga_renceng(nama_pelanggan):
     """Tentukan harga Kc Bawang Renceng berdasarkan pelanggan"""
@@ -180,6 +1087,12 @@ def get_harga_renceng(nama_pelanggan):
     else:
         return 1600  # Pelanggan Umum
 
+def get_harga_otomatis(nama_pelanggan, nama_barang):
+    """Harga barang penjualan yang tidak perlu diketik (None = harus diisi manual)"""
+    if nama_barang == "Kc Bawang Renceng":
+        return get_harga_renceng(nama_pelanggan)
+    return None
+
 def buat_keyboard_menu_utama():
     """Buat keyboard menu utama 2 kolom"""
     keyboard = [
@@ -192,6 +1105,7 @@ def buat_keyboard_menu_utama():
             InlineKeyboardButton("📈 STATISTIK", callback_data="menu_statistik")
         ],
         [
+            InlineKeyboardButton("📦 STOK", callback_data="menu_stok"),
             InlineKeyboardButton("ℹ️ INFO", callback_data="menu_info")
         ]
     ]
@@ -274,6 +1188,335 @@ def buat_keyboard_histori_pelanggan():
     
     return InlineKeyboardMarkup(keyboard)
 
+def buat_keyboard_histori(prefix, halaman, ada_berikutnya):
+    """Buat keyboard menu utama dengan navigasi halaman histori (halaman 0 = terbaru)"""
+    navigasi = []
+    if halaman > 0:
+        navigasi.append(InlineKeyboardButton("⬅️ Lebih baru", callback_data=f"{prefix}_{halaman - 1}"))
+    if ada_berikutnya:
+        navigasi.append(InlineKeyboardButton("Lebih lama ➡️", callback_data=f"{prefix}_{halaman + 1}"))
+    
+    keyboard = [navigasi] if navigasi else []
+    keyboard.extend(buat_keyboard_menu_utama().inline_keyboard)
+    return InlineKeyboardMarkup(keyboard)
+
+def buat_keyboard_cari(halaman, ada_berikutnya):
+    """Buat keyboard navigasi halaman hasil pencarian"""
+    navigasi = []
+    if halaman > 0:
+        navigasi.append(InlineKeyboardButton("⬅️ Sebelumnya", callback_data=f"cari_{halaman - 1}"))
+    if ada_berikutnya:
+        navigasi.append(InlineKeyboardButton("Berikutnya ➡️", callback_data=f"cari_{halaman + 1}"))
+    
+    keyboard = [navigasi] if navigasi else []
+    keyboard.append([InlineKeyboardButton("🚫 Tutup", callback_data="cancel")])
+    return InlineKeyboardMarkup(keyboard)
+
+def format_histori_pelanggan(nama_pelanggan, rows):
+    """Format histori nota penjualan satu pelanggan"""
+    if not rows:
+        return f"📭 *Belum ada data histori untuk {nama_pelanggan}*"
+    
+    histori_text = f"📊 *HISTORI - {nama_pelanggan}*\n\n"
+    total_penjualan = 0
+    
+    for row in rows:
+        nomor_nota, tanggal, total, status = row
+        status_emoji = "✅" if status == "LUNAS" else "⏳"
+        histori_text += f"{status_emoji} *{nomor_nota}*\n"
+        histori_text += f"   📅 {tanggal}\n"
+        histori_text += f"   💰 {format_rupiah(total)}\n\n"
+        total_penjualan += total
+    
+    histori_text += f"📈 *Total Penjualan: {format_rupiah(total_penjualan)}*"
+    return histori_text
+
+def format_kartu_pelanggan(entri):
+    """Format ringkasan pelanggan dari indeks (dikirim lewat inline query): piutang, nota terakhir, harga"""
+    nama = escape_markdown(entri['nama'])
+    teks = f"👤 *{nama}*\n\n"
+    if entri['piutang']:
+        teks += f"⏳ *Piutang: {format_rupiah(entri['piutang'])}* ({entri['belum_lunas']} nota belum lunas)\n\n"
+    else:
+        teks += "✅ Tidak ada piutang\n\n"
+    if entri['nota']:
+        teks += "🧾 *Nota terakhir:*\n"
+        for nomor_nota, tanggal, total, sisa, status, _ in entri['nota']:
+            status_emoji = "✅" if status == "LUNAS" else "⏳"
+            kurang = f" (kurang {format_rupiah(-sisa)})" if sisa < 0 else ""
+            teks += f"{status_emoji} `{nomor_nota}` {tanggal} {format_rupiah(total)}{kurang}\n"
+        teks += "\n"
+    harga = []
+    for barang in DAFTAR_BARANG_PENJUALAN:
+        tier = get_harga_otomatis(entri['nama'], barang)
+        if tier is not None:
+            harga.append(f"• {barang}: {format_rupiah(tier)}")
+        elif barang in entri['harga']:
+            harga.append(f"• {barang}: {format_rupiah(entri['harga'][barang])} (terakhir)")
+    if harga:
+        teks += "🏷️ *Harga:*\n" + "\n".join(harga)
+    return teks.rstrip()
+
+def deskripsi_pelanggan(entri):
+    """Satu baris ringkasan pelanggan untuk daftar hasil inline"""
+    bagian = [f"Piutang {format_rupiah(entri['piutang'])} ({entri['belum_lunas']} nota)" if entri['piutang'] else "Lunas"]
+    if entri['nota']:
+        _, tanggal, total, _, _, _ = entri['nota'][0]
+        bagian.append(f"terakhir {tanggal} {format_rupiah(total)}")
+    return " · ".join(bagian)
+
+def format_statistik_indeks():
+    s = indeks_pelanggan.statistik()
+    return f"{s['pelanggan']} pelanggan di {s['usaha']} usaha, {s['cari']} pencarian, {s['dimuat']} kali dimuat"
+
+def format_histori_semua(rows):
+    """Format histori nota penjualan semua pelanggan"""
+    if not rows:
+        return "📭 *Belum ada data histori*"
+    
+    histori_text = "📊 *HISTORI SEMUA PELANGGAN*\n\n"
+    
+    for row in rows:
+        nomor_nota, nama_pelanggan, tanggal, total, status = row
+        status_emoji = "✅" if status == "LUNAS" else "⏳"
+        histori_text += f"{status_emoji} *{nomor_nota}*\n"
+        histori_text += f"   👤 {nama_pelanggan}\n"
+        histori_text += f"   📅 {tanggal}\n"
+        histori_text += f"   💰 {format_rupiah(total)}\n\n"
+    return histori_text
+
+def format_statistik(nama_usaha, bulan, penjualan, belanja):
+    """Format statistik arus kas satu bulan dari (jumlah, total) penjualan dan belanja"""
+    total_penjualan = penjualan[1] if penjualan[1] else 0
+    total_belanja = belanja[1] if belanja[1] else 0
+    
+    # Hitung laba/rugi
+    laba_rugi = total_penjualan - total_belanja
+    
+    return f"""
+📈 *STATISTIK BULAN INI* ({bulan})
+🏪 {nama_usaha}
+
+🛒 *PENJUALAN:*
+• Jumlah transaksi: {penjualan[0]}
+• Total penjualan: {format_rupiah(total_penjualan)}
+
+🛍️ *BELANJA:*
+• Jumlah transaksi: {belanja[0]}
+• Total belanja: {format_rupiah(total_belanja)}
+
+💰 *ARUS KAS (penjualan - belanja):*
+• {format_rupiah(laba_rugi)} ({'✅ SURPLUS' if laba_rugi >= 0 else '❌ DEFISIT'})
+
+💹 Laba per produk & pelanggan (HPP): /laba
+"""
+
+def format_hasil_cari(kata_kunci, hasil, halaman):
+    """Format daftar hasil pencarian nota"""
+    kata_kunci = escape_markdown(kata_kunci)
+    if not hasil:
+        return f"🔍 Tidak ada nota yang cocok dengan *{kata_kunci}*"
+    
+    teks = f"🔍 *HASIL CARI: {kata_kunci}* (hal. {halaman + 1})\n\n"
+    for item in hasil:
+        nomor_nota, nama = escape_markdown(item['nomor_nota']), escape_markdown(item['nama'] or "")
+        if item['jenis'] == 'penjualan':
+            emoji = "✅" if item['status'] == "LUNAS" else "⏳"
+            teks += f"{emoji} *{nomor_nota}*\n"
+            teks += f"   👤 {nama}\n"
+        else:
+            teks += f"🛍️ *{nomor_nota}*\n"
+            teks += f"   🏢 {nama}\n"
+        teks += f"   📅 {item['tanggal']}\n"
+        teks += f"   💰 {format_rupiah(item['total'])}\n\n"
+    return teks
+
+def format_stok(nama_usaha, daftar_stok):
+    """Format daftar saldo stok usaha"""
+    teks = f"📦 *STOK {nama_usaha}*\n"
+    for jenis, judul in (('produk', "Produk jadi"), ('bahan', "Bahan baku")):
+        teks += f"\n*{judul}:*\n"
+        for item in daftar_stok:
+            if item['jenis'] != jenis:
+                continue
+            menipis = item['jumlah'] < 0 or (item['batas_minimum'] > 0 and item['jumlah'] <= item['batas_minimum'])
+            teks += f"{'⚠️' if menipis else '•'} {item['sku']}: {format_jumlah(item['jumlah'])} {item['satuan']}"
+            if item['batas_minimum'] > 0:
+                teks += f" (min {format_jumlah(item['batas_minimum'])})"
+            teks += "\n"
+    return teks
+
+def format_peringatan_stok(menipis):
+    """Format peringatan stok menipis; string kosong jika tidak ada"""
+    if not menipis:
+        return ""
+    teks = "⚠️ *STOK MENIPIS*\n\n"
+    for sku, jumlah, satuan, batas in menipis:
+        teks += f"• {sku}: {format_jumlah(jumlah)} {satuan}"
+        if batas > 0:
+            teks += f" (min {format_jumlah(batas)})"
+        teks += "\n"
+    teks += "\nCatat belanja bahan, /produksi, atau /stok set untuk menyesuaikan."
+    return teks
+
+def _format_persen(nilai):
+    if nilai is None:
+        return "-"
+    return f"{'▲' if nilai >= 0 else '▼'} {abs(nilai):.1f}%"
+
+def format_analisa(nama_usaha, analisa):
+    """Format analisa laba (HPP, laba per produk & pelanggan, WAC, tren)"""
+    teks = f"💹 *ANALISA LABA* ({analisa['bulan']})\n"
+    teks += f"🏪 {nama_usaha}\n\n"
+    teks += f"🛒 Penjualan bersih: {format_rupiah(analisa['pendapatan'])}\n"
+    teks += f"🏭 HPP bahan: {format_rupiah(analisa['hpp'])}\n"
+    teks += f"📊 Laba kotor: {format_rupiah(analisa['laba_kotor'])}\n"
+    teks += f"🧾 Overhead (upah, biaya): {format_rupiah(analisa['overhead'])}\n"
+    teks += f"💰 *Laba bersih: {format_rupiah(analisa['laba_bersih'])}*\n"
+    
+    if analisa['produk']:
+        teks += "\n*Per produk:*\n"
+        for baris in analisa['produk']:
+            margin = f"{baris['margin']:.1f}%" if baris['margin'] is not None else "-"
+            teks += f"• {baris['nama']}: {format_rupiah(baris['laba'])} (margin {margin})\n"
+            teks += f"   {format_jumlah(baris['qty'])} terjual, HPP {format_rupiah(baris['hpp'])}\n"
+    
+    if analisa['pelanggan']:
+        teks += "\n*Per pelanggan:*\n"
+        for baris in analisa['pelanggan']:
+            margin = f"{baris['margin']:.1f}%" if baris['margin'] is not None else "-"
+            teks += f"• {baris['nama']}: {format_rupiah(baris['laba'])} dari {format_rupiah(baris['pendapatan'])} ({margin})\n"
+    
+    if analisa['wac']:
+        teks += "\n*Harga rata-rata bahan (WAC):*\n"
+        for bahan, harga in analisa['wac'].items():
+            teks += f"• {bahan}: {format_rupiah(harga)}/{BAHAN_BAKU.get(bahan, 'unit')}\n"
+    
+    if analisa['tren']:
+        teks += "\n*Tren bulanan (laba bersih):*\n"
+        for baris in analisa['tren']:
+            teks += f"• {baris['bulan']}: {format_rupiah(baris['laba_bersih'])} {_format_persen(baris['perubahan_laba'])}\n"
+    
+    if analisa['tanpa_biaya']:
+        teks += f"\n⚠️ HPP belum lengkap (resep/harga bahan belum ada): {', '.join(analisa['tanpa_biaya'])}\n"
+    return teks
+
+def format_laporan_harian(laporan):
+    """Format laporan tutup buku harian (dan mingguan) untuk owner"""
+    tanggal = datetime.date.fromisoformat(laporan['tanggal']).strftime("%d/%m/%Y")
+    if laporan['sementara']:
+        teks = f"📒 *LAPORAN SEMENTARA {tanggal}*\n"
+    else:
+        teks = f"📒 *TUTUP BUKU {tanggal}*\n"
+    teks += f"🏪 {laporan['nama_usaha']}\n\n"
+    teks += f"🛒 Penjualan: {laporan['jumlah_penjualan']} nota, {format_rupiah(laporan['total_penjualan'])}\n"
+    teks += f"🛍️ Belanja: {laporan['jumlah_belanja']} nota, {format_rupiah(laporan['total_belanja'])}\n"
+    teks += f"💰 Arus kas: {format_rupiah(laporan['total_penjualan'] - laporan['total_belanja'])}\n"
+    
+    if laporan['piutang']:
+        teks += f"\n📌 *Piutang berjalan:* {format_rupiah(laporan['piutang'])} ({laporan['jumlah_piutang']} nota)\n"
+        for nama, jumlah in laporan['piutang_terbesar']:
+            teks += f"• {nama}: {format_rupiah(jumlah)}\n"
+    
+    if laporan['mingguan']:
+        hari, jp, tp, jb, tb = laporan['mingguan']
+        teks += f"\n📅 *7 hari terakhir* ({hari} hari tercatat):\n"
+        teks += f"• Penjualan: {jp} nota, {format_rupiah(tp)}\n"
+        teks += f"• Belanja: {jb} nota, {format_rupiah(tb)}\n"
+        teks += f"• Arus kas: {format_rupiah(tp - tb)}\n"
+    
+    teks += "\nDetail laba: /laba"
+    if laporan['sementara']:
+        teks += "\n_Nota setelah laporan ini masuk tutup buku besok._"
+    return teks
+
+def format_status_arsip(dipindah, daftar, ukuran_db):
+    """Format hasil /arsip: tahun yang baru dipindah + semua file arsip"""
+    teks = "🗄️ *ARSIP TAHUNAN*\n\n"
+    if dipindah:
+        for info in dipindah:
+            teks += f"✅ {info['tahun']}: {info['penjualan']:,} penjualan + {info['belanja']:,} belanja dipindah\n"
+    else:
+        teks += "ℹ️ Tidak ada nota lunas tahun tutup yang perlu dipindah\n"
+    
+    teks += f"\n💽 Database utama: {ukuran_db / 1024 / 1024:.1f} MB\n"
+    if dipindah:
+        teks += "_(ruang bekas nota dirapatkan saat optimasi tutup buku malam)_\n"
+    if daftar:
+        teks += "\n*File arsip:*\n"
+        for tahun, penjualan, belanja, ukuran in daftar:
+            teks += f"• {tahun}: {penjualan:,} penjualan, {belanja:,} belanja ({ukuran / 1024 / 1024:.1f} MB)\n"
+    return teks
+
+def format_riwayat_nota(nomor_nota, riwayat):
+    """Format /riwayat: event jurnal nota dari yang terlama"""
+    teks = f"📜 *RIWAYAT {escape_markdown(nomor_nota)}*\n\n"
+    if not riwayat:
+        return teks + "ℹ️ Belum ada riwayat koreksi (nota hasil impor, dibuat sebelum jurnal aktif, atau tidak ditemukan)"
+    for jenis, data, user_id, waktu in riwayat:
+        teks += f"`{waktu[:16].replace('T', ' ')}` "
+        if jenis == jurnal.DIBUAT:
+            asal = " (sebelum jurnal/impor)" if data.get('asal') == jurnal.ASAL_SEBELUM_JURNAL else ""
+            total = data['nota'].get('total_setelah_retur', data['nota'].get('total_belanja'))
+            teks += f"🆕 dibuat{asal} {format_rupiah(total or 0)}"
+        elif jenis == jurnal.DIBAYAR:
+            teks += f"💵 dibayar {format_rupiah(data['nominal'])}"
+        elif jenis == jurnal.DIUBAH:
+            teks += f"✏️ diubah: {escape_markdown(', '.join(data['perubahan']))}"
+        else:
+            teks += "🚫 dibatalkan" + (f": {escape_markdown(data['alasan'])}" if data.get('alasan') else "")
+        teks += f" — {user_id or '-'}\n"
+    return teks
+
+def format_jurnal(status, laporan):
+    """Format /jurnal: status snapshot + hasil pemeriksaan data nota terhadap jurnal"""
+    teks = "📒 *JURNAL NOTA*\n\n"
+    teks += f"🧾 Event: {status['event']:,} (sejak snapshot: {status['event_sejak_snapshot']:,})\n"
+    teks += f"📸 Snapshot terakhir: {status['snapshot_waktu'][:16].replace('T', ' ') if status['snapshot_waktu'] else 'belum ada'}\n"
+    teks += f"🔎 Nota dicek: {laporan['nota_dicek']:,}\n\n"
+    if laporan['diperbaiki'] is not None:
+        teks += f"🩹 Diperbaiki: {laporan['diperbaiki']} nota, item bulanan dibangun ulang\n"
+    beda = {
+        'Nota beda': laporan['nota_beda'], 'Item bulanan beda': laporan['item_beda'],
+        'Stok beda': laporan['stok_beda'], 'Event tanpa keadaan awal': laporan['tanpa_awal'],
+    }
+    if not any(beda.values()):
+        teks += "✅ Data nota cocok dengan jurnal\n"
+    else:
+        for judul, jumlah in beda.items():
+            if jumlah:
+                teks += f"⚠️ {judul}: {jumlah:,}\n"
+        for contoh in laporan['contoh_nota'][:5]:
+            kolom = escape_markdown(', '.join(contoh['kolom'])) if contoh['kolom'] else f"seharusnya {contoh['seharusnya']}"
+            teks += f"• {contoh['jenis']} #{contoh['id']}: {kolom}\n"
+        for nomor, sku, ada, harus in laporan['contoh_stok'][:5]:
+            teks += f"• stok {escape_markdown(nomor)} {sku}: {format_jumlah(ada)} (seharusnya {format_jumlah(harus)})\n"
+        if laporan['nota_beda'] and laporan['diperbaiki'] is None:
+            teks += "\nKetik /jurnal perbaiki untuk menulis ulang nota dari jurnal"
+    teks += f"\n⏱️ {laporan['durasi_detik']} detik"
+    return teks
+
+def format_hasil_impor(hasil, berhenti=None):
+    """Format ringkasan impor massal (baris diimpor/ditolak beserta alasannya)"""
+    teks = "📥 *HASIL IMPOR*\n\n" if berhenti is None else f"⚠️ *IMPOR BERHENTI:* {berhenti}\n\n"
+    teks += f"📄 Baris dibaca: {hasil['baris']}\n"
+    teks += f"✅ Baris diimpor: {hasil['baris_diimpor']}\n"
+    teks += f"   🛒 {hasil['nota']['penjualan']} nota penjualan\n"
+    teks += f"   🛍️ {hasil['nota']['belanja']} nota belanja\n"
+    teks += f"❌ Baris ditolak: {hasil['baris_ditolak']}\n"
+    
+    if hasil['alasan']:
+        teks += "\n*Alasan ditolak:*\n"
+        for alasan, jumlah in hasil['alasan'].most_common(8):
+            teks += f"• {alasan}: {jumlah}\n"
+        teks += "\n*Contoh baris:*\n"
+        for nomor, alasan in hasil['contoh_ditolak']:
+            teks += f"• baris {nomor}: {alasan}\n"
+    
+    if 'durasi_detik' in hasil:
+        teks += f"\n⏱️ {hasil['durasi_detik']} detik"
+    return teks
+
 def format_nota_penjualan(data):
     """Format nota penjualan menjadi teks dengan format kolom yang rapi"""
     
@@ -390,6 +1633,7 @@ def format_nota_belanja(data):
     return nota_text
 
 # ===== HANDLER COMMAND =====
+@pantau
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk command /start"""
     user_id = update.effective_user.id
@@ -400,7 +1644,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'data': {}
     }
     welcome_text = "*             𝙱𝙾𝚃 𝙼𝙰𝙽𝙰𝙹𝙴𝙼𝙴𝙽 𝙺𝙴𝚄𝙰𝙽𝙶𝙰𝙽*\n*                𝗕𝗘𝗥𝗞𝗔𝗛 𝗗𝗨𝗔 𝗣𝗨𝗧𝗥𝗜 *\n──────────────────────────\n\n"
-    welcome_text += "Silahkan Pilih Menu dibawah"
+    welcome_text += "Silahkan Pilih Menu dibawah\n\n"
+    welcome_text += "⚡ Entri cepat: `jual ujang: renceng 200, kiloan 3@45000, bayar 250000`"
     
     await update.message.reply_text(
         welcome_text, 
@@ -408,26 +1653,412 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=buat_keyboard_menu_utama()
     )
 
-# ===== HANDLER CALLBACK QUERY =====
-async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handler untuk inline keyboard callback"""
-    query = update.callback_query
-    await query.answer()
-    
-    user_id = query.from_user.id
-    callback_data = query.data
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /profile start|stop|status (khusus admin)"""
+    user_id = update.effective_user.id
+    if not is_admin(user_id):
+        await update.message.reply_text("❌ Command ini khusus admin")
+        return
     
-    logger.info(f"🔄 Callback from {user_id}: {callback_data}")
+    aksi = context.args[0].lower() if context.args else 'status'
+    
+    if aksi == 'start':
+        if PROFILER.mulai():
+            logger.info(f"🔬 Profiler dimulai oleh {user_id}")
+            await update.message.reply_text("🔬 Profiler aktif. Ketik /profile stop untuk mengambil laporan.")
+        else:
+            await update.message.reply_text("ℹ️ Profiler sudah aktif")
+    
+    elif aksi == 'stop':
+        laporan = PROFILER.berhenti({
+            'Sesi aktif': len(user_sessions),
+            'Cache respons': respons_cache.format_statistik(),
+            'Indeks pelanggan': format_statistik_indeks(),
+            'Update ulang dilewati': jendela_update.dilewati,
+        })
+        if laporan is None:
+            await update.message.reply_text("ℹ️ Profiler tidak aktif")
+            return
+        logger.info(f"🔬 Profiler dihentikan oleh {user_id}")
+        nama_file = f"profil-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
+        await update.message.reply_document(
+            document=io.BytesIO(laporan.encode('utf-8')),
+            filename=nama_file,
+            caption="🔬 Laporan profiler"
+        )
+    
+    else:
+        status = "aktif" if PROFILER.aktif else "tidak aktif"
+        await update.message.reply_text(
+            f"🔬 Profiler {status}\n"
+            f"Sampel: {PROFILER.jumlah_sampel}\n"
+            f"Sesi aktif: {len(user_sessions)}\n"
+            f"Cache respons: {respons_cache.format_statistik()}\n"
+            f"Indeks pelanggan: {format_statistik_indeks()}\n"
+            f"Update ulang dilewati: {jendela_update.dilewati}\n\n"
+            "Gunakan /profile start atau /profile stop"
+        )
+
+async def usaha_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /usaha [nama <nama baru>]"""
+    user_id = update.effective_user.id
+    keanggotaan = get_keanggotaan(user_id)
+    
+    if context.args and context.args[0].lower() == 'nama':
+        if keanggotaan['role'] != ROLE_OWNER:
+            await update.message.reply_text("❌ Hanya owner yang bisa mengganti nama usaha")
+            return
+        nama_baru = " ".join(context.args[1:]).strip()
+        if not nama_baru:
+            await update.message.reply_text("❌ Format: /usaha nama <nama usaha>")
+            return
+        ubah_nama_usaha(keanggotaan['business_id'], nama_baru)
+        await update.message.reply_text(f"✅ Nama usaha diganti menjadi *{nama_baru}*", parse_mode='Markdown')
+        return
+    
+    info_text = f"🏪 *{keanggotaan['nama_usaha']}*\n"
+    info_text += f"👤 Role kamu: *{keanggotaan['role']}*\n\n"
+    info_text += "*Anggota:*\n"
+    for anggota_id, role in ambil_anggota_usaha(keanggotaan['business_id']):
+        info_text += f"• {anggota_id} ({role})\n"
+    
+    if keanggotaan['role'] == ROLE_OWNER:
+        info_text += "\nUndang anggota: /undang kasir | viewer | owner"
+    
+    await update.message.reply_text(info_text, parse_mode='Markdown')
+
+async def undang_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /undang <role> (khusus owner)"""
+    user_id = update.effective_user.id
+    keanggotaan = get_keanggotaan(user_id)
+    
+    if keanggotaan['role'] != ROLE_OWNER:
+        await update.message.reply_text("❌ Hanya owner yang bisa mengundang anggota")
+        return
+    
+    role = context.args[0].lower() if context.args else ROLE_KASIR
+    if role not in DAFTAR_ROLE:
+        await update.message.reply_text(f"❌ Role tidak dikenal. Pilih: {', '.join(DAFTAR_ROLE)}")
+        return
+    
+    kode = buat_undangan(keanggotaan['business_id'], role, user_id)
+    await update.message.reply_text(
+        f"🎟️ Kode undangan *{role}* untuk {keanggotaan['nama_usaha']}:\n\n"
+        f"`{kode}`\n\n"
+        f"Minta anggota baru mengetik: /gabung {kode}\n"
+        f"Berlaku {UNDANGAN_BERLAKU_JAM} jam.",
+        parse_mode='Markdown'
+    )
+
+async def gabung_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /gabung <kode>"""
+    user_id = update.effective_user.id
+    if not context.args:
+        await update.message.reply_text("❌ Format: /gabung <kode undangan>")
+        return
+    
+    try:
+        keanggotaan = gabung_usaha(user_id, context.args[0])
+    except GabungDitolak as e:
+        await update.message.reply_text(str(e))
+        return
+    if keanggotaan is None:
+        await update.message.reply_text("❌ Kode undangan tidak valid atau sudah dipakai")
+        return
+    
+    user_sessions.pop(user_id, None)
+    logger.info(f"👥 User {user_id} bergabung ke usaha {keanggotaan['business_id']} sebagai {keanggotaan['role']}")
+    await update.message.reply_text(
+        f"✅ Bergabung ke *{keanggotaan['nama_usaha']}* sebagai *{keanggotaan['role']}*",
+        parse_mode='Markdown',
+        reply_markup=buat_keyboard_menu_utama()
+    )
+
+async def cari_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /cari <kata kunci>"""
+    user_id = update.effective_user.id
+    kata_kunci = " ".join(context.args).strip()
+    if not kata_kunci:
+        await update.message.reply_text(
+            "🔍 Format: /cari <kata kunci>\n\n"
+            "Contoh: /cari plastik, /cari ujang kiloan, /cari PNJ-19-10"
+        )
+        return
+    tertunda = backfill_tertunda(BACKFILL_USAHA, BACKFILL_CARI)
+    if tertunda:
+        await update.message.reply_text(pesan_backfill(tertunda))
+        return
+    
+    if user_id not in user_sessions:
+        user_sessions[user_id] = {'state': 'idle', 'data': {}}
+    user_sessions[user_id]['cari'] = kata_kunci
+    
+    business_id = get_keanggotaan(user_id)['business_id']
+    hasil, ada_berikutnya = cari_nota(business_id, kata_kunci)
+    await update.message.reply_text(
+        format_hasil_cari(kata_kunci, hasil, 0),
+        parse_mode='Markdown',
+        reply_markup=buat_keyboard_cari(0, ada_berikutnya)
+    )
+
+async def stok_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /stok [set|min|riwayat <barang> [jumlah]]"""
+    user_id = update.effective_user.id
+    keanggotaan = get_keanggotaan(user_id)
+    business_id = keanggotaan['business_id']
+    aksi = context.args[0].lower() if context.args else ''
+    
+    if aksi not in ('set', 'min', 'riwayat'):
+        await update.message.reply_text(
+            format_stok(keanggotaan['nama_usaha'], ambil_stok(business_id)) +
+            "\n/stok set <barang> <jumlah> - stock opname\n"
+            "/stok min <barang> <jumlah> - batas peringatan\n"
+            "/stok riwayat <barang> - mutasi terakhir",
+            parse_mode='Markdown'
+        )
+        return
+    
+    argumen = context.args[1:]
+    angka = None
+    if aksi == 'riwayat':
+        nama = " ".join(argumen)
+    else:
+        try:
+            nama = " ".join(argumen[:-1])
+            angka = float(argumen[-1].replace(",", "."))
+        except (IndexError, ValueError):
+            await update.message.reply_text(f"❌ Format: /stok {aksi} <barang> <jumlah>")
+            return
+    
+    sku = cari_sku(nama)
+    if sku is None:
+        await update.message.reply_text(
+            f"❌ Barang '{nama}' tidak dikenal. Pilih: {', '.join([*PRODUK_JADI, *BAHAN_BAKU])}"
+        )
+        return
+    satuan = info_sku(sku)[1]
+    
+    if aksi == 'set':
+        if keanggotaan['role'] not in ROLE_PENCATAT:
+            await update.message.reply_text("❌ Role viewer tidak bisa mengubah stok")
+            return
+        saldo = atur_stok(business_id, user_id, sku, angka)
+        logger.info(f"📦 Opname {sku} usaha {business_id}: {saldo}")
+        await update.message.reply_text(f"✅ Stok {sku} disesuaikan menjadi {format_jumlah(saldo)} {satuan}")
+    
+    elif aksi == 'min':
+        if keanggotaan['role'] != ROLE_OWNER:
+            await update.message.reply_text("❌ Hanya owner yang bisa mengatur batas minimum stok")
+            return
+        atur_batas_minimum(business_id, sku, angka)
+        await update.message.reply_text(f"✅ Batas minimum {sku}: {format_jumlah(angka)} {satuan}")
+    
+    else:
+        rows = ambil_mutasi_stok(business_id, sku)
+        if not rows:
+            await update.message.reply_text(f"📭 Belum ada mutasi stok {sku}")
+            return
+        riwayat_text = f"📜 *MUTASI {sku}*\n\n"
+        for perubahan, saldo, sumber, referensi, timestamp in rows:
+            waktu = datetime.datetime.fromisoformat(timestamp).strftime("%d/%m %H:%M")
+            tanda = "+" if perubahan >= 0 else ""
+            riwayat_text += f"• {waktu} {sumber} {referensi or ''}\n"
+            riwayat_text += f"   {tanda}{format_jumlah(perubahan)} → {format_jumlah(saldo)} {satuan}\n"
+        await update.message.reply_text(riwayat_text, parse_mode='Markdown')
+
+async def produksi_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /produksi <produk> <jumlah>"""
+    user_id = update.effective_user.id
+    keanggotaan = get_keanggotaan(user_id)
+    
+    if keanggotaan['role'] not in ROLE_PENCATAT:
+        await update.message.reply_text("❌ Role viewer tidak bisa mencatat produksi")
+        return
+    
+    try:
+        produk = cari_sku(" ".join(context.args[:-1]), PRODUK_JADI)
+        jumlah = float(context.args[-1].replace(",", "."))
+    except (IndexError, ValueError):
+        produk, jumlah = None, 0
+    if produk is None or jumlah <= 0:
+        await update.message.reply_text(
+            "🏭 Format: /produksi <produk> <jumlah>\n\n"
+            f"Produk: {', '.join(PRODUK_JADI)}\n"
+            "Contoh: /produksi renceng 200"
+        )
+        return
+    
+    try:
+        # update_id sebagai kunci: /produksi yang dikirim ulang tidak memotong stok dua kali
+        hasil = catat_produksi(keanggotaan['business_id'], user_id, produk, jumlah, kunci=f"update:{update.update_id}")
+    except repositori.NotaSudahTersimpan as e:
+        await update.message.reply_text(f"ℹ️ Produksi ini sudah dicatat sebagai {e.nomor_nota}")
+        return
+    if hasil is None:
+        await update.message.reply_text("❌ Gagal mencatat produksi!")
+        return
+    
+    nomor, pemakaian = hasil
+    produksi_text = f"🏭 *PRODUKSI {nomor}*\n\n"
+    produksi_text += f"✅ +{format_jumlah(jumlah)} {PRODUK_JADI[produk]} {produk}\n\n"
+    produksi_text += "*Bahan terpakai:*\n"
+    for bahan, qty in pemakaian.items():
+        produksi_text += f"• {bahan}: {format_jumlah(qty)} {BAHAN_BAKU.get(bahan, '')}\n"
+    await update.message.reply_text(produksi_text, parse_mode='Markdown')
+    await kirim_peringatan_stok(update.message, keanggotaan['business_id'], pemakaian)
+
+async def laba_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /laba [mm/YYYY]"""
+    keanggotaan = get_keanggotaan(update.effective_user.id)
+    bulan = context.args[0] if context.args else datetime.datetime.now().strftime("%m/%Y")
+    try:
+        datetime.datetime.strptime(bulan, "%m/%Y")
+    except ValueError:
+        await update.message.reply_text("❌ Format: /laba [mm/YYYY], contoh /laba 09/2026")
+        return
+    tertunda = backfill_tertunda(BACKFILL_USAHA, BACKFILL_ANALISA)
+    if tertunda:
+        await update.message.reply_text(pesan_backfill(tertunda))
+        return
+    
+    analisa = ambil_analisa(keanggotaan['business_id'], bulan)
+    await update.message.reply_text(format_analisa(keanggotaan['nama_usaha'], analisa), parse_mode='Markdown')
+
+async def resep_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /resep [<produk>: <bahan>=<jumlah>, ...]"""
+    user_id = update.effective_user.id
+    keanggotaan = get_keanggotaan(user_id)
+    business_id = keanggotaan['business_id']
+    teks = " ".join(context.args)
+    
+    if ':' in teks:
+        if keanggotaan['role'] != ROLE_OWNER:
+            await update.message.reply_text("❌ Hanya owner yang bisa mengubah resep")
+            return
+        nama_produk, isi = teks.split(':', 1)
+        produk = cari_sku(nama_produk, PRODUK_JADI)
+        komposisi = {}
+        for nama_bahan, angka in re.findall(r'([^=,;]+)=\s*([0-9]+(?:[.,][0-9]+)?)', isi):
+            bahan = cari_sku(nama_bahan, BAHAN_BAKU)
+            if bahan is None:
+                await update.message.reply_text(f"❌ Bahan '{nama_bahan.strip()}' tidak dikenal. Pilih: {', '.join(BAHAN_BAKU)}")
+                return
+            komposisi[bahan] = float(angka.replace(",", "."))
+        if produk is None or not komposisi:
+            await update.message.reply_text(
+                "❌ Format: /resep <produk>: <bahan>=<jumlah>, ...\n\n"
+                "Contoh: /resep renceng: kacang=0.025, minyak=0.003, bumbu=0.002, plastik=0.001, label=0.001"
+            )
+            return
+        simpan_resep(business_id, produk, komposisi)
+        logger.info(f"📋 Resep {produk} usaha {business_id} diperbarui")
+    
+    resep_text = "📋 *RESEP PRODUKSI* (per satuan produk)\n"
+    for produk, satuan in PRODUK_JADI.items():
+        resep_text += f"\n*{produk}* (1 {satuan}):\n"
+        for bahan, qty in ambil_resep(business_id, produk).items():
+            resep_text += f"• {bahan}: {format_jumlah(qty)} {BAHAN_BAKU.get(bahan, '')}\n"
+    if keanggotaan['role'] == ROLE_OWNER:
+        resep_text += "\nUbah: /resep <produk>: <bahan>=<jumlah>, ..."
+    await update.message.reply_text(resep_text, parse_mode='Markdown')
+
+async def impor_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /import: minta file CSV/XLSX nota lama (khusus owner)"""
+    user_id = update.effective_user.id
+    if get_keanggotaan(user_id)['role'] != ROLE_OWNER:
+        await update.message.reply_text("❌ Hanya owner yang bisa mengimpor nota")
+        return
+    
+    user_sessions[user_id] = {'state': 'tunggu_file_impor', 'data': {}}
+    await update.message.reply_text(
+        "📥 *IMPOR NOTA LAMA*\n\n"
+        "Kirim file .csv atau .xlsx (maks 20 MB). Baris pertama berisi header, satu baris = satu item:\n\n"
+        "`jenis,tanggal,pihak,barang,qty,harga,nota,bayar`\n"
+        "`jual,05/01/2024,UJANG,Kc Bawang Renceng,100,1200,A-17,120000`\n"
+        "`beli,05/01/2024,TOKO JAYA,Kacang Kupas,25,28000,,`\n\n"
+        "• jenis: jual / beli\n"
+        "• nota, bayar, keterangan: opsional; baris berurutan dengan nota asal sama jadi satu nota\n"
+        "• barang harus sesuai daftar barang bot\n"
+        "• stok tidak diubah, sesuaikan dengan /stok set",
+        parse_mode='Markdown'
+    )
+
+async def handle_dokumen(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk file yang dikirim user: impor nota jika sedang menunggu file /import"""
+    user_id = update.effective_user.id
+    session = user_sessions.get(user_id)
+    if session is None or session['state'] != 'tunggu_file_impor':
+        await update.message.reply_text("ℹ️ Untuk impor nota lama, ketik /import dulu lalu kirim filenya")
+        return
+    
+    dokumen = update.message.document
+    ekstensi = os.path.splitext(dokumen.file_name or '')[1].lower()
+    if ekstensi not in ('.csv', '.xlsx', '.xlsm'):
+        await update.message.reply_text("❌ Format file harus .csv atau .xlsx")
+        return
+    if dokumen.file_size and dokumen.file_size > IMPOR_MAKS_MB * 1024 * 1024:
+        await update.message.reply_text(f"❌ File lebih dari {IMPOR_MAKS_MB} MB, pecah menjadi beberapa file")
+        return
+    
+    keanggotaan = get_keanggotaan(user_id)
+    session['state'] = 'idle'
+    await update.message.reply_text(f"⏳ Mengimpor {dokumen.file_name}...")
+    
+    import impor
+    import tempfile
+    proses = impor.Impor(get_repositori(), keanggotaan['business_id'], user_id, KATALOG_BARANG)
+    with tempfile.TemporaryDirectory(prefix="impor-") as tmp:
+        path = os.path.join(tmp, "nota" + ekstensi)
+        try:
+            berkas = await context.bot.get_file(dokumen.file_id)
+            await berkas.download_to_drive(path)
+            hasil = await asyncio.to_thread(proses.jalankan, impor.baca_baris(path))
+        except Exception as e:
+            logger.error(f"❌ Error impor usaha {keanggotaan['business_id']}: {e}")
+            if not any(proses.hasil['nota'].values()):
+                await update.message.reply_text(f"❌ Impor gagal: {e}")
+            else:
+                # Batch yang sudah tersimpan sebelum error tetap ada
+                await update.message.reply_text(
+                    format_hasil_impor(proses.hasil, berhenti=escape_markdown(str(e))), parse_mode='Markdown'
+                )
+            return
+        finally:
+            # Nota impor bisa jatuh di bulan mana saja: buang semua respons usaha ini
+            respons_cache.hapus(keanggotaan['business_id'])
+            indeks_pelanggan.hapus(keanggotaan['business_id'])
+    
+    await update.message.reply_text(format_hasil_impor(hasil), parse_mode='Markdown')
+
+# ===== HANDLER CALLBACK QUERY =====
+@pantau
+async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk inline keyboard callback"""
+    query = update.callback_query
+    await query.answer()
+    
+    user_id = query.from_user.id
+    callback_data = query.data
+    
+    logger.info(f"🔄 Callback from {user_id}: {callback_data}")
     
     if user_id not in user_sessions:
         user_sessions[user_id] = {'state': 'idle', 'data': {}}
     
     session = user_sessions[user_id]
+    keanggotaan = get_keanggotaan(user_id)
     
     if callback_data.startswith('menu_'):
         # Handle menu utama
         menu = callback_data.split('_')[1]
         
+        if menu in ('jual', 'beli') and keanggotaan['role'] not in ROLE_PENCATAT:
+            await query.edit_message_text(
+                "❌ Role viewer hanya bisa melihat histori dan statistik",
+                reply_markup=buat_keyboard_menu_utama()
+            )
+            return
+        
         if menu == 'jual':
             # Mulai proses penjualan
             session['state'] = 'pilih_pelanggan'
@@ -436,7 +2067,8 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 'daftar_barang': [],
                 'retur_items': [],
                 'nomor_nota': buat_nomor_nota("PNJ"),
-                'tanggal': datetime.datetime.now().strftime("%d/%m/%Y")
+                'tanggal': datetime.datetime.now().strftime("%d/%m/%Y"),
+                'token': secrets.token_hex(8)
             }
             
             await query.edit_message_text(
@@ -454,7 +2086,8 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             session['data'] = {
                 'daftar_barang': [],
                 'nomor_nota': buat_nomor_nota("BLJ"),
-                'tanggal': datetime.datetime.now().strftime("%d/%m/%Y")
+                'tanggal': datetime.datetime.now().strftime("%d/%m/%Y"),
+                'token': secrets.token_hex(8)
             }
             
             await query.edit_message_text(
@@ -474,7 +2107,15 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         elif menu == 'statistik':
             # Tampilkan statistik
-            await tampilkan_statistik(query, user_id)
+            await tampilkan_statistik(query, keanggotaan)
+            
+        elif menu == 'stok':
+            # Tampilkan saldo stok usaha
+            await query.edit_message_text(
+                format_stok(keanggotaan['nama_usaha'], ambil_stok(keanggotaan['business_id'])),
+                parse_mode='Markdown',
+                reply_markup=buat_keyboard_menu_utama()
+            )
             
         elif menu == 'info':
             # Tampilkan info dengan keyboard menu
@@ -489,6 +2130,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • Buat nota belanja 
 • Simpan histori transaksi
 • Statistik penjualan & belanja
+• Stok bahan & produk, produksi sesuai resep
 
 *Version:* 2.0
 *Host:* Railway
@@ -542,7 +2184,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             session['data']['current_item'] = {'nama': nama_barang}
             session['state'] = 'input_harga_barang'
             
-            await query.e0dit_message_text(
+            await query.edit_message_text(
                 f"📦 *Barang:* {nama_barang}\n\n"
                 "Masukkan harga satuan:",
                 parse_mode='Markdown'
@@ -655,14 +2297,79 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
     
     elif callback_data.startswith('histori_pelanggan_'):
-        # Handle histori berdasarkan pelanggan
-        pelanggan_index = int(callback_data.split('_')[2]) - 1
+        # Handle histori berdasarkan pelanggan: histori_pelanggan_<no>[_<halaman>]
+        bagian = callback_data.split('_')
+        pelanggan_index = int(bagian[2]) - 1
+        halaman = int(bagian[3]) if len(bagian) > 3 else 0
         nama_pelanggan = DAFTAR_PELANGGAN[pelanggan_index]
-        await tampilkan_histori_pelanggan(query, user_id, nama_pelanggan)
+        await tampilkan_histori_pelanggan(query, keanggotaan['business_id'], nama_pelanggan, halaman)
+    
+    elif callback_data.startswith('histori_semua'):
+        # Handle semua histori: histori_semua[_<halaman>]
+        bagian = callback_data.split('_')
+        halaman = int(bagian[2]) if len(bagian) > 2 else 0
+        await tampilkan_histori_semua(query, keanggotaan['business_id'], halaman)
+    
+    elif callback_data.startswith('cari_'):
+        # Handle halaman hasil pencarian
+        halaman = int(callback_data.split('_')[1])
+        kata_kunci = session.get('cari')
+        if not kata_kunci:
+            await query.edit_message_text("❌ Pencarian kedaluwarsa, ketik /cari lagi")
+            return
+        tertunda = backfill_tertunda(BACKFILL_USAHA, BACKFILL_CARI)
+        if tertunda:
+            await query.edit_message_text(pesan_backfill(tertunda))
+            return
+        hasil, ada_berikutnya = cari_nota(keanggotaan['business_id'], kata_kunci, halaman)
+        await query.edit_message_text(
+            format_hasil_cari(kata_kunci, hasil, halaman),
+            parse_mode='Markdown',
+            reply_markup=buat_keyboard_cari(halaman, ada_berikutnya)
+        )
     
-    elif callback_data == 'histori_semua':
-        # Handle semua histori
-        await tampilkan_histori_semua(query, user_id)
+    elif callback_data.startswith('restore_'):
+        # Konfirmasi restore database (khusus admin)
+        if not is_admin(user_id):
+            await query.edit_message_text("❌ Command ini khusus admin")
+            return
+        nama = callback_data[len('restore_'):]
+        await query.edit_message_text(f"♻️ Memulihkan database dari {nama}...")
+        import backup
+        try:
+            pengaman = await asyncio.to_thread(backup.pulihkan, DB_FILE, get_penyimpanan_backup(), nama)
+        except Exception as e:
+            logger.error(f"❌ Error restore: {e}")
+            await query.edit_message_text(f"❌ Restore gagal: {e}")
+            return
+        # Arsip tahunan yang tercatat di database hasil restore tapi hilang dari disk
+        catatan_arsip = ""
+        if DB_BACKEND == 'sqlite':
+            try:
+                dipulihkan, hilang = await asyncio.to_thread(
+                    backup.pulihkan_arsip, DB_FILE, get_repositori().arsip_dir, get_penyimpanan_backup()
+                )
+                if dipulihkan:
+                    catatan_arsip += f"\nArsip diunduh: {', '.join(dipulihkan)}"
+                if hilang:
+                    catatan_arsip += f"\n⚠️ Arsip tidak ada di backup: {', '.join(hilang)}"
+            except Exception as e:
+                logger.error(f"❌ Error restore arsip: {e}")
+                catatan_arsip = f"\n⚠️ Arsip gagal dipulihkan: {e}"
+        # Data di cache berasal dari database sebelum restore
+        keanggotaan_cache.clear()
+        analisa_cache.clear()
+        respons_cache.kosongkan()
+        indeks_pelanggan.hapus()
+        panaskan_indeks_latar()
+        # Snapshot bisa diambil sebelum backfill migrasi selesai
+        lanjutkan_backfill_latar()
+        logger.info(f"♻️ Restore {nama} oleh admin {user_id}")
+        await query.edit_message_text(
+            f"✅ Database dipulihkan dari {nama}\n"
+            f"Kondisi sebelum restore disimpan sebagai {pengaman}"
+            f"{catatan_arsip}"
+        )
     
     elif callback_data == 'cancel':
         # Batalkan proses dan kembali ke menu utama
@@ -674,6 +2381,17 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=buat_keyboard_menu_utama()
         )
 
+def kunci_sesi(session):
+    """Kunci idempotensi nota dari token sesi (None untuk sesi lama tanpa token)"""
+    token = session['data'].get('token')
+    return f"sesi:{token}" if token else None
+
+async def kirim_peringatan_stok(message, business_id, daftar_sku):
+    """Kirim peringatan jika ada barang yang stoknya menipis setelah transaksi"""
+    teks = format_peringatan_stok(cek_stok_menipis(business_id, daftar_sku))
+    if teks:
+        await message.reply_text(teks, parse_mode='Markdown')
+
 async def proses_pembayaran(query, session, nominal_bayar):
     """Proses pembayaran dan simpan nota"""
     total_barang = sum(item['subtotal'] for item in session['data']['daftar_barang'])
@@ -697,13 +2415,18 @@ async def proses_pembayaran(query, session, nominal_bayar):
         retur_items=session['data']['retur_items'],
         total_setelah_retur=total_setelah_retur,
         bayar=nominal_bayar,
-        sisa=sisa
+        sisa=sisa,
+        kunci=kunci_sesi(session)
     )
     
     if success:
         # Kirim nota
         nota_text = format_nota_penjualan(session['data'])
         await query.edit_message_text(nota_text, parse_mode='Markdown')
+        await kirim_peringatan_stok(
+            query.message, get_keanggotaan(query.from_user.id)['business_id'],
+            [item['nama'] for item in session['data']['daftar_barang']]
+        )
         
         # Reset session
         session['state'] = 'idle'
@@ -712,143 +2435,141 @@ async def proses_pembayaran(query, session, nominal_bayar):
     else:
         await query.edit_message_text("❌ Gagal menyimpan nota!")
 
-async def tampilkan_histori_pelanggan(query, user_id, nama_pelanggan):
+async def proses_entri_cepat(update, user_id, message_text):
+    """Entri cepat: 'jual ujang: renceng 200, kiloan 3@45000, bayar 250000' langsung jadi satu nota
+
+    update_id menjadi kunci idempotensi: pesan yang dikirim ulang tidak menyimpan nota kedua.
+    """
+    kunci = f"update:{update.update_id}"
+    keanggotaan = get_keanggotaan(user_id)
+    if keanggotaan['role'] not in ROLE_PENCATAT:
+        await update.message.reply_text("❌ Role viewer tidak bisa membuat nota")
+        return
+
+    try:
+        entri = entri_cepat.urai(message_text, DAFTAR_PELANGGAN, KATALOG_BARANG, get_harga_otomatis)
+    except entri_cepat.EntriTidakValid as e:
+        await update.message.reply_text(
+            "❌ Nota belum disimpan:\n" + "\n".join(f"• {k}" for k in e.kesalahan) +
+            "\n\nContoh: jual ujang: renceng 200, kiloan 3@45000, retur renceng 10, bayar 250000"
+        )
+        return
+
+    tanggal = datetime.datetime.now().strftime("%d/%m/%Y")
+    total_barang = sum(item['subtotal'] for item in entri['daftar_barang'])
+
+    if entri['jenis'] == 'penjualan':
+        total_setelah_retur = total_barang - sum(item['subtotal'] for item in entri['retur_items'])
+        bayar = total_setelah_retur if entri['bayar'] is None else entri['bayar']
+        data = {
+            'nomor_nota': buat_nomor_nota("PNJ"),
+            'tanggal': tanggal,
+            'nama_pelanggan': entri['pihak'],
+            'daftar_barang': entri['daftar_barang'],
+            'retur_items': entri['retur_items'],
+            'total_setelah_retur': total_setelah_retur,
+            'bayar': bayar,
+            'sisa': bayar - total_setelah_retur,
+        }
+        data['status'] = "LUNAS" if data['sisa'] >= 0 else "BELUM LUNAS"
+        nomor = simpan_nota_penjualan(
+            user_id, data['nomor_nota'], data['nama_pelanggan'], tanggal, data['daftar_barang'],
+            data['retur_items'], total_setelah_retur, bayar, data['sisa'], kunci=kunci
+        )
+    else:
+        data = {
+            'nomor_nota': buat_nomor_nota("BLJ"),
+            'tanggal': tanggal,
+            'nama_supplier': entri['pihak'],
+            'daftar_barang': entri['daftar_barang'],
+            'total_belanja': total_barang if entri['total'] is None else entri['total'],
+            'keterangan': entri['keterangan'],
+        }
+        nomor = simpan_nota_belanja(
+            user_id, data['nomor_nota'], data['nama_supplier'], tanggal, data['daftar_barang'],
+            data['total_belanja'], data['keterangan'], kunci=kunci
+        )
+
+    if not nomor:
+        await update.message.reply_text("❌ Gagal menyimpan nota!")
+        return
+    # Pesan yang dikirim ulang Telegram dibalas dengan nomor nota yang sudah tersimpan
+    data['nomor_nota'] = nomor
+    logger.info(f"⚡ Entri cepat {nomor} oleh {user_id}")
+    nota_text = format_nota_penjualan(data) if entri['jenis'] == 'penjualan' else format_nota_belanja(data)
+    await update.message.reply_text(nota_text, parse_mode='Markdown')
+    if entri['jenis'] == 'penjualan':
+        await kirim_peringatan_stok(
+            update.message, keanggotaan['business_id'], [item['nama'] for item in entri['daftar_barang']]
+        )
+
+@pantau
+async def tampilkan_histori_pelanggan(query, business_id, nama_pelanggan, halaman=0):
     """Tampilkan histori berdasarkan pelanggan"""
+    tertunda = backfill_tertunda(BACKFILL_USAHA)
+    if tertunda:
+        await query.edit_message_text(pesan_backfill(tertunda), reply_markup=buat_keyboard_menu_utama())
+        return
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT nomor_nota, tanggal, total_setelah_retur, status 
-            FROM nota_penjualan 
-            WHERE user_id = ? AND nama_pelanggan = ?
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        ''', (user_id, nama_pelanggan))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        if not rows:
-            await query.edit_message_text(
-                f"📭 *Belum ada data histori untuk {nama_pelanggan}*",
-                parse_mode='Markdown',
-                reply_markup=buat_keyboard_menu_utama()
+        def buat_respons():
+            # Satu baris lebih untuk tahu apakah masih ada halaman yang lebih lama
+            rows = ambil_histori_pelanggan(
+                business_id, nama_pelanggan, HISTORI_PER_HALAMAN + 1, halaman * HISTORI_PER_HALAMAN
             )
-            return
+            return format_histori_pelanggan(nama_pelanggan, rows[:HISTORI_PER_HALAMAN]), len(rows) > HISTORI_PER_HALAMAN
         
-        histori_text = f"📊 *HISTORI - {nama_pelanggan}*\n\n"
-        total_penjualan = 0
-        
-        for row in rows:
-            nomor_nota, tanggal, total, status = row
-            status_emoji = "✅" if status == "LUNAS" else "⏳"
-            histori_text += f"{status_emoji} *{nomor_nota}*\n"
-            histori_text += f"   📅 {tanggal}\n"
-            histori_text += f"   💰 {format_rupiah(total)}\n\n"
-            total_penjualan += total
-        
-        histori_text += f"📈 *Total Penjualan: {format_rupiah(total_penjualan)}*"
+        histori_text, ada_berikutnya = respons_tersimpan(
+            business_id, 'histori_pelanggan', (nama_pelanggan, halaman), buat_respons
+        )
+        prefix = f"histori_pelanggan_{DAFTAR_PELANGGAN.index(nama_pelanggan) + 1}"
         
         await query.edit_message_text(
             histori_text, 
             parse_mode='Markdown',
-            reply_markup=buat_keyboard_menu_utama()
+            reply_markup=buat_keyboard_histori(prefix, halaman, ada_berikutnya)
         )
         
     except Exception as e:
         await query.edit_message_text(f"❌ Error: {str(e)}")
 
-async def tampilkan_histori_semua(query, user_id):
+@pantau
+async def tampilkan_histori_semua(query, business_id, halaman=0):
     """Tampilkan semua histori"""
+    tertunda = backfill_tertunda(BACKFILL_USAHA)
+    if tertunda:
+        await query.edit_message_text(pesan_backfill(tertunda), reply_markup=buat_keyboard_menu_utama())
+        return
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+        def buat_respons():
+            rows = ambil_histori_semua(business_id, HISTORI_PER_HALAMAN + 1, halaman * HISTORI_PER_HALAMAN)
+            return format_histori_semua(rows[:HISTORI_PER_HALAMAN]), len(rows) > HISTORI_PER_HALAMAN
         
-        cursor.execute('''
-            SELECT nomor_nota, nama_pelanggan, tanggal, total_setelah_retur, status 
-            FROM nota_penjualan 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        ''', (user_id,))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        if not rows:
-            await query.edit_message_text(
-                "📭 *Belum ada data histori*",
-                parse_mode='Markdown',
-                reply_markup=buat_keyboard_menu_utama()
-            )
-            return
-        
-        histori_text = "📊 *HISTORI SEMUA PELANGGAN*\n\n"
-        
-        for row in rows:
-            nomor_nota, nama_pelanggan, tanggal, total, status = row
-            status_emoji = "✅" if status == "LUNAS" else "⏳"
-            histori_text += f"{status_emoji} *{nomor_nota}*\n"
-            histori_text += f"   👤 {nama_pelanggan}\n"
-            histori_text += f"   📅 {tanggal}\n"
-            histori_text += f"   💰 {format_rupiah(total)}\n\n"
+        histori_text, ada_berikutnya = respons_tersimpan(business_id, 'histori_semua', halaman, buat_respons)
         
         await query.edit_message_text(
             histori_text, 
             parse_mode='Markdown',
-            reply_markup=buat_keyboard_menu_utama()
+            reply_markup=buat_keyboard_histori("histori_semua", halaman, ada_berikutnya)
         )
         
     except Exception as e:
         await query.edit_message_text(f"❌ Error: {str(e)}")
 
-async def tampilkan_statistik(query, user_id):
-    """Tampilkan statistik penjualan dan belanja"""
+@pantau
+async def tampilkan_statistik(query, keanggotaan):
+    """Tampilkan statistik penjualan dan belanja seluruh usaha"""
+    tertunda = backfill_tertunda(BACKFILL_USAHA)
+    if tertunda:
+        await query.edit_message_text(pesan_backfill(tertunda), reply_markup=buat_keyboard_menu_utama())
+        return
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Statistik penjualan bulan ini
+        business_id = keanggotaan['business_id']
+        nama_usaha = keanggotaan['nama_usaha']
         bulan_ini = datetime.datetime.now().strftime("%m/%Y")
-        cursor.execute('''
-            SELECT COUNT(*), SUM(total_setelah_retur) 
-            FROM nota_penjualan 
-            WHERE user_id = ? AND tanggal LIKE ?
-        ''', (user_id, f'%/{bulan_ini}'))
-        
-        penjualan = cursor.fetchone()
-        total_penjualan = penjualan[1] if penjualan[1] else 0
-        
-        # Statistik belanja bulan ini
-        cursor.execute('''
-            SELECT COUNT(*), SUM(total_belanja) 
-            FROM nota_belanja 
-            WHERE user_id = ? AND tanggal LIKE ?
-        ''', (user_id, f'%/{bulan_ini}'))
-        
-        belanja = cursor.fetchone()
-        total_belanja = belanja[1] if belanja[1] else 0
-        
-        conn.close()
-        
-        # Hitung laba/rugi
-        laba_rugi = total_penjualan - total_belanja
-        
-        statistik_text = f"""
-📈 *STATISTIK BULAN INI* ({bulan_ini})
-
-🛒 *PENJUALAN:*
-• Jumlah transaksi: {penjualan[0]}
-• Total penjualan: {format_rupiah(total_penjualan)}
-
-🛍️ *BELANJA:*
-• Jumlah transaksi: {belanja[0]}
-• Total belanja: {format_rupiah(total_belanja)}
-
-💰 *LABA/RUGI:*
-• {format_rupiah(laba_rugi)} ({'✅ LABA' if laba_rugi >= 0 else '❌ RUGI'})
-"""
+        statistik_text = respons_tersimpan(
+            business_id, 'statistik', (bulan_ini, nama_usaha),
+            lambda: format_statistik(nama_usaha, bulan_ini, *ambil_statistik_bulan(business_id, bulan_ini))
+        )
         
         await query.edit_message_text(
             statistik_text, 
@@ -860,6 +2581,7 @@ async def tampilkan_statistik(query, user_id):
         await query.edit_message_text(f"❌ Error: {str(e)}")
 
 # ===== HANDLER MESSAGE =====
+@pantau
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk pesan teks"""
     user_id = update.effective_user.id
@@ -873,8 +2595,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = user_sessions[user_id]
     state = session['state']
     session_type = session.get('type', '')
-    
-    if state == 'input_nama_supplier':
+
+    if state == 'idle' and entri_cepat.adalah_entri_cepat(message_text):
+        await proses_entri_cepat(update, user_id, message_text)
+
+    elif state == 'input_nama_supplier':
         # Simpan nama supplier
         session['data']['nama_supplier'] = message_text
         session['state'] = 'pilih_barang_belanja'
@@ -1019,7 +2744,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 tanggal=session['data']['tanggal'],
                 daftar_barang=session['data']['daftar_barang'],
                 total_belanja=total_belanja,
-                keterangan=""
+                keterangan="",
+                kunci=kunci_sesi(session)
             )
             
             if success:
@@ -1064,13 +2790,18 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 retur_items=session['data']['retur_items'],
                 total_setelah_retur=total_setelah_retur,
                 bayar=nominal_bayar,
-                sisa=sisa
+                sisa=sisa,
+                kunci=kunci_sesi(session)
             )
             
             if success:
                 # Kirim nota
                 nota_text = format_nota_penjualan(session['data'])
                 await update.message.reply_text(nota_text, parse_mode='Markdown')
+                await kirim_peringatan_stok(
+                    update.message, get_keanggotaan(user_id)['business_id'],
+                    [item['nama'] for item in session['data']['daftar_barang']]
+                )
                 
                 # Reset session
                 session['state'] = 'idle'
@@ -1082,6 +2813,525 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except ValueError:
             await update.message.reply_text("❌ Masukkan angka yang valid!")
 
+async def sinkron_sesi(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Tulis sesi user ke backend bersama setelah update diproses"""
+    if update.effective_user:
+        user_sessions.sinkron(update.effective_user.id)
+
+# ===== IDEMPOTENSI UPDATE =====
+async def saring_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Lewati update yang sudah pernah diproses (dikirim ulang Telegram) sebelum handler lain jalan"""
+    if not jendela_update.tandai(update.update_id):
+        logger.info(f"♻️ Update {update.update_id} sudah diproses, dilewati")
+        raise ApplicationHandlerStop
+
+async def catat_update_selesai(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Catat update selesai diproses; offset ditulis ke database paling sering tiap beberapa detik"""
+    jendela_update.tandai_selesai(update.update_id)
+    if SIMPAN_OFFSET_UPDATE:
+        offset = jendela_update.perlu_disimpan()
+        if offset:
+            simpan_offset_update(offset)
+
+# ===== JOB TERJADWAL =====
+async def kirim_laporan_owner(bot, laporan):
+    """Kirim satu laporan harian ke semua owner usahanya; kembalikan jumlah pesan terkirim"""
+    teks = format_laporan_harian(laporan)
+    terkirim = 0
+    for owner_id in laporan['owner']:
+        try:
+            await bot.send_message(chat_id=owner_id, text=teks, parse_mode='Markdown')
+            terkirim += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Laporan harian ke {owner_id} gagal: {e}")
+        await asyncio.sleep(0.05)  # jaga di bawah batas kirim Telegram
+    return terkirim
+
+async def jalankan_tutup_buku(bot, tanggal):
+    """Tutup buku satu tanggal (tahap berat di thread) lalu kirim laporan ke owner"""
+    info = await asyncio.to_thread(
+        tutup_buku.tutup_harian, DB_FILE, tanggal, cpu_persen=JOB_CPU_PERSEN, repo=get_repositori()
+    )
+    if info is None:
+        return None
+    
+    terkirim = 0
+    for laporan in tutup_buku.laporan_tertunda(DB_FILE, tanggal, HARI_LAPORAN_MINGGUAN, get_repositori()):
+        terkirim += await kirim_laporan_owner(bot, laporan)
+        tutup_buku.tandai_terkirim(DB_FILE, tanggal, laporan['business_id'])
+    
+    tutup_buku.selesaikan(DB_FILE, tanggal)
+    info['laporan_terkirim'] = terkirim
+    return info
+
+async def kirim_pratinjau_harian(bot, tanggal):
+    """Laporan sementara hari ini; tidak menutup harinya, tutup buku final menyusul besok"""
+    terkirim = 0
+    daftar = await asyncio.to_thread(
+        tutup_buku.pratinjau_harian, DB_FILE, tanggal, HARI_LAPORAN_MINGGUAN,
+        cpu_persen=JOB_CPU_PERSEN, repo=get_repositori()
+    )
+    for laporan in daftar:
+        terkirim += await kirim_laporan_owner(bot, laporan)
+    return terkirim
+
+def tunda_saat_backfill(context, callback):
+    """Jadwalkan ulang job satu menit lagi selama backfill migrasi belum selesai; True jika ditunda"""
+    if not backfill_tertunda():
+        return False
+    context.job_queue.run_once(callback, when=60, name=f"{callback.__name__}_tertunda")
+    logger.info(f"⏳ {callback.__name__} menunggu backfill migrasi selesai")
+    return True
+
+async def job_tutup_harian(context: ContextTypes.DEFAULT_TYPE):
+    """Job harian: tutup buku final hari yang sudah lewat (kemarin + yang terlewat), lalu pratinjau hari ini"""
+    if tunda_saat_backfill(context, job_tutup_harian):
+        return
+    hari_ini = datetime.date.today()
+    try:
+        for tanggal in tutup_buku.tanggal_perlu_ditutup(DB_FILE, hari_ini):
+            await jalankan_tutup_buku(context.bot, tanggal)
+        await kirim_pratinjau_harian(context.bot, hari_ini.isoformat())
+    except Exception as e:
+        logger.error(f"❌ Error tutup buku harian: {e}")
+
+async def job_lanjutkan_tutup_buku(context: ContextTypes.DEFAULT_TYPE):
+    """Saat start: lanjutkan run tutup buku yang terhenti karena restart"""
+    if tunda_saat_backfill(context, job_lanjutkan_tutup_buku):
+        return
+    try:
+        for tanggal in tutup_buku.run_belum_selesai(DB_FILE):
+            await jalankan_tutup_buku(context.bot, tanggal)
+    except Exception as e:
+        logger.error(f"❌ Error melanjutkan tutup buku: {e}")
+
+def jadwalkan_job(application):
+    """Daftarkan job terjadwal; cukup di satu proses (bukan di setiap worker)"""
+    if application.job_queue is None:
+        logger.warning("⚠️ JobQueue tidak tersedia, install python-telegram-bot[job-queue] untuk tutup buku otomatis")
+        return False
+    
+    jam, menit = (int(x) for x in JAM_TUTUP_HARIAN.split(':'))
+    # Timestamp nota memakai waktu lokal server, jadwal mengikuti zona yang sama
+    zona = datetime.datetime.now().astimezone().tzinfo
+    application.job_queue.run_daily(
+        job_tutup_harian, time=datetime.time(jam, menit, tzinfo=zona), name=tutup_buku.NAMA_JOB
+    )
+    application.job_queue.run_once(job_lanjutkan_tutup_buku, when=30, name="lanjutkan_tutup_buku")
+    application.job_queue.run_repeating(job_bersihkan_idempotensi, interval=3600, first=300, name="bersihkan_idempotensi")
+    if DB_BACKEND == 'sqlite':
+        jam_arsip, menit_arsip = (int(x) for x in JAM_ARSIP.split(':'))
+        application.job_queue.run_daily(
+            job_arsip, time=datetime.time(jam_arsip, menit_arsip, tzinfo=zona), name="arsip_tahunan"
+        )
+        application.job_queue.run_repeating(job_snapshot_jurnal, interval=3600, first=600, name="snapshot_jurnal")
+    if BACKUP_INTERVAL_MENIT > 0:
+        application.job_queue.run_repeating(
+            job_backup, interval=BACKUP_INTERVAL_MENIT * 60, first=60, name="backup"
+        )
+        logger.info(f"💾 Backup otomatis setiap {BACKUP_INTERVAL_MENIT} menit ke {BACKUP_S3_BUCKET or BACKUP_DIR}")
+    logger.info(f"⏰ Tutup buku harian dijadwalkan pukul {JAM_TUTUP_HARIAN}")
+    return True
+
+def get_penyimpanan_backup():
+    """Penyimpanan snapshot sesuai konfigurasi BACKUP_*"""
+    global penyimpanan_backup
+    if penyimpanan_backup is None:
+        import backup
+        penyimpanan_backup = backup.buat_penyimpanan(BACKUP_DIR, BACKUP_S3_BUCKET, BACKUP_S3_ENDPOINT)
+    return penyimpanan_backup
+
+def backup_sekarang(label=""):
+    """Buat snapshot lalu terapkan retensi (blocking, jalankan di thread)"""
+    import backup
+    penyimpanan = get_penyimpanan_backup()
+    info = backup.buat_snapshot(DB_FILE, penyimpanan, label=label)
+    info['dihapus'] = backup.terapkan_retensi(
+        penyimpanan, simpan_jam=BACKUP_SIMPAN_JAM, simpan_hari=BACKUP_SIMPAN_HARI, simpan_minggu=BACKUP_SIMPAN_MINGGU
+    )
+    return info
+
+async def job_bersihkan_idempotensi(context: ContextTypes.DEFAULT_TYPE):
+    """Job berkala: buang kunci idempotensi nota di luar jendela dedupe"""
+    try:
+        jumlah = await asyncio.to_thread(bersihkan_idempotensi)
+        if jumlah:
+            logger.info(f"🧹 {jumlah} kunci idempotensi lama dihapus")
+    except Exception as e:
+        logger.error(f"❌ Error membersihkan kunci idempotensi: {str(e)}")
+
+def arsipkan_sekarang():
+    """Pindahkan nota lunas tahun tutup ke arsip tahunan (blocking, jalankan di thread)"""
+    sampai = arsip.tahun_tutup_terakhir(datetime.date.today(), ARSIP_SETELAH_BULAN)
+    arsip_dir = get_repositori().arsip_dir
+    dipindah = arsip.arsipkan(DB_FILE, arsip_dir, sampai, cpu_persen=JOB_CPU_PERSEN)
+    if any(info['penjualan'] for info in dipindah):
+        # Nota terakhir pelanggan bisa ikut pindah ke arsip
+        indeks_pelanggan.hapus()
+        panaskan_indeks_pelanggan()
+    unggah_arsip()
+    return dipindah
+
+def unggah_arsip():
+    """Unggah file arsip yang baru/berubah ke penyimpanan backup (blocking)
+
+    Nota yang dipindah sudah tidak ada di snapshot database utama, jadi file
+    arsip harus ikut disimpan di luar disk lokal. Gagal unggah hanya dicatat;
+    job arsip berikutnya mencoba lagi.
+    """
+    import backup
+    try:
+        return backup.unggah_arsip(DB_FILE, get_repositori().arsip_dir, get_penyimpanan_backup())
+    except Exception as e:
+        logger.error(f"❌ Error unggah arsip: {e}")
+        return []
+
+async def job_arsip(context: ContextTypes.DEFAULT_TYPE):
+    """Job harian: arsipkan tahun tutup (biasanya hanya bekerja sekali setahun + nota yang baru lunas)"""
+    if tunda_saat_backfill(context, job_arsip):
+        return
+    try:
+        await asyncio.to_thread(arsipkan_sekarang)
+    except Exception as e:
+        logger.error(f"❌ Error arsip tahunan: {e}")
+
+async def job_snapshot_jurnal(context: ContextTypes.DEFAULT_TYPE):
+    """Job berkala: snapshot jurnal nota setelah JURNAL_SNAPSHOT_EVENT event baru"""
+    try:
+        await asyncio.to_thread(snapshot_jurnal, JURNAL_SNAPSHOT_EVENT)
+    except Exception as e:
+        logger.error(f"❌ Error snapshot jurnal: {e}")
+
+async def job_backup(context: ContextTypes.DEFAULT_TYPE):
+    """Job berkala: snapshot database"""
+    try:
+        await asyncio.to_thread(backup_sekarang)
+    except Exception as e:
+        logger.error(f"❌ Error backup: {e}")
+
+def parse_waktu_restore(teks):
+    """Waktu tujuan restore: 'YYYY-MM-DD HH:MM', 'DD/MM/YYYY HH:MM', atau tanggal saja (akhir hari)"""
+    for fmt in ("%Y-%m-%d %H:%M", "%d/%m/%Y %H:%M", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.datetime.strptime(teks, fmt)
+        except ValueError:
+            pass
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(teks, fmt).replace(hour=23, minute=59, second=59)
+        except ValueError:
+            pass
+    return None
+
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /backup (khusus admin): snapshot sekarang + daftar snapshot"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Command ini khusus admin")
+        return
+    
+    try:
+        info = await asyncio.to_thread(backup_sekarang, "manual")
+    except Exception as e:
+        logger.error(f"❌ Error backup manual: {e}")
+        await update.message.reply_text(f"❌ Backup gagal: {e}")
+        return
+    
+    import backup
+    daftar = get_penyimpanan_backup().daftar()
+    backup_text = f"💾 Snapshot dibuat: `{info['nama']}`\n"
+    backup_text += f"Ukuran: {info['ukuran_db'] / 1024 / 1024:.1f} MB → {info['ukuran'] / 1024 / 1024:.1f} MB (gzip)\n"
+    backup_text += f"Durasi: {info['durasi_total']} detik\n\n"
+    backup_text += f"*Snapshot tersimpan ({len(daftar)}):*\n"
+    for nama in daftar[-5:]:
+        backup_text += f"• {backup.waktu_snapshot(nama):%d/%m/%Y %H:%M:%S}\n"
+    backup_text += "\nPulihkan: /restore YYYY-MM-DD HH:MM"
+    await update.message.reply_text(backup_text, parse_mode='Markdown')
+
+async def restore_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /restore <waktu> (khusus admin): pilih snapshot lalu minta konfirmasi"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Command ini khusus admin")
+        return
+    
+    waktu = parse_waktu_restore(" ".join(context.args))
+    if waktu is None:
+        await update.message.reply_text("❌ Format: /restore YYYY-MM-DD HH:MM (atau tanggal saja)")
+        return
+    
+    import backup
+    nama = await asyncio.to_thread(backup.cari_snapshot, get_penyimpanan_backup(), waktu)
+    if nama is None:
+        await update.message.reply_text(f"❌ Tidak ada snapshot sebelum {waktu:%d/%m/%Y %H:%M}")
+        return
+    
+    keyboard = [[
+        InlineKeyboardButton("✅ Pulihkan", callback_data=f"restore_{nama}"),
+        InlineKeyboardButton("❌ Batal", callback_data="cancel")
+    ]]
+    await update.message.reply_text(
+        f"♻️ Snapshot terdekat: *{backup.waktu_snapshot(nama):%d/%m/%Y %H:%M:%S}*\n\n"
+        "Semua transaksi setelah waktu tersebut akan hilang dari database aktif "
+        "(kondisi sekarang disimpan dulu sebagai snapshot pra-restore). "
+        "File arsip tahunan yang hilang dari disk ikut diunduh dari backup.",
+        parse_mode='Markdown',
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def tutup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /tutup [YYYY-MM-DD] (khusus admin): tutup buku hari yang sudah lewat (default kemarin)"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Command ini khusus admin")
+        return
+    
+    hari_ini = datetime.date.today()
+    tanggal = context.args[0] if context.args else (hari_ini - datetime.timedelta(days=1)).isoformat()
+    try:
+        tanggal_obj = datetime.date.fromisoformat(tanggal)
+    except ValueError:
+        await update.message.reply_text("❌ Format: /tutup [YYYY-MM-DD]")
+        return
+    tertunda = backfill_tertunda()
+    if tertunda:
+        await update.message.reply_text(pesan_backfill(tertunda))
+        return
+    if tanggal_obj >= hari_ini:
+        # Run yang selesai tidak diulang, jadi nota setelahnya tidak akan masuk ringkasan
+        await update.message.reply_text(
+            "❌ Hanya hari yang sudah lewat yang bisa ditutup. "
+            f"Laporan sementara hari ini dikirim otomatis pukul {JAM_TUTUP_HARIAN}."
+        )
+        return
+    
+    await update.message.reply_text(f"📒 Menjalankan tutup buku {tanggal}...")
+    info = await jalankan_tutup_buku(context.bot, tanggal)
+    if info is None:
+        await update.message.reply_text(f"ℹ️ Tutup buku {tanggal} sudah selesai atau sedang berjalan")
+        return
+    await update.message.reply_text(
+        f"✅ Tutup buku {tanggal} selesai\n"
+        f"Usaha diringkas: {info['usaha']}\n"
+        f"Optimasi: {', '.join(info['optimasi']) or '-'}\n"
+        f"Laporan terkirim: {info['laporan_terkirim']}\n"
+        f"Durasi: {info['durasi_detik']} detik"
+    )
+
+async def arsip_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /arsip (khusus admin): arsipkan tahun tutup sekarang + daftar file arsip"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Command ini khusus admin")
+        return
+    
+    if DB_BACKEND != 'sqlite':
+        await update.message.reply_text("ℹ️ Arsip tahunan hanya tersedia untuk DB_BACKEND=sqlite")
+        return
+    tertunda = backfill_tertunda()
+    if tertunda:
+        await update.message.reply_text(pesan_backfill(tertunda))
+        return
+    
+    await update.message.reply_text("🗄️ Memindahkan nota lunas tahun tutup ke arsip...")
+    try:
+        dipindah = await asyncio.to_thread(arsipkan_sekarang)
+        daftar = await asyncio.to_thread(arsip.status_arsip, DB_FILE, get_repositori().arsip_dir)
+    except Exception as e:
+        logger.error(f"❌ Error arsip manual: {e}")
+        await update.message.reply_text(f"❌ Arsip gagal: {e}")
+        return
+    
+    await update.message.reply_text(
+        format_status_arsip(dipindah, daftar, os.path.getsize(DB_FILE)), parse_mode='Markdown'
+    )
+
+async def bayar_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /bayar <nomor nota> [nominal]: catat pembayaran piutang (tanpa nominal = lunas)"""
+    user_id = update.effective_user.id
+    keanggotaan = get_keanggotaan(user_id)
+    if keanggotaan['role'] not in ROLE_PENCATAT:
+        await update.message.reply_text("❌ Role viewer tidak bisa mencatat pembayaran")
+        return
+    tertunda = backfill_tertunda(BACKFILL_USAHA)
+    if tertunda:
+        await update.message.reply_text(pesan_backfill(tertunda))
+        return
+    
+    try:
+        nomor = context.args[0].upper()
+        teks_nominal = " ".join(context.args[1:])
+        nominal = None if teks_nominal.lower() in ('', 'lunas', 'pas') else entri_cepat.parse_nominal(teks_nominal)
+    except (IndexError, ValueError):
+        nomor, nominal = None, None
+    if nomor is None or (nominal is not None and nominal <= 0):
+        await update.message.reply_text(
+            "💵 Format: /bayar <nomor nota> [nominal|lunas]\n\n"
+            "Contoh: /bayar PNJ-19-10-26-001 50rb"
+        )
+        return
+    
+    judul = f"💵 Pembayaran {nomor} dicatat"
+    try:
+        # update_id sebagai kunci: /bayar yang dikirim ulang Telegram tidak dicatat dua kali
+        nota = bayar_nota(keanggotaan['business_id'], user_id, nomor, nominal, kunci=f"update:{update.update_id}")
+    except KoreksiDitolak as e:
+        await update.message.reply_text(str(e))
+        return
+    except repositori.NotaBerubah:
+        await update.message.reply_text("⚠️ Nota baru saja dikoreksi user lain, cek /riwayat lalu ulangi")
+        return
+    except repositori.NotaSudahTersimpan:
+        # Balas dengan keadaan nota sekarang
+        try:
+            _, nota = ambil_nota_koreksi(keanggotaan['business_id'], nomor)
+        except KoreksiDitolak:
+            await update.message.reply_text(f"ℹ️ Pembayaran {nomor} sudah dicatat sebelumnya")
+            return
+        judul = f"ℹ️ Pembayaran {nomor} sudah dicatat sebelumnya"
+    
+    teks = f"{judul}\n\n"
+    teks += f"Total: {format_rupiah(nota['total_setelah_retur'])}\n"
+    teks += f"Sudah dibayar: {format_rupiah(nota['bayar'])}\n"
+    teks += "✅ LUNAS" if nota['sisa'] >= 0 else f"⏳ Kurang {format_rupiah(-nota['sisa'])}"
+    await update.message.reply_text(teks)
+
+async def ubah_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /ubah <nomor nota> <entri cepat> (khusus owner): ganti isi nota"""
+    user_id = update.effective_user.id
+    keanggotaan = get_keanggotaan(user_id)
+    if keanggotaan['role'] != ROLE_OWNER:
+        await update.message.reply_text("❌ Hanya owner yang bisa mengubah nota")
+        return
+    # Koreksi nota lama mengurangi item bulanan yang belum di-backfill
+    tertunda = backfill_tertunda(BACKFILL_USAHA, BACKFILL_ANALISA)
+    if tertunda:
+        await update.message.reply_text(pesan_backfill(tertunda))
+        return
+    
+    bagian = update.message.text.split(None, 2)
+    if len(bagian) < 3 or not entri_cepat.adalah_entri_cepat(bagian[2]):
+        await update.message.reply_text(
+            "✏️ Format: /ubah <nomor nota> <entri cepat>\n\n"
+            "Contoh: /ubah PNJ-19-10-26-001 jual ujang: renceng 150, kiloan 3@45000\n"
+            "Bayar yang tidak ditulis tetap seperti nota lama."
+        )
+        return
+    nomor, teks = bagian[1].upper(), bagian[2]
+    
+    try:
+        entri = entri_cepat.urai(teks, DAFTAR_PELANGGAN, KATALOG_BARANG, get_harga_otomatis)
+        jenis, nota = ubah_nota(
+            keanggotaan['business_id'], user_id, nomor, entri,
+            bayar_ditulis=re.search(r'\bbayar\b', teks, re.IGNORECASE) is not None,
+            kunci=f"update:{update.update_id}"
+        )
+        judul = "✏️ *Nota diubah*"
+    except entri_cepat.EntriTidakValid as e:
+        await update.message.reply_text("❌ Nota belum diubah:\n" + "\n".join(f"• {k}" for k in e.kesalahan))
+        return
+    except KoreksiDitolak as e:
+        await update.message.reply_text(str(e))
+        return
+    except repositori.NotaBerubah:
+        await update.message.reply_text("⚠️ Nota baru saja dikoreksi user lain, cek /riwayat lalu ulangi")
+        return
+    except repositori.NotaSudahTersimpan:
+        try:
+            jenis, nota = ambil_nota_koreksi(keanggotaan['business_id'], nomor)
+        except KoreksiDitolak:
+            await update.message.reply_text(f"ℹ️ Perubahan nota {nomor} sudah disimpan sebelumnya")
+            return
+        judul = "ℹ️ *Perubahan ini sudah disimpan sebelumnya*"
+    
+    nota_text = format_nota_penjualan(nota) if jenis == 'penjualan' else format_nota_belanja(nota)
+    await update.message.reply_text(f"{judul}\n\n" + nota_text, parse_mode='Markdown')
+
+async def batal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /batal <nomor nota> [alasan] (khusus owner)"""
+    user_id = update.effective_user.id
+    keanggotaan = get_keanggotaan(user_id)
+    if keanggotaan['role'] != ROLE_OWNER:
+        await update.message.reply_text("❌ Hanya owner yang bisa membatalkan nota")
+        return
+    tertunda = backfill_tertunda(BACKFILL_USAHA, BACKFILL_ANALISA)
+    if tertunda:
+        await update.message.reply_text(pesan_backfill(tertunda))
+        return
+    
+    if not context.args:
+        await update.message.reply_text("🚫 Format: /batal <nomor nota> [alasan]\n\nContoh: /batal PNJ-19-10-26-001 salah pelanggan")
+        return
+    nomor, alasan = context.args[0].upper(), " ".join(context.args[1:])
+    
+    try:
+        jenis, nota = batalkan_nota(keanggotaan['business_id'], user_id, nomor, alasan, kunci=f"update:{update.update_id}")
+    except KoreksiDitolak as e:
+        await update.message.reply_text(str(e))
+        return
+    except repositori.NotaBerubah:
+        await update.message.reply_text("⚠️ Nota baru saja dikoreksi user lain, cek /riwayat lalu ulangi")
+        return
+    except repositori.NotaSudahTersimpan:
+        await update.message.reply_text(f"ℹ️ Nota {nomor} sudah dibatalkan sebelumnya. Riwayat: /riwayat {nomor}")
+        return
+    
+    total = nota['total_setelah_retur'] if jenis == 'penjualan' else nota['total_belanja']
+    await update.message.reply_text(
+        f"🚫 Nota {nomor} ({format_rupiah(total)}) dibatalkan\n"
+        "Stok dan ringkasan item sudah dikembalikan. Riwayat: /riwayat " + nomor
+    )
+
+async def riwayat_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /riwayat <nomor nota>: daftar koreksi nota dari jurnal"""
+    if not context.args:
+        await update.message.reply_text("📜 Format: /riwayat <nomor nota>")
+        return
+    
+    nomor = context.args[0].upper()
+    keanggotaan = get_keanggotaan(update.effective_user.id)
+    riwayat = get_repositori().riwayat_nota(keanggotaan['business_id'], nomor)
+    await update.message.reply_text(format_riwayat_nota(nomor, riwayat), parse_mode='Markdown')
+
+async def jurnal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk command /jurnal [snapshot|perbaiki] (khusus admin): periksa data nota terhadap jurnal"""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Command ini khusus admin")
+        return
+    
+    if DB_BACKEND != 'sqlite':
+        await update.message.reply_text("ℹ️ Snapshot dan pemeriksaan jurnal hanya tersedia untuk DB_BACKEND=sqlite")
+        return
+    
+    perintah = context.args[0].lower() if context.args else ""
+    await update.message.reply_text("📒 Memeriksa jurnal nota...")
+    try:
+        if perintah == 'snapshot':
+            await asyncio.to_thread(snapshot_jurnal, 1)
+        laporan = await asyncio.to_thread(cek_jurnal, perintah == 'perbaiki')
+        status = await asyncio.to_thread(jurnal.status, DB_FILE)
+    except Exception as e:
+        logger.error(f"❌ Error cek jurnal: {e}")
+        await update.message.reply_text(f"❌ Cek jurnal gagal: {e}")
+        return
+    
+    await update.message.reply_text(format_jurnal(status, laporan), parse_mode='Markdown')
+
+# ===== INLINE QUERY =====
+@pantau
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler inline query (@bot ujang): piutang, nota terakhir, dan harga pelanggan dari indeks memori"""
+    query = update.inline_query
+    business_id = get_keanggotaan(query.from_user.id)['business_id']
+    if indeks_perlu_dimuat(business_id):
+        await asyncio.to_thread(muat_indeks_pelanggan, business_id)
+    
+    hasil = [
+        InlineQueryResultArticle(
+            id=str(i), title=f"👤 {entri['nama']}", description=deskripsi_pelanggan(entri),
+            input_message_content=InputTextMessageContent(format_kartu_pelanggan(entri), parse_mode='Markdown'),
+        )
+        for i, entri in enumerate(cari_pelanggan_inline(business_id, query.query))
+    ]
+    # Hasil tiap usaha berbeda: cache Telegram per user, dan singkat agar pembayaran baru cepat terlihat
+    await query.answer(hasil, cache_time=INLINE_CACHE_DETIK, is_personal=True)
+
 # ===== ERROR HANDLER =====
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk error"""
@@ -1097,26 +3347,102 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         pass
 
 # ===== MAIN FUNCTION =====
-def main():
-    """Main function untuk menjalankan bot"""
-    logger.info("🚀 Starting Telegram Bot...")
-    
-    # Inisialisasi database
-    if not init_database():
-        logger.error("❌ Gagal menginisialisasi database")
-        return
+def buat_aplikasi(builder=None):
+    """Buat Application lengkap dengan semua handler
+
+    `builder` bisa diisi ApplicationBuilder kustom (mis. dengan request palsu
+    untuk benchmark); default memakai BOT_TOKEN.
+    """
+    if builder is None:
+        builder = Application.builder().token(BOT_TOKEN)
+    application = builder.build()
     
-    # Buat application
-    application = Application.builder().token(BOT_TOKEN).build()
+    # Update yang dikirim ulang Telegram berhenti di sini sebelum handler mana pun (group -1)
+    application.add_handler(TypeHandler(Update, saring_update), group=-1)
     
     # Add handlers
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("usaha", usaha_command))
+    application.add_handler(CommandHandler("undang", undang_command))
+    application.add_handler(CommandHandler("gabung", gabung_command))
+    application.add_handler(CommandHandler("cari", cari_command))
+    application.add_handler(CommandHandler("stok", stok_command))
+    application.add_handler(CommandHandler("produksi", produksi_command))
+    application.add_handler(CommandHandler("resep", resep_command))
+    application.add_handler(CommandHandler("laba", laba_command))
+    application.add_handler(CommandHandler("tutup", tutup_command))
+    application.add_handler(CommandHandler("arsip", arsip_command))
+    application.add_handler(CommandHandler("bayar", bayar_command))
+    application.add_handler(CommandHandler("ubah", ubah_command))
+    application.add_handler(CommandHandler("batal", batal_command))
+    application.add_handler(CommandHandler("riwayat", riwayat_command))
+    application.add_handler(CommandHandler("jurnal", jurnal_command))
+    application.add_handler(CommandHandler("backup", backup_command))
+    application.add_handler(CommandHandler("restore", restore_command))
+    application.add_handler(CommandHandler("import", impor_command))
     application.add_handler(CallbackQueryHandler(handle_callback))
+    application.add_handler(InlineQueryHandler(inline_query))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_dokumen))
+    
+    # Sesi dengan backend bersama disinkronkan setelah semua handler (group 1)
+    if hasattr(user_sessions, 'sinkron'):
+        application.add_handler(TypeHandler(Update, sinkron_sesi), group=1)
+    application.add_handler(TypeHandler(Update, catat_update_selesai), group=2)
     
     # Add error handler
     application.add_error_handler(error_handler)
     
+    return application
+
+def main(builder=None):
+    """Main function untuk menjalankan bot
+
+    `builder` diteruskan ke buat_aplikasi (dipakai benchmark startup).
+    """
+    global user_sessions
+    logger.info("🚀 Starting Telegram Bot...")
+    
+    # Inisialisasi database
+    if not init_database():
+        logger.error("❌ Gagal menginisialisasi database")
+        return
+    
+    # Konfigurasi sesi dicek di sini agar salah konfigurasi gagal sebelum worker dijalankan
+    try:
+        user_sessions = buat_sesi()
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        return
+    
+    if BOT_WORKERS > 1:
+        if not WEBHOOK_URL:
+            logger.error("❌ BOT_WORKERS > 1 membutuhkan WEBHOOK_URL")
+            return
+        import scaleout
+        scaleout.jalankan(BOT_TOKEN, BOT_WORKERS, WEBHOOK_URL, PORT,
+                          secret_token=WEBHOOK_SECRET, db_file=DB_FILE)
+        return
+    
+    # Update sampai offset tersimpan sudah diproses sebelum restart: jika dikirim ulang, dilewati
+    try:
+        jendela_update.offset = muat_offset_update()
+        logger.info(f"♻️ Offset update terakhir: {jendela_update.offset}, "
+                    f"{bersihkan_idempotensi()} kunci idempotensi lama dihapus")
+    except Exception as e:
+        logger.error(f"❌ Error memuat offset update: {str(e)}")
+    
+    if BOT_PROFILE:
+        PROFILER.mulai()
+        logger.info("🔬 Profiler aktif (BOT_PROFILE=1)")
+    
+    # Buat application
+    application = buat_aplikasi(builder)
+    jadwalkan_job(application)
+    panaskan_indeks_latar()
+    lanjutkan_backfill_latar()
+    
     # Jalankan bot
     logger.info("🤖 Bot sedang berjalan...")
     
@@ -1126,6 +3452,10 @@ def main():
         logger.info("🛑 Bot dihentikan")
     except Exception as e:
         logger.error(f"❌ Error: {e}")
+    finally:
+        offset = jendela_update.perlu_disimpan(paksa=True)
+        if offset:
+            simpan_offset_update(offset)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache respons tampilan (STATISTIK, HISTORI) untuk bot nota.
+
+Entri berupa teks yang sudah diformat, dengan kunci
+(business_id, tampilan, parameter), mis. (7, 'statistik', ('10/2026', 'Toko A')).
+Tampilan yang dibuka ulang dijawab dari memori tanpa query SQL dan tanpa
+memformat ulang teks.
+
+Invalidasi write-through: kode yang menyimpan nota memanggil `hapus()` untuk
+kunci yang terpengaruh (mis. histori pelanggan itu dan statistik bulan nota),
+entri lain tetap berlaku. Ukuran dibatasi dengan eviksi LRU.
+
+Jika beberapa proses menulis ke database yang sama (mode banyak worker),
+entri bisa disimpan bersama `versi` (versi_data usaha); entri dengan versi
+berbeda dianggap basi saat diambil.
+"""
+
+from collections import OrderedDict, defaultdict
+
+# Penanda "semua parameter" untuk hapus()
+SEMUA = object()
+
+
+class CacheRespons:
+    """LRU respons per usaha dengan hitungan hit/miss untuk metrik"""
+
+    def __init__(self, maks_entri=2000):
+        self.maks_entri = maks_entri
+        self._data = OrderedDict()
+        # business_id -> kunci miliknya, agar invalidasi tidak memindai seluruh cache
+        self._per_usaha = defaultdict(set)
+        self.hit = 0
+        self.miss = 0
+        self.eviksi = 0
+        self.invalidasi = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def ambil(self, kunci, versi=None):
+        """Nilai tersimpan untuk `kunci`, atau None (miss / versi berbeda)"""
+        entri = self._data.get(kunci)
+        if entri is None or entri[0] != versi:
+            if entri is not None:
+                self._buang(kunci)
+            self.miss += 1
+            return None
+        self._data.move_to_end(kunci)
+        self.hit += 1
+        return entri[1]
+
+    def simpan(self, kunci, nilai, versi=None):
+        if self.maks_entri <= 0:
+            return
+        self._data[kunci] = (versi, nilai)
+        self._data.move_to_end(kunci)
+        self._per_usaha[kunci[0]].add(kunci)
+        while len(self._data) > self.maks_entri:
+            lama = next(iter(self._data))
+            self._buang(lama)
+            self.eviksi += 1
+
+    def hapus(self, business_id, tampilan=SEMUA, parameter=SEMUA):
+        """Buang entri usaha yang cocok dengan tampilan/parameter; kembalikan jumlahnya
+
+        `parameter` boleh berupa fungsi (predikat) untuk mencocokkan sebagian,
+        mis. semua statistik bulan tertentu apa pun nama usahanya.
+        """
+        cocok = [
+            k for k in self._per_usaha.get(business_id, ())
+            if (tampilan is SEMUA or k[1] == tampilan)
+            and (parameter is SEMUA or (parameter(k[2]) if callable(parameter) else k[2] == parameter))
+        ]
+        for k in cocok:
+            self._buang(k)
+        self.invalidasi += len(cocok)
+        return len(cocok)
+
+    def kosongkan(self):
+        self.invalidasi += len(self._data)
+        self._data.clear()
+        self._per_usaha.clear()
+
+    def _buang(self, kunci):
+        del self._data[kunci]
+        milik = self._per_usaha[kunci[0]]
+        milik.discard(kunci)
+        if not milik:
+            del self._per_usaha[kunci[0]]
+
+    def statistik(self):
+        """Ringkasan metrik cache (hit rate dalam persen)"""
+        total = self.hit + self.miss
+        return {
+            'entri': len(self._data),
+            'maks_entri': self.maks_entri,
+            'hit': self.hit,
+            'miss': self.miss,
+            'hit_rate': round(100 * self.hit / total, 1) if total else 0.0,
+            'eviksi': self.eviksi,
+            'invalidasi': self.invalidasi,
+        }
+
+    def format_statistik(self):
+        s = self.statistik()
+        return (f"{s['hit_rate']}% hit ({s['hit']}/{s['hit'] + s['miss']}), "
+                f"{s['entri']}/{s['maks_entri']} entri, {s['eviksi']} eviksi, {s['invalidasi']} invalidasi")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Entri cepat: satu pesan teks menjadi satu nota utuh.
+
+Format (bagian dipisah koma, titik koma, atau baris baru):
+
+    jual <pelanggan>: <barang> <qty>[@harga], ..., retur <barang> <qty>[@harga], bayar <nominal|pas|utang>
+    beli <supplier>: <barang> <qty>@<harga>, ..., total <nominal>, ket <teks>
+
+Contoh:
+    jual ujang: renceng 200, kiloan 3@45000, retur renceng 10, bayar 250rb
+    beli pasar ciamis: kacang 50@28.000, minyak 10@17500, ket dibayar minggu depan
+
+Aturan:
+    - nama pelanggan dan barang cukup sebagian (huruf besar/kecil bebas)
+      asal hanya cocok ke satu pilihan di katalog; supplier bebas
+    - qty bilangan bulat > 0, boleh ditulis sebelum nama barang (200 renceng)
+    - harga tanpa @ diisi `harga_otomatis(pelanggan, barang)` (mis. harga
+      renceng per pelanggan); barang tanpa harga otomatis wajib pakai @
+    - nominal: 45000, 45.000, Rp45.000, 45rb, 45k, 1,5jt; tanpa rb/jt
+      titik/koma hanya pemisah ribuan (2@1.5 ditolak, bukan Rp15)
+    - qty paling banyak MAKS_QTY, nominal paling besar MAKS_NOMINAL
+    - bayar tidak ditulis / "pas" / "lunas" = dibayar pas; "utang" = 0
+    - total (belanja) opsional, default jumlah subtotal; ket harus bagian
+      terakhir dan boleh berisi koma
+
+Modul ini hanya mengurai teks dan mencocokkan katalog. Semua kesalahan
+dikumpulkan sekaligus agar kasir bisa memperbaiki pesan dalam sekali kirim;
+penyimpanan dan balasan ada di bot_nota.py.
+"""
+
+import re
+import functools
+
+POLA_KEPALA = re.compile(r'\s*(jual|beli)\s+([^:\n]+?)\s*:\s*(.*)', re.IGNORECASE | re.DOTALL)
+# Koma di antara dua angka tanpa spasi adalah bagian nominal (45,000 / 1,5jt), bukan pemisah
+POLA_PEMISAH = re.compile(r'\s*(?:[;\n]|(?<!\d),|,(?!\d))\s*')
+POLA_KETERANGAN = re.compile(r'(?:^|[,;\n])\s*(?:ket|keterangan)\b\s*:?\s*(.*)$', re.IGNORECASE | re.DOTALL)
+POLA_ITEM = re.compile(r'(?P<nama>.*?\D)\s*[x×]?\s*(?P<qty>\d+)\s*(?:@\s*(?P<harga>.+))?')
+POLA_ITEM_QTY_DULU = re.compile(r'(?P<qty>\d+)\s*[x×]?\s+(?P<nama>[^@]*?\D)\s*(?:@\s*(?P<harga>.+))?')
+# Desimal hanya bersama satuan (1,5jt); tanpa satuan titik/koma harus pemisah ribuan (45.000)
+POLA_NOMINAL = re.compile(
+    r'(?:rp\.?\s*)?(?:(\d+(?:[.,]\d+)*)\s*(rb|ribu|k|jt|juta)|(\d{1,3}(?:[.,]\d{3})+|\d+))', re.IGNORECASE
+)
+
+KALI_SATUAN = {'rb': 1000, 'ribu': 1000, 'k': 1000, 'jt': 1000000, 'juta': 1000000}
+KATA_BAYAR_PAS = {'pas', 'lunas', 'cash', 'tunai'}
+KATA_BAYAR_UTANG = {'utang', 'hutang', 'kasbon', 'tempo'}
+JENIS = {'jual': 'penjualan', 'beli': 'belanja'}
+# Batas wajar satu nota; angka di atasnya hampir pasti salah ketik (dan subtotal tetap muat di INTEGER)
+MAKS_QTY = 100000
+MAKS_NOMINAL = 10 ** 10
+
+
+class EntriTidakValid(ValueError):
+    """Pesan entri cepat tidak bisa dijadikan nota; `kesalahan` berisi semua alasannya"""
+
+    def __init__(self, kesalahan):
+        super().__init__("; ".join(kesalahan))
+        self.kesalahan = kesalahan
+
+
+def adalah_entri_cepat(teks):
+    """Cek murah apakah pesan berbentuk 'jual/beli <nama>: ...'"""
+    return bool(teks) and POLA_KEPALA.fullmatch(teks) is not None
+
+def parse_nominal(teks):
+    """Nominal rupiah dari teks (45.000 / 45rb / 1,5jt); ValueError jika bukan nominal atau di atas MAKS_NOMINAL"""
+    m = POLA_NOMINAL.fullmatch(teks.strip().replace(' ', ''))
+    if not m:
+        raise ValueError(teks)
+    angka, satuan, bulat = m.groups()
+    if satuan:
+        nominal = int(round(float(angka.replace('.', '', angka.count('.') - 1).replace(',', '.')) *
+                            KALI_SATUAN[satuan.lower()]))
+    else:
+        nominal = int(bulat.replace('.', '').replace(',', ''))
+    if nominal > MAKS_NOMINAL:
+        raise ValueError(teks)
+    return nominal
+
+@functools.lru_cache(maxsize=64)
+def _indeks(pilihan):
+    return [(p.lower(), p) for p in pilihan]
+
+def cocokkan(teks, pilihan):
+    """Nama di `pilihan` yang cocok dengan teks: persis, atau satu-satunya yang memuat teks
+
+    Kembalikan (nama, None) atau (None, daftar_kandidat) jika tidak ada / ambigu.
+    """
+    teks = " ".join(teks.lower().split())
+    indeks = _indeks(tuple(pilihan))
+    for kecil, nama in indeks:
+        if kecil == teks:
+            return nama, None
+    cocok = [nama for kecil, nama in indeks if teks and teks in kecil]
+    return (cocok[0], None) if len(cocok) == 1 else (None, cocok)
+
+def _pesan_tidak_cocok(jenis, teks, kandidat, pilihan):
+    if kandidat:
+        return f"{jenis} '{teks}' ambigu: {', '.join(kandidat)}"
+    return f"{jenis} '{teks}' tidak dikenal (pilihan: {', '.join(pilihan)})"
+
+def _urai_item(bagian, katalog, pelanggan, harga_otomatis, kesalahan):
+    """(nama, qty, harga) dari '<barang> <qty>[@harga]', atau None (kesalahan dicatat)"""
+    m = POLA_ITEM.fullmatch(bagian) or POLA_ITEM_QTY_DULU.fullmatch(bagian)
+    if not m:
+        kesalahan.append(f"'{bagian}' bukan format '<barang> <qty>[@harga]'")
+        return None
+    nama, kandidat = cocokkan(m.group('nama'), katalog)
+    if nama is None:
+        kesalahan.append(_pesan_tidak_cocok("barang", m.group('nama').strip(), kandidat, katalog))
+        return None
+    qty = int(m.group('qty'))
+    if qty <= 0:
+        kesalahan.append(f"qty {nama} harus lebih dari 0")
+        return None
+    if qty > MAKS_QTY:
+        kesalahan.append(f"qty {nama} terlalu besar (maks {MAKS_QTY})")
+        return None
+    if m.group('harga'):
+        try:
+            harga = parse_nominal(m.group('harga'))
+        except ValueError:
+            kesalahan.append(f"harga '{m.group('harga').strip()}' untuk {nama} bukan nominal yang valid")
+            return None
+    else:
+        harga = harga_otomatis(pelanggan, nama) if harga_otomatis else None
+        if harga is None:
+            kesalahan.append(f"harga {nama} wajib diisi, mis. '{bagian} @45000'")
+            return None
+    return {'nama': nama, 'harga': harga, 'qty': qty, 'subtotal': harga * qty}
+
+def urai(teks, daftar_pelanggan, katalog, harga_otomatis=None):
+    """Urai pesan entri cepat menjadi dict nota; EntriTidakValid jika ada kesalahan
+
+    `katalog` berisi daftar barang per jenis ('penjualan', 'belanja'). Hasil:
+    {'jenis', 'pihak', 'daftar_barang', 'retur_items', 'bayar' (None = pas),
+    'total' (None = jumlah subtotal), 'keterangan'}; item berbentuk
+    {'nama', 'harga', 'qty', 'subtotal'} seperti nota dari menu.
+    """
+    m = POLA_KEPALA.fullmatch(teks or '')
+    if not m:
+        raise EntriTidakValid(["format: 'jual <pelanggan>: <barang> <qty>, ...' atau 'beli <supplier>: ...'"])
+    jenis = JENIS[m.group(1).lower()]
+    isi = m.group(3)
+    kesalahan = []
+
+    if jenis == 'penjualan':
+        pihak, kandidat = cocokkan(m.group(2), daftar_pelanggan)
+        if pihak is None:
+            kesalahan.append(_pesan_tidak_cocok("pelanggan", m.group(2), kandidat, daftar_pelanggan))
+    else:
+        pihak = " ".join(m.group(2).split())
+
+    keterangan = ""
+    ket = POLA_KETERANGAN.search(isi)
+    if ket:
+        keterangan = ket.group(1).strip()
+        isi = isi[:ket.start()]
+
+    hasil = {
+        'jenis': jenis, 'pihak': pihak, 'daftar_barang': [], 'retur_items': [],
+        'bayar': None, 'total': None, 'keterangan': keterangan,
+    }
+    for bagian in POLA_PEMISAH.split(isi.strip()):
+        if not bagian:
+            continue
+        kata, _, sisa = bagian.partition(' ')
+        kata = kata.lower()
+        if kata == 'bayar' and jenis == 'penjualan':
+            sisa = sisa.strip().lower()
+            if sisa in KATA_BAYAR_PAS or not sisa:
+                hasil['bayar'] = None
+            elif sisa in KATA_BAYAR_UTANG:
+                hasil['bayar'] = 0
+            else:
+                try:
+                    hasil['bayar'] = parse_nominal(sisa)
+                except ValueError:
+                    kesalahan.append(f"bayar '{sisa}' bukan nominal yang valid")
+        elif kata == 'total' and jenis == 'belanja':
+            try:
+                hasil['total'] = parse_nominal(sisa)
+            except ValueError:
+                kesalahan.append(f"total '{sisa.strip()}' bukan nominal yang valid")
+        elif kata == 'retur' and jenis == 'penjualan':
+            item = _urai_item(sisa.strip(), katalog[jenis], pihak, harga_otomatis, kesalahan)
+            if item:
+                hasil['retur_items'].append(item)
+        else:
+            item = _urai_item(bagian, katalog[jenis], pihak, harga_otomatis if jenis == 'penjualan' else None,
+                              kesalahan)
+            if item:
+                hasil['daftar_barang'].append(item)
+
+    if not hasil['daftar_barang'] and not kesalahan:
+        kesalahan.append("minimal harus ada 1 barang")
+    if kesalahan:
+        raise EntriTidakValid(kesalahan)
+    return hasil
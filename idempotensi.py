@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pemrosesan update yang dikirim ulang untuk bot nota.
+
+Telegram bisa mengirim ulang update yang sama: setelah bot restart sebelum
+offset getUpdates terkonfirmasi, atau webhook yang dikirim ulang karena
+timeout. User juga bisa menekan tombol bayar lagi jika balasan belum
+sampai. Perlindungannya berlapis:
+
+1. Kunci idempotensi (repositori.py): token sesi atau update_id disimpan
+   di tabel nota_idempotensi dalam transaksi yang sama dengan
+   perubahannya. Pemakaian ulang kunci tidak mengubah apa pun
+   (NotaSudahTersimpan membawa nomor nota / produksi lama). Kunci lebih
+   tua dari jendela dedupe (IDEMPOTENSI_JAM) dihapus berkala.
+2. `JendelaUpdate` (modul ini): update_id yang baru diproses disimpan di
+   memori (jumlah dibatasi) dan update_id sampai offset tersimpan dianggap
+   sudah diproses, sehingga update ulang dilewati sebelum handler jalan.
+3. Offset polling: update_id terakhir yang selesai diproses ditulis ke
+   tabel status_bot secara berkala dan saat bot berhenti, lalu dimuat
+   saat start.
+
+Lapisan 2 dan 3 hanya mempercepat (update ulang tidak memanggil handler);
+tepat sekali termasuk untuk update yang diproses setelah offset terakhir
+ditulis hanya dijamin lapisan 1, yang dipakai oleh:
+
+    - nota baru (tombol simpan sesi, entri cepat satu pesan)
+    - koreksi nota (/bayar, /ubah, /batal)
+    - /produksi (mutasi stok bahan & produk)
+
+Perintah lain yang mengubah data menulis nilai mutlak sehingga aman
+diulang: /stok set dan /stok min, /resep, /usaha nama, /gabung, /tutup,
+/arsip. Yang hanya dilindungi lapisan 2 dan 3: /undang (kode undangan
+kedua), /backup (snapshot tambahan), dan tombol konfirmasi /restore;
+file /import yang dikirim ulang ditolak karena sesi sudah kembali idle.
+"""
+
+import time
+from collections import deque
+
+# Kunci tabel status_bot untuk offset polling
+KUNCI_OFFSET = 'offset_update'
+
+
+class JendelaUpdate:
+    """update_id yang sudah diproses: offset tersimpan + jendela update terbaru"""
+
+    def __init__(self, maks=10000, interval_simpan=5.0):
+        self.maks = maks
+        self.interval_simpan = interval_simpan
+        # Semua update_id <= offset dianggap sudah diproses (dimuat dari database saat start)
+        self.offset = 0
+        # update_id tertinggi yang selesai diproses di proses ini
+        self.selesai = 0
+        self.dilewati = 0
+        self._urutan = deque()
+        self._ada = set()
+        self._terakhir_disimpan = time.monotonic()
+        self._offset_disimpan = 0
+
+    def sudah_diproses(self, update_id):
+        return update_id <= self.offset or update_id in self._ada
+
+    def tandai(self, update_id):
+        """Catat update yang mulai diproses; kembalikan False jika ternyata update ulang"""
+        if self.sudah_diproses(update_id):
+            self.dilewati += 1
+            return False
+        self._ada.add(update_id)
+        self._urutan.append(update_id)
+        while len(self._urutan) > self.maks:
+            self._ada.discard(self._urutan.popleft())
+        return True
+
+    def tandai_selesai(self, update_id):
+        self.selesai = max(self.selesai, update_id)
+
+    def perlu_disimpan(self, paksa=False):
+        """Offset yang perlu ditulis ke database (dibatasi interval_simpan), atau None"""
+        if self.selesai <= self._offset_disimpan:
+            return None
+        if not paksa and time.monotonic() - self._terakhir_disimpan < self.interval_simpan:
+            return None
+        return self.selesai
+
+    def sudah_disimpan(self, offset):
+        self._offset_disimpan = max(self._offset_disimpan, offset)
+        self._terakhir_disimpan = time.monotonic()
+
+    def kosongkan(self):
+        self._urutan.clear()
+        self._ada.clear()
+        self.offset = self.selesai = self._offset_disimpan = 0
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Impor massal nota lama dari file CSV / XLSX.
+
+Satu baris file = satu item nota. Baris berurutan dengan jenis, tanggal,
+pihak, dan nomor nota asal yang sama digabung menjadi satu nota. Kolom
+dikenali dari baris header (huruf besar/kecil bebas, urutan bebas):
+
+    jenis       - jual/penjualan atau beli/belanja
+    tanggal     - dd/mm/YYYY atau YYYY-mm-dd (tidak boleh di masa depan)
+    pihak       - nama pelanggan / supplier (alias: pelanggan, supplier)
+    barang      - harus ada di katalog barang penjualan / belanja
+    qty         - jumlah > 0
+    harga       - harga satuan >= 0
+    nota        - opsional, nomor nota asal (disimpan di keterangan)
+    bayar       - opsional, uang dibayar untuk nota penjualan (default lunas)
+    keterangan  - opsional, untuk nota belanja
+
+File dibaca baris per baris (csv / openpyxl read_only) dan nota disimpan
+per batch lewat repositori.impor_nota dalam satu transaksi per batch,
+sehingga memori tetap kecil walaupun file berisi ratusan ribu baris.
+Nomor nota dipesan sekaligus per batch dari tabel nomor_urut. Jika satu
+baris ditolak, baris lain dengan nomor nota asal yang sama ikut ditolak
+(tanpa kolom nota, hanya baris itu sendiri yang ditolak).
+
+Nota impor tidak mengubah stok (stok lama sebaiknya disesuaikan lewat
+/stok set), tapi ikut dihitung di histori, statistik, /cari, dan /laba.
+
+XLSX membutuhkan paket `openpyxl`.
+"""
+
+import os
+import csv
+import math
+import time
+import logging
+import datetime
+import functools
+from collections import Counter
+
+import analitik
+
+logger = logging.getLogger(__name__)
+
+# Nota per transaksi impor
+UKURAN_BATCH = 5000
+
+# Prefix nomor nota hasil impor: IMP-dd-mm-yy-<urut>
+PREFIX_NOMOR = "IMP"
+
+# Contoh baris ditolak yang dilaporkan (sisanya hanya dihitung per alasan)
+MAKS_CONTOH_DITOLAK = 10
+
+KOLOM_WAJIB = ('jenis', 'tanggal', 'pihak', 'barang', 'qty', 'harga')
+
+ALIAS_KOLOM = {
+    'jenis': 'jenis', 'tipe': 'jenis',
+    'tanggal': 'tanggal', 'tgl': 'tanggal',
+    'pihak': 'pihak', 'pelanggan': 'pihak', 'supplier': 'pihak', 'nama': 'pihak',
+    'barang': 'barang', 'item': 'barang',
+    'qty': 'qty', 'jumlah': 'qty',
+    'harga': 'harga', 'harga satuan': 'harga',
+    'nota': 'nota', 'no nota': 'nota', 'nomor nota': 'nota',
+    'bayar': 'bayar',
+    'keterangan': 'keterangan', 'ket': 'keterangan',
+}
+
+ALIAS_JENIS = {
+    'jual': 'penjualan', 'penjualan': 'penjualan',
+    'beli': 'belanja', 'belanja': 'belanja', 'pembelian': 'belanja',
+}
+
+
+class BarisDitolak(ValueError):
+    """Baris file tidak valid; pesan berisi alasan penolakan"""
+
+
+# ===== BACA FILE =====
+def _baca_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        contoh = f.read(4096)
+        f.seek(0)
+        try:
+            dialek = csv.Sniffer().sniff(contoh, delimiters=',;\t')
+        except csv.Error:
+            dialek = csv.excel
+        for nomor, baris in enumerate(csv.reader(f, dialek), start=1):
+            yield nomor, baris
+
+def _baca_xlsx(path):
+    import openpyxl
+    buku = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for nomor, baris in enumerate(buku.active.iter_rows(values_only=True), start=1):
+            yield nomor, list(baris)
+    finally:
+        buku.close()
+
+def baca_baris(path):
+    """Iterator (nomor baris, list nilai) dari file CSV atau XLSX"""
+    ekstensi = os.path.splitext(path)[1].lower()
+    if ekstensi == '.csv':
+        return _baca_csv(path)
+    if ekstensi in ('.xlsx', '.xlsm'):
+        return _baca_xlsx(path)
+    raise ValueError(f"Format file {ekstensi or '(tanpa ekstensi)'} tidak didukung, gunakan .csv atau .xlsx")
+
+def peta_header(baris):
+    """Posisi kolom dari baris header: {nama kolom: indeks}"""
+    peta = {}
+    for i, nilai in enumerate(baris):
+        kolom = ALIAS_KOLOM.get(str(nilai or '').strip().lower())
+        if kolom and kolom not in peta:
+            peta[kolom] = i
+    kurang = [k for k in KOLOM_WAJIB if k not in peta]
+    if kurang:
+        raise ValueError(f"Kolom wajib tidak ada di header: {', '.join(kurang)}")
+    return peta
+
+
+# ===== VALIDASI =====
+def _teks(nilai):
+    return str(nilai).strip() if nilai is not None else ''
+
+def _angka(nilai, nama):
+    """Angka dari sel: 1.200 / 1,5 / Rp 12.000 / nilai numerik XLSX"""
+    if isinstance(nilai, (int, float)):
+        if not math.isfinite(nilai):
+            raise BarisDitolak(f"{nama} bukan angka")
+        return nilai
+    teks = _teks(nilai).replace('Rp', '').replace(' ', '')
+    if not teks:
+        raise BarisDitolak(f"{nama} kosong")
+    if ',' in teks:
+        teks = teks.replace('.', '').replace(',', '.')
+    elif teks.count('.') == 1 and len(teks.split('.')[1]) != 3:
+        pass  # titik desimal (1.5), bukan pemisah ribuan
+    else:
+        teks = teks.replace('.', '')
+    try:
+        angka = float(teks)
+    except ValueError:
+        raise BarisDitolak(f"{nama} bukan angka")
+    # float() menerima inf/nan: round() lalu gagal dan nan lolos cek qty <= 0
+    if not math.isfinite(angka):
+        raise BarisDitolak(f"{nama} bukan angka")
+    return int(angka) if angka.is_integer() else angka
+
+@functools.lru_cache(maxsize=4096)
+def _tanggal_teks(teks):
+    """Tanggal dari teks, atau None; di-cache karena file buku besar berisi ribuan baris per tanggal"""
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.datetime.strptime(teks, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+def _tanggal(nilai, hari_ini):
+    if isinstance(nilai, datetime.datetime):
+        tanggal = nilai.date()
+    elif isinstance(nilai, datetime.date):
+        tanggal = nilai
+    else:
+        tanggal = _tanggal_teks(_teks(nilai))
+        if tanggal is None:
+            raise BarisDitolak("tanggal tidak dikenal")
+    if tanggal > hari_ini:
+        raise BarisDitolak("tanggal di masa depan")
+    return tanggal
+
+def _cocok_katalog(nama, katalog):
+    """Nama barang sesuai katalog (huruf besar/kecil bebas), atau None"""
+    return katalog.get(nama.lower())
+
+def parse_item(baris, peta, katalog, hari_ini):
+    """Validasi satu baris; kembalikan (kunci nota, item, ekstra) atau BarisDitolak"""
+    def sel(kolom):
+        i = peta.get(kolom)
+        return baris[i] if i is not None and i < len(baris) else None
+
+    jenis = ALIAS_JENIS.get(_teks(sel('jenis')).lower())
+    if jenis is None:
+        raise BarisDitolak("jenis bukan jual/beli")
+    tanggal = _tanggal(sel('tanggal'), hari_ini)
+    pihak = _teks(sel('pihak'))
+    if not pihak:
+        raise BarisDitolak("pihak kosong")
+    nama_barang = _teks(sel('barang'))
+    barang = _cocok_katalog(nama_barang, katalog[jenis])
+    if barang is None:
+        raise BarisDitolak(f"barang tidak ada di katalog {jenis}")
+    qty = _angka(sel('qty'), "qty")
+    if qty <= 0:
+        raise BarisDitolak("qty harus lebih dari 0")
+    harga = _angka(sel('harga'), "harga")
+    if harga < 0:
+        raise BarisDitolak("harga negatif")
+    bayar = sel('bayar')
+    ekstra = {
+        'bayar': _angka(bayar, "bayar") if _teks(bayar) else None,
+        'keterangan': _teks(sel('keterangan')),
+    }
+    item = {'nama': barang, 'harga': harga, 'qty': qty, 'subtotal': round(harga * qty)}
+    return (jenis, tanggal, pihak, _teks(sel('nota'))), item, ekstra
+
+
+# ===== SUSUN NOTA =====
+def _buat_nota(kunci, daftar_barang, ekstra, user_id, business_id):
+    """Dict nota (tanpa nomor) dengan kolom yang sama seperti nota dari bot"""
+    jenis, tanggal, pihak, nota_asal = kunci
+    total = sum(item['subtotal'] for item in daftar_barang)
+    asal = f"Nota asal {nota_asal}" if nota_asal else ""
+    nota = {
+        'user_id': user_id, 'business_id': business_id, 'tanggal': tanggal.strftime("%d/%m/%Y"),
+        'timestamp': datetime.datetime.combine(tanggal, datetime.time(12)).isoformat(),
+        'daftar_barang': daftar_barang,
+    }
+    if jenis == 'penjualan':
+        bayar = ekstra['bayar'] if ekstra['bayar'] is not None else total
+        sisa = bayar - total
+        keterangan = f"Sisa {sisa}" if sisa >= 0 else f"Kurang {-sisa}"
+        nota.update({
+            'nama_pelanggan': pihak, 'retur_items': [], 'total_sebelum_retur': total, 'total_retur': 0,
+            'total_setelah_retur': total, 'bayar': bayar, 'sisa': sisa,
+            'status': "LUNAS" if sisa >= 0 else "BELUM LUNAS",
+            'keterangan': f"{keterangan} · {asal}" if asal else keterangan,
+        })
+    else:
+        nota.update({
+            'nama_supplier': pihak, 'total_belanja': total,
+            'keterangan': " · ".join(k for k in (ekstra['keterangan'], asal) if k),
+        })
+    return nota
+
+def _item_bulanan(nota, jenis, ringkasan):
+    """Tambahkan item nota ke ringkasan bulanan batch {(bulan, jenis, barang, pihak): [qty, nilai]}"""
+    bulan = int(nota['timestamp'][:4] + nota['timestamp'][5:7])
+    jenis_item = analitik.JENIS_JUAL if jenis == 'penjualan' else analitik.JENIS_BELI
+    pihak = nota.get('nama_pelanggan') or nota.get('nama_supplier') or ''
+    for item in nota['daftar_barang']:
+        total = ringkasan.setdefault((bulan, jenis_item, item['nama'], pihak), [0, 0])
+        total[0] += item['qty']
+        total[1] += item['subtotal']
+
+
+# ===== IMPOR =====
+class Impor:
+    """Satu proses impor file: kumpulkan nota per batch lalu simpan lewat repositori"""
+
+    def __init__(self, repo, business_id, user_id, katalog, ukuran_batch=UKURAN_BATCH, prefix=PREFIX_NOMOR):
+        self.repo = repo
+        self.business_id = business_id
+        self.user_id = user_id
+        # Katalog: {'penjualan': [nama barang], 'belanja': [...]} -> lookup huruf kecil
+        self.katalog = {jenis: {n.lower(): n for n in daftar} for jenis, daftar in katalog.items()}
+        self.ukuran_batch = ukuran_batch
+        self.prefix = prefix
+        self.batch = []
+        self.hasil = {
+            'baris': 0, 'baris_diimpor': 0, 'baris_ditolak': 0,
+            'nota': {'penjualan': 0, 'belanja': 0}, 'alasan': Counter(), 'contoh_ditolak': [],
+        }
+
+    def _tolak(self, nomor_baris, alasan, detail=None):
+        self.hasil['baris_ditolak'] += 1
+        self.hasil['alasan'][alasan] += 1
+        if len(self.hasil['contoh_ditolak']) < MAKS_CONTOH_DITOLAK:
+            self.hasil['contoh_ditolak'].append((nomor_baris, detail or alasan))
+
+    def _tutup_nota(self, kunci, daftar_barang, ekstra, baris_nota, alasan_tolak):
+        """Nota selesai dibaca: masukkan ke batch, atau tolak baris validnya jika ada baris lain yang ditolak"""
+        if alasan_tolak is not None:
+            for nomor in baris_nota:
+                self._tolak(nomor, "ikut ditolak (baris lain di nota yang sama)", f"ikut ditolak (baris {alasan_tolak})")
+            return
+        self.batch.append((kunci[0], _buat_nota(kunci, daftar_barang, ekstra, self.user_id, self.business_id),
+                           len(baris_nota)))
+        if len(self.batch) >= self.ukuran_batch:
+            self.simpan_batch()
+
+    def simpan_batch(self):
+        """Simpan batch: pesan blok nomor nota lalu satu transaksi per jenis nota"""
+        if not self.batch:
+            return
+        awal = self.repo.alokasi_nomor(self.prefix, len(self.batch))
+        per_jenis = {'penjualan': [], 'belanja': []}
+        ringkasan = {'penjualan': {}, 'belanja': {}}
+        baris = {'penjualan': 0, 'belanja': 0}
+        for urut, (jenis, nota, jumlah_baris) in enumerate(self.batch, start=awal):
+            nota['nomor_nota'] = f"{self.prefix}-{nota['tanggal'][:2]}-{nota['tanggal'][3:5]}-{nota['tanggal'][8:]}-{urut:04d}"
+            per_jenis[jenis].append(nota)
+            _item_bulanan(nota, jenis, ringkasan[jenis])
+            baris[jenis] += jumlah_baris
+        for jenis, daftar in per_jenis.items():
+            if not daftar:
+                continue
+            item = [(*k, qty, nilai) for k, (qty, nilai) in ringkasan[jenis].items()]
+            self.repo.impor_nota(jenis, daftar, self.business_id, item)
+            self.hasil['nota'][jenis] += len(daftar)
+            self.hasil['baris_diimpor'] += baris[jenis]
+        self.batch = []
+
+    def jalankan(self, baris_file, hari_ini=None):
+        """Proses iterator (nomor baris, nilai) dari baca_baris; kembalikan ringkasan hasil"""
+        hari_ini = hari_ini or datetime.date.today()
+        t0 = time.perf_counter()
+        peta = None
+        kunci_aktif, daftar_barang, ekstra, baris_nota, alasan_tolak = None, [], None, [], None
+
+        # Baris ditolak terakhir yang punya nomor nota asal: nota dengan nomor asal itu ikut ditolak
+        tolak_asal = None
+
+        for nomor, baris in baris_file:
+            if not any(_teks(nilai) for nilai in baris):
+                continue
+            if peta is None:
+                peta = peta_header(baris)
+                continue
+            self.hasil['baris'] += 1
+            try:
+                kunci, item, ekstra_baris = parse_item(baris, peta, self.katalog, hari_ini)
+            except BarisDitolak as e:
+                self._tolak(nomor, str(e))
+                nota_asal = _teks(baris[peta['nota']]) if 'nota' in peta and peta['nota'] < len(baris) else ''
+                if nota_asal:
+                    tolak_asal = (nota_asal, nomor)
+                    if kunci_aktif is not None and nota_asal == kunci_aktif[3]:
+                        alasan_tolak = alasan_tolak or nomor
+                continue
+
+            if kunci != kunci_aktif:
+                if kunci_aktif is not None:
+                    self._tutup_nota(kunci_aktif, daftar_barang, ekstra, baris_nota, alasan_tolak)
+                kunci_aktif, daftar_barang, ekstra, baris_nota, alasan_tolak = kunci, [], ekstra_baris, [], None
+                if tolak_asal is not None and kunci[3] == tolak_asal[0]:
+                    alasan_tolak = tolak_asal[1]
+            daftar_barang.append(item)
+            baris_nota.append(nomor)
+            if ekstra_baris['bayar'] is not None:
+                ekstra['bayar'] = ekstra_baris['bayar']
+            if ekstra_baris['keterangan'] and not ekstra['keterangan']:
+                ekstra['keterangan'] = ekstra_baris['keterangan']
+
+        if peta is None:
+            raise ValueError("File kosong atau tanpa header")
+        if kunci_aktif is not None:
+            self._tutup_nota(kunci_aktif, daftar_barang, ekstra, baris_nota, alasan_tolak)
+        self.simpan_batch()
+
+        self.hasil['durasi_detik'] = round(time.perf_counter() - t0, 2)
+        logger.info(
+            f"📥 Impor usaha {self.business_id}: {self.hasil['nota']['penjualan']} penjualan, "
+            f"{self.hasil['nota']['belanja']} belanja, {self.hasil['baris_ditolak']} baris ditolak "
+            f"({self.hasil['durasi_detik']} detik)"
+        )
+        return self.hasil
+
+def impor_file(path, repo, business_id, user_id, katalog, ukuran_batch=UKURAN_BATCH):
+    """Impor file CSV/XLSX ke repositori; kembalikan ringkasan hasil (lihat Impor.jalankan)"""
+    return Impor(repo, business_id, user_id, katalog, ukuran_batch).jalankan(baca_baris(path))
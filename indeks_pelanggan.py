@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Indeks pelanggan di memori untuk inline query (@bot ujang).
+
+Per usaha disimpan setiap pelanggan dengan piutang berjalan (jumlah nota
+belum lunas dan total kekurangannya), beberapa nota terakhir, dan harga
+terakhir tiap barang dari nota-nota tersebut. Pencarian cukup mencocokkan
+awalan kata nama pelanggan di memori, tanpa query database.
+
+Isi indeks dimuat dari repositori (ringkasan_pelanggan) saat bot start dan
+saat usaha pertama kali dicari, lalu diperbarui write-through: nota baru
+ditambahkan langsung (`catat_nota`), koreksi nota memuat ulang pelanggan
+yang terpengaruh, impor/arsip/restore memuat ulang usahanya.
+
+Pencarian memakai daftar kata nama terurut (awalan dicari dengan bisect)
+dan urutan pelanggan (piutang terbesar, lalu nota terbaru) yang dibangun
+ulang sekali setelah isi usaha berubah, bukan memindai semua pelanggan
+per query.
+
+Muat ulang berjalan di thread sementara nota baru bisa tersimpan di
+antaranya: setiap perubahan menaikkan `generasi` usaha, dan hasil muat yang
+dibaca sebelum perubahan terakhir ditolak (`muat` mengembalikan False) agar
+pemanggil membaca ulang.
+"""
+
+import re
+import heapq
+import bisect
+import threading
+
+# Kata nama pelanggan untuk pencarian (sama dengan token /cari)
+POLA_KATA = re.compile(r'[^\W_]+')
+
+
+def kunci_nama(nama):
+    """Kunci pelanggan: huruf besar, spasi dirapikan"""
+    return " ".join((nama or "").upper().split())
+
+def _kata(teks):
+    return POLA_KATA.findall((teks or "").lower())
+
+
+class IndeksPelanggan:
+    """Ringkasan pelanggan per usaha: {business_id: {kunci_nama: entri}}
+
+    Entri berupa dict: nama, piutang, belum_lunas, nota (list tuple
+    (nomor_nota, tanggal, total, sisa, status, timestamp), terbaru dulu),
+    daftar_barang (barang tiap nota di `nota`, urutan sama), harga ({barang:
+    harga terakhir}), kunci (kunci_nama), dan kata (token nama untuk
+    dicocokkan). Entri tidak diubah di tempat; pembaruan mengganti entri baru, jadi
+    pembaca boleh memakai entri tanpa lock.
+    """
+
+    def __init__(self, per_pelanggan=5):
+        self.per_pelanggan = per_pelanggan
+        self._usaha = {}
+        # business_id -> versi_data usaha saat dimuat (cek basi di mode banyak worker)
+        self._versi = {}
+        self._generasi = {}
+        # business_id -> (isi, urutan entri, posisi urut, [(kata, kunci)] terurut); dibangun ulang jika isi diganti
+        self._turunan = {}
+        self._lock = threading.Lock()
+        self.cari_dilayani = 0
+        self.dimuat = 0
+
+    def __contains__(self, business_id):
+        return business_id in self._usaha
+
+    def generasi(self, business_id):
+        return self._generasi.get(business_id, 0)
+
+    def versi(self, business_id):
+        return self._versi.get(business_id)
+
+    def _naikkan_generasi(self, business_id):
+        self._generasi[business_id] = self._generasi.get(business_id, 0) + 1
+
+    def _entri(self, nama, piutang, belum_lunas, nota):
+        harga = {}
+        for *_, daftar_barang, _ in reversed(nota):
+            for item in daftar_barang:
+                harga[item['nama']] = item['harga']
+        return {
+            'nama': nama, 'piutang': piutang or 0, 'belum_lunas': belum_lunas or 0,
+            'nota': [(nomor, tanggal, total, sisa, status, waktu) for nomor, tanggal, total, sisa, status, _, waktu in nota],
+            'daftar_barang': [daftar_barang for *_, daftar_barang, _ in nota],
+            'harga': harga, 'kunci': kunci_nama(nama), 'kata': _kata(nama),
+        }
+
+    def muat(self, business_id, piutang, nota, generasi, versi=None, nama_pelanggan=None):
+        """Pasang hasil repositori.ringkasan_pelanggan; False jika usaha berubah sejak `generasi` dibaca
+
+        Tanpa `nama_pelanggan` seluruh isi usaha diganti; dengan
+        `nama_pelanggan` hanya pelanggan itu (usaha yang belum dimuat dilewati).
+        """
+        per_nama = {}
+        for nama, *isi in nota:
+            per_nama.setdefault(nama, []).append(isi)
+        piutang = {nama: (jumlah, total) for nama, jumlah, total in piutang}
+        entri = {}
+        for nama in set(per_nama) | set(piutang):
+            jumlah, total = piutang.get(nama, (0, 0))
+            entri[kunci_nama(nama)] = self._entri(nama, total, jumlah, per_nama.get(nama, []))
+
+        with self._lock:
+            if self.generasi(business_id) != generasi:
+                return False
+            if nama_pelanggan is None:
+                self._usaha[business_id] = entri
+                self._versi[business_id] = versi
+            elif business_id in self._usaha:
+                isi = dict(self._usaha[business_id])
+                isi.pop(kunci_nama(nama_pelanggan), None)
+                isi.update(entri)
+                self._usaha[business_id] = isi
+            self.dimuat += 1
+            return True
+
+    def catat_nota(self, business_id, nota):
+        """Tambahkan nota penjualan yang baru disimpan
+
+        Nota disisipkan sesuai timestamp seperti urutan repositori (nota
+        impor bertanggal lama bisa bukan yang terbaru), jadi harga terakhir
+        dihitung ulang dari nota yang tersisa.
+        """
+        with self._lock:
+            self._naikkan_generasi(business_id)
+            isi = self._usaha.get(business_id)
+            if isi is None:
+                return
+            kunci = kunci_nama(nota['nama_pelanggan'])
+            lama = isi.get(kunci) or self._entri(nota['nama_pelanggan'], 0, 0, [])
+            daftar = [(nota['nomor_nota'], nota['tanggal'], nota['total_setelah_retur'], nota['sisa'],
+                       nota['status'], nota['daftar_barang'], nota['timestamp'])]
+            daftar += [(*n[:5], daftar_barang, n[5]) for n, daftar_barang in zip(lama['nota'], lama['daftar_barang'])]
+            # Sort stabil: timestamp sama, nota yang baru disimpan tetap di depan (id terbesar)
+            daftar.sort(key=lambda n: n[6], reverse=True)
+            piutang, belum_lunas = lama['piutang'], lama['belum_lunas']
+            if nota['sisa'] < 0:
+                piutang -= nota['sisa']
+                belum_lunas += 1
+            baru = self._entri(lama['nama'], piutang, belum_lunas, daftar[:self.per_pelanggan])
+            isi = dict(isi)
+            isi[kunci] = baru
+            self._usaha[business_id] = isi
+
+    def tandai_berubah(self, business_id):
+        """Catat perubahan yang isinya dimuat ulang pemanggil (hasil muat yang lebih lama ditolak)"""
+        with self._lock:
+            self._naikkan_generasi(business_id)
+
+    def hapus(self, business_id=None):
+        """Buang usaha (atau semua) dari indeks; dimuat ulang saat dicari berikutnya"""
+        with self._lock:
+            daftar = list(self._usaha) if business_id is None else [business_id]
+            for b in daftar:
+                self._naikkan_generasi(b)
+                self._usaha.pop(b, None)
+                self._versi.pop(b, None)
+                self._turunan.pop(b, None)
+
+    def _bangun_turunan(self, business_id, isi):
+        """Urutan pelanggan & daftar kata terurut untuk `isi`; dipakai ulang selama isi tidak diganti"""
+        turunan = self._turunan.get(business_id)
+        if turunan is not None and turunan[0] is isi:
+            return turunan
+        # Sort stabil dua kali: piutang terbesar, yang seri urut nota terbaru
+        urutan = sorted(isi.values(), key=lambda e: e['nota'][0][5] if e['nota'] else "", reverse=True)
+        urutan.sort(key=lambda e: -e['piutang'])
+        posisi = {e['kunci']: i for i, e in enumerate(urutan)}
+        kata = sorted((k, e['kunci']) for e in urutan for k in set(e['kata']))
+        turunan = (isi, urutan, posisi, kata)
+        self._turunan[business_id] = turunan
+        return turunan
+
+    @staticmethod
+    def _awalan(kata_urut, awalan):
+        """Kunci pelanggan yang punya kata berawalan `awalan`"""
+        hasil = set()
+        for i in range(bisect.bisect_left(kata_urut, (awalan,)), len(kata_urut)):
+            kata, kunci = kata_urut[i]
+            if not kata.startswith(awalan):
+                break
+            hasil.add(kunci)
+        return hasil
+
+    def cari(self, business_id, teks, limit=20):
+        """Entri pelanggan yang setiap kata `teks`-nya awalan kata nama, urut kecocokan
+
+        Nama yang sama persis di depan, lalu piutang terbesar, lalu nota
+        terbaru. Teks kosong: semua pelanggan dengan urutan yang sama.
+        """
+        isi = self._usaha.get(business_id)
+        if isi is None:
+            return None
+        self.cari_dilayani += 1
+        _, urutan, posisi, kata_urut = self._bangun_turunan(business_id, isi)
+        kata = _kata(teks)
+        if not kata:
+            return urutan[:limit]
+        # Kata terpanjang dulu: kandidatnya paling sedikit
+        kata.sort(key=len, reverse=True)
+        cocok = self._awalan(kata_urut, kata[0])
+        for q in kata[1:]:
+            if not cocok:
+                break
+            cocok &= self._awalan(kata_urut, q)
+        persis = kunci_nama(teks)
+        terpilih = heapq.nsmallest(limit, cocok, key=lambda k: (k != persis, posisi[k]))
+        return [isi[k] for k in terpilih]
+
+    def statistik(self):
+        return {
+            'usaha': len(self._usaha),
+            'pelanggan': sum(len(isi) for isi in self._usaha.values()),
+            'cari': self.cari_dilayani,
+            'dimuat': self.dimuat,
+        }
+
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Jurnal nota: log event append-only untuk setiap perubahan nota.
+
+Setiap nota punya urutan event di tabel nota_event:
+
+    dibuat      - isi nota lengkap saat disimpan; untuk nota hasil /impor
+                  dan nota yang dibuat sebelum jurnal ada, keadaan
+                  terakhirnya ditulis tepat sebelum perubahan pertamanya
+                  (impor massal tidak menulis event per nota)
+    diubah      - /ubah: kolom yang berubah beserta nilai barunya
+    dibayar     - /bayar: nominal + kolom pembayaran yang berubah
+    dibatalkan  - /batal: nota keluar dari tabel nota (alasan dicatat)
+
+Tabel nota_penjualan / nota_belanja, item_bulanan, dan stok adalah hasil
+materialisasi event tersebut; repositori menulis event dan efeknya dalam
+satu transaksi. Event tidak pernah diubah (trigger menolak UPDATE); event
+nota yang diarsipkan ikut pindah ke file arsip tahunnya (arsip.py).
+ringkasan_harian tidak disentuh: isinya laporan tutup buku pada hari itu.
+
+Snapshot berkala (snapshot_nota) menyimpan keadaan tiap nota sampai event
+tertentu. Snapshot baru dihitung dari snapshot sebelumnya + event
+sesudahnya, dan keadaan semua nota dibangun dari snapshot terakhir + event
+sejak itu, jadi biayanya sebanding jumlah event sejak snapshot, bukan
+seluruh riwayat. `cek` membandingkan keadaan hasil jurnal dengan tabel
+nota, item_bulanan, dan (opsional) mutasi stok per nota; `perbaiki`
+menulis ulang baris nota yang beda. Snapshot dan pemeriksaan hanya untuk
+backend SQLite.
+
+Pemakaian dari command line:
+
+    python jurnal.py --db keuangan.db --snapshot
+    python jurnal.py --db keuangan.db --cek
+    python jurnal.py --db keuangan.db --perbaiki
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import datetime
+
+import arsip
+
+logger = logging.getLogger(__name__)
+
+DIBUAT = "dibuat"
+DIUBAH = "diubah"
+DIBAYAR = "dibayar"
+DIBATALKAN = "dibatalkan"
+
+# Jumlah contoh beda per jenis yang dimasukkan ke laporan cek
+CONTOH_BEDA = 20
+
+# Keadaan nota yang tidak tercatat lengkap sejak dibuat (impor / sebelum jurnal):
+# stok awalnya tidak diketahui jurnal
+ASAL_SEBELUM_JURNAL = "sebelum_jurnal"
+
+JENIS_NOTA = {'nota_penjualan': 'penjualan', 'nota_belanja': 'belanja'}
+
+
+def _sekarang():
+    return datetime.datetime.now().isoformat()
+
+def kode_data(data):
+    """dict event/snapshot -> BLOB (JSON deflate, sama dengan kolom barang arsip)"""
+    if data is None:
+        return None
+    return arsip.kompres_json(json.dumps(data, ensure_ascii=False))
+
+def baca_data(blob):
+    return arsip.buka_json(blob)
+
+def keadaan_nota(nota, kolom):
+    """Keadaan nota untuk jurnal: nilai `kolom` saja, daftar barang sebagai list"""
+    return {
+        k: json.loads(nota[k]) if isinstance(nota.get(k), str) and k in ('daftar_barang', 'retur_items') else nota.get(k)
+        for k in kolom
+    }
+
+def perubahan(lama, baru, kolom):
+    """{kolom: nilai baru} yang berbeda dari keadaan lama"""
+    return {k: baru.get(k) for k in kolom if baru.get(k) != lama.get(k)}
+
+def terapkan(keadaan, jenis, data):
+    """Keadaan nota setelah satu event; None = nota dibatalkan"""
+    if jenis == DIBUAT:
+        hasil = dict(data['nota'])
+        if data.get('asal'):
+            hasil['_asal'] = data['asal']
+        return hasil
+    if keadaan is None:
+        raise ValueError(f"event '{jenis}' tanpa keadaan awal")
+    if jenis == DIBATALKAN:
+        return None
+    return {**keadaan, **data.get('perubahan', {})}
+
+def _bersih(keadaan):
+    """Keadaan tanpa kunci meta (awalan _), untuk dibandingkan dengan baris nota"""
+    return {k: v for k, v in keadaan.items() if not k.startswith('_')}
+
+
+# ===== SNAPSHOT & PUTAR ULANG =====
+def snapshot_terakhir(conn):
+    """(id snapshot, event_id) terakhir, (0, 0) jika belum ada"""
+    row = conn.execute("SELECT id, event_id FROM jurnal_snapshot ORDER BY id DESC LIMIT 1").fetchone()
+    return tuple(row) if row else (0, 0)
+
+def _putar(conn, keadaan, dari, sampai, rusak):
+    """Terapkan event id (dari, sampai] ke dict keadaan {(jenis_nota, nota_id): keadaan}; kembalikan jumlahnya"""
+    jumlah = 0
+    for jenis_nota, nota_id, jenis, data in conn.execute('''
+        SELECT jenis_nota, nota_id, jenis, data FROM nota_event WHERE id > ? AND id <= ? ORDER BY id
+    ''', (dari, sampai)):
+        kunci = (jenis_nota, nota_id)
+        try:
+            keadaan[kunci] = terapkan(keadaan.get(kunci), jenis, baca_data(data))
+        except ValueError:
+            rusak.append(kunci)
+        jumlah += 1
+    return jumlah
+
+def bangun_keadaan(conn):
+    """Keadaan semua nota yang tercatat di jurnal: snapshot terakhir + event sesudahnya
+
+    Kembalikan (keadaan, info) dengan keadaan {(jenis_nota, nota_id): dict
+    atau None}.
+    """
+    _, dari = snapshot_terakhir(conn)
+    keadaan = {
+        (jenis_nota, nota_id): baca_data(data)
+        for jenis_nota, nota_id, data in conn.execute("SELECT jenis_nota, nota_id, data FROM snapshot_nota")
+    }
+    sampai = conn.execute("SELECT ifnull(MAX(id), 0) FROM nota_event").fetchone()[0]
+    rusak = []
+    diputar = _putar(conn, keadaan, dari, sampai, rusak)
+    return keadaan, {'snapshot_event': dari, 'event_terakhir': sampai, 'event_diputar': diputar, 'tanpa_awal': rusak}
+
+def buat_snapshot(db_file, minimal_event=1):
+    """Snapshot keadaan nota yang berubah sejak snapshot terakhir; None jika event baru < `minimal_event`
+
+    Hanya nota yang punya event baru yang dihitung dan ditulis ulang.
+    """
+    t0 = time.perf_counter()
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _, dari = snapshot_terakhir(conn)
+        sampai = conn.execute("SELECT ifnull(MAX(id), 0) FROM nota_event").fetchone()[0]
+        if sampai - dari < max(minimal_event, 1):
+            return None
+        disentuh = [tuple(row) for row in conn.execute(
+            "SELECT DISTINCT jenis_nota, nota_id FROM nota_event WHERE id > ? AND id <= ?", (dari, sampai)
+        )]
+        keadaan = {}
+        for kunci in disentuh:
+            row = conn.execute(
+                "SELECT data FROM snapshot_nota WHERE jenis_nota = ? AND nota_id = ?", kunci
+            ).fetchone()
+            if row is not None:
+                keadaan[kunci] = baca_data(row[0])
+        rusak = []
+        diputar = _putar(conn, keadaan, dari, sampai, rusak)
+        conn.executemany('''
+            INSERT INTO snapshot_nota (jenis_nota, nota_id, event_id, data) VALUES (?, ?, ?, ?)
+            ON CONFLICT(jenis_nota, nota_id) DO UPDATE SET event_id = excluded.event_id, data = excluded.data
+        ''', [(*kunci, sampai, kode_data(isi)) for kunci, isi in keadaan.items()])
+        info = {
+            'event_id': sampai, 'nota': len(keadaan), 'event_diputar': diputar, 'tanpa_awal': len(rusak),
+            'durasi_detik': round(time.perf_counter() - t0, 3),
+        }
+        conn.execute('''
+            INSERT INTO jurnal_snapshot (event_id, waktu, jumlah_nota, event_diputar, durasi) VALUES (?, ?, ?, ?, ?)
+        ''', (sampai, _sekarang(), info['nota'], diputar, info['durasi_detik']))
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"📸 Snapshot jurnal sampai event {sampai}: {info['nota']:,} nota, {diputar:,} event")
+    return info
+
+def status(db_file):
+    """Ringkasan jurnal: jumlah event, snapshot terakhir, event sejak snapshot"""
+    conn = sqlite3.connect(db_file)
+    try:
+        jumlah, terakhir = conn.execute("SELECT COUNT(*), ifnull(MAX(id), 0) FROM nota_event").fetchone()
+        row = conn.execute("SELECT event_id, waktu FROM jurnal_snapshot ORDER BY id DESC LIMIT 1").fetchone()
+        event_snapshot, waktu = row if row else (0, None)
+        return {
+            'event': jumlah, 'event_terakhir': terakhir, 'snapshot_event': event_snapshot,
+            'snapshot_waktu': waktu, 'event_sejak_snapshot': terakhir - event_snapshot,
+        }
+    finally:
+        conn.close()
+
+
+# ===== CEK & PERBAIKI =====
+def _id_diarsip(conn, arsip_dir, daftar_kunci):
+    """Kunci (jenis_nota, nota_id) dari `daftar_kunci` yang notanya ada di file arsip"""
+    hasil = set()
+    if not daftar_kunci:
+        return hasil
+    for _, path in arsip.daftar_arsip(conn, arsip_dir):
+        arsip.pasang(conn, path)
+        try:
+            for tabel, jenis_nota in JENIS_NOTA.items():
+                ids = [nota_id for jenis, nota_id in daftar_kunci if jenis == jenis_nota]
+                if ids:
+                    hasil.update((jenis_nota, row[0]) for row in conn.execute(
+                        f"SELECT id FROM {arsip.SKEMA}.{tabel} WHERE id IN (SELECT value FROM json_each(?))",
+                        (json.dumps(ids),)
+                    ))
+        finally:
+            arsip.lepas(conn)
+    return hasil
+
+def _baris_nota(conn, jenis_nota, nota_id):
+    from repositori import TABEL_NOTA
+    tabel, kolom = TABEL_NOTA[jenis_nota]
+    row = conn.execute(f"SELECT {', '.join(kolom)} FROM {tabel} WHERE id = ?", (nota_id,)).fetchone()
+    return None if row is None else keadaan_nota(dict(zip(kolom, row)), kolom)
+
+def _beda_nota(conn, keadaan, arsip_dir):
+    """[(kunci, keadaan jurnal, baris tabel)] nota yang tidak sama; nota yang sudah diarsip dilewati"""
+    beda = []
+    for kunci, isi in keadaan.items():
+        baris = _baris_nota(conn, *kunci)
+        harapan = None if isi is None else _bersih(isi)
+        if baris != harapan:
+            beda.append((kunci, harapan, baris))
+    hilang = [kunci for kunci, harapan, baris in beda if baris is None]
+    diarsip = _id_diarsip(conn, arsip_dir, hilang)
+    return [b for b in beda if b[0] not in diarsip]
+
+def _kolom_beda(harapan, baris):
+    if harapan is None or baris is None:
+        return []
+    return sorted(k for k in harapan if harapan.get(k) != baris.get(k))
+
+def _beda_item_bulanan(conn):
+    """[(business_id, bulan, jenis, barang, pihak, tersimpan, seharusnya)] bulan yang belum diarsip"""
+    import migrasi
+    tahun_arsip = conn.execute("SELECT MAX(tahun) FROM arsip_tahun").fetchone()[0]
+    batas_bulan = (tahun_arsip + 1) * 100 if tahun_arsip else 0
+    conn.execute('''
+        CREATE TEMP TABLE item_cek (
+            business_id INTEGER NOT NULL, bulan INTEGER NOT NULL, jenis TEXT NOT NULL, barang TEXT NOT NULL,
+            pihak TEXT NOT NULL, qty REAL NOT NULL, nilai INTEGER NOT NULL,
+            PRIMARY KEY (business_id, bulan, jenis, barang, pihak)
+        )
+    ''')
+    try:
+        # SQL yang sama dengan backfill migrasi / bangun_ulang_item_bulanan, ditulis ke tabel sementara
+        for daftar_sql in migrasi.SUMBER_ITEM_BULANAN.values():
+            for sql in daftar_sql:
+                conn.execute(sql.replace("item_bulanan", "item_cek"), {'dari': 0, 'sampai': 1 << 62})
+        beda = conn.execute('''
+            SELECT business_id, bulan, jenis, barang, pihak, qty_simpan, nilai_simpan, qty_harus, nilai_harus FROM (
+                SELECT i.business_id, i.bulan, i.jenis, i.barang, i.pihak, i.qty AS qty_simpan, i.nilai AS nilai_simpan,
+                       ifnull(c.qty, 0) AS qty_harus, ifnull(c.nilai, 0) AS nilai_harus
+                FROM item_bulanan i LEFT JOIN temp.item_cek c USING (business_id, bulan, jenis, barang, pihak)
+                WHERE i.bulan >= :batas
+                UNION ALL
+                SELECT c.business_id, c.bulan, c.jenis, c.barang, c.pihak, 0, 0, c.qty, c.nilai
+                FROM temp.item_cek c
+                WHERE c.bulan >= :batas AND NOT EXISTS (
+                    SELECT 1 FROM item_bulanan i WHERE i.business_id = c.business_id AND i.bulan = c.bulan
+                    AND i.jenis = c.jenis AND i.barang = c.barang AND i.pihak = c.pihak
+                )
+            )
+            WHERE abs(qty_simpan - qty_harus) > 1e-6 OR nilai_simpan != nilai_harus
+        ''', {'batas': batas_bulan}).fetchall()
+    finally:
+        conn.execute("DROP TABLE temp.item_cek")
+    return [(b, bulan, jenis, barang, pihak, (qs, ns), (qh, nh)) for b, bulan, jenis, barang, pihak, qs, ns, qh, nh in beda]
+
+def _beda_stok(conn, keadaan, mutasi_nota):
+    """[(nomor_nota, sku, tercatat, seharusnya)] nota yang mutasi stoknya tidak sesuai keadaan akhirnya
+
+    Hanya nota yang tercatat lengkap sejak dibuat di jurnal (bukan hasil impor
+    atau sebelum jurnal); nota batal seharusnya punya mutasi bersih nol.
+    """
+    from repositori import TABEL_NOTA
+    tercatat = {}
+    for referensi, sku, jumlah in conn.execute('''
+        SELECT referensi, sku, SUM(perubahan) FROM mutasi_stok WHERE referensi IS NOT NULL GROUP BY 1, 2
+    '''):
+        tercatat.setdefault(referensi, {})[sku] = jumlah
+    nomor = {}
+    for tabel, jenis_nota in JENIS_NOTA.items():
+        for nota_id, nomor_nota in conn.execute(
+            "SELECT DISTINCT nota_id, nomor_nota FROM nota_event WHERE jenis_nota = ?", (jenis_nota,)
+        ):
+            nomor[(jenis_nota, nota_id)] = nomor_nota
+    beda = []
+    for kunci, isi in keadaan.items():
+        if kunci not in nomor or (isi is not None and isi.get('_asal')):
+            continue
+        if isi is None:
+            # Nota batal: keadaan awalnya dilihat dari event pertamanya, lalu
+            # cukup cek mutasinya sudah dibalik semua
+            awal = conn.execute(
+                "SELECT data FROM nota_event WHERE jenis_nota = ? AND nota_id = ? ORDER BY id LIMIT 1", kunci
+            ).fetchone()
+            if awal is None or baca_data(awal[0]).get('asal'):
+                continue
+            harus = {}
+        else:
+            harus = mutasi_nota(kunci[0], isi)
+        ada = tercatat.get(nomor[kunci], {})
+        for sku in set(harus) | set(ada):
+            if abs(ada.get(sku, 0) - harus.get(sku, 0)) > 1e-6:
+                beda.append((nomor[kunci], sku, ada.get(sku, 0), harus.get(sku, 0)))
+    return beda
+
+def cek(db_file, arsip_dir, mutasi_nota=None, contoh=CONTOH_BEDA):
+    """Bandingkan keadaan hasil jurnal dengan data tersimpan; kembalikan dict laporan
+
+    `mutasi_nota(jenis_nota, keadaan)` (opsional) memberi mutasi stok bersih
+    {sku: perubahan} yang seharusnya untuk keadaan nota tersebut.
+    """
+    t0 = time.perf_counter()
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        conn.execute("BEGIN")  # satu snapshot baca untuk semua pemeriksaan
+        keadaan, info = bangun_keadaan(conn)
+        beda_nota = _beda_nota(conn, keadaan, arsip_dir)
+        beda_item = _beda_item_bulanan(conn)
+        beda_stok = _beda_stok(conn, keadaan, mutasi_nota) if mutasi_nota else []
+        conn.rollback()
+    finally:
+        conn.close()
+    return {
+        **info,
+        'tanpa_awal': len(info['tanpa_awal']),
+        'nota_dicek': len(keadaan),
+        'nota_beda': len(beda_nota),
+        'item_beda': len(beda_item),
+        'stok_beda': len(beda_stok),
+        'contoh_nota': [
+            {'jenis': k[0], 'id': k[1], 'seharusnya': 'batal' if h is None else 'ada',
+             'tersimpan': 'tidak ada' if b is None else 'ada', 'kolom': _kolom_beda(h, b)}
+            for k, h, b in beda_nota[:contoh]
+        ],
+        'contoh_item': [list(b) for b in beda_item[:contoh]],
+        'contoh_stok': [list(b) for b in beda_stok[:contoh]],
+        'durasi_detik': round(time.perf_counter() - t0, 3),
+    }
+
+def perbaiki(db_file, arsip_dir):
+    """Tulis ulang baris nota yang beda dari keadaan jurnal (satu transaksi); kembalikan jumlahnya
+
+    Nota batal dihapus, nota yang hilang disisipkan lagi dengan id yang sama.
+    item_bulanan dibangun ulang terpisah (bot_nota.bangun_ulang_item_bulanan);
+    stok tidak diubah, selisihnya dibetulkan lewat opname.
+    """
+    from repositori import TABEL_NOTA, baris_nota
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        keadaan, _ = bangun_keadaan(conn)
+        beda = _beda_nota(conn, keadaan, arsip_dir)
+        for (jenis_nota, nota_id), harapan, baris in beda:
+            tabel, kolom = TABEL_NOTA[jenis_nota]
+            if harapan is None:
+                conn.execute(f"DELETE FROM {tabel} WHERE id = ?", (nota_id,))
+            elif baris is None:
+                conn.execute(
+                    f"INSERT INTO {tabel} (id, {', '.join(kolom)}) VALUES (?, {', '.join('?' * len(kolom))})",
+                    (nota_id, *baris_nota(harapan, kolom))
+                )
+            else:
+                ubah = _kolom_beda(harapan, baris)
+                conn.execute(
+                    f"UPDATE {tabel} SET {', '.join(f'{k} = ?' for k in ubah)} WHERE id = ?",
+                    (*baris_nota(harapan, ubah), nota_id)
+                )
+        conn.commit()
+    finally:
+        conn.close()
+    if beda:
+        logger.warning(f"🩹 Jurnal: {len(beda)} nota ditulis ulang dari event")
+    return len(beda)
+
+
+def main():
+    # argparse hanya untuk CLI, tidak ikut dimuat saat bot start
+    import argparse
+    parser = argparse.ArgumentParser(description="Jurnal event nota bot")
+    parser.add_argument('--db', required=True, help="path keuangan.db (skema sudah dimigrasi)")
+    parser.add_argument('--arsip-dir', help="folder file arsip (default: folder arsip di samping database)")
+    parser.add_argument('--snapshot', action='store_true', help="buat snapshot keadaan nota")
+    parser.add_argument('--cek', action='store_true', help="bandingkan jurnal dengan data tersimpan")
+    parser.add_argument('--perbaiki', action='store_true', help="tulis ulang nota yang beda dari jurnal")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    arsip_dir = args.arsip_dir or os.path.join(os.path.dirname(os.path.abspath(args.db)), "arsip")
+    if args.snapshot:
+        print(json.dumps(buat_snapshot(args.db), indent=2))
+    if args.perbaiki:
+        print(f"{perbaiki(args.db, arsip_dir)} nota ditulis ulang")
+    if args.cek or not (args.snapshot or args.perbaiki):
+        print(json.dumps(cek(args.db, arsip_dir), indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
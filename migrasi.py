@@ -0,0 +1,845 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migrasi skema database bot nota.
+
+Versi skema disimpan di PRAGMA user_version. Setiap migrasi punya nomor
+versi berurutan dan dijalankan sekali; jika user_version sudah versi
+terbaru, startup tidak menjalankan perintah apa pun selain membaca versi.
+
+Database lama (sebelum ada migrasi) punya user_version 0, jadi semua
+migrasi ditulis idempoten: CREATE ... IF NOT EXISTS dan cek kolom sebelum
+ALTER, sehingga tabel yang sudah dibuat versi bot sebelumnya tidak diubah.
+
+Pengisian data tabel besar (backfill) dijalankan per rentang id dengan
+transaksi pendek dan jeda di antaranya, sehingga bot/worker lain tetap bisa
+menulis selama upgrade. Batas id, SQL, dan checkpoint tiap backfill
+disimpan di tabel riwayat_migrasi (checkpoint dalam transaksi yang sama
+dengan batch-nya); jika proses berhenti di tengah jalan, run berikutnya
+melanjutkan dari batch terakhir.
+
+Saat bot start (tunda_backfill=True) migrasi hanya menjalankan perubahan
+skema dan mencatat rencana backfill, lalu user_version dinaikkan; batch-nya
+dijalankan `jalankan_backfill` di thread latar setelah bot mulai polling.
+Fitur yang membaca data hasil backfill dicek lewat `status_backfill`.
+
+Kode migrasi sengaja tidak memakai fungsi dari bot_nota.py: migrasi lama
+harus tetap menghasilkan skema yang sama walaupun kode bot berubah.
+
+Pemakaian dari command line:
+
+    python migrasi.py --db keuangan.db --dry-run
+    python migrasi.py --db keuangan.db --batch 5000 --cpu 80
+"""
+
+import re
+import json
+import time
+import sqlite3
+import logging
+import datetime
+
+import analitik
+from tutup_buku import Pembatas
+
+logger = logging.getLogger(__name__)
+
+# Jumlah id yang diproses per transaksi backfill
+UKURAN_BATCH = 5000
+
+# Batas CPU backfill (persen satu core); sisa waktu jadi jeda untuk penulis lain
+CPU_PERSEN = 80
+
+MIGRASI = []
+
+
+class Migrasi:
+    def __init__(self, versi, nama, fungsi):
+        self.versi = versi
+        self.nama = nama
+        self.fungsi = fungsi
+
+
+def migrasi(versi, nama):
+    """Dekorator: daftarkan fungsi migrasi untuk versi skema `versi`"""
+    def daftar(fungsi):
+        if MIGRASI and versi <= MIGRASI[-1].versi:
+            raise ValueError(f"Versi migrasi harus naik: {versi}")
+        MIGRASI.append(Migrasi(versi, nama, fungsi))
+        return fungsi
+    return daftar
+
+
+def _sekarang():
+    return datetime.datetime.now().isoformat()
+
+def _ringkas_sql(sql):
+    return " ".join(sql.split())[:80]
+
+
+class Konteks:
+    """Alat bantu fungsi migrasi: eksekusi perintah, cek skema, dan backfill bertahap
+
+    Pada dry-run perintah yang mengubah database hanya dicatat ke `langkah`,
+    dan backfill hanya menghitung jumlah baris yang akan diproses. Dengan
+    `tunda_backfill` backfill hanya dicatat untuk jalankan_backfill.
+    """
+
+    def __init__(self, conn, versi, dry_run=False, ukuran_batch=UKURAN_BATCH, cpu_persen=CPU_PERSEN,
+                 tunda_backfill=False):
+        self.conn = conn
+        self.versi = versi
+        self.dry_run = dry_run
+        self.tunda_backfill = tunda_backfill
+        self.ukuran_batch = ukuran_batch
+        self.pembatas = Pembatas(cpu_persen)
+        self.langkah = []
+
+    def eksekusi(self, sql, parameter=()):
+        if self.dry_run:
+            # CREATE ... IF NOT EXISTS untuk objek yang sudah ada tidak mengubah apa pun
+            nama = re.search(r"IF NOT EXISTS\s+(\w+)", sql)
+            if not (nama and self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (nama.group(1),)).fetchone()):
+                self.langkah.append({'langkah': _ringkas_sql(sql)})
+            return None
+        return self.conn.execute(sql, parameter)
+
+    def ada_tabel(self, nama):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nama,)).fetchone() is not None
+
+    def ada_kolom(self, tabel, kolom):
+        return kolom in [row[1] for row in self.conn.execute(f"PRAGMA table_info({tabel})")]
+
+    def _riwayat(self, langkah):
+        if not self.ada_tabel('riwayat_migrasi'):
+            return None
+        return self.conn.execute(
+            "SELECT checkpoint, batas, baris, durasi, selesai FROM riwayat_migrasi WHERE versi = ? AND langkah = ?",
+            (self.versi, langkah)
+        ).fetchone()
+
+    def tabel_baru(self, nama):
+        """True jika tabel `nama` belum ada saat migrasi ini pertama kali dijalankan
+
+        Keputusan disimpan, sehingga migrasi yang dilanjutkan setelah crash
+        (tabelnya sudah dibuat) tetap mengisi datanya.
+        """
+        langkah = f"baru:{nama}"
+        row = self._riwayat(langkah)
+        if row is not None:
+            return bool(row[0])
+        baru = not self.ada_tabel(nama)
+        if not self.dry_run:
+            self.conn.execute(
+                "INSERT INTO riwayat_migrasi (versi, langkah, checkpoint) VALUES (?, ?, ?)", (self.versi, langkah, int(baru))
+            )
+        return baru
+
+    def backfill(self, langkah, tabel, daftar_sql, setelah=()):
+        """Jalankan `daftar_sql` per rentang id `tabel` (parameter :dari dan :sampai, inklusif)
+
+        Batas atas diambil dari MAX(id) saat backfill pertama kali dicatat;
+        baris yang ditulis setelahnya sudah ditangani trigger/kode bot baru.
+        `setelah` dijalankan sekali di transaksi batch terakhir. Rencana
+        (tabel, SQL, setelah) disimpan di riwayat_migrasi, sehingga backfill
+        yang ditunda dilanjutkan dengan SQL versi migrasinya walaupun kode
+        berubah.
+        """
+        if isinstance(daftar_sql, str):
+            daftar_sql = [daftar_sql]
+        row = self._riwayat(langkah)
+        if row is not None and row[4]:
+            return
+        if row is None:
+            checkpoint = 0
+            batas = self.conn.execute(f"SELECT ifnull(MAX(id), 0) FROM {tabel}").fetchone()[0] if self.ada_tabel(tabel) else 0
+        else:
+            checkpoint, batas = row[0], row[1]
+
+        if self.dry_run:
+            jumlah = self.conn.execute(
+                f"SELECT COUNT(*) FROM {tabel} WHERE id > ? AND id <= ?", (checkpoint, batas)
+            ).fetchone()[0] if batas else 0
+            self.langkah.append({
+                'langkah': langkah, 'baris': jumlah, 'batch': -(-(batas - checkpoint) // self.ukuran_batch),
+            })
+            return
+
+        rencana = json.dumps({'tabel': tabel, 'sql': daftar_sql, 'setelah': list(setelah)})
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO riwayat_migrasi (versi, langkah, checkpoint, batas, baris, durasi, rencana) "
+                "VALUES (?, ?, 0, ?, 0, 0, ?)",
+                (self.versi, langkah, batas, rencana)
+            )
+        else:
+            # Backfill yang terputus sebelum rencana ikut disimpan
+            self.conn.execute(
+                "UPDATE riwayat_migrasi SET rencana = ? WHERE versi = ? AND langkah = ?", (rencana, self.versi, langkah)
+            )
+        if self.tunda_backfill and checkpoint < batas:
+            self.langkah.append({'langkah': langkah, 'tertunda': batas - checkpoint})
+            return
+
+        # Transaksi migrasi di-commit dulu supaya tiap batch berdiri sendiri
+        self.conn.execute("COMMIT")
+        info = _isi_backfill(self.conn, self.versi, langkah, self.ukuran_batch, self.pembatas)
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.langkah.append({'langkah': langkah, **info})
+
+
+def _isi_backfill(conn, versi, langkah, ukuran_batch, pembatas):
+    """Jalankan batch backfill `langkah` dari checkpoint tersimpan sampai selesai; kembalikan ringkasannya
+
+    Checkpoint dibaca ulang di awal tiap batch (di dalam BEGIN IMMEDIATE),
+    jadi dua proses yang melanjutkan backfill yang sama tidak memproses
+    rentang yang sama dua kali.
+    """
+    t0 = time.perf_counter()
+    batch = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            checkpoint, batas, baris, durasi, selesai, rencana = conn.execute(
+                "SELECT checkpoint, batas, baris, durasi, selesai, rencana FROM riwayat_migrasi "
+                "WHERE versi = ? AND langkah = ?", (versi, langkah)
+            ).fetchone()
+            rencana = json.loads(rencana)
+            if selesai:
+                conn.execute("COMMIT")
+                break
+            if checkpoint >= batas:
+                for sql in rencana['setelah']:
+                    conn.execute(sql)
+                conn.execute(
+                    "UPDATE riwayat_migrasi SET selesai = ? WHERE versi = ? AND langkah = ?", (_sekarang(), versi, langkah)
+                )
+                conn.execute("COMMIT")
+                break
+            sampai = min(checkpoint + ukuran_batch, batas)
+            t_batch = time.perf_counter()
+            for sql in rencana['sql']:
+                baris += max(conn.execute(sql, {'dari': checkpoint + 1, 'sampai': sampai}).rowcount, 0)
+            durasi += time.perf_counter() - t_batch
+            conn.execute(
+                "UPDATE riwayat_migrasi SET checkpoint = ?, baris = ?, durasi = ? WHERE versi = ? AND langkah = ?",
+                (sampai, baris, round(durasi, 3), versi, langkah)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        batch += 1
+        pembatas.jeda()
+    info = {'baris': baris, 'batch': batch, 'durasi': round(time.perf_counter() - t0, 3)}
+    logger.info(f"  ↳ {langkah}: {baris:,} baris, {batch} batch, {info['durasi']:.2f} detik")
+    return info
+
+
+# ===== RUNNER =====
+def versi_skema(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def versi_terbaru():
+    return MIGRASI[-1].versi
+
+def _jalankan_satu(conn, m, dry_run, ukuran_batch, cpu_persen, tunda_backfill):
+    k = Konteks(conn, m.versi, dry_run=dry_run, ukuran_batch=ukuran_batch, cpu_persen=cpu_persen,
+                tunda_backfill=tunda_backfill)
+    t0 = time.perf_counter()
+    if dry_run:
+        m.fungsi(k)
+        return {'versi': m.versi, 'nama': m.nama, 'langkah': k.langkah}
+
+    logger.info(f"🔧 Migrasi {m.versi}: {m.nama}")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        m.fungsi(k)
+        durasi = round(time.perf_counter() - t0, 3)
+        conn.execute(f"PRAGMA user_version = {int(m.versi)}")
+        conn.execute('''
+            INSERT OR REPLACE INTO riwayat_migrasi (versi, langkah, durasi, selesai) VALUES (?, '*', ?, ?)
+        ''', (m.versi, durasi, _sekarang()))
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    logger.info(f"✅ Migrasi {m.versi} selesai dalam {durasi:.2f} detik")
+    return {'versi': m.versi, 'nama': m.nama, 'durasi': durasi, 'langkah': k.langkah}
+
+def jalankan(db_file, dry_run=False, ukuran_batch=UKURAN_BATCH, cpu_persen=CPU_PERSEN, tunda_backfill=False):
+    """Terapkan migrasi yang belum dijalankan; kembalikan laporan (list dict per migrasi)
+
+    Dry-run membuka database read-only dan hanya melaporkan rencana.
+    Dengan `tunda_backfill` backfill hanya dicatat; jalankan dengan
+    jalankan_backfill setelah bot siap menerima update.
+    """
+    if dry_run:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    try:
+        versi = versi_skema(conn)
+        if versi >= versi_terbaru():
+            if versi > versi_terbaru():
+                logger.warning(f"⚠️ Skema database versi {versi} lebih baru dari kode ({versi_terbaru()})")
+            return []
+
+        if not dry_run:
+            # WAL agar pembaca tidak terblokir penulis (penting untuk mode banyak worker)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS riwayat_migrasi (
+                    versi INTEGER NOT NULL,
+                    langkah TEXT NOT NULL,
+                    checkpoint INTEGER,
+                    batas INTEGER,
+                    baris INTEGER,
+                    durasi REAL,
+                    selesai TEXT,
+                    rencana TEXT,
+                    PRIMARY KEY (versi, langkah)
+                )
+            ''')
+            if 'rencana' not in [row[1] for row in conn.execute("PRAGMA table_info(riwayat_migrasi)")]:
+                conn.execute("ALTER TABLE riwayat_migrasi ADD COLUMN rencana TEXT")
+            logger.info(f"🔧 Upgrade skema database {versi} → {versi_terbaru()}")
+        return [
+            _jalankan_satu(conn, m, dry_run, ukuran_batch, cpu_persen, tunda_backfill)
+            for m in MIGRASI if m.versi > versi
+        ]
+    finally:
+        conn.close()
+
+def _backfill_tertunda(conn):
+    try:
+        return conn.execute(
+            "SELECT versi, langkah, checkpoint, batas FROM riwayat_migrasi "
+            "WHERE rencana IS NOT NULL AND selesai IS NULL ORDER BY versi, rowid"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # Belum pernah ada migrasi dengan backfill tertunda (tabel/kolom rencana belum ada)
+        return []
+
+def status_backfill(db_file):
+    """[(versi, langkah, checkpoint, batas)] backfill yang belum selesai, urut dijalankan"""
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        return _backfill_tertunda(conn)
+    finally:
+        conn.close()
+
+def jalankan_backfill(db_file, ukuran_batch=UKURAN_BATCH, cpu_persen=CPU_PERSEN):
+    """Selesaikan backfill yang belum selesai (blocking, untuk thread latar); kembalikan laporan per langkah
+
+    Urutan mengikuti migrasi (mis. business_id nota lama sebelum indeks
+    pencarian yang memakai business_id).
+    """
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    try:
+        pembatas = Pembatas(cpu_persen)
+        return [
+            {'versi': versi, 'langkah': langkah, **_isi_backfill(conn, versi, langkah, ukuran_batch, pembatas)}
+            for versi, langkah, _, _ in _backfill_tertunda(conn)
+        ]
+    finally:
+        conn.close()
+
+def format_laporan(laporan, dry_run=False):
+    """Teks laporan migrasi (rencana untuk dry-run, durasi untuk run biasa)"""
+    if not laporan:
+        return "✅ Skema database sudah versi terbaru"
+    teks = "📋 RENCANA MIGRASI (dry-run)\n" if dry_run else "🔧 LAPORAN MIGRASI\n"
+    for m in laporan:
+        durasi = f" ({m['durasi']:.2f} detik)" if 'durasi' in m else ""
+        teks += f"\n{m['versi']}. {m['nama']}{durasi}\n"
+        for langkah in m['langkah']:
+            teks += f"   • {langkah['langkah']}"
+            if 'baris' in langkah:
+                teks += f": {langkah['baris']:,} baris, {langkah['batch']} batch"
+            if 'tertunda' in langkah:
+                teks += f": {langkah['tertunda']:,} id diisi di latar"
+            if 'durasi' in langkah:
+                teks += f", {langkah['durasi']:.2f} detik"
+            teks += "\n"
+    return teks
+
+
+# ===== MIGRASI =====
+@migrasi(1, "tabel nota dan usaha")
+def _tabel_dasar(k):
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS nota_penjualan (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            business_id INTEGER,
+            nomor_nota TEXT UNIQUE,
+            nama_pelanggan TEXT,
+            tanggal TEXT,
+            timestamp TEXT,
+            daftar_barang TEXT,
+            retur_items TEXT,
+            total_sebelum_retur INTEGER,
+            total_retur INTEGER,
+            total_setelah_retur INTEGER,
+            bayar INTEGER,
+            sisa INTEGER,
+            status TEXT,
+            keterangan TEXT
+        )
+    ''')
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS nota_belanja (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            business_id INTEGER,
+            nomor_nota TEXT UNIQUE,
+            nama_supplier TEXT,
+            tanggal TEXT,
+            timestamp TEXT,
+            daftar_barang TEXT,
+            total_belanja INTEGER,
+            keterangan TEXT
+        )
+    ''')
+    # Tabel usaha (tenant) dan anggotanya
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS usaha (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nama TEXT,
+            dibuat TEXT
+        )
+    ''')
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS anggota_usaha (
+            user_id INTEGER PRIMARY KEY,
+            business_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            bergabung TEXT
+        )
+    ''')
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS undangan_usaha (
+            kode TEXT PRIMARY KEY,
+            business_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            dibuat_oleh INTEGER,
+            dibuat TEXT
+        )
+    ''')
+    k.eksekusi("CREATE INDEX IF NOT EXISTS idx_anggota_business ON anggota_usaha (business_id)")
+
+
+@migrasi(2, "business_id untuk nota lama + index per usaha")
+def _business_id(k):
+    for tabel in ("nota_penjualan", "nota_belanja"):
+        if not k.ada_kolom(tabel, "business_id"):
+            k.eksekusi(f"ALTER TABLE {tabel} ADD COLUMN business_id INTEGER")
+
+    # Nota lama tanpa usaha dipindahkan ke usaha pribadi pemiliknya (role owner)
+    filter_null = {
+        tabel: "WHERE business_id IS NULL" if k.ada_kolom(tabel, "business_id") else ""
+        for tabel in ("nota_penjualan", "nota_belanja")
+    }
+    user_tanpa_usaha = [row[0] for row in k.conn.execute(f'''
+        SELECT user_id FROM nota_penjualan {filter_null["nota_penjualan"]}
+        UNION
+        SELECT user_id FROM nota_belanja {filter_null["nota_belanja"]}
+    ''')] if k.ada_tabel("nota_penjualan") else []
+    if user_tanpa_usaha:
+        k.langkah.append({'langkah': f"usaha pribadi untuk {len(user_tanpa_usaha)} user lama"})
+    if not k.dry_run:
+        sekarang = _sekarang()
+        for user_id in user_tanpa_usaha:
+            if k.conn.execute("SELECT 1 FROM anggota_usaha WHERE user_id = ?", (user_id,)).fetchone():
+                continue
+            business_id = k.conn.execute(
+                "INSERT INTO usaha (nama, dibuat) VALUES (?, ?)", (f"Usaha {user_id}", sekarang)
+            ).lastrowid
+            k.conn.execute(
+                "INSERT INTO anggota_usaha (user_id, business_id, role, bergabung) VALUES (?, ?, 'owner', ?)",
+                (user_id, business_id, sekarang)
+            )
+    if user_tanpa_usaha:
+        for tabel in ("nota_penjualan", "nota_belanja"):
+            k.backfill(f"business_id {tabel}", tabel, f'''
+                UPDATE {tabel} SET business_id = (
+                    SELECT business_id FROM anggota_usaha a WHERE a.user_id = {tabel}.user_id
+                ) WHERE id BETWEEN :dari AND :sampai AND business_id IS NULL
+            ''', setelah=["UPDATE usaha SET versi_data = versi_data + 1"] if k.ada_kolom("usaha", "versi_data") else ())
+
+    # Index per usaha: histori & statistik hanya membaca range milik satu usaha
+    k.eksekusi('''
+        CREATE INDEX IF NOT EXISTS idx_penjualan_business_waktu
+        ON nota_penjualan (business_id, timestamp, total_setelah_retur)
+    ''')
+    k.eksekusi('''
+        CREATE INDEX IF NOT EXISTS idx_penjualan_business_pelanggan
+        ON nota_penjualan (business_id, nama_pelanggan, timestamp)
+    ''')
+    k.eksekusi('''
+        CREATE INDEX IF NOT EXISTS idx_belanja_business_waktu
+        ON nota_belanja (business_id, timestamp, total_belanja)
+    ''')
+
+
+# rowid nota_fts = id * 2 untuk penjualan, id * 2 + 1 untuk belanja.
+# Kolom `usaha` berisi token "u<business_id>" supaya pencarian langsung dibatasi per usaha.
+SQL_FTS_BARANG = "ifnull((SELECT group_concat(json_extract(value, '$.nama'), ' ') FROM json_each({kolom})), '')"
+
+TRIGGER_PENCARIAN = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS nota_penjualan_fts_insert AFTER INSERT ON nota_penjualan BEGIN
+        INSERT INTO nota_fts (rowid, nomor_nota, nama, barang, keterangan, usaha)
+        VALUES (NEW.id * 2, NEW.nomor_nota, NEW.nama_pelanggan,
+                {SQL_FTS_BARANG.format(kolom='NEW.daftar_barang')} || ' ' ||
+                {SQL_FTS_BARANG.format(kolom='NEW.retur_items')},
+                NEW.keterangan, 'u' || NEW.business_id);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS nota_belanja_fts_insert AFTER INSERT ON nota_belanja BEGIN
+        INSERT INTO nota_fts (rowid, nomor_nota, nama, barang, keterangan, usaha)
+        VALUES (NEW.id * 2 + 1, NEW.nomor_nota, NEW.nama_supplier,
+                {SQL_FTS_BARANG.format(kolom='NEW.daftar_barang')},
+                NEW.keterangan, 'u' || NEW.business_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS nota_penjualan_fts_delete AFTER DELETE ON nota_penjualan BEGIN
+        DELETE FROM nota_fts WHERE rowid = OLD.id * 2;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS nota_belanja_fts_delete AFTER DELETE ON nota_belanja BEGIN
+        DELETE FROM nota_fts WHERE rowid = OLD.id * 2 + 1;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS nota_penjualan_fts_update
+    AFTER UPDATE OF business_id, nama_pelanggan, daftar_barang, retur_items, keterangan ON nota_penjualan BEGIN
+        UPDATE nota_fts SET
+            nama = NEW.nama_pelanggan,
+            barang = {SQL_FTS_BARANG.format(kolom='NEW.daftar_barang')} || ' ' ||
+                {SQL_FTS_BARANG.format(kolom='NEW.retur_items')},
+            keterangan = NEW.keterangan,
+            usaha = 'u' || NEW.business_id
+        WHERE rowid = NEW.id * 2;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS nota_belanja_fts_update
+    AFTER UPDATE OF business_id, nama_supplier, daftar_barang, keterangan ON nota_belanja BEGIN
+        UPDATE nota_fts SET
+            nama = NEW.nama_supplier,
+            barang = {SQL_FTS_BARANG.format(kolom='NEW.daftar_barang')},
+            keterangan = NEW.keterangan,
+            usaha = 'u' || NEW.business_id
+        WHERE rowid = NEW.id * 2 + 1;
+    END
+    ''',
+]
+
+@migrasi(3, "indeks pencarian nota (FTS5)")
+def _indeks_pencarian(k):
+    baru = k.tabel_baru('nota_fts')
+    k.eksekusi('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS nota_fts USING fts5(
+            nomor_nota, nama, barang, keterangan, usaha,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+    # Trigger dibuat sebelum backfill: nota baru selama backfill langsung masuk indeks
+    for trigger in TRIGGER_PENCARIAN:
+        k.eksekusi(trigger)
+    if baru:
+        k.backfill("nota_fts penjualan", "nota_penjualan", f'''
+            INSERT INTO nota_fts (rowid, nomor_nota, nama, barang, keterangan, usaha)
+            SELECT id * 2, nomor_nota, nama_pelanggan,
+                   {SQL_FTS_BARANG.format(kolom='daftar_barang')} || ' ' ||
+                   {SQL_FTS_BARANG.format(kolom='retur_items')},
+                   keterangan, 'u' || business_id
+            FROM nota_penjualan WHERE id BETWEEN :dari AND :sampai
+        ''')
+        k.backfill("nota_fts belanja", "nota_belanja", f'''
+            INSERT INTO nota_fts (rowid, nomor_nota, nama, barang, keterangan, usaha)
+            SELECT id * 2 + 1, nomor_nota, nama_supplier, {SQL_FTS_BARANG.format(kolom='daftar_barang')},
+                   keterangan, 'u' || business_id
+            FROM nota_belanja WHERE id BETWEEN :dari AND :sampai
+        ''')
+
+
+@migrasi(4, "stok, mutasi stok, dan resep")
+def _stok(k):
+    # Saldo stok per SKU, diperbarui incremental setiap mutasi (tidak dihitung ulang dari histori)
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS stok (
+            business_id INTEGER NOT NULL,
+            sku TEXT NOT NULL,
+            jenis TEXT NOT NULL,
+            satuan TEXT,
+            jumlah REAL NOT NULL DEFAULT 0,
+            batas_minimum REAL NOT NULL DEFAULT 0,
+            diperbarui TEXT,
+            PRIMARY KEY (business_id, sku)
+        )
+    ''')
+    # Buku mutasi stok (audit): setiap perubahan saldo beserta sumbernya
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS mutasi_stok (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            business_id INTEGER NOT NULL,
+            sku TEXT NOT NULL,
+            perubahan REAL NOT NULL,
+            saldo REAL NOT NULL,
+            sumber TEXT NOT NULL,
+            referensi TEXT,
+            user_id INTEGER,
+            timestamp TEXT
+        )
+    ''')
+    k.eksekusi("CREATE INDEX IF NOT EXISTS idx_mutasi_business_sku ON mutasi_stok (business_id, sku, id)")
+    # Resep (BOM) per usaha; jika kosong dipakai RESEP_DEFAULT
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS resep (
+            business_id INTEGER NOT NULL,
+            produk TEXT NOT NULL,
+            bahan TEXT NOT NULL,
+            jumlah REAL NOT NULL,
+            PRIMARY KEY (business_id, produk, bahan)
+        )
+    ''')
+
+
+# Ringkasan item nota per (usaha, bulan, jenis, barang, pihak) dari rentang id nota.
+# Upsert menjumlahkan, jadi hasil beberapa batch untuk kelompok yang sama digabung.
+SQL_ISI_ITEM_BULANAN = '''
+    INSERT INTO item_bulanan (business_id, bulan, jenis, barang, pihak, qty, nilai)
+    SELECT n.business_id, CAST(strftime('%Y%m', n.timestamp) AS INTEGER), '{jenis}',
+           json_extract(j.value, '$.nama'), ifnull(n.{pihak}, ''),
+           SUM(json_extract(j.value, '$.qty')), SUM(json_extract(j.value, '$.subtotal'))
+    FROM {tabel} n, json_each(n.{kolom}) j
+    WHERE n.business_id IS NOT NULL AND n.id BETWEEN :dari AND :sampai
+    GROUP BY 1, 2, 4, 5
+    ON CONFLICT(business_id, bulan, jenis, barang, pihak) DO UPDATE SET
+        qty = item_bulanan.qty + excluded.qty, nilai = item_bulanan.nilai + excluded.nilai
+'''
+
+SUMBER_ITEM_BULANAN = {
+    "nota_penjualan": [
+        SQL_ISI_ITEM_BULANAN.format(jenis=analitik.JENIS_JUAL, tabel="nota_penjualan", kolom="daftar_barang", pihak="nama_pelanggan"),
+        SQL_ISI_ITEM_BULANAN.format(jenis=analitik.JENIS_RETUR, tabel="nota_penjualan", kolom="retur_items", pihak="nama_pelanggan"),
+    ],
+    "nota_belanja": [
+        SQL_ISI_ITEM_BULANAN.format(jenis=analitik.JENIS_BELI, tabel="nota_belanja", kolom="daftar_barang", pihak="nama_supplier"),
+    ],
+}
+
+@migrasi(5, "ringkasan item bulanan + versi data usaha")
+def _item_bulanan(k):
+    # Versi data usaha, naik setiap ada nota/resep baru (untuk invalidasi cache analisa antar worker)
+    if not k.ada_kolom("usaha", "versi_data"):
+        k.eksekusi("ALTER TABLE usaha ADD COLUMN versi_data INTEGER NOT NULL DEFAULT 0")
+
+    baru = k.tabel_baru('item_bulanan')
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS item_bulanan (
+            business_id INTEGER NOT NULL,
+            bulan INTEGER NOT NULL,
+            jenis TEXT NOT NULL,
+            barang TEXT NOT NULL,
+            pihak TEXT NOT NULL,
+            qty REAL NOT NULL,
+            nilai INTEGER NOT NULL,
+            PRIMARY KEY (business_id, bulan, jenis, barang, pihak)
+        )
+    ''')
+    if baru:
+        # Cache analisa yang dibuat selama backfill tidak berlaku setelah data lengkap
+        for tabel, daftar_sql in SUMBER_ITEM_BULANAN.items():
+            k.backfill(f"item_bulanan {tabel}", tabel, daftar_sql, setelah=["UPDATE usaha SET versi_data = versi_data + 1"])
+
+
+@migrasi(6, "ringkasan harian, job terjadwal, index piutang")
+def _tutup_buku(k):
+    # Hanya nota belum lunas: piutang per usaha/pelanggan tanpa scan semua nota
+    k.eksekusi('''
+        CREATE INDEX IF NOT EXISTS idx_penjualan_piutang
+        ON nota_penjualan (business_id, nama_pelanggan, timestamp, sisa) WHERE sisa < 0
+    ''')
+    # Ringkasan harian hasil tutup buku dan checkpoint job terjadwal
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS ringkasan_harian (
+            business_id INTEGER NOT NULL,
+            tanggal TEXT NOT NULL,
+            jumlah_penjualan INTEGER,
+            total_penjualan INTEGER,
+            jumlah_belanja INTEGER,
+            total_belanja INTEGER,
+            jumlah_piutang INTEGER,
+            piutang INTEGER,
+            dibuat TEXT,
+            PRIMARY KEY (business_id, tanggal)
+        )
+    ''')
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS job_run (
+            nama TEXT NOT NULL,
+            tanggal TEXT NOT NULL,
+            tahap TEXT NOT NULL,
+            checkpoint INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL,
+            pemilik TEXT,
+            mulai TEXT,
+            diperbarui TEXT,
+            selesai TEXT,
+            PRIMARY KEY (nama, tanggal)
+        )
+    ''')
+
+
+@migrasi(7, "nomor urut nota")
+def _nomor_urut(k):
+    # Penghitung nomor per prefix; blok nomor dipesan sekaligus (mis. impor massal)
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS nomor_urut (
+            prefix TEXT PRIMARY KEY,
+            terakhir INTEGER NOT NULL
+        )
+    ''')
+
+
+@migrasi(8, "kunci idempotensi nota + offset update")
+def _idempotensi(k):
+    # Kunci (token sesi / update_id) ditulis dalam transaksi yang sama dengan notanya;
+    # baris lebih tua dari jendela dedupe dihapus berkala lewat index waktu
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS nota_idempotensi (
+            kunci TEXT PRIMARY KEY,
+            jenis TEXT NOT NULL,
+            nomor_nota TEXT NOT NULL,
+            waktu TEXT NOT NULL
+        )
+    ''')
+    k.eksekusi("CREATE INDEX IF NOT EXISTS idx_idempotensi_waktu ON nota_idempotensi (waktu)")
+    # Status bot antar restart, mis. update_id terakhir yang selesai diproses
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS status_bot (
+            kunci TEXT PRIMARY KEY,
+            nilai TEXT
+        )
+    ''')
+
+
+@migrasi(9, "arsip tahunan nota")
+def _arsip(k):
+    # File arsip per tahun (lihat arsip.py) beserta jumlah nota yang sudah dipindah
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS arsip_tahun (
+            tahun INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            jumlah_penjualan INTEGER NOT NULL DEFAULT 0,
+            jumlah_belanja INTEGER NOT NULL DEFAULT 0,
+            diperbarui TEXT
+        )
+    ''')
+    # Jumlah & total nota yang sudah dipindah ke arsip, agar statistik tidak membuka arsip
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS ringkasan_arsip (
+            business_id INTEGER NOT NULL,
+            bulan INTEGER NOT NULL,
+            jumlah_penjualan INTEGER NOT NULL DEFAULT 0,
+            total_penjualan INTEGER NOT NULL DEFAULT 0,
+            jumlah_belanja INTEGER NOT NULL DEFAULT 0,
+            total_belanja INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (business_id, bulan)
+        )
+    ''')
+
+
+@migrasi(10, "jurnal event nota")
+def _jurnal(k):
+    # Log append-only perubahan nota (lihat jurnal.py); data = JSON terkompresi (arsip.kompres_json).
+    # Nota lama tidak di-backfill: event 'dibuat'-nya ditulis saat perubahan pertama.
+    # AUTOINCREMENT: id event yang ikut dipindah ke arsip tidak boleh dipakai ulang,
+    # snapshot menandai posisinya dengan id event.
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS nota_event (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            business_id INTEGER NOT NULL,
+            jenis_nota TEXT NOT NULL,
+            nota_id INTEGER NOT NULL,
+            nomor_nota TEXT NOT NULL,
+            jenis TEXT NOT NULL,
+            data BLOB NOT NULL,
+            user_id INTEGER,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    k.eksekusi("CREATE INDEX IF NOT EXISTS idx_event_nota ON nota_event (jenis_nota, nota_id, id)")
+    k.eksekusi("CREATE INDEX IF NOT EXISTS idx_event_nomor ON nota_event (business_id, nomor_nota, id)")
+    # Event tidak pernah diubah; DELETE hanya dipakai saat event ikut dipindah ke arsip
+    k.eksekusi('''
+        CREATE TRIGGER IF NOT EXISTS nota_event_tetap BEFORE UPDATE ON nota_event BEGIN
+            SELECT RAISE(ABORT, 'nota_event hanya bisa ditambah');
+        END
+    ''')
+    # Snapshot keadaan nota sampai event tertentu; data NULL = nota dibatalkan
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS snapshot_nota (
+            jenis_nota TEXT NOT NULL,
+            nota_id INTEGER NOT NULL,
+            event_id INTEGER NOT NULL,
+            data BLOB,
+            PRIMARY KEY (jenis_nota, nota_id)
+        )
+    ''')
+    k.eksekusi('''
+        CREATE TABLE IF NOT EXISTS jurnal_snapshot (
+            id INTEGER PRIMARY KEY,
+            event_id INTEGER NOT NULL,
+            waktu TEXT NOT NULL,
+            jumlah_nota INTEGER NOT NULL,
+            event_diputar INTEGER NOT NULL,
+            durasi REAL
+        )
+    ''')
+
+
+@migrasi(11, "masa berlaku kode undangan")
+def _undangan_kedaluwarsa(k):
+    if not k.ada_kolom("undangan_usaha", "kedaluwarsa"):
+        k.eksekusi("ALTER TABLE undangan_usaha ADD COLUMN kedaluwarsa TEXT")
+    # Kode lama berlaku 48 jam sejak dibuat (default UNDANGAN_BERLAKU_JAM)
+    k.eksekusi('''
+        UPDATE undangan_usaha SET kedaluwarsa = strftime('%Y-%m-%dT%H:%M:%S', dibuat, '+48 hours')
+        WHERE kedaluwarsa IS NULL
+    ''')
+
+
+def main():
+    # argparse hanya untuk CLI, tidak ikut dimuat saat bot start
+    import argparse
+    parser = argparse.ArgumentParser(description="Migrasi skema database bot nota")
+    parser.add_argument('--db', required=True, help="path keuangan.db")
+    parser.add_argument('--dry-run', action='store_true', help="tampilkan rencana tanpa mengubah database")
+    parser.add_argument('--batch', type=int, default=UKURAN_BATCH, help="id per transaksi backfill")
+    parser.add_argument('--cpu', type=int, default=CPU_PERSEN, help="batas CPU backfill (persen)")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    laporan = jalankan(args.db, dry_run=args.dry_run, ukuran_batch=args.batch, cpu_persen=args.cpu)
+    print(format_laporan(laporan, dry_run=args.dry_run))
+    # Backfill yang ditunda bot (mis. bot berhenti sebelum selesai) diselesaikan dari CLI juga
+    if args.dry_run:
+        for versi, langkah, checkpoint, batas in status_backfill(args.db):
+            print(f"⏳ Backfill tertunda {versi}. {langkah}: {batas - checkpoint:,} id")
+    else:
+        for info in jalankan_backfill(args.db, ukuran_batch=args.batch, cpu_persen=args.cpu):
+            print(f"✅ Backfill {info['versi']}. {info['langkah']}: {info['baris']:,} baris, {info['batch']} batch")
+
+if __name__ == '__main__':
+    main()
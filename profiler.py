@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profiler sampling untuk bot nota.
+
+Saat aktif, sebuah thread mengambil sampel stack thread event loop setiap
+beberapa milidetik, tapi hanya ketika ada handler yang sedang dijalankan
+(ditandai oleh decorator `pantau`). Hasilnya berupa daftar fungsi terpanas
+dan selisih snapshot tracemalloc sejak profiling dimulai.
+
+Saat tidak aktif, decorator `pantau` hanya melakukan satu pengecekan atribut.
+"""
+
+import io
+import sys
+import time
+import datetime
+import threading
+import functools
+import inspect
+import tracemalloc
+from collections import Counter, defaultdict
+
+
+class Profiler:
+    """Profiler sampling + tracemalloc yang bisa dinyalakan/dimatikan saat runtime"""
+
+    def __init__(self, interval=0.005, top_n=25):
+        self.interval = interval
+        self.top_n = top_n
+        self.aktif = False
+        self._lock = threading.Lock()
+        # Naik setiap mulai(): panggilan yang masuk di sesi lama tidak dihitung saat keluar
+        self._sesi = 0
+        self._reset()
+
+    def _reset(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self._tid = None
+        self._kedalaman = 0
+        self._mulai = None
+        self._snapshot_awal = None
+        # tracemalloc dimatikan lagi hanya jika dinyalakan oleh mulai() (bukan -X tracemalloc dsb.)
+        self._tracemalloc_sendiri = False
+        self.jumlah_sampel = 0
+        self.sampel_self = Counter()
+        self.sampel_total = Counter()
+        # nama fungsi -> [jumlah panggilan, total detik, maks detik]
+        self.durasi_handler = defaultdict(lambda: [0, 0.0, 0.0])
+
+    # ===== KONTROL =====
+    def mulai(self):
+        """Mulai profiling; mengembalikan False jika sudah berjalan"""
+        with self._lock:
+            if self.aktif:
+                return False
+            self._reset()
+            self._sesi += 1
+            self._tid = threading.get_ident()
+            self._mulai = time.time()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                self._tracemalloc_sendiri = True
+            self._snapshot_awal = tracemalloc.take_snapshot()
+            self._thread = threading.Thread(target=self._loop_sampling, name="profiler-sampler", daemon=True)
+            self.aktif = True
+            self._thread.start()
+            return True
+
+    def berhenti(self, info_tambahan=None):
+        """Hentikan profiling dan kembalikan laporan teks (None jika tidak aktif)"""
+        with self._lock:
+            if not self.aktif:
+                return None
+            self.aktif = False
+            self._stop.set()
+            self._thread.join(timeout=1)
+            snapshot_akhir = tracemalloc.take_snapshot()
+            if self._tracemalloc_sendiri:
+                tracemalloc.stop()
+            laporan = self._buat_laporan(snapshot_akhir, info_tambahan or {})
+            self._snapshot_awal = None
+            return laporan
+
+    # ===== SAMPLING =====
+    def _loop_sampling(self):
+        while not self._stop.wait(self.interval):
+            if self._kedalaman <= 0:
+                continue
+            frame = sys._current_frames().get(self._tid)
+            if frame is None:
+                continue
+            self.jumlah_sampel += 1
+            self.sampel_self[self._kunci(frame)] += 1
+            dilihat = set()
+            while frame is not None:
+                kunci = self._kunci(frame)
+                if kunci not in dilihat:
+                    dilihat.add(kunci)
+                    self.sampel_total[kunci] += 1
+                frame = frame.f_back
+
+    @staticmethod
+    def _kunci(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+    def _masuk(self):
+        self._kedalaman += 1
+        return self._sesi, time.perf_counter()
+
+    def _keluar(self, nama, masuk):
+        sesi, t0 = masuk
+        if sesi != self._sesi:
+            # Masuk sebelum profiler dimulai ulang: kedalaman sesi ini tidak ikut dikurangi
+            return
+        self._kedalaman = max(self._kedalaman - 1, 0)
+        durasi = time.perf_counter() - t0
+        data = self.durasi_handler[nama]
+        data[0] += 1
+        data[1] += durasi
+        data[2] = max(data[2], durasi)
+
+    # ===== LAPORAN =====
+    def _buat_laporan(self, snapshot_akhir, info_tambahan):
+        out = io.StringIO()
+        durasi = time.time() - self._mulai
+        out.write(f"PROFIL BOT - {datetime.datetime.now().isoformat(timespec='seconds')}\n")
+        out.write(f"Durasi profiling : {durasi:.1f} detik\n")
+        out.write(f"Interval sampling: {self.interval * 1000:.1f} ms\n")
+        out.write(f"Jumlah sampel    : {self.jumlah_sampel}\n")
+        for kunci, nilai in info_tambahan.items():
+            out.write(f"{kunci:<17}: {nilai}\n")
+
+        out.write("\n== HANDLER & DB (wall time) ==\n")
+        out.write(f"{'fungsi':<32}{'panggilan':>10}{'rata2 ms':>12}{'maks ms':>12}{'total s':>10}\n")
+        for nama, (n, total, maks) in sorted(self.durasi_handler.items(), key=lambda x: -x[1][1]):
+            out.write(f"{nama:<32}{n:>10}{total / n * 1000:>12.2f}{maks * 1000:>12.2f}{total:>10.3f}\n")
+
+        total_sampel = max(self.jumlah_sampel, 1)
+        out.write(f"\n== TOP {self.top_n} FUNGSI (self) ==\n")
+        for kunci, n in self.sampel_self.most_common(self.top_n):
+            out.write(f"{n / total_sampel * 100:6.1f}%  {n:>6}  {kunci}\n")
+        out.write(f"\n== TOP {self.top_n} FUNGSI (kumulatif) ==\n")
+        for kunci, n in self.sampel_total.most_common(self.top_n):
+            out.write(f"{n / total_sampel * 100:6.1f}%  {n:>6}  {kunci}\n")
+
+        out.write(f"\n== TRACEMALLOC: TOP {self.top_n} PERTUMBUHAN MEMORI ==\n")
+        selisih = snapshot_akhir.compare_to(self._snapshot_awal, 'lineno')
+        for stat in selisih[:self.top_n]:
+            out.write(f"{stat}\n")
+        return out.getvalue()
+
+
+PROFILER = Profiler()
+
+
+def pantau(func):
+    """Decorator untuk handler/fungsi DB; overhead hanya satu pengecekan saat profiler mati"""
+    nama = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper_async(*args, **kwargs):
+            if not PROFILER.aktif:
+                return await func(*args, **kwargs)
+            masuk = PROFILER._masuk()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                PROFILER._keluar(nama, masuk)
+        return wrapper_async
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.aktif:
+            return func(*args, **kwargs)
+        masuk = PROFILER._masuk()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            PROFILER._keluar(nama, masuk)
+    return wrapper
@@ -0,0 +1,1407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Repositori nota: satu antarmuka penyimpanan untuk handler bot nota.
+
+Handler tidak menulis SQL sendiri untuk nota; bot_nota.py memanggil
+repositori sesuai DB_BACKEND:
+
+    RepositoriSQLite   - file SQLite (default), skema dari migrasi.py
+    RepositoriPostgres - PostgreSQL lewat psycopg 3 + pool koneksi
+                         (butuh paket `psycopg[binary]` dan `psycopg-pool`)
+
+Yang dicakup antarmuka:
+    simpan nota   - nota + efeknya (mutasi stok, ringkasan item bulanan,
+                    versi data usaha) dalam satu transaksi, opsional dengan
+                    kunci idempotensi agar update yang diulang tidak
+                    menyimpan nota dua kali (juga untuk koreksi nota)
+    impor massal  - banyak nota sekaligus (executemany / COPY) + ringkasan item
+    nomor nota    - blok nomor urut per prefix, dipesan sekali untuk banyak nota
+    histori       - halaman nota terbaru per usaha / per pelanggan
+    statistik     - jumlah & total penjualan/belanja dalam rentang waktu
+    pencarian     - kandidat nota yang memuat semua kata (kata terakhir prefix)
+    koreksi nota  - ubah / bayar / batal nota lewat jurnal event (jurnal.py):
+                    event + baris nota + efeknya dalam satu transaksi, dengan
+                    cek versi agar dua koreksi bersamaan tidak saling menimpa
+
+Di SQLite, nota tahun tutup bisa dipindah ke file arsip per tahun (arsip.py).
+Histori dan pencarian menyambung ke arsip hanya jika halamannya melewati
+data database utama; statistik memakai ringkasan_arsip tanpa membuka arsip.
+
+Kedua implementasi harus lolos benchmarks/cek_repositori.py.
+"""
+
+import os
+import json
+import sqlite3
+import datetime
+
+import arsip
+import jurnal
+import migrasi
+
+
+class NomorNotaGanda(Exception):
+    """Nomor nota sudah dipakai nota lain"""
+
+
+class NotaBerubah(Exception):
+    """Nota sudah dikoreksi / dibatalkan proses lain sejak dibaca (versi jurnal tidak cocok)"""
+
+
+class NotaSudahTersimpan(Exception):
+    """Kunci idempotensi sudah dipakai: nota / koreksi yang sama pernah disimpan (update/tombol diulang)"""
+
+    def __init__(self, nomor_nota):
+        super().__init__(nomor_nota)
+        self.nomor_nota = nomor_nota
+
+
+# Kolom nota sesuai urutan INSERT/COPY
+KOLOM_PENJUALAN = (
+    'user_id', 'business_id', 'nomor_nota', 'nama_pelanggan', 'tanggal', 'timestamp', 'daftar_barang',
+    'retur_items', 'total_sebelum_retur', 'total_retur', 'total_setelah_retur', 'bayar', 'sisa', 'status',
+    'keterangan',
+)
+KOLOM_BELANJA = (
+    'user_id', 'business_id', 'nomor_nota', 'nama_supplier', 'tanggal', 'timestamp', 'daftar_barang',
+    'total_belanja', 'keterangan',
+)
+KOLOM_JSON = {'daftar_barang', 'retur_items'}
+
+TABEL_NOTA = {
+    'penjualan': ('nota_penjualan', KOLOM_PENJUALAN),
+    'belanja': ('nota_belanja', KOLOM_BELANJA),
+}
+
+
+def baris_nota(nota, kolom):
+    """Tuple nilai nota sesuai urutan kolom; daftar barang diubah ke JSON"""
+    return tuple(
+        json.dumps(nota[k], ensure_ascii=False) if k in KOLOM_JSON and not isinstance(nota[k], str) else nota.get(k)
+        for k in kolom
+    )
+
+
+class Repositori:
+    """Antarmuka repositori nota
+
+    `mutasi` berisi dict (sku, jenis, satuan, perubahan, sumber) dan `item`
+    berisi tuple (bulan YYYYMM, jenis, barang, pihak, qty, nilai); keduanya
+    disimpan dalam transaksi yang sama dengan notanya. Nomor nota yang sudah
+    ada menimbulkan NomorNotaGanda dan tidak ada perubahan yang tersimpan.
+
+    `kunci` (opsional) adalah kunci idempotensi, mis. token sesi atau
+    update_id. Kunci dicatat di transaksi yang sama; jika kunci sudah pernah
+    dipakai, tidak ada perubahan dan NotaSudahTersimpan membawa nomor nota
+    yang tersimpan sebelumnya.
+    """
+
+    def siapkan(self):
+        """Buat / upgrade skema penyimpanan"""
+        raise NotImplementedError
+
+    def simpan_penjualan(self, nota, mutasi=(), item=(), kunci=None):
+        raise NotImplementedError
+
+    def simpan_belanja(self, nota, mutasi=(), item=(), kunci=None):
+        raise NotImplementedError
+
+    def bersihkan_idempotensi(self, sebelum):
+        """Hapus kunci idempotensi dengan waktu < `sebelum` (ISO); kembalikan jumlahnya"""
+        raise NotImplementedError
+
+    def nota_kunci(self, kunci):
+        """Nomor nota yang tercatat untuk kunci idempotensi, atau None jika kunci belum dipakai"""
+        raise NotImplementedError
+
+    def impor_nota(self, jenis, daftar_nota, business_id=None, item=()):
+        """Simpan banyak nota 'penjualan'/'belanja' sekaligus; kembalikan jumlahnya
+
+        Stok tidak diubah. Jika `item` diisi, ringkasan item bulanan usaha
+        `business_id` ikut ditambah dan versi data dinaikkan dalam transaksi
+        yang sama.
+        """
+        raise NotImplementedError
+
+    def alokasi_nomor(self, prefix, jumlah=1):
+        """Pesan `jumlah` nomor urut berikutnya untuk `prefix`; kembalikan nomor pertama"""
+        raise NotImplementedError
+
+    def histori_pelanggan(self, business_id, nama_pelanggan, limit=10, offset=0):
+        """[(nomor_nota, tanggal, total_setelah_retur, status)] terbaru dulu"""
+        raise NotImplementedError
+
+    def histori_semua(self, business_id, limit=10, offset=0):
+        """[(nomor_nota, nama_pelanggan, tanggal, total_setelah_retur, status)] terbaru dulu"""
+        raise NotImplementedError
+
+    def statistik_periode(self, business_id, awal, akhir):
+        """((jumlah, total) penjualan, (jumlah, total) belanja) untuk timestamp [awal, akhir)"""
+        raise NotImplementedError
+
+    def kandidat_cari(self, business_id, kata, limit, offset=0):
+        """Nota yang memuat semua `kata` (kata terakhir sebagai prefix), terbaru dulu, mulai dari `offset`
+
+        Kembalikan [(kunci, nomor_nota, nama, barang, keterangan)] dengan
+        kunci = id * 2 untuk penjualan dan id * 2 + 1 untuk belanja.
+        """
+        raise NotImplementedError
+
+    def ambil_hasil_cari(self, daftar_kunci):
+        """{kunci: dict jenis, nomor_nota, nama, tanggal, total, status}"""
+        raise NotImplementedError
+
+    def ringkasan_pelanggan(self, business_id, nama_pelanggan=None, per_pelanggan=5):
+        """Piutang dan nota terakhir per pelanggan (bahan indeks inline), hanya data aktif
+
+        Kembalikan (piutang, nota): piutang [(nama_pelanggan, jumlah nota
+        belum lunas, total kekurangan)] dan nota [(nama_pelanggan, nomor_nota,
+        tanggal, total_setelah_retur, sisa, status, daftar_barang (list),
+        timestamp)] berisi `per_pelanggan` nota terbaru tiap pelanggan, urut
+        nama lalu terbaru dulu. `nama_pelanggan` membatasi ke satu pelanggan.
+        """
+        raise NotImplementedError
+
+    def saldo_stok(self, business_id, sku):
+        raise NotImplementedError
+
+    def catat_mutasi(self, business_id, mutasi, referensi=None, user_id=None, kunci=None):
+        """Catat mutasi stok di luar nota (mis. produksi) dalam satu transaksi; kembalikan saldo baru per mutasi
+
+        `kunci` seperti pada simpan (dicatat dengan jenis 'mutasi' dan nomor
+        `referensi`); kunci yang sudah dipakai melempar NotaSudahTersimpan.
+        """
+        raise NotImplementedError
+
+    def opname_stok(self, business_id, sku, jenis, satuan, jumlah, user_id=None):
+        """Samakan saldo dengan jumlah fisik; selisihnya dicatat sebagai mutasi 'opname'. Kembalikan saldo"""
+        raise NotImplementedError
+
+    def atur_batas_minimum(self, business_id, sku, jenis, satuan, batas):
+        raise NotImplementedError
+
+    def daftar_stok(self, business_id):
+        """[(sku, jenis, satuan, jumlah, batas_minimum)] barang yang pernah bermutasi / diberi batas"""
+        raise NotImplementedError
+
+    def stok_menipis(self, business_id, daftar_sku):
+        """[(sku, jumlah, satuan, batas_minimum)] yang minus atau tidak di atas batas minimum"""
+        raise NotImplementedError
+
+    def mutasi_stok(self, business_id, sku, limit=10):
+        """[(perubahan, saldo, sumber, referensi, timestamp)] terbaru dulu"""
+        raise NotImplementedError
+
+    def piutang_pelanggan(self, business_id, sebelum=None):
+        """[(nama_pelanggan, jumlah nota belum lunas, total kekurangan)], nota dengan timestamp < `sebelum`"""
+        raise NotImplementedError
+
+    def versi_data(self, business_id):
+        raise NotImplementedError
+
+    def naikkan_versi_data(self, business_id):
+        """Tandai data usaha berubah di luar nota (mis. resep), untuk invalidasi cache analisa"""
+        raise NotImplementedError
+
+    def item_bulanan(self, business_id, sampai_bulan):
+        """[(bulan, jenis, barang, pihak, qty, nilai)] sampai bulan YYYYMM"""
+        raise NotImplementedError
+
+    def ambil_nota(self, business_id, jenis, nomor_nota):
+        """Nota 'penjualan'/'belanja' di data aktif untuk dikoreksi, atau None
+
+        Kembalikan dict kolom nota (daftar barang sebagai list) + `id` dan
+        `versi` (id event jurnal terakhir nota, 0 jika belum punya event).
+        """
+        raise NotImplementedError
+
+    def koreksi_nota(self, jenis, nota_lama, nota_baru, event, info=None, mutasi=(), item=(), user_id=None, kunci=None):
+        """Catat event jurnal `event` untuk nota hasil ambil_nota dan terapkan efeknya; kembalikan id event
+
+        `nota_baru` None membatalkan nota (baris nota dihapus). Kolom yang
+        berubah disimpan di data event bersama `info` (mis. nominal, alasan).
+        `mutasi` dan `item` berisi selisihnya (format sama dengan simpan).
+        Jika nota sudah berubah sejak dibaca, tidak ada yang disimpan dan
+        NotaBerubah dilempar. `kunci` sama seperti pada simpan: koreksi yang
+        diulang dengan kunci yang sama melempar NotaSudahTersimpan.
+        """
+        raise NotImplementedError
+
+    def riwayat_nota(self, business_id, nomor_nota):
+        """[(jenis event, data, user_id, timestamp)] event jurnal nota (juga yang sudah diarsipkan), terlama dulu"""
+        raise NotImplementedError
+
+    def nota_diarsipkan(self, business_id, nomor_nota):
+        """True jika nota sudah dipindah ke arsip tahunan (hanya SQLite yang punya arsip)"""
+        return False
+
+    def tutup(self):
+        pass
+
+
+# ===== SQLITE =====
+# Query histori & statistik per usaha (dipakai juga benchmarks/bench_query.py)
+SQL_HISTORI_PELANGGAN = '''
+    SELECT nomor_nota, tanggal, total_setelah_retur, status
+    FROM nota_penjualan
+    WHERE business_id = ? AND nama_pelanggan = ?
+    ORDER BY timestamp DESC
+    LIMIT ? OFFSET ?
+'''
+
+SQL_HISTORI_SEMUA = '''
+    SELECT nomor_nota, nama_pelanggan, tanggal, total_setelah_retur, status
+    FROM nota_penjualan
+    WHERE business_id = ?
+    ORDER BY timestamp DESC
+    LIMIT ? OFFSET ?
+'''
+
+SQL_STATISTIK_PENJUALAN = '''
+    SELECT COUNT(*), SUM(total_setelah_retur)
+    FROM nota_penjualan
+    WHERE business_id = ? AND timestamp >= ? AND timestamp < ?
+'''
+
+SQL_STATISTIK_BELANJA = '''
+    SELECT COUNT(*), SUM(total_belanja)
+    FROM nota_belanja
+    WHERE business_id = ? AND timestamp >= ? AND timestamp < ?
+'''
+
+SQL_CARI = '''
+    SELECT rowid, nomor_nota, nama, barang, keterangan FROM nota_fts
+    WHERE nota_fts MATCH ?
+    ORDER BY rowid DESC
+    LIMIT ? OFFSET ?
+'''
+
+SQL_JUMLAH_CARI = "SELECT COUNT(*) FROM nota_fts WHERE nota_fts MATCH ?"
+
+# Kolom histori dan filternya (parameter histori_semua / histori_pelanggan)
+KOLOM_HISTORI_SEMUA = "nomor_nota, nama_pelanggan, tanggal, total_setelah_retur, status"
+KOLOM_HISTORI_PELANGGAN = "nomor_nota, tanggal, total_setelah_retur, status"
+SYARAT_HISTORI_SEMUA = "business_id = ?"
+SYARAT_HISTORI_PELANGGAN = "business_id = ? AND nama_pelanggan = ?"
+
+# Histori satu tahun arsip: nota database utama di rentang tahunnya (mis. piutang yang
+# belum dipindah) + nota arsip. Baris arsip yang masih ada di database utama dilewati.
+SQL_HISTORI_ARSIP = '''
+    SELECT {kolom}, timestamp FROM main.nota_penjualan
+    WHERE {syarat} AND timestamp >= ? AND timestamp < ?
+    UNION ALL
+    SELECT {kolom}, timestamp FROM arsip.nota_penjualan a
+    WHERE {syarat} AND NOT EXISTS (SELECT 1 FROM main.nota_penjualan h WHERE h.id = a.id)
+    ORDER BY timestamp DESC
+'''
+
+# Jumlah baris SQL_HISTORI_ARSIP tanpa cek NOT EXISTS per baris arsip (index saja),
+# untuk melompati tahun arsip utuh saat offset halaman lebih jauh lagi
+SQL_JUMLAH_HISTORI_ARSIP = '''
+    SELECT (SELECT COUNT(*) FROM arsip.nota_penjualan WHERE {syarat})
+         + (SELECT COUNT(*) FROM main.nota_penjualan h
+            WHERE {syarat} AND timestamp >= ? AND timestamp < ?
+            AND NOT EXISTS (SELECT 1 FROM arsip.nota_penjualan a WHERE a.id = h.id))
+'''
+
+# Baris arsip yang masih ada di database utama (pemindahan belum selesai) dilewati
+SQL_CARI_ARSIP = '''
+    SELECT a.rowid, a.nomor_nota, a.nama, a.barang, a.keterangan FROM arsip.nota_fts a
+    WHERE a.nota_fts MATCH ? AND NOT EXISTS (SELECT 1 FROM main.nota_fts m WHERE m.rowid = a.rowid)
+    ORDER BY a.rowid DESC
+    LIMIT ? OFFSET ?
+'''
+
+SQL_JUMLAH_CARI_ARSIP = '''
+    SELECT COUNT(*) FROM arsip.nota_fts a
+    WHERE a.nota_fts MATCH ? AND NOT EXISTS (SELECT 1 FROM main.nota_fts m WHERE m.rowid = a.rowid)
+'''
+
+SQL_HASIL_CARI = {
+    0: '''
+        SELECT nomor_nota, nama_pelanggan, tanggal, total_setelah_retur, status
+        FROM {db}.nota_penjualan WHERE id = ?
+    ''',
+    1: '''
+        SELECT nomor_nota, nama_supplier, tanggal, total_belanja, 'BELANJA'
+        FROM {db}.nota_belanja WHERE id = ?
+    ''',
+}
+
+# Nota yang sudah dipindah ke arsip, per bulan YYYYMM
+SQL_STATISTIK_ARSIP = '''
+    SELECT ifnull(SUM(jumlah_penjualan), 0), ifnull(SUM(total_penjualan), 0),
+           ifnull(SUM(jumlah_belanja), 0), ifnull(SUM(total_belanja), 0)
+    FROM ringkasan_arsip
+    WHERE business_id = ? AND bulan >= ? AND bulan < ?
+'''
+
+SQL_ITEM_BULANAN = '''
+    SELECT bulan, jenis, barang, pihak, qty, nilai
+    FROM item_bulanan
+    WHERE business_id = ? AND bulan <= ?
+'''
+
+# Indeks pelanggan inline: nama pelanggan usaha dilompati lewat indeks (satu seek per
+# pelanggan, bukan scan semua nota), lalu nota terakhir tiap pelanggan dari indeks yang sama
+SQL_PELANGGAN_USAHA = '''
+    SELECT MIN(nama_pelanggan) FROM nota_penjualan WHERE business_id = :b
+    UNION ALL
+    SELECT (SELECT MIN(nama_pelanggan) FROM nota_penjualan WHERE business_id = :b AND nama_pelanggan > p.nama)
+    FROM p WHERE p.nama IS NOT NULL
+'''
+
+SQL_NOTA_TERAKHIR_PELANGGAN = '''
+    WITH RECURSIVE p(nama) AS ({pelanggan})
+    SELECT n.nama_pelanggan, n.nomor_nota, n.tanggal, n.total_setelah_retur, n.sisa, n.status,
+           n.daftar_barang, n.timestamp
+    FROM p JOIN nota_penjualan n ON n.id IN (
+        SELECT id FROM nota_penjualan WHERE business_id = :b AND nama_pelanggan = p.nama
+        ORDER BY timestamp DESC LIMIT :n
+    )
+    ORDER BY n.nama_pelanggan, n.timestamp DESC
+'''
+
+# Piutang per pelanggan dari partial index idx_penjualan_piutang
+SQL_PIUTANG_PELANGGAN = '''
+    SELECT nama_pelanggan, COUNT(*), -SUM(sisa) FROM nota_penjualan
+    WHERE business_id = :b AND sisa < 0 {syarat}
+    GROUP BY nama_pelanggan
+'''
+
+SQL_STOK_MENIPIS = '''
+    SELECT sku, jumlah, satuan, batas_minimum FROM stok
+    WHERE business_id = ? AND sku IN ({daftar})
+      AND (jumlah < 0 OR (batas_minimum > 0 AND jumlah <= batas_minimum))
+'''
+
+SQL_MUTASI_STOK = '''
+    SELECT perubahan, saldo, sumber, referensi, timestamp FROM mutasi_stok
+    WHERE business_id = ? AND sku = ?
+    ORDER BY id DESC LIMIT ?
+'''
+
+SQL_TAMBAH_ITEM_BULANAN = '''
+    INSERT INTO item_bulanan (business_id, bulan, jenis, barang, pihak, qty, nilai) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(business_id, bulan, jenis, barang, pihak) DO UPDATE SET
+        qty = item_bulanan.qty + excluded.qty, nilai = item_bulanan.nilai + excluded.nilai
+'''
+
+def buat_query_fts(business_id, kata):
+    """Query FTS5 yang dibatasi satu usaha: semua kata utuh, kata terakhir prefix"""
+    if not kata:
+        return None
+    syarat = [f'"{k}"' for k in kata[:-1]] + [f'"{kata[-1]}"*']
+    return f'usaha : "u{business_id}" AND ' + ' '.join(syarat)
+
+def pakai_kunci_sqlite(conn, kunci, jenis, nomor_nota, waktu):
+    """Catat kunci idempotensi di transaksi `conn`; NotaSudahTersimpan (transaksi dibatalkan) jika sudah dipakai"""
+    try:
+        conn.execute(
+            "INSERT INTO nota_idempotensi (kunci, jenis, nomor_nota, waktu) VALUES (?, ?, ?, ?)",
+            (kunci, jenis, nomor_nota, waktu)
+        )
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        row = conn.execute("SELECT nomor_nota FROM nota_idempotensi WHERE kunci = ?", (kunci,)).fetchone()
+        raise NotaSudahTersimpan(row[0])
+
+def catat_mutasi_sqlite(conn, business_id, mutasi, referensi=None, user_id=None):
+    """Ubah saldo stok satu SKU secara incremental dan catat di buku mutasi; kembalikan saldo baru"""
+    sekarang = datetime.datetime.now().isoformat()
+    saldo = conn.execute('''
+        INSERT INTO stok (business_id, sku, jenis, satuan, jumlah, diperbarui) VALUES (?, ?, ?, ?, round(?, 3), ?)
+        ON CONFLICT(business_id, sku) DO UPDATE SET
+            jumlah = round(stok.jumlah + excluded.jumlah, 3), diperbarui = excluded.diperbarui
+        RETURNING jumlah
+    ''', (business_id, mutasi['sku'], mutasi['jenis'], mutasi['satuan'], mutasi['perubahan'], sekarang)).fetchall()[0][0]
+    conn.execute('''
+        INSERT INTO mutasi_stok (business_id, sku, perubahan, saldo, sumber, referensi, user_id, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (business_id, mutasi['sku'], mutasi['perubahan'], saldo, mutasi['sumber'], referensi, user_id, sekarang))
+    return saldo
+
+def _tambah_event_sqlite(conn, jenis, nota_id, nota, event, data, user_id, waktu):
+    return conn.execute('''
+        INSERT INTO nota_event (business_id, jenis_nota, nota_id, nomor_nota, jenis, data, user_id, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (nota['business_id'], jenis, nota_id, nota['nomor_nota'], event, jurnal.kode_data(data), user_id, waktu)).lastrowid
+
+def _naikkan_versi_sqlite(conn, business_id):
+    conn.execute('''
+        INSERT INTO usaha (id, versi_data) VALUES (?, 1)
+        ON CONFLICT(id) DO UPDATE SET versi_data = usaha.versi_data + 1
+    ''', (business_id,))
+
+# Versi nota untuk cek koreksi bersamaan: id event jurnal terakhirnya
+SQL_VERSI_NOTA = "SELECT ifnull(MAX(id), 0) FROM nota_event WHERE jenis_nota = ? AND nota_id = ?"
+
+def _bulan_penuh(awal, akhir):
+    """Bulan YYYYMM [dari, sampai) yang awal bulannya ada di rentang timestamp [awal, akhir)
+
+    Ringkasan arsip per bulan, jadi rentang statistik yang tidak pas awal
+    bulan dibulatkan ke bulan penuh di dalamnya.
+    """
+    def bulan(teks):
+        waktu = datetime.datetime.fromisoformat(teks)
+        awal_bulan = waktu.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # Bulan ke-13 tetap benar sebagai batas: YYYY13 di antara YYYY12 dan (YYYY+1)01
+        return waktu.year * 100 + waktu.month + (waktu != awal_bulan)
+    return bulan(awal), bulan(akhir)
+
+def _tambah_arsip(statistik, jumlah, total):
+    if not jumlah:
+        return statistik
+    return statistik[0] + jumlah, (statistik[1] or 0) + total
+
+
+class RepositoriSQLite(Repositori):
+    """Repositori di file SQLite; satu koneksi per operasi (aman untuk banyak proses)
+
+    `arsip_dir` adalah folder file arsip tahunan (default: folder arsip di
+    samping file database).
+    """
+
+    def __init__(self, db_file, arsip_dir=None):
+        self.db_file = db_file
+        self.arsip_dir = arsip_dir or os.path.join(os.path.dirname(os.path.abspath(db_file)), "arsip")
+
+    def siapkan(self):
+        return migrasi.jalankan(self.db_file)
+
+    def _simpan(self, jenis, nota, mutasi, item, kunci):
+        tabel, kolom = TABEL_NOTA[jenis]
+        conn = sqlite3.connect(self.db_file)
+        try:
+            if kunci is not None:
+                pakai_kunci_sqlite(conn, kunci, jenis, nota['nomor_nota'], nota['timestamp'])
+            try:
+                nota_id = conn.execute(
+                    f"INSERT INTO {tabel} ({', '.join(kolom)}) VALUES ({', '.join('?' * len(kolom))})",
+                    baris_nota(nota, kolom)
+                ).lastrowid
+            except sqlite3.IntegrityError as e:
+                if 'nomor_nota' in str(e):
+                    raise NomorNotaGanda(nota['nomor_nota']) from e
+                raise
+            _tambah_event_sqlite(conn, jenis, nota_id, nota, jurnal.DIBUAT,
+                                 {'nota': jurnal.keadaan_nota(nota, kolom)}, nota['user_id'], nota['timestamp'])
+            business_id = nota['business_id']
+            for m in mutasi:
+                catat_mutasi_sqlite(conn, business_id, m, nota['nomor_nota'], nota['user_id'])
+            conn.executemany(SQL_TAMBAH_ITEM_BULANAN, [(business_id, *baris) for baris in item])
+            _naikkan_versi_sqlite(conn, business_id)
+            conn.commit()
+        finally:
+            # Selalu tutup koneksi agar insert gagal tidak menahan lock tulis
+            conn.close()
+
+    def simpan_penjualan(self, nota, mutasi=(), item=(), kunci=None):
+        self._simpan('penjualan', nota, mutasi, item, kunci)
+
+    def simpan_belanja(self, nota, mutasi=(), item=(), kunci=None):
+        self._simpan('belanja', nota, mutasi, item, kunci)
+
+    def bersihkan_idempotensi(self, sebelum):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            jumlah = conn.execute("DELETE FROM nota_idempotensi WHERE waktu < ?", (sebelum,)).rowcount
+            conn.commit()
+            return jumlah
+        finally:
+            conn.close()
+
+    def nota_kunci(self, kunci):
+        row = self._baca("SELECT nomor_nota FROM nota_idempotensi WHERE kunci = ?", (kunci,), satu=True)
+        return row[0] if row else None
+
+    def impor_nota(self, jenis, daftar_nota, business_id=None, item=()):
+        tabel, kolom = TABEL_NOTA[jenis]
+        daftar_kolom = ', '.join(kolom)
+        conn = sqlite3.connect(self.db_file)
+        try:
+            # Nota ditampung dulu di tabel sementara lalu dipindah dengan satu INSERT ... SELECT:
+            # trigger indeks pencarian jauh lebih murah dalam satu statement daripada satu statement per nota
+            conn.execute(f"CREATE TEMP TABLE impor_nota AS SELECT {daftar_kolom} FROM {tabel} WHERE 0")
+            conn.executemany(
+                f"INSERT INTO temp.impor_nota VALUES ({', '.join('?' * len(kolom))})",
+                (baris_nota(nota, kolom) for nota in daftar_nota)
+            )
+            try:
+                cursor = conn.execute(f"INSERT INTO {tabel} ({daftar_kolom}) SELECT {daftar_kolom} FROM temp.impor_nota")
+            except sqlite3.IntegrityError as e:
+                if 'nomor_nota' in str(e):
+                    raise NomorNotaGanda(str(e)) from e
+                raise
+            jumlah = cursor.rowcount
+            if item:
+                conn.executemany(SQL_TAMBAH_ITEM_BULANAN, [(business_id, *baris) for baris in item])
+                _naikkan_versi_sqlite(conn, business_id)
+            conn.commit()
+            return jumlah
+        finally:
+            conn.close()
+
+    def alokasi_nomor(self, prefix, jumlah=1):
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            terakhir = conn.execute('''
+                INSERT INTO nomor_urut (prefix, terakhir) VALUES (?, ?)
+                ON CONFLICT(prefix) DO UPDATE SET terakhir = nomor_urut.terakhir + excluded.terakhir
+                RETURNING terakhir
+            ''', (prefix, jumlah)).fetchall()[0][0]
+            conn.commit()
+            return terakhir - jumlah + 1
+        finally:
+            conn.close()
+
+    def _baca(self, sql, parameter, satu=False):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            cursor = conn.execute(sql, parameter)
+            return cursor.fetchone() if satu else cursor.fetchall()
+        finally:
+            conn.close()
+
+    def histori_pelanggan(self, business_id, nama_pelanggan, limit=10, offset=0):
+        return self._histori(SQL_HISTORI_PELANGGAN, KOLOM_HISTORI_PELANGGAN, SYARAT_HISTORI_PELANGGAN,
+                             (business_id, nama_pelanggan), limit, offset)
+
+    def histori_semua(self, business_id, limit=10, offset=0):
+        return self._histori(SQL_HISTORI_SEMUA, KOLOM_HISTORI_SEMUA, SYARAT_HISTORI_SEMUA,
+                             (business_id,), limit, offset)
+
+    def _histori(self, sql, kolom, syarat, parameter, limit, offset):
+        """Halaman histori database utama, disambung ke arsip (terbaru dulu) jika halamannya melewati data utama"""
+        conn = sqlite3.connect(self.db_file)
+        try:
+            daftar = arsip.daftar_arsip(conn, self.arsip_dir)
+            if not daftar:
+                return conn.execute(sql, (*parameter, limit, offset)).fetchall()
+
+            # Nota database utama sejak tahun setelah arsip terbaru
+            akhir = f"{daftar[0][0] + 1:04d}-01-01"
+            rows = conn.execute(f'''
+                SELECT {kolom} FROM nota_penjualan WHERE {syarat} AND timestamp >= ?
+                ORDER BY timestamp DESC LIMIT ? OFFSET ?
+            ''', (*parameter, akhir, limit, offset)).fetchall()
+            if len(rows) == limit:
+                return rows
+            lewati = 0 if rows else offset - conn.execute(
+                f"SELECT COUNT(*) FROM nota_penjualan WHERE {syarat} AND timestamp >= ?", (*parameter, akhir)
+            ).fetchone()[0]
+
+            sql_arsip = SQL_HISTORI_ARSIP.format(kolom=kolom, syarat=syarat)
+            sql_jumlah = SQL_JUMLAH_HISTORI_ARSIP.format(syarat=syarat)
+            for i, (tahun, path) in enumerate(daftar):
+                # Arsip terlama juga mencakup nota database utama yang lebih tua lagi
+                awal = "" if i == len(daftar) - 1 else f"{tahun:04d}-01-01"
+                arsip.pasang(conn, path)
+                try:
+                    jumlah = conn.execute(sql_jumlah, (*parameter, *parameter, awal, akhir)).fetchone()[0] if lewati else 0
+                    if lewati and lewati >= jumlah:
+                        lewati -= jumlah
+                    else:
+                        rows += [row[:-1] for row in conn.execute(
+                            sql_arsip + " LIMIT ? OFFSET ?", (*parameter, awal, akhir, *parameter, limit - len(rows), lewati)
+                        )]
+                        lewati = 0
+                finally:
+                    arsip.lepas(conn)
+                if len(rows) == limit:
+                    break
+                akhir = awal
+            return rows
+        finally:
+            conn.close()
+
+    def statistik_periode(self, business_id, awal, akhir):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            penjualan = conn.execute(SQL_STATISTIK_PENJUALAN, (business_id, awal, akhir)).fetchone()
+            belanja = conn.execute(SQL_STATISTIK_BELANJA, (business_id, awal, akhir)).fetchone()
+            jp, tp, jb, tb = conn.execute(SQL_STATISTIK_ARSIP, (business_id, *_bulan_penuh(awal, akhir))).fetchone()
+            return _tambah_arsip(penjualan, jp, tp), _tambah_arsip(belanja, jb, tb)
+        finally:
+            conn.close()
+
+    def kandidat_cari(self, business_id, kata, limit, offset=0):
+        """Kandidat database utama, disambung ke arsip (terbaru dulu) seperti halaman histori"""
+        query_fts = buat_query_fts(business_id, kata)
+        if query_fts is None:
+            return []
+        conn = sqlite3.connect(self.db_file)
+        try:
+            hasil = conn.execute(SQL_CARI, (query_fts, limit, offset)).fetchall()
+            if len(hasil) == limit:
+                return hasil
+            daftar = arsip.daftar_arsip(conn, self.arsip_dir)
+            if not daftar:
+                return hasil
+            lewati = 0 if hasil else offset - conn.execute(SQL_JUMLAH_CARI, (query_fts,)).fetchone()[0]
+            for tahun, path in daftar:
+                arsip.pasang(conn, path)
+                try:
+                    jumlah = conn.execute(SQL_JUMLAH_CARI_ARSIP, (query_fts,)).fetchone()[0] if lewati else 0
+                    if lewati and lewati >= jumlah:
+                        lewati -= jumlah
+                    else:
+                        hasil += conn.execute(SQL_CARI_ARSIP, (query_fts, limit - len(hasil), lewati)).fetchall()
+                        lewati = 0
+                finally:
+                    arsip.lepas(conn)
+                if len(hasil) == limit:
+                    break
+            return hasil
+        finally:
+            conn.close()
+
+    def ambil_hasil_cari(self, daftar_kunci):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            hasil = {}
+            self._isi_hasil_cari(conn, "main", daftar_kunci, hasil)
+            sisa = [kunci for kunci in daftar_kunci if kunci not in hasil]
+            if sisa:
+                for tahun, path in arsip.daftar_arsip(conn, self.arsip_dir):
+                    arsip.pasang(conn, path)
+                    try:
+                        self._isi_hasil_cari(conn, "arsip", sisa, hasil)
+                    finally:
+                        arsip.lepas(conn)
+                    sisa = [kunci for kunci in sisa if kunci not in hasil]
+                    if not sisa:
+                        break
+            return hasil
+        finally:
+            conn.close()
+
+    def _isi_hasil_cari(self, conn, db, daftar_kunci, hasil):
+        for kunci in daftar_kunci:
+            row = conn.execute(SQL_HASIL_CARI[kunci % 2].format(db=db), (kunci // 2,)).fetchone()
+            if row:
+                hasil[kunci] = _hasil_cari(kunci, row)
+
+    def ringkasan_pelanggan(self, business_id, nama_pelanggan=None, per_pelanggan=5):
+        parameter = {'b': business_id, 'nama': nama_pelanggan, 'n': per_pelanggan}
+        satu = nama_pelanggan is not None
+        conn = sqlite3.connect(self.db_file)
+        try:
+            piutang = conn.execute(SQL_PIUTANG_PELANGGAN.format(
+                syarat="AND nama_pelanggan = :nama" if satu else ""), parameter).fetchall()
+            nota = conn.execute(SQL_NOTA_TERAKHIR_PELANGGAN.format(
+                pelanggan="SELECT :nama" if satu else SQL_PELANGGAN_USAHA), parameter).fetchall()
+        finally:
+            conn.close()
+        return piutang, [(*row[:6], json.loads(row[6] or '[]'), row[7]) for row in nota]
+
+    def saldo_stok(self, business_id, sku):
+        row = self._baca("SELECT jumlah FROM stok WHERE business_id = ? AND sku = ?", (business_id, sku), satu=True)
+        return row[0] if row else 0
+
+    def catat_mutasi(self, business_id, mutasi, referensi=None, user_id=None, kunci=None):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            if kunci is not None:
+                pakai_kunci_sqlite(conn, kunci, 'mutasi', referensi, datetime.datetime.now().isoformat())
+            saldo = [catat_mutasi_sqlite(conn, business_id, m, referensi, user_id) for m in mutasi]
+            conn.commit()
+            return saldo
+        finally:
+            conn.close()
+
+    def opname_stok(self, business_id, sku, jenis, satuan, jumlah, user_id=None):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT jumlah FROM stok WHERE business_id = ? AND sku = ?", (business_id, sku)).fetchone()
+            mutasi = {'sku': sku, 'jenis': jenis, 'satuan': satuan,
+                      'perubahan': jumlah - (row[0] if row else 0), 'sumber': 'opname'}
+            saldo = catat_mutasi_sqlite(conn, business_id, mutasi, None, user_id)
+            conn.commit()
+            return saldo
+        finally:
+            conn.close()
+
+    def atur_batas_minimum(self, business_id, sku, jenis, satuan, batas):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            conn.execute('''
+                INSERT INTO stok (business_id, sku, jenis, satuan, batas_minimum, diperbarui) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(business_id, sku) DO UPDATE SET batas_minimum = excluded.batas_minimum
+            ''', (business_id, sku, jenis, satuan, batas, datetime.datetime.now().isoformat()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def daftar_stok(self, business_id):
+        return self._baca(
+            "SELECT sku, jenis, satuan, jumlah, batas_minimum FROM stok WHERE business_id = ?", (business_id,)
+        )
+
+    def stok_menipis(self, business_id, daftar_sku):
+        return self._baca(SQL_STOK_MENIPIS.format(daftar=", ".join("?" * len(daftar_sku))), (business_id, *daftar_sku))
+
+    def mutasi_stok(self, business_id, sku, limit=10):
+        return self._baca(SQL_MUTASI_STOK, (business_id, sku, limit))
+
+    def piutang_pelanggan(self, business_id, sebelum=None):
+        return self._baca(SQL_PIUTANG_PELANGGAN.format(syarat="AND timestamp < :sebelum" if sebelum else ""),
+                          {'b': business_id, 'sebelum': sebelum})
+
+    def versi_data(self, business_id):
+        row = self._baca("SELECT versi_data FROM usaha WHERE id = ?", (business_id,), satu=True)
+        return row[0] if row else 0
+
+    def naikkan_versi_data(self, business_id):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            _naikkan_versi_sqlite(conn, business_id)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def item_bulanan(self, business_id, sampai_bulan):
+        return self._baca(SQL_ITEM_BULANAN, (business_id, sampai_bulan))
+
+    def ambil_nota(self, business_id, jenis, nomor_nota):
+        tabel, kolom = TABEL_NOTA[jenis]
+        conn = sqlite3.connect(self.db_file)
+        try:
+            row = conn.execute(
+                f"SELECT id, {', '.join(kolom)} FROM {tabel} WHERE nomor_nota = ? AND business_id = ?",
+                (nomor_nota, business_id)
+            ).fetchone()
+            if row is None:
+                return None
+            versi = conn.execute(SQL_VERSI_NOTA, (jenis, row[0])).fetchone()[0]
+            return {'id': row[0], **jurnal.keadaan_nota(dict(zip(kolom, row[1:])), kolom), 'versi': versi}
+        finally:
+            conn.close()
+
+    def koreksi_nota(self, jenis, nota_lama, nota_baru, event, info=None, mutasi=(), item=(), user_id=None, kunci=None):
+        tabel, kolom = TABEL_NOTA[jenis]
+        nota_id, business_id = nota_lama['id'], nota_lama['business_id']
+        lama = jurnal.keadaan_nota(nota_lama, kolom)
+        sekarang = datetime.datetime.now().isoformat()
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if kunci is not None:
+                # Dicek sebelum versi: koreksi yang diulang membaca nota yang sudah dikoreksi
+                pakai_kunci_sqlite(conn, kunci, jenis, nota_lama['nomor_nota'], sekarang)
+            versi = conn.execute(SQL_VERSI_NOTA, (jenis, nota_id)).fetchone()[0]
+            row = conn.execute(f"SELECT {', '.join(kolom)} FROM {tabel} WHERE id = ?", (nota_id,)).fetchone()
+            if row is None or versi != nota_lama['versi'] or jurnal.keadaan_nota(dict(zip(kolom, row)), kolom) != lama:
+                raise NotaBerubah(nota_lama['nomor_nota'])
+            if versi == 0:
+                # Nota dari sebelum jurnal ada: keadaannya saat ini menjadi event pertama
+                _tambah_event_sqlite(conn, jenis, nota_id, lama, jurnal.DIBUAT,
+                                     {'nota': lama, 'asal': jurnal.ASAL_SEBELUM_JURNAL}, user_id, sekarang)
+            data = dict(info or {})
+            if nota_baru is not None:
+                data['perubahan'] = jurnal.perubahan(lama, nota_baru, kolom)
+            event_id = _tambah_event_sqlite(conn, jenis, nota_id, lama, event, data, user_id, sekarang)
+            if nota_baru is None:
+                # Trigger DELETE ikut membuang baris indeks pencarian
+                conn.execute(f"DELETE FROM {tabel} WHERE id = ?", (nota_id,))
+            elif data['perubahan']:
+                ubah = list(data['perubahan'])
+                conn.execute(
+                    f"UPDATE {tabel} SET {', '.join(f'{k} = ?' for k in ubah)} WHERE id = ?",
+                    (*baris_nota(nota_baru, ubah), nota_id)
+                )
+            for m in mutasi:
+                catat_mutasi_sqlite(conn, business_id, m, nota_lama['nomor_nota'], user_id)
+            conn.executemany(SQL_TAMBAH_ITEM_BULANAN, [(business_id, *baris) for baris in item])
+            _naikkan_versi_sqlite(conn, business_id)
+            conn.commit()
+            return event_id
+        finally:
+            conn.close()
+
+    def riwayat_nota(self, business_id, nomor_nota):
+        sql = '''
+            SELECT jenis, data, user_id, timestamp FROM {db}.nota_event
+            WHERE business_id = ? AND nomor_nota = ? ORDER BY id
+        '''
+        conn = sqlite3.connect(self.db_file)
+        try:
+            rows = conn.execute(sql.format(db='main'), (business_id, nomor_nota)).fetchall()
+            # Event nota yang sudah diarsipkan ikut pindah ke file arsip tahunnya
+            if not rows:
+                for _, path in arsip.daftar_arsip(conn, self.arsip_dir):
+                    arsip.pasang(conn, path)
+                    try:
+                        rows = conn.execute(sql.format(db=arsip.SKEMA), (business_id, nomor_nota)).fetchall()
+                    finally:
+                        arsip.lepas(conn)
+                    if rows:
+                        break
+        finally:
+            conn.close()
+        return [(jenis, jurnal.baca_data(data), user_id, waktu) for jenis, data, user_id, waktu in rows]
+
+    def nota_diarsipkan(self, business_id, nomor_nota):
+        conn = sqlite3.connect(self.db_file)
+        try:
+            for _, path in arsip.daftar_arsip(conn, self.arsip_dir):
+                arsip.pasang(conn, path)
+                try:
+                    for tabel, _ in TABEL_NOTA.values():
+                        if conn.execute(
+                            f"SELECT 1 FROM {arsip.SKEMA}.{tabel} WHERE nomor_nota = ? AND business_id = ?",
+                            (nomor_nota, business_id)
+                        ).fetchone():
+                            return True
+                finally:
+                    arsip.lepas(conn)
+            return False
+        finally:
+            conn.close()
+
+
+def _hasil_cari(kunci, row):
+    nomor_nota, nama, tanggal, total, status = row
+    return {
+        'jenis': 'penjualan' if kunci % 2 == 0 else 'belanja', 'nomor_nota': nomor_nota, 'nama': nama,
+        'tanggal': tanggal, 'total': total, 'status': status
+    }
+
+
+# ===== POSTGRESQL =====
+# Kolom `cari` (tsvector, config 'simple') dibuat otomatis dari nomor, nama, nama barang, dan keterangan.
+# Selain huruf/angka diganti spasi agar token sama dengan FTS5 unicode61 ("PNJ-19-10" -> pnj, 19, 10).
+# Naikkan VERSI_SKEMA_POSTGRES setiap SKEMA_POSTGRES diubah; startup melewati DDL jika versinya sama
+# (padanan PRAGMA user_version di migrasi.py).
+VERSI_SKEMA_POSTGRES = 3
+SKEMA_POSTGRES = [
+    '''
+    CREATE TABLE IF NOT EXISTS usaha (
+        id BIGINT PRIMARY KEY,
+        versi_data BIGINT NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS nota_penjualan (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT,
+        business_id BIGINT,
+        nomor_nota TEXT UNIQUE,
+        nama_pelanggan TEXT,
+        tanggal TEXT,
+        timestamp TEXT,
+        daftar_barang JSONB,
+        retur_items JSONB,
+        total_sebelum_retur BIGINT,
+        total_retur BIGINT,
+        total_setelah_retur BIGINT,
+        bayar BIGINT,
+        sisa BIGINT,
+        status TEXT,
+        keterangan TEXT,
+        cari TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', regexp_replace(
+            coalesce(nomor_nota, '') || ' ' || coalesce(nama_pelanggan, '') || ' ' ||
+            coalesce(jsonb_path_query_array(daftar_barang, '$[*].nama')::text, '') || ' ' ||
+            coalesce(jsonb_path_query_array(retur_items, '$[*].nama')::text, '') || ' ' ||
+            coalesce(keterangan, ''), '[^[:alnum:]]+', ' ', 'g'))) STORED
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS nota_belanja (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT,
+        business_id BIGINT,
+        nomor_nota TEXT UNIQUE,
+        nama_supplier TEXT,
+        tanggal TEXT,
+        timestamp TEXT,
+        daftar_barang JSONB,
+        total_belanja BIGINT,
+        keterangan TEXT,
+        cari TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', regexp_replace(
+            coalesce(nomor_nota, '') || ' ' || coalesce(nama_supplier, '') || ' ' ||
+            coalesce(jsonb_path_query_array(daftar_barang, '$[*].nama')::text, '') || ' ' ||
+            coalesce(keterangan, ''), '[^[:alnum:]]+', ' ', 'g'))) STORED
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_penjualan_business_waktu ON nota_penjualan (business_id, timestamp, total_setelah_retur)",
+    "CREATE INDEX IF NOT EXISTS idx_penjualan_business_pelanggan ON nota_penjualan (business_id, nama_pelanggan, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_belanja_business_waktu ON nota_belanja (business_id, timestamp, total_belanja)",
+    "CREATE INDEX IF NOT EXISTS idx_penjualan_cari ON nota_penjualan USING GIN (cari)",
+    "CREATE INDEX IF NOT EXISTS idx_belanja_cari ON nota_belanja USING GIN (cari)",
+    '''
+    CREATE TABLE IF NOT EXISTS stok (
+        business_id BIGINT NOT NULL,
+        sku TEXT NOT NULL,
+        jenis TEXT NOT NULL,
+        satuan TEXT,
+        jumlah DOUBLE PRECISION NOT NULL DEFAULT 0,
+        batas_minimum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        diperbarui TEXT,
+        PRIMARY KEY (business_id, sku)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS mutasi_stok (
+        id BIGSERIAL PRIMARY KEY,
+        business_id BIGINT NOT NULL,
+        sku TEXT NOT NULL,
+        perubahan DOUBLE PRECISION NOT NULL,
+        saldo DOUBLE PRECISION NOT NULL,
+        sumber TEXT NOT NULL,
+        referensi TEXT,
+        user_id BIGINT,
+        timestamp TEXT
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_mutasi_business_sku ON mutasi_stok (business_id, sku, id)",
+    '''
+    CREATE TABLE IF NOT EXISTS item_bulanan (
+        business_id BIGINT NOT NULL,
+        bulan INTEGER NOT NULL,
+        jenis TEXT NOT NULL,
+        barang TEXT NOT NULL,
+        pihak TEXT NOT NULL,
+        qty DOUBLE PRECISION NOT NULL,
+        nilai BIGINT NOT NULL,
+        PRIMARY KEY (business_id, bulan, jenis, barang, pihak)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS nomor_urut (
+        prefix TEXT PRIMARY KEY,
+        terakhir BIGINT NOT NULL
+    )
+    ''',
+    "CREATE TABLE IF NOT EXISTS versi_skema (versi INTEGER NOT NULL)",
+    # Versi 2: kunci idempotensi nota
+    '''
+    CREATE TABLE IF NOT EXISTS nota_idempotensi (
+        kunci TEXT PRIMARY KEY,
+        jenis TEXT NOT NULL,
+        nomor_nota TEXT NOT NULL,
+        waktu TEXT NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_idempotensi_waktu ON nota_idempotensi (waktu)",
+    # Versi 3: jurnal event nota (jurnal.py); snapshot dan pemeriksaan jurnal hanya di SQLite
+    '''
+    CREATE TABLE IF NOT EXISTS nota_event (
+        id BIGSERIAL PRIMARY KEY,
+        business_id BIGINT NOT NULL,
+        jenis_nota TEXT NOT NULL,
+        nota_id BIGINT NOT NULL,
+        nomor_nota TEXT NOT NULL,
+        jenis TEXT NOT NULL,
+        data JSONB NOT NULL,
+        user_id BIGINT,
+        timestamp TEXT NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_event_nota ON nota_event (jenis_nota, nota_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_event_nomor ON nota_event (business_id, nomor_nota, id)",
+    '''
+    CREATE OR REPLACE FUNCTION tolak_ubah_event() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        RAISE EXCEPTION 'nota_event hanya bisa ditambah';
+    END
+    $$
+    ''',
+    "CREATE OR REPLACE TRIGGER nota_event_tetap BEFORE UPDATE ON nota_event FOR EACH ROW EXECUTE FUNCTION tolak_ubah_event()",
+]
+
+SQL_PG_VERSI_NOTA = "SELECT COALESCE(MAX(id), 0) FROM nota_event WHERE jenis_nota = %s AND nota_id = %s"
+
+SQL_PG_TAMBAH_EVENT = '''
+    INSERT INTO nota_event (business_id, jenis_nota, nota_id, nomor_nota, jenis, data, user_id, timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+'''
+
+SQL_PG_BARANG = "jsonb_path_query_array({kolom}, '$[*].nama')::text"
+
+SQL_PG_CARI = f'''
+    SELECT kunci, nomor_nota, nama, barang, keterangan FROM (
+        (SELECT id * 2 AS kunci, nomor_nota, nama_pelanggan AS nama,
+                {SQL_PG_BARANG.format(kolom='daftar_barang')} || ' ' || {SQL_PG_BARANG.format(kolom='retur_items')} AS barang,
+                keterangan
+         FROM nota_penjualan WHERE business_id = %(usaha)s AND cari @@ to_tsquery('simple', %(query)s)
+         ORDER BY id DESC LIMIT %(ambil)s)
+        UNION ALL
+        (SELECT id * 2 + 1, nomor_nota, nama_supplier, {SQL_PG_BARANG.format(kolom='daftar_barang')}, keterangan
+         FROM nota_belanja WHERE business_id = %(usaha)s AND cari @@ to_tsquery('simple', %(query)s)
+         ORDER BY id DESC LIMIT %(ambil)s)
+    ) kandidat
+    ORDER BY kunci DESC LIMIT %(limit)s OFFSET %(offset)s
+'''
+
+
+class RepositoriPostgres(Repositori):
+    """Repositori di PostgreSQL dengan pool koneksi psycopg
+
+    `skema` (opsional) dipakai sebagai search_path, mis. skema sementara
+    untuk uji kesesuaian di instance PostgreSQL bersama.
+    """
+
+    def __init__(self, dsn, skema=None, min_koneksi=1, maks_koneksi=10):
+        import psycopg
+        from psycopg.types.json import Jsonb
+        from psycopg_pool import ConnectionPool
+        self._psycopg = psycopg
+        self._jsonb = Jsonb
+        self.skema = skema
+        kwargs = {'options': f"-c search_path={skema}"} if skema else {}
+        self.pool = ConnectionPool(dsn, min_size=min_koneksi, max_size=maks_koneksi, kwargs=kwargs, open=True)
+
+    def versi_skema(self, conn):
+        """Versi skema yang tercatat di database (0 jika belum pernah disiapkan)"""
+        if conn.execute("SELECT to_regclass('versi_skema')").fetchone()[0] is None:
+            return 0
+        return conn.execute("SELECT COALESCE(MAX(versi), 0) FROM versi_skema").fetchone()[0]
+
+    def siapkan(self):
+        with self.pool.connection() as conn:
+            # Restart biasa: skema sudah terbaru, cukup dua query ringan tanpa DDL
+            if self.versi_skema(conn) >= VERSI_SKEMA_POSTGRES:
+                return []
+            if self.skema:
+                conn.execute(f"CREATE SCHEMA IF NOT EXISTS {self.skema}")
+            for sql in SKEMA_POSTGRES:
+                conn.execute(sql)
+            conn.execute("DELETE FROM versi_skema")
+            conn.execute("INSERT INTO versi_skema (versi) VALUES (%s)", (VERSI_SKEMA_POSTGRES,))
+        return []
+
+    def _simpan(self, jenis, nota, mutasi, item, kunci):
+        tabel, kolom = TABEL_NOTA[jenis]
+        sekarang = datetime.datetime.now().isoformat()
+        business_id = nota['business_id']
+        try:
+            with self.pool.connection() as conn:
+                if kunci is not None:
+                    self._pakai_kunci(conn, kunci, jenis, nota['nomor_nota'], nota['timestamp'])
+                nota_id = conn.execute(
+                    f"INSERT INTO {tabel} ({', '.join(kolom)}) VALUES ({', '.join(['%s'] * len(kolom))}) RETURNING id",
+                    baris_nota(nota, kolom)
+                ).fetchone()[0]
+                self._tambah_event(conn, jenis, nota_id, nota, jurnal.DIBUAT,
+                                   {'nota': jurnal.keadaan_nota(nota, kolom)}, nota['user_id'], nota['timestamp'])
+                for m in mutasi:
+                    self._catat_mutasi(conn, business_id, m, nota['nomor_nota'], nota['user_id'], sekarang)
+                self._tambah_item(conn, business_id, item)
+        except self._psycopg.errors.UniqueViolation as e:
+            raise NomorNotaGanda(nota['nomor_nota']) from e
+
+    def simpan_penjualan(self, nota, mutasi=(), item=(), kunci=None):
+        self._simpan('penjualan', nota, mutasi, item, kunci)
+
+    def simpan_belanja(self, nota, mutasi=(), item=(), kunci=None):
+        self._simpan('belanja', nota, mutasi, item, kunci)
+
+    def bersihkan_idempotensi(self, sebelum):
+        with self.pool.connection() as conn:
+            return conn.execute("DELETE FROM nota_idempotensi WHERE waktu < %s", (sebelum,)).rowcount
+
+    def nota_kunci(self, kunci):
+        row = self._baca("SELECT nomor_nota FROM nota_idempotensi WHERE kunci = %s", (kunci,), satu=True)
+        return row[0] if row else None
+
+    def _tambah_event(self, conn, jenis, nota_id, nota, event, data, user_id, waktu):
+        return conn.execute(SQL_PG_TAMBAH_EVENT, (
+            nota['business_id'], jenis, nota_id, nota['nomor_nota'], event, self._jsonb(data), user_id, waktu
+        )).fetchone()[0]
+
+    def _pakai_kunci(self, conn, kunci, jenis, nomor_nota, waktu):
+        """Catat kunci idempotensi di transaksi `conn`; NotaSudahTersimpan jika sudah dipakai"""
+        # Insert kunci yang sama dari transaksi lain menunggu transaksi ini selesai
+        baru = conn.execute('''
+            INSERT INTO nota_idempotensi (kunci, jenis, nomor_nota, waktu) VALUES (%s, %s, %s, %s)
+            ON CONFLICT (kunci) DO NOTHING
+        ''', (kunci, jenis, nomor_nota, waktu)).rowcount
+        if not baru:
+            lama = conn.execute("SELECT nomor_nota FROM nota_idempotensi WHERE kunci = %s", (kunci,)).fetchone()[0]
+            raise NotaSudahTersimpan(lama)
+
+    def _catat_mutasi(self, conn, business_id, m, referensi, user_id, sekarang):
+        saldo = conn.execute('''
+            INSERT INTO stok (business_id, sku, jenis, satuan, jumlah, diperbarui)
+            VALUES (%s, %s, %s, %s, round(%s::numeric, 3), %s)
+            ON CONFLICT (business_id, sku) DO UPDATE SET
+                jumlah = round((stok.jumlah + excluded.jumlah)::numeric, 3),
+                diperbarui = excluded.diperbarui
+            RETURNING jumlah
+        ''', (business_id, m['sku'], m['jenis'], m['satuan'], m['perubahan'], sekarang)).fetchone()[0]
+        conn.execute('''
+            INSERT INTO mutasi_stok (business_id, sku, perubahan, saldo, sumber, referensi, user_id, timestamp)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ''', (business_id, m['sku'], m['perubahan'], saldo, m['sumber'], referensi, user_id, sekarang))
+        return saldo
+
+    def _tambah_item(self, conn, business_id, item):
+        """Tambah ringkasan item bulanan dan naikkan versi data di transaksi `conn`"""
+        with conn.cursor() as cur:
+            cur.executemany('''
+                INSERT INTO item_bulanan (business_id, bulan, jenis, barang, pihak, qty, nilai)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (business_id, bulan, jenis, barang, pihak) DO UPDATE SET
+                    qty = item_bulanan.qty + excluded.qty, nilai = item_bulanan.nilai + excluded.nilai
+            ''', [(business_id, *baris) for baris in item])
+        conn.execute('''
+            INSERT INTO usaha (id, versi_data) VALUES (%s, 1)
+            ON CONFLICT (id) DO UPDATE SET versi_data = usaha.versi_data + 1
+        ''', (business_id,))
+
+    def impor_nota(self, jenis, daftar_nota, business_id=None, item=()):
+        tabel, kolom = TABEL_NOTA[jenis]
+        jumlah = 0
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur, cur.copy(f"COPY {tabel} ({', '.join(kolom)}) FROM STDIN") as copy:
+                    for nota in daftar_nota:
+                        copy.write_row(baris_nota(nota, kolom))
+                        jumlah += 1
+                if item:
+                    self._tambah_item(conn, business_id, item)
+        except self._psycopg.errors.UniqueViolation as e:
+            raise NomorNotaGanda(str(e)) from e
+        return jumlah
+
+    def alokasi_nomor(self, prefix, jumlah=1):
+        with self.pool.connection() as conn:
+            terakhir = conn.execute('''
+                INSERT INTO nomor_urut (prefix, terakhir) VALUES (%s, %s)
+                ON CONFLICT (prefix) DO UPDATE SET terakhir = nomor_urut.terakhir + excluded.terakhir
+                RETURNING terakhir
+            ''', (prefix, jumlah)).fetchone()[0]
+        return terakhir - jumlah + 1
+
+    def _baca(self, sql, parameter, satu=False):
+        with self.pool.connection() as conn:
+            cursor = conn.execute(sql, parameter)
+            return cursor.fetchone() if satu else cursor.fetchall()
+
+    def histori_pelanggan(self, business_id, nama_pelanggan, limit=10, offset=0):
+        return self._baca('''
+            SELECT nomor_nota, tanggal, total_setelah_retur, status
+            FROM nota_penjualan
+            WHERE business_id = %s AND nama_pelanggan = %s
+            ORDER BY timestamp DESC
+            LIMIT %s OFFSET %s
+        ''', (business_id, nama_pelanggan, limit, offset))
+
+    def histori_semua(self, business_id, limit=10, offset=0):
+        return self._baca('''
+            SELECT nomor_nota, nama_pelanggan, tanggal, total_setelah_retur, status
+            FROM nota_penjualan
+            WHERE business_id = %s
+            ORDER BY timestamp DESC
+            LIMIT %s OFFSET %s
+        ''', (business_id, limit, offset))
+
+    def statistik_periode(self, business_id, awal, akhir):
+        with self.pool.connection() as conn:
+            penjualan = conn.execute('''
+                SELECT COUNT(*), SUM(total_setelah_retur)::bigint FROM nota_penjualan
+                WHERE business_id = %s AND timestamp >= %s AND timestamp < %s
+            ''', (business_id, awal, akhir)).fetchone()
+            belanja = conn.execute('''
+                SELECT COUNT(*), SUM(total_belanja)::bigint FROM nota_belanja
+                WHERE business_id = %s AND timestamp >= %s AND timestamp < %s
+            ''', (business_id, awal, akhir)).fetchone()
+            return tuple(penjualan), tuple(belanja)
+
+    def kandidat_cari(self, business_id, kata, limit, offset=0):
+        if not kata:
+            return []
+        # Token hanya huruf/angka (lihat bot_nota._token_cari), aman disusun menjadi tsquery
+        query = ' & '.join(kata[:-1] + [f"{kata[-1]}:*"])
+        parameter = {'usaha': business_id, 'query': query, 'limit': limit, 'offset': offset, 'ambil': limit + offset}
+        return [tuple(row) for row in self._baca(SQL_PG_CARI, parameter)]
+
+    def ambil_hasil_cari(self, daftar_kunci):
+        penjualan = [k // 2 for k in daftar_kunci if k % 2 == 0]
+        belanja = [k // 2 for k in daftar_kunci if k % 2 == 1]
+        hasil = {}
+        with self.pool.connection() as conn:
+            for id_nota, *row in conn.execute('''
+                SELECT id, nomor_nota, nama_pelanggan, tanggal, total_setelah_retur, status
+                FROM nota_penjualan WHERE id = ANY(%s)
+            ''', (penjualan,)):
+                hasil[id_nota * 2] = _hasil_cari(id_nota * 2, row)
+            for id_nota, *row in conn.execute('''
+                SELECT id, nomor_nota, nama_supplier, tanggal, total_belanja, 'BELANJA'
+                FROM nota_belanja WHERE id = ANY(%s)
+            ''', (belanja,)):
+                hasil[id_nota * 2 + 1] = _hasil_cari(id_nota * 2 + 1, row)
+        return hasil
+
+    def ringkasan_pelanggan(self, business_id, nama_pelanggan=None, per_pelanggan=5):
+        parameter = {'b': business_id, 'nama': nama_pelanggan, 'n': per_pelanggan}
+        satu = nama_pelanggan is not None
+        pelanggan = "SELECT %(nama)s::text" if satu else '''
+            SELECT MIN(nama_pelanggan) FROM nota_penjualan WHERE business_id = %(b)s
+            UNION ALL
+            SELECT (SELECT MIN(nama_pelanggan) FROM nota_penjualan WHERE business_id = %(b)s AND nama_pelanggan > p.nama)
+            FROM p WHERE p.nama IS NOT NULL
+        '''
+        with self.pool.connection() as conn:
+            piutang = conn.execute(f'''
+                SELECT nama_pelanggan, COUNT(*), (-SUM(sisa))::bigint FROM nota_penjualan
+                WHERE business_id = %(b)s AND sisa < 0 {"AND nama_pelanggan = %(nama)s" if satu else ""}
+                GROUP BY nama_pelanggan
+            ''', parameter).fetchall()
+            nota = conn.execute(f'''
+                WITH RECURSIVE p(nama) AS ({pelanggan})
+                SELECT p.nama, n.nomor_nota, n.tanggal, n.total_setelah_retur, n.sisa, n.status,
+                       n.daftar_barang, n.timestamp
+                FROM p CROSS JOIN LATERAL (
+                    SELECT nomor_nota, tanggal, total_setelah_retur, sisa, status, daftar_barang, timestamp
+                    FROM nota_penjualan WHERE business_id = %(b)s AND nama_pelanggan = p.nama
+                    ORDER BY timestamp DESC LIMIT %(n)s
+                ) n
+                ORDER BY p.nama, n.timestamp DESC
+            ''', parameter).fetchall()
+        return piutang, [(*row[:6], row[6] or [], row[7]) for row in nota]
+
+    def saldo_stok(self, business_id, sku):
+        row = self._baca("SELECT jumlah FROM stok WHERE business_id = %s AND sku = %s", (business_id, sku), satu=True)
+        return row[0] if row else 0
+
+    def catat_mutasi(self, business_id, mutasi, referensi=None, user_id=None, kunci=None):
+        sekarang = datetime.datetime.now().isoformat()
+        with self.pool.connection() as conn:
+            if kunci is not None:
+                self._pakai_kunci(conn, kunci, 'mutasi', referensi, sekarang)
+            return [self._catat_mutasi(conn, business_id, m, referensi, user_id, sekarang) for m in mutasi]
+
+    def opname_stok(self, business_id, sku, jenis, satuan, jumlah, user_id=None):
+        sekarang = datetime.datetime.now().isoformat()
+        with self.pool.connection() as conn:
+            # Pastikan barisnya ada lalu kunci, agar mutasi bersamaan tidak terselip di antara baca dan tulis
+            conn.execute('''
+                INSERT INTO stok (business_id, sku, jenis, satuan, diperbarui) VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (business_id, sku) DO NOTHING
+            ''', (business_id, sku, jenis, satuan, sekarang))
+            saldo = conn.execute(
+                "SELECT jumlah FROM stok WHERE business_id = %s AND sku = %s FOR UPDATE", (business_id, sku)
+            ).fetchone()[0]
+            mutasi = {'sku': sku, 'jenis': jenis, 'satuan': satuan, 'perubahan': jumlah - saldo, 'sumber': 'opname'}
+            return self._catat_mutasi(conn, business_id, mutasi, None, user_id, sekarang)
+
+    def atur_batas_minimum(self, business_id, sku, jenis, satuan, batas):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO stok (business_id, sku, jenis, satuan, batas_minimum, diperbarui)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (business_id, sku) DO UPDATE SET batas_minimum = excluded.batas_minimum
+            ''', (business_id, sku, jenis, satuan, batas, datetime.datetime.now().isoformat()))
+
+    def daftar_stok(self, business_id):
+        return [tuple(row) for row in self._baca(
+            "SELECT sku, jenis, satuan, jumlah, batas_minimum FROM stok WHERE business_id = %s", (business_id,)
+        )]
+
+    def stok_menipis(self, business_id, daftar_sku):
+        return [tuple(row) for row in self._baca('''
+            SELECT sku, jumlah, satuan, batas_minimum FROM stok
+            WHERE business_id = %s AND sku = ANY(%s)
+              AND (jumlah < 0 OR (batas_minimum > 0 AND jumlah <= batas_minimum))
+        ''', (business_id, list(daftar_sku)))]
+
+    def mutasi_stok(self, business_id, sku, limit=10):
+        return [tuple(row) for row in self._baca('''
+            SELECT perubahan, saldo, sumber, referensi, timestamp FROM mutasi_stok
+            WHERE business_id = %s AND sku = %s
+            ORDER BY id DESC LIMIT %s
+        ''', (business_id, sku, limit))]
+
+    def piutang_pelanggan(self, business_id, sebelum=None):
+        syarat = "AND timestamp < %(sebelum)s" if sebelum else ""
+        return [tuple(row) for row in self._baca(f'''
+            SELECT nama_pelanggan, COUNT(*), (-SUM(sisa))::bigint FROM nota_penjualan
+            WHERE business_id = %(b)s AND sisa < 0 {syarat}
+            GROUP BY nama_pelanggan
+        ''', {'b': business_id, 'sebelum': sebelum})]
+
+    def versi_data(self, business_id):
+        row = self._baca("SELECT versi_data FROM usaha WHERE id = %s", (business_id,), satu=True)
+        return row[0] if row else 0
+
+    def naikkan_versi_data(self, business_id):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO usaha (id, versi_data) VALUES (%s, 1)
+                ON CONFLICT (id) DO UPDATE SET versi_data = usaha.versi_data + 1
+            ''', (business_id,))
+
+    def item_bulanan(self, business_id, sampai_bulan):
+        return [tuple(row) for row in self._baca('''
+            SELECT bulan, jenis, barang, pihak, qty, nilai FROM item_bulanan
+            WHERE business_id = %s AND bulan <= %s
+        ''', (business_id, sampai_bulan))]
+
+    def ambil_nota(self, business_id, jenis, nomor_nota):
+        tabel, kolom = TABEL_NOTA[jenis]
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f"SELECT id, {', '.join(kolom)} FROM {tabel} WHERE nomor_nota = %s AND business_id = %s",
+                (nomor_nota, business_id)
+            ).fetchone()
+            if row is None:
+                return None
+            versi = conn.execute(SQL_PG_VERSI_NOTA, (jenis, row[0])).fetchone()[0]
+            return {'id': row[0], **jurnal.keadaan_nota(dict(zip(kolom, row[1:])), kolom), 'versi': versi}
+
+    def koreksi_nota(self, jenis, nota_lama, nota_baru, event, info=None, mutasi=(), item=(), user_id=None, kunci=None):
+        tabel, kolom = TABEL_NOTA[jenis]
+        nota_id, business_id = nota_lama['id'], nota_lama['business_id']
+        lama = jurnal.keadaan_nota(nota_lama, kolom)
+        sekarang = datetime.datetime.now().isoformat()
+        with self.pool.connection() as conn:
+            if kunci is not None:
+                self._pakai_kunci(conn, kunci, jenis, nota_lama['nomor_nota'], sekarang)
+            # Kunci baris nota: koreksi bersamaan untuk nota yang sama menunggu lalu gagal cek versi
+            row = conn.execute(f"SELECT {', '.join(kolom)} FROM {tabel} WHERE id = %s FOR UPDATE", (nota_id,)).fetchone()
+            versi = conn.execute(SQL_PG_VERSI_NOTA, (jenis, nota_id)).fetchone()[0]
+            if row is None or versi != nota_lama['versi'] or jurnal.keadaan_nota(dict(zip(kolom, row)), kolom) != lama:
+                raise NotaBerubah(nota_lama['nomor_nota'])
+            if versi == 0:
+                self._tambah_event(conn, jenis, nota_id, lama, jurnal.DIBUAT,
+                                   {'nota': lama, 'asal': jurnal.ASAL_SEBELUM_JURNAL}, user_id, sekarang)
+            data = dict(info or {})
+            if nota_baru is not None:
+                data['perubahan'] = jurnal.perubahan(lama, nota_baru, kolom)
+            event_id = self._tambah_event(conn, jenis, nota_id, lama, event, data, user_id, sekarang)
+            if nota_baru is None:
+                conn.execute(f"DELETE FROM {tabel} WHERE id = %s", (nota_id,))
+            elif data['perubahan']:
+                ubah = list(data['perubahan'])
+                conn.execute(
+                    f"UPDATE {tabel} SET {', '.join(f'{k} = %s' for k in ubah)} WHERE id = %s",
+                    (*baris_nota(nota_baru, ubah), nota_id)
+                )
+            for m in mutasi:
+                self._catat_mutasi(conn, business_id, m, nota_lama['nomor_nota'], user_id, sekarang)
+            self._tambah_item(conn, business_id, item)
+            return event_id
+
+    def riwayat_nota(self, business_id, nomor_nota):
+        return [tuple(row) for row in self._baca('''
+            SELECT jenis, data, user_id, timestamp FROM nota_event
+            WHERE business_id = %s AND nomor_nota = %s ORDER BY id
+        ''', (business_id, nomor_nota))]
+
+    def tutup(self):
+        self.pool.close()
+
+
+def buat_repositori(jenis="sqlite", db_file=None, dsn=None, arsip_dir=None):
+    """Buat repositori sesuai konfigurasi DB_BACKEND"""
+    if jenis == "sqlite":
+        return RepositoriSQLite(db_file, arsip_dir)
+    if jenis == "postgres":
+        if not dsn:
+            raise ValueError("DB_BACKEND=postgres membutuhkan DATABASE_URL")
+        return RepositoriPostgres(dsn)
+    raise ValueError(f"DB_BACKEND tidak dikenal: {jenis}")
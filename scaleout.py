@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mode banyak worker untuk bot nota.
+
+Dispatcher menerima webhook Telegram lalu membagikan update ke N proses
+worker berdasarkan consistent hashing user_id, sehingga semua update dari
+satu user selalu diproses berurutan oleh worker yang sama dan sesinya tetap
+lokal. Worker memakai database SQLite yang sama (mode WAL) dan backend sesi
+bersama dari sesi.py.
+
+Dispatcher mengawasi worker: worker yang mati dijalankan ulang dengan
+antrian yang sama, sehingga bagian hash ring-nya tetap dilayani. SIGTERM
+(Railway/Docker) menutup webhook, lalu worker menghabiskan antriannya
+sebelum berhenti.
+
+Dijalankan lewat bot_nota.py dengan BOT_WORKERS > 1 dan WEBHOOK_URL.
+"""
+
+import json
+import queue
+import signal
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Jeda pengecekan worker yang mati (detik)
+INTERVAL_AWASI = 1.0
+
+# Jenis update yang punya field `from`
+_FIELD_USER = (
+    'message', 'edited_message', 'callback_query', 'inline_query',
+    'chosen_inline_result', 'shipping_query', 'pre_checkout_query',
+    'my_chat_member', 'chat_member', 'chat_join_request',
+)
+
+
+class HashRing:
+    """Consistent hashing dengan virtual node"""
+
+    def __init__(self, nodes, replika=100):
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node) for node in nodes for i in range(replika)
+        )
+        self._kunci = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(teks):
+        return int.from_bytes(hashlib.md5(str(teks).encode('utf-8')).digest()[:8], 'big')
+
+    def node(self, kunci):
+        i = bisect.bisect(self._kunci, self._hash(kunci)) % len(self._kunci)
+        return self._ring[i][1]
+
+
+def user_id_dari_update(data):
+    """Ambil user_id dari dict update Telegram (fallback ke update_id)"""
+    for field in _FIELD_USER:
+        isi = data.get(field)
+        if isi and 'from' in isi:
+            return isi['from']['id']
+    return data.get('update_id', 0)
+
+
+# ===== WORKER =====
+async def _loop_worker(indeks, antrian, siap, db_file, pembuat_aplikasi):
+    import bot_nota
+    from telegram import Update
+
+    if db_file:
+        bot_nota.DB_FILE = db_file
+    bot_nota.user_sessions = bot_nota.buat_sesi()
+
+    if pembuat_aplikasi is None:
+        application = bot_nota.buat_aplikasi()
+        if indeks == 0:
+            # Job terjadwal (tutup buku harian) dan backfill migrasi cukup di satu worker
+            bot_nota.jadwalkan_job(application)
+            bot_nota.lanjutkan_backfill_latar()
+        # Indeks inline query ada di memori tiap worker
+        bot_nota.panaskan_indeks_latar()
+        await application.initialize()
+    else:
+        application, _ = await pembuat_aplikasi()
+    await application.start()
+    if siap is not None:
+        siap.put(indeks)
+
+    loop = asyncio.get_running_loop()
+    diproses = 0
+    logger.info(f"👷 Worker {indeks} siap")
+    while True:
+        data = await loop.run_in_executor(None, antrian.get)
+        if data is None:
+            break
+        await application.process_update(Update.de_json(data, application.bot))
+        diproses += 1
+
+    await application.stop()
+    await application.shutdown()
+    return diproses
+
+def proses_worker(indeks, antrian, hasil=None, siap=None, db_file=None, pembuat_aplikasi=None):
+    """Entry point proses worker; `pembuat_aplikasi` dipakai benchmark untuk Bot API palsu"""
+    # SIGTERM ke seluruh process group ditangani dispatcher: worker berhenti lewat antrian setelah kosong
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    diproses = asyncio.run(_loop_worker(indeks, antrian, siap, db_file, pembuat_aplikasi))
+    if hasil is not None:
+        hasil.put((indeks, diproses))
+
+
+class Dispatcher:
+    """Membagikan update ke antrian worker sesuai hash user_id"""
+
+    def __init__(self, jumlah_worker, db_file=None, pembuat_aplikasi=None):
+        self._ctx = multiprocessing.get_context('spawn')
+        self._db_file = db_file
+        self._pembuat_aplikasi = pembuat_aplikasi
+        self.antrian = [self._ctx.Queue() for _ in range(jumlah_worker)]
+        self.hasil = self._ctx.Queue()
+        self.siap = self._ctx.Queue()
+        self.ring = HashRing(range(jumlah_worker))
+        self.workers = [self._buat_worker(i) for i in range(jumlah_worker)]
+        self.dijalankan_ulang = 0
+        self._berhenti = False
+
+    def _buat_worker(self, indeks):
+        return self._ctx.Process(
+            target=proses_worker,
+            args=(indeks, self.antrian[indeks], self.hasil, self.siap, self._db_file, self._pembuat_aplikasi),
+            name=f"bot-worker-{indeks}",
+            daemon=True,
+        )
+
+    def mulai(self):
+        for worker in self.workers:
+            worker.start()
+
+    def tunggu_siap(self):
+        """Blok sampai semua worker selesai inisialisasi"""
+        for _ in self.workers:
+            self.siap.get()
+
+    def awasi(self):
+        """Jalankan ulang worker yang mati; antriannya tetap, jadi update yang menunggu ikut diproses"""
+        if self._berhenti:
+            return 0
+        jumlah = 0
+        for i, worker in enumerate(self.workers):
+            if worker.exitcode is None:
+                continue
+            logger.error(f"💀 Worker {i} mati (exit code {worker.exitcode}), dijalankan ulang")
+            # Worker yang mati saat menunggu get() meninggalkan lock baca antrian terkunci
+            if self.antrian[i]._rlock.acquire(block=False):
+                self.antrian[i]._rlock.release()
+            else:
+                logger.error(f"⚠️ Antrian worker {i} terkunci, sekitar {self.antrian[i].qsize()} update ditinggalkan")
+                self.antrian[i] = self._ctx.Queue()
+            self.workers[i] = self._buat_worker(i)
+            self.workers[i].start()
+            jumlah += 1
+        self.dijalankan_ulang += jumlah
+        return jumlah
+
+    def kirim(self, data):
+        self.antrian[self.ring.node(user_id_dari_update(data))].put(data)
+
+    def berhenti(self):
+        """Kirim sinyal berhenti, tunggu worker menghabiskan antrian; kembalikan jumlah update per worker"""
+        self._berhenti = True
+        for antrian in self.antrian:
+            antrian.put(None)
+        for worker in self.workers:
+            worker.join()
+        # Hanya worker yang keluar normal yang mengirim jumlah update
+        diproses = {i: 0 for i in range(len(self.workers))}
+        for _ in range(sum(1 for worker in self.workers if worker.exitcode == 0)):
+            try:
+                indeks, jumlah = self.hasil.get(timeout=5)
+            except queue.Empty:
+                break
+            diproses[indeks] += jumlah
+        return diproses
+
+
+# ===== WEBHOOK RECEIVER =====
+class PenerimaWebhook:
+    """Server HTTP minimal untuk webhook Telegram yang meneruskan update ke Dispatcher"""
+
+    def __init__(self, dispatcher, path='/webhook', secret_token=None):
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret_token = secret_token
+
+    async def _tangani(self, reader, writer):
+        status = "200 OK"
+        try:
+            header = await reader.readuntil(b'\r\n\r\n')
+            baris = header.decode('latin-1').split('\r\n')
+            metode, path, _ = baris[0].split(' ', 2)
+            headers = {}
+            for b in baris[1:]:
+                if ':' in b:
+                    k, v = b.split(':', 1)
+                    headers[k.strip().lower()] = v.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            if metode != 'POST' or path != self.path:
+                status = "404 Not Found"
+            elif self.secret_token and headers.get('x-telegram-bot-api-secret-token') != self.secret_token:
+                status = "403 Forbidden"
+            else:
+                self.dispatcher.kirim(json.loads(body))
+        except Exception as e:
+            logger.error(f"❌ Webhook error: {e}")
+            status = "400 Bad Request"
+        finally:
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            try:
+                await writer.drain()
+            finally:
+                writer.close()
+
+    async def serve(self, host, port, berhenti=None, awasi=None):
+        """Layani webhook sampai event `berhenti` diset; `awasi` dipanggil tiap INTERVAL_AWASI detik"""
+        server = await asyncio.start_server(self._tangani, host, port)
+        berhenti = berhenti or asyncio.Event()
+        async with server:
+            while not berhenti.is_set():
+                try:
+                    await asyncio.wait_for(berhenti.wait(), INTERVAL_AWASI)
+                except asyncio.TimeoutError:
+                    if awasi is not None:
+                        awasi()
+
+
+async def _daftarkan_webhook(token, url, secret_token):
+    from telegram import Bot
+    async with Bot(token) as bot:
+        await bot.set_webhook(url=url, secret_token=secret_token, allowed_updates=None)
+
+async def _layani(penerima, dispatcher, port):
+    berhenti = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, berhenti.set)
+    await penerima.serve('0.0.0.0', port, berhenti=berhenti, awasi=dispatcher.awasi)
+    logger.info("🛑 Dispatcher dihentikan, menunggu antrian worker habis...")
+
+def jalankan(token, jumlah_worker, webhook_url, port, secret_token=None, db_file=None):
+    """Jalankan dispatcher + N worker sampai SIGTERM/SIGINT"""
+    dispatcher = Dispatcher(jumlah_worker, db_file=db_file)
+    dispatcher.mulai()
+    asyncio.run(_daftarkan_webhook(token, webhook_url, secret_token))
+    logger.info(f"🚦 Dispatcher aktif: {jumlah_worker} worker, port {port}")
+
+    penerima = PenerimaWebhook(dispatcher, path=urlparse(webhook_url).path or '/', secret_token=secret_token)
+    try:
+        asyncio.run(_layani(penerima, dispatcher, port))
+    finally:
+        diproses = dispatcher.berhenti()
+        logger.info(f"✅ Worker selesai: {sum(diproses.values())} update, {dispatcher.dijalankan_ulang} kali dijalankan ulang")
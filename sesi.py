@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Penyimpanan sesi user untuk bot nota.
+
+Default-nya sesi disimpan di dict biasa (satu proses). Untuk mode banyak
+worker, sesi tetap di-cache lokal di worker pemilik user (lihat scaleout.py),
+lalu ditulis ke backend bersama setelah setiap update supaya bisa dipulihkan
+jika worker restart atau pembagian user berubah.
+
+Backend:
+    memory  - dict biasa, tanpa overhead
+    sqlite  - tabel sesi_user di file SQLite bersama
+    redis   - server Redis (butuh paket `redis` dan REDIS_URL); REDIS_URL=palsu://
+              memakai RedisPalsu di dalam proses, khusus uji & benchmark
+"""
+
+import json
+import sqlite3
+from collections.abc import MutableMapping
+
+
+# REDIS_URL khusus uji: RedisPalsu di dalam proses (tidak dibagi antar worker)
+URL_REDIS_PALSU = "palsu://"
+
+
+class RedisPalsu:
+    """Pengganti klien Redis di dalam proses (subset get/set/delete) untuk uji & benchmark"""
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, kunci):
+        return self._data.get(kunci)
+
+    def set(self, kunci, nilai):
+        self._data[kunci] = nilai.encode('utf-8') if isinstance(nilai, str) else nilai
+        return True
+
+    def delete(self, *kunci):
+        return sum(1 for k in kunci if self._data.pop(k, None) is not None)
+
+
+class BackendSQLite:
+    """Backend sesi berbentuk tabel di file SQLite bersama"""
+
+    def __init__(self, path):
+        self.path = path
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE IF NOT EXISTS sesi_user (user_id INTEGER PRIMARY KEY, data TEXT)")
+        conn.commit()
+        conn.close()
+
+    def ambil(self, user_id):
+        conn = sqlite3.connect(self.path)
+        try:
+            row = conn.execute("SELECT data FROM sesi_user WHERE user_id = ?", (user_id,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def simpan(self, user_id, data):
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute(
+                "INSERT INTO sesi_user (user_id, data) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+                (user_id, data)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def hapus(self, user_id):
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("DELETE FROM sesi_user WHERE user_id = ?", (user_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class BackendRedis:
+    """Backend sesi di Redis (atau klien kompatibel seperti RedisPalsu)"""
+
+    def __init__(self, klien, prefix="sesi:"):
+        self.klien = klien
+        self.prefix = prefix
+
+    def ambil(self, user_id):
+        nilai = self.klien.get(f"{self.prefix}{user_id}")
+        return nilai.decode('utf-8') if isinstance(nilai, bytes) else nilai
+
+    def simpan(self, user_id, data):
+        self.klien.set(f"{self.prefix}{user_id}", data)
+
+    def hapus(self, user_id):
+        self.klien.delete(f"{self.prefix}{user_id}")
+
+
+class SesiTersinkron(MutableMapping):
+    """Dict sesi dengan cache lokal dan write-back ke backend bersama
+
+    Handler tetap memakai sesi seperti dict biasa (diubah in-place);
+    `sinkron(user_id)` dipanggil setelah update selesai diproses.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lokal = {}
+
+    def __getitem__(self, user_id):
+        if user_id not in self._lokal:
+            data = self.backend.ambil(user_id)
+            if data is None:
+                raise KeyError(user_id)
+            self._lokal[user_id] = json.loads(data)
+        return self._lokal[user_id]
+
+    def __setitem__(self, user_id, sesi):
+        self._lokal[user_id] = sesi
+
+    def __delitem__(self, user_id):
+        if user_id not in self:
+            raise KeyError(user_id)
+        del self._lokal[user_id]
+        self.backend.hapus(user_id)
+
+    def __iter__(self):
+        return iter(self._lokal)
+
+    def __len__(self):
+        return len(self._lokal)
+
+    def sinkron(self, user_id):
+        """Tulis sesi user ke backend (dipanggil setelah setiap update)"""
+        sesi = self._lokal.get(user_id)
+        if sesi is not None:
+            self.backend.simpan(user_id, json.dumps(sesi, ensure_ascii=False))
+
+
+def buat_penyimpanan_sesi(jenis="memory", db_file=None, redis_url=None):
+    """Buat penyimpanan sesi sesuai konfigurasi SESSION_BACKEND"""
+    if jenis == "memory":
+        return {}
+    if jenis == "sqlite":
+        return SesiTersinkron(BackendSQLite(db_file))
+    if jenis == "redis":
+        if not redis_url:
+            # Tanpa server bersama sesi tiap worker terpisah: lebih baik gagal saat start
+            raise ValueError("SESSION_BACKEND=redis membutuhkan REDIS_URL")
+        if redis_url == URL_REDIS_PALSU:
+            return SesiTersinkron(BackendRedis(RedisPalsu()))
+        import redis
+        return SesiTersinkron(BackendRedis(redis.Redis.from_url(redis_url)))
+    raise ValueError(f"SESSION_BACKEND tidak dikenal: {jenis}")
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tutup buku harian untuk bot nota.
+
+Dijalankan terjadwal (JobQueue) di thread terpisah, lalu bot mengirim
+laporan ke owner. Hanya hari yang sudah lewat yang ditutup (kemarin dan hari
+yang terlewat), karena run yang selesai tidak diulang lagi; untuk hari ini
+bot hanya mengirim pratinjau yang tidak dicatat di job_run. Tahapan dicatat
+di tabel job_run sehingga jika proses restart di tengah jalan, run yang sama
+dilanjutkan dari checkpoint terakhir:
+
+    ringkasan - isi ringkasan_harian per usaha (penjualan, belanja, piutang);
+                checkpoint = business_id terakhir, ditulis dalam transaksi
+                yang sama dengan ringkasannya
+    optimasi  - wal_checkpoint, PRAGMA optimize, merge indeks FTS, VACUUM jika
+                file banyak ruang kosong; hanya saat tidak ada nota baru
+    laporan   - bot mengirim ringkasan ke owner; checkpoint per usaha. Usaha
+                yang angkanya sama dengan pratinjau yang sudah dikirim dilewati
+    selesai
+
+Pekerjaan berat dibatasi `cpu_persen` dengan jeda di antara unit kerja.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import datetime
+
+logger = logging.getLogger(__name__)
+
+NAMA_JOB = "tutup_harian"
+
+TAHAP_RINGKASAN = "ringkasan"
+TAHAP_OPTIMASI = "optimasi"
+TAHAP_LAPORAN = "laporan"
+TAHAP_SELESAI = "selesai"
+
+# Run dengan heartbeat lebih lama dari ini dianggap mati dan boleh diambil alih
+LEASE_DETIK = 600
+
+# Optimasi hanya dijalankan jika tidak ada nota baru selama ini
+IDLE_MENIT = 15
+
+# VACUUM hanya jika halaman kosong melebihi rasio ini
+RASIO_VACUUM = 0.2
+
+# Jumlah halaman FTS yang di-merge per langkah
+MERGE_FTS = 500
+
+# Hari terlewat (bot mati) paling jauh yang masih ditutup oleh job harian
+MAKS_HARI_TERLEWAT = 7
+
+
+class Pembatas:
+    """Batasi pemakaian CPU: setelah tiap unit kerja, tidur sebanding lama kerjanya"""
+
+    def __init__(self, cpu_persen=50):
+        self.rasio = max(100 / max(min(cpu_persen, 100), 1) - 1, 0)
+        self._mulai = time.monotonic()
+
+    def jeda(self):
+        kerja = time.monotonic() - self._mulai
+        if self.rasio:
+            time.sleep(kerja * self.rasio)
+        self._mulai = time.monotonic()
+
+
+def _repo_nota(repo, db_file):
+    """Repositori untuk membaca nota; default nota di file SQLite yang sama"""
+    if repo is not None:
+        return repo
+    import repositori  # lazy: repositori -> migrasi -> tutup_buku
+    return repositori.RepositoriSQLite(db_file)
+
+def pemilik_proses():
+    return f"{os.uname().nodename}:{os.getpid()}"
+
+def _sekarang():
+    return datetime.datetime.now().isoformat()
+
+def _besok(tanggal):
+    return (datetime.date.fromisoformat(tanggal) + datetime.timedelta(days=1)).isoformat()
+
+def _update_run(conn, tanggal, **kolom):
+    kolom['diperbarui'] = _sekarang()
+    setelan = ", ".join(f"{k} = ?" for k in kolom)
+    conn.execute(
+        f"UPDATE job_run SET {setelan} WHERE nama = ? AND tanggal = ?",
+        (*kolom.values(), NAMA_JOB, tanggal)
+    )
+
+
+# ===== KLAIM RUN =====
+def klaim_run(conn, tanggal, pemilik):
+    """Ambil (atau lanjutkan) run tanggal ini; kembalikan (tahap, checkpoint) atau None jika tidak perlu"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT tahap, checkpoint, status, pemilik, diperbarui, selesai FROM job_run WHERE nama = ? AND tanggal = ?",
+            (NAMA_JOB, tanggal)
+        ).fetchone()
+        if row is None:
+            sekarang = _sekarang()
+            conn.execute('''
+                INSERT INTO job_run (nama, tanggal, tahap, checkpoint, status, pemilik, mulai, diperbarui)
+                VALUES (?, ?, ?, 0, 'berjalan', ?, ?, ?)
+            ''', (NAMA_JOB, tanggal, TAHAP_RINGKASAN, pemilik, sekarang, sekarang))
+            conn.commit()
+            return TAHAP_RINGKASAN, 0
+
+        tahap, checkpoint, status, pemilik_lama, diperbarui, selesai = row
+        if status == 'selesai':
+            if selesai and selesai >= _besok(tanggal):
+                conn.rollback()
+                return None
+            # Ditutup sebelum harinya lewat (versi lama menutup hari ini): hitung ulang
+            logger.info(f"🔁 Tutup buku {tanggal} selesai sebelum harinya lewat, dihitung ulang")
+            sekarang = _sekarang()
+            _update_run(conn, tanggal, tahap=TAHAP_RINGKASAN, checkpoint=0, status='berjalan',
+                        pemilik=pemilik, mulai=sekarang, selesai=None)
+            conn.commit()
+            return TAHAP_RINGKASAN, 0
+        umur = (datetime.datetime.now() - datetime.datetime.fromisoformat(diperbarui)).total_seconds()
+        if pemilik_lama != pemilik and umur < LEASE_DETIK:
+            conn.rollback()
+            logger.info(f"⏭️ Tutup buku {tanggal} sedang dijalankan {pemilik_lama}")
+            return None
+
+        _update_run(conn, tanggal, pemilik=pemilik)
+        conn.commit()
+        if pemilik_lama != pemilik or tahap != TAHAP_RINGKASAN or checkpoint:
+            logger.info(f"🔁 Melanjutkan tutup buku {tanggal} dari tahap {tahap} (checkpoint {checkpoint})")
+        return tahap, checkpoint
+    except Exception:
+        conn.rollback()
+        raise
+
+def run_belum_selesai(db_file, hari_ini=None):
+    """Tanggal (sebelum hari ini) run tutup buku yang berhenti di tengah jalan"""
+    hari_ini = (hari_ini or datetime.date.today()).isoformat()
+    conn = sqlite3.connect(db_file)
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT tanggal FROM job_run WHERE nama = ? AND status = 'berjalan' AND tanggal < ? ORDER BY tanggal",
+            (NAMA_JOB, hari_ini)
+        )]
+    finally:
+        conn.close()
+
+def tanggal_perlu_ditutup(db_file, hari_ini=None, maks_hari=None):
+    """Hari yang sudah lewat tapi belum ditutup final: kemarin + hari terlewat sejak tutup terakhir
+
+    Run yang selesai sebelum harinya lewat tidak dihitung final (lihat klaim_run).
+    """
+    hari_ini = hari_ini or datetime.date.today()
+    maks_hari = MAKS_HARI_TERLEWAT if maks_hari is None else maks_hari
+    kemarin = hari_ini - datetime.timedelta(days=1)
+    batas = (hari_ini - datetime.timedelta(days=maks_hari)).isoformat()
+    conn = sqlite3.connect(db_file)
+    try:
+        final = {
+            tanggal for tanggal, selesai in conn.execute(
+                "SELECT tanggal, selesai FROM job_run WHERE nama = ? AND status = 'selesai' AND tanggal >= ?",
+                (NAMA_JOB, batas)
+            ) if selesai and selesai >= _besok(tanggal)
+        }
+        pertama = conn.execute("SELECT MIN(tanggal) FROM job_run WHERE nama = ?", (NAMA_JOB,)).fetchone()[0]
+    finally:
+        conn.close()
+
+    # Hari sebelum bot pertama kali tutup buku tidak disusulkan
+    awal = hari_ini - datetime.timedelta(days=maks_hari)
+    if pertama is None:
+        awal = kemarin
+    elif pertama > awal.isoformat():
+        awal = datetime.date.fromisoformat(pertama)
+    hasil = []
+    while awal <= kemarin:
+        if awal.isoformat() not in final:
+            hasil.append(awal.isoformat())
+        awal += datetime.timedelta(days=1)
+    return hasil
+
+
+# ===== TAHAP RINGKASAN =====
+def hitung_ringkasan(repo, business_id, tanggal):
+    """Ringkasan satu usaha untuk satu tanggal (YYYY-MM-DD) + piutang berjalan, dibaca lewat repositori nota"""
+    awal = datetime.date.fromisoformat(tanggal)
+    akhir = (awal + datetime.timedelta(days=1)).isoformat()
+    (jumlah_penjualan, total_penjualan), (jumlah_belanja, total_belanja) = repo.statistik_periode(
+        business_id, awal.isoformat(), akhir
+    )
+    # Piutang: semua nota belum lunas sampai akhir tanggal tersebut
+    piutang = repo.piutang_pelanggan(business_id, sebelum=akhir)
+    return {
+        'jumlah_penjualan': jumlah_penjualan, 'total_penjualan': total_penjualan or 0,
+        'jumlah_belanja': jumlah_belanja, 'total_belanja': total_belanja or 0,
+        'jumlah_piutang': sum(row[1] for row in piutang), 'piutang': sum(row[2] for row in piutang),
+    }
+
+def simpan_ringkasan(conn, repo, business_id, tanggal):
+    """Hitung dan upsert ringkasan_harian satu usaha (belum di-commit)
+
+    `dibuat` hanya diperbarui jika angka transaksi hari itu berubah, sehingga
+    tahap laporan bisa melewati usaha yang pratinjaunya sudah dikirim.
+    """
+    data = hitung_ringkasan(repo, business_id, tanggal)
+    conn.execute('''
+        INSERT INTO ringkasan_harian
+        (business_id, tanggal, jumlah_penjualan, total_penjualan, jumlah_belanja, total_belanja,
+         jumlah_piutang, piutang, dibuat)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(business_id, tanggal) DO UPDATE SET
+            dibuat = CASE WHEN jumlah_penjualan = excluded.jumlah_penjualan
+                           AND total_penjualan = excluded.total_penjualan
+                           AND jumlah_belanja = excluded.jumlah_belanja
+                           AND total_belanja = excluded.total_belanja
+                          THEN dibuat ELSE excluded.dibuat END,
+            jumlah_penjualan = excluded.jumlah_penjualan, total_penjualan = excluded.total_penjualan,
+            jumlah_belanja = excluded.jumlah_belanja, total_belanja = excluded.total_belanja,
+            jumlah_piutang = excluded.jumlah_piutang, piutang = excluded.piutang
+    ''', (business_id, tanggal, data['jumlah_penjualan'], data['total_penjualan'], data['jumlah_belanja'],
+          data['total_belanja'], data['jumlah_piutang'], data['piutang'], _sekarang()))
+
+def _tahap_ringkasan(conn, repo, tanggal, checkpoint, pembatas):
+    jumlah = 0
+    daftar_usaha = [row[0] for row in conn.execute("SELECT id FROM usaha WHERE id > ? ORDER BY id", (checkpoint,))]
+    for business_id in daftar_usaha:
+        simpan_ringkasan(conn, repo, business_id, tanggal)
+        # Checkpoint ditulis dalam transaksi yang sama dengan ringkasannya
+        _update_run(conn, tanggal, checkpoint=business_id)
+        conn.commit()
+        jumlah += 1
+        pembatas.jeda()
+    _update_run(conn, tanggal, tahap=TAHAP_OPTIMASI, checkpoint=0)
+    conn.commit()
+    return jumlah
+
+
+# ===== TAHAP OPTIMASI =====
+def sedang_idle(conn, menit=None):
+    """True jika tidak ada nota baru dalam `menit` terakhir (lookup rowid terakhir, O(1))"""
+    menit = IDLE_MENIT if menit is None else menit
+    batas = (datetime.datetime.now() - datetime.timedelta(minutes=menit)).isoformat()
+    for tabel in ("nota_penjualan", "nota_belanja"):
+        row = conn.execute(f"SELECT timestamp FROM {tabel} ORDER BY id DESC LIMIT 1").fetchone()
+        if row and row[0] and row[0] >= batas:
+            return False
+    return True
+
+def _tahap_optimasi(conn, tanggal, pembatas):
+    langkah = []
+    if not sedang_idle(conn):
+        logger.info("⏭️ Optimasi database dilewati: masih ada transaksi")
+        langkah.append("dilewati (tidak idle)")
+    else:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        langkah.append("wal_checkpoint")
+        pembatas.jeda()
+
+        conn.execute("PRAGMA optimize")
+        langkah.append("optimize")
+        pembatas.jeda()
+
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'nota_fts'").fetchone():
+            # Merge bertahap: berhenti jika tidak ada lagi segmen yang digabung
+            for _ in range(20):
+                sebelum = conn.total_changes
+                conn.execute("INSERT INTO nota_fts (nota_fts, rank) VALUES ('merge', ?)", (MERGE_FTS,))
+                conn.commit()
+                pembatas.jeda()
+                if conn.total_changes - sebelum < 2:
+                    break
+            langkah.append("fts_merge")
+
+        halaman = conn.execute("PRAGMA page_count").fetchone()[0]
+        kosong = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if halaman and kosong / halaman > RASIO_VACUUM and sedang_idle(conn):
+            conn.execute("VACUUM")
+            langkah.append(f"vacuum ({kosong} halaman kosong)")
+            pembatas.jeda()
+
+    _update_run(conn, tanggal, tahap=TAHAP_LAPORAN, checkpoint=0)
+    conn.commit()
+    return langkah
+
+
+# ===== RUN =====
+def tutup_harian(db_file, tanggal, pemilik=None, cpu_persen=50, repo=None):
+    """Jalankan (atau lanjutkan) tutup buku tanggal YYYY-MM-DD sampai tahap laporan
+
+    Blocking, dipanggil lewat asyncio.to_thread. Angka nota dibaca lewat `repo`
+    (default: nota di `db_file`); job_run & ringkasan_harian selalu di `db_file`.
+    Kembalikan dict info run atau None jika run sudah selesai / sedang dipegang proses lain.
+    """
+    repo = _repo_nota(repo, db_file)
+    pemilik = pemilik or pemilik_proses()
+    pembatas = Pembatas(cpu_persen)
+    t0 = time.perf_counter()
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        klaim = klaim_run(conn, tanggal, pemilik)
+        if klaim is None:
+            return None
+        tahap, checkpoint = klaim
+        info = {'tanggal': tanggal, 'dilanjutkan': tahap != TAHAP_RINGKASAN or checkpoint > 0,
+                'usaha': 0, 'optimasi': []}
+
+        if tahap == TAHAP_RINGKASAN:
+            info['usaha'] = _tahap_ringkasan(conn, repo, tanggal, checkpoint, pembatas)
+            tahap = TAHAP_OPTIMASI
+        if tahap == TAHAP_OPTIMASI:
+            info['optimasi'] = _tahap_optimasi(conn, tanggal, pembatas)
+
+        info['durasi_detik'] = round(time.perf_counter() - t0, 2)
+        logger.info(f"📒 Tutup buku {tanggal}: {info['usaha']} usaha, optimasi {info['optimasi']}, "
+                    f"{info['durasi_detik']} detik")
+        return info
+    finally:
+        conn.close()
+
+
+# ===== TAHAP LAPORAN =====
+def _susun_laporan(conn, repo, tanggal, setelah, hari_mingguan, sejak=None):
+    """Laporan per usaha (id > setelah) yang ada transaksinya; `sejak` = hanya ringkasan yang berubah sejak itu"""
+    tanggal_obj = datetime.date.fromisoformat(tanggal)
+    mingguan = hari_mingguan is not None and tanggal_obj.weekday() == hari_mingguan
+    awal_minggu = (tanggal_obj - datetime.timedelta(days=6)).isoformat()
+
+    hasil = []
+    for business_id, nama_usaha, jp, tp, jb, tb, jpi, piutang in conn.execute('''
+        SELECT r.business_id, u.nama, r.jumlah_penjualan, r.total_penjualan, r.jumlah_belanja,
+               r.total_belanja, r.jumlah_piutang, r.piutang
+        FROM ringkasan_harian r JOIN usaha u ON u.id = r.business_id
+        WHERE r.tanggal = ? AND r.business_id > ? AND (r.jumlah_penjualan > 0 OR r.jumlah_belanja > 0)
+          AND r.dibuat >= ?
+        ORDER BY r.business_id
+    ''', (tanggal, setelah, sejak or '')).fetchall():
+        laporan = {
+            'business_id': business_id, 'nama_usaha': nama_usaha, 'tanggal': tanggal,
+            'jumlah_penjualan': jp, 'total_penjualan': tp, 'jumlah_belanja': jb, 'total_belanja': tb,
+            'jumlah_piutang': jpi, 'piutang': piutang,
+            'owner': [r[0] for r in conn.execute(
+                "SELECT user_id FROM anggota_usaha WHERE business_id = ? AND role = 'owner'", (business_id,)
+            )],
+            'piutang_terbesar': [
+                (nama, jumlah) for nama, _, jumlah in
+                sorted(repo.piutang_pelanggan(business_id), key=lambda row: row[2], reverse=True)[:3]
+            ],
+            'mingguan': None,
+            'sementara': False,
+        }
+        if mingguan:
+            laporan['mingguan'] = conn.execute('''
+                SELECT COUNT(*), ifnull(SUM(jumlah_penjualan), 0), ifnull(SUM(total_penjualan), 0),
+                       ifnull(SUM(jumlah_belanja), 0), ifnull(SUM(total_belanja), 0)
+                FROM ringkasan_harian WHERE business_id = ? AND tanggal >= ? AND tanggal <= ?
+            ''', (business_id, awal_minggu, tanggal)).fetchone()
+        hasil.append(laporan)
+    return hasil
+
+def laporan_tertunda(db_file, tanggal, hari_mingguan=None, repo=None):
+    """Ringkasan per usaha yang belum dikirim (setelah checkpoint), hanya usaha yang ada transaksinya
+
+    Usaha yang angkanya tidak berubah sejak pratinjau dilewati. Jika
+    `hari_mingguan` sama dengan hari tanggal tersebut, sertakan total 7 hari terakhir.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        row = conn.execute(
+            "SELECT tahap, checkpoint, mulai FROM job_run WHERE nama = ? AND tanggal = ?", (NAMA_JOB, tanggal)
+        ).fetchone()
+        if not row or row[0] != TAHAP_LAPORAN:
+            return []
+        return _susun_laporan(conn, _repo_nota(repo, db_file), tanggal, row[1], hari_mingguan,
+                              sejak=row[2])
+    finally:
+        conn.close()
+
+def pratinjau_harian(db_file, tanggal, hari_mingguan=None, cpu_persen=50, repo=None):
+    """Ringkasan sementara hari yang belum lewat: isi ringkasan_harian lalu kembalikan laporan
+
+    Tidak dicatat di job_run, jadi tutup buku final besok menghitung ulang hari
+    ini dan hanya mengirim laporan lagi untuk usaha yang angkanya berubah.
+    """
+    repo = _repo_nota(repo, db_file)
+    pembatas = Pembatas(cpu_persen)
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        for (business_id,) in conn.execute("SELECT id FROM usaha ORDER BY id").fetchall():
+            simpan_ringkasan(conn, repo, business_id, tanggal)
+            conn.commit()
+            pembatas.jeda()
+        hasil = _susun_laporan(conn, repo, tanggal, 0, hari_mingguan)
+        for laporan in hasil:
+            laporan['sementara'] = True
+        return hasil
+    finally:
+        conn.close()
+
+def tandai_terkirim(db_file, tanggal, business_id):
+    """Checkpoint tahap laporan: usaha sampai business_id sudah dikirimi"""
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        _update_run(conn, tanggal, checkpoint=business_id)
+        conn.commit()
+    finally:
+        conn.close()
+
+def selesaikan(db_file, tanggal):
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        _update_run(conn, tanggal, tahap=TAHAP_SELESAI, status='selesai', selesai=_sekarang())
+        conn.commit()
+    finally:
+        conn.close()